@@ -29,6 +29,7 @@ from neutron.agent.linux import dhcp
 from neutron.agent.linux import external_process
 from neutron.agent.linux import interface
 from neutron.agent.linux import ovs_lib  # noqa
+from neutron.agent.metadata import multiplexed_proxy
 from neutron.agent import rpc as agent_rpc
 from neutron.common import config as common_config
 from neutron.common import constants
@@ -48,6 +49,15 @@ LOG = logging.getLogger(__name__)
 
 
 class DhcpAgent(manager.Manager):
+    """DHCP agent service manager.
+
+    API version history:
+        1.0 - Initial version.
+        1.1 - ports_create_end, ports_update_end and ports_delete_end:
+              port notifications of a network in bulk
+    """
+    target = messaging.Target(version='1.1')
+
     OPTS = [
         cfg.IntOpt('resync_interval', default=5,
                    help=_("Interval to resync.")),
@@ -66,6 +76,11 @@ class DhcpAgent(manager.Manager):
                    default='$state_path/metadata_proxy',
                    help=_('Location of Metadata Proxy UNIX domain '
                           'socket')),
+        cfg.BoolOpt('metadata_proxy_multiplexed', default=False,
+                    help=_("Serve the metadata proxies of all the "
+                           "routers or networks handled by the agent "
+                           "from a single process instead of one process "
+                           "each.")),
     ]
 
     def __init__(self, host=None):
@@ -83,6 +98,11 @@ class DhcpAgent(manager.Manager):
         if not os.path.isdir(dhcp_dir):
             os.makedirs(dhcp_dir, 0o755)
         self.dhcp_version = self.dhcp_driver_cls.check_version()
+        self.metadata_proxy_manager = None
+        if self.conf.metadata_proxy_multiplexed:
+            self.metadata_proxy_manager = (
+                multiplexed_proxy.MultiplexedProxyManager(
+                    self.conf, 'dhcp-agent', self.root_helper))
         self._populate_networks_cache()
 
     def _populate_networks_cache(self):
@@ -348,12 +368,45 @@ class DhcpAgent(manager.Manager):
             self.cache.remove_port(port)
             self.call_driver('reload_allocations', network)
 
+    @utils.synchronized('dhcp-agent')
+    def ports_update_end(self, context, payload):
+        """Handle the update notification of many ports.
+
+        The allocations of each network are reloaded once.
+        """
+        networks = collections.OrderedDict()
+        for port in payload['ports']:
+            updated_port = dhcp.DictModel(port)
+            network = self.cache.get_network_by_id(updated_port.network_id)
+            if network:
+                self.cache.put_port(updated_port)
+                networks[network.id] = network
+        for network in networks.values():
+            self.call_driver('reload_allocations', network)
+
+    # Use the update handler for the port create event.
+    ports_create_end = ports_update_end
+
+    @utils.synchronized('dhcp-agent')
+    def ports_delete_end(self, context, payload):
+        """Handle the delete notification of many ports."""
+        networks = collections.OrderedDict()
+        for port_id in payload['port_ids']:
+            port = self.cache.get_port_by_id(port_id)
+            if port:
+                network = self.cache.get_network_by_id(port.network_id)
+                self.cache.remove_port(port)
+                networks[network.id] = network
+        for network in networks.values():
+            self.call_driver('reload_allocations', network)
+
     def enable_isolated_metadata_proxy(self, network):
 
         # The proxy might work for either a single network
         # or all the networks connected via a router
         # to the one passed as a parameter
-        neutron_lookup_param = '--network_id=%s' % network.id
+        network_id = network.id
+        router_id = None
         # When the metadata network is enabled, the proxy might
         # be started for the router attached to the network
         if self.conf.enable_metadata_network:
@@ -370,8 +423,19 @@ class DhcpAgent(manager.Manager):
                                 {'port_num': len(router_ports),
                                  'port_id': router_ports[0].id,
                                  'router_id': router_ports[0].device_id})
-                neutron_lookup_param = ('--router_id=%s' %
-                                        router_ports[0].device_id)
+                network_id = None
+                router_id = router_ports[0].device_id
+
+        if self.metadata_proxy_manager:
+            self.metadata_proxy_manager.add(
+                network.id, network.namespace, dhcp.METADATA_PORT,
+                network_id=network_id, router_id=router_id)
+            return
+
+        if router_id:
+            neutron_lookup_param = '--router_id=%s' % router_id
+        else:
+            neutron_lookup_param = '--network_id=%s' % network_id
 
         def callback(pid_file):
             metadata_proxy_socket = cfg.CONF.metadata_proxy_socket
@@ -393,6 +457,9 @@ class DhcpAgent(manager.Manager):
         pm.enable(callback)
 
     def disable_isolated_metadata_proxy(self, network):
+        if self.metadata_proxy_manager:
+            self.metadata_proxy_manager.remove(network.id)
+            return
         pm = external_process.ProcessManager(
             self.conf,
             network.id,
@@ -37,6 +37,7 @@ from neutron.agent.linux import interface
 from neutron.agent.linux import ip_lib
 from neutron.agent.linux import iptables_manager
 from neutron.agent.linux import ra
+from neutron.agent.metadata import multiplexed_proxy
 from neutron.agent import rpc as agent_rpc
 from neutron.common import config as common_config
 from neutron.common import constants as l3_constants
@@ -156,8 +157,9 @@ class L3NATAgent(firewall_l3_agent.FWaaSL3AgentRpcCallback,
               - add_arp_entry
               - del_arp_entry
               Needed by the L3 service when dealing with DVR
+        1.3 - update_arp_entries: ARP entries of a DVR router in bulk
     """
-    target = messaging.Target(version='1.2')
+    target = messaging.Target(version='1.3')
 
     OPTS = [
         cfg.StrOpt('agent_mode', default='legacy',
@@ -202,6 +204,17 @@ class L3NATAgent(firewall_l3_agent.FWaaSL3AgentRpcCallback,
                    default='$state_path/metadata_proxy',
                    help=_('Location of Metadata Proxy UNIX domain '
                           'socket')),
+        cfg.BoolOpt('metadata_proxy_multiplexed', default=False,
+                    help=_("Serve the metadata proxies of all the "
+                           "routers or networks handled by the agent "
+                           "from a single process instead of one process "
+                           "each.")),
+        cfg.IntOpt('router_processing_workers', default=8,
+                   help=_("Number of routers the agent processes "
+                          "concurrently.")),
+        cfg.IntOpt('iptables_apply_workers', default=16,
+                   help=_("Maximum number of router namespaces whose "
+                          "iptables rules are applied concurrently.")),
     ]
 
     def __init__(self, host, conf=None):
@@ -211,9 +224,17 @@ class L3NATAgent(firewall_l3_agent.FWaaSL3AgentRpcCallback,
             self.conf = cfg.CONF
         self.root_helper = config.get_root_helper(self.conf)
         self.router_info = {}
+        self.iptables_apply_service = iptables_manager.IptablesApplyService(
+            self.conf.iptables_apply_workers)
 
         self._check_config_params()
 
+        self.metadata_proxy_manager = None
+        if self.conf.metadata_proxy_multiplexed:
+            self.metadata_proxy_manager = (
+                multiplexed_proxy.MultiplexedProxyManager(
+                    self.conf, 'l3-agent', self.root_helper))
+
         try:
             self.driver = importutils.import_object(
                 self.conf.interface_driver,
@@ -461,7 +482,9 @@ class L3NATAgent(firewall_l3_agent.FWaaSL3AgentRpcCallback,
                                     root_helper=self.root_helper,
                                     router=router,
                                     use_ipv6=self.use_ipv6,
-                                    ns_name=ns_name)
+                                    ns_name=ns_name,
+                                    iptables_apply_service=(
+                                        self.iptables_apply_service))
         self.event_observers.notify(
             adv_svc.AdvancedService.before_router_added, ri)
 
@@ -537,11 +560,19 @@ class L3NATAgent(firewall_l3_agent.FWaaSL3AgentRpcCallback,
             ns_name)
 
     def _spawn_metadata_proxy(self, router_id, ns_name):
+        if self.metadata_proxy_manager:
+            self.metadata_proxy_manager.add(router_id, ns_name,
+                                            self.conf.metadata_port,
+                                            router_id=router_id)
+            return
         callback = self._get_metadata_proxy_callback(router_id)
         pm = self._get_metadata_proxy_process_manager(router_id, ns_name)
         pm.enable(callback)
 
     def _destroy_metadata_proxy(self, router_id, ns_name):
+        if self.metadata_proxy_manager:
+            self.metadata_proxy_manager.remove(router_id)
+            return
         pm = self._get_metadata_proxy_process_manager(router_id, ns_name)
         pm.disable()
 
@@ -554,12 +585,15 @@ class L3NATAgent(firewall_l3_agent.FWaaSL3AgentRpcCallback,
             self.plugin_rpc.get_ports_by_subnet(self.context,
                                                 subnet_id))
 
+        entries = []
         for p in subnet_ports:
             if p['device_owner'] not in l3_constants.ROUTER_INTERFACE_OWNERS:
                 for fixed_ip in p['fixed_ips']:
-                    self._update_arp_entry(ri, fixed_ip['ip_address'],
-                                           p['mac_address'],
-                                           subnet_id, 'add')
+                    entries.append({'ip_address': fixed_ip['ip_address'],
+                                    'mac_address': p['mac_address'],
+                                    'subnet_id': subnet_id,
+                                    'operation': 'add'})
+        self._update_arp_entries(ri, entries)
 
     def _set_subnet_info(self, port):
         ips = port['fixed_ips']
@@ -1022,7 +1056,8 @@ class L3NATAgent(firewall_l3_agent.FWaaSL3AgentRpcCallback,
         ri.snat_iptables_manager = iptables_manager.IptablesManager(
             root_helper=self.root_helper,
             namespace=snat_ns_name,
-            use_ipv6=self.use_ipv6)
+            use_ipv6=self.use_ipv6,
+            apply_service=self.iptables_apply_service)
         # kicks the FW Agent to add rules for the snat namespace
         self.process_router_add(ri)
 
@@ -1043,11 +1078,12 @@ class L3NATAgent(firewall_l3_agent.FWaaSL3AgentRpcCallback,
                 self.get_gw_port_host(ri.router) == self.host):
                 self._create_dvr_gateway(ri, ex_gw_port, interface_name,
                                          snat_ports)
-            for port in snat_ports:
-                for ip in port['fixed_ips']:
-                    self._update_arp_entry(ri, ip['ip_address'],
-                                           port['mac_address'],
-                                           ip['subnet_id'], 'add')
+            self._update_arp_entries(ri, [
+                {'ip_address': ip['ip_address'],
+                 'mac_address': port['mac_address'],
+                 'subnet_id': ip['subnet_id'],
+                 'operation': 'add'}
+                for port in snat_ports for ip in port['fixed_ips']])
             return
 
         # Compute a list of addresses this router is supposed to have.
@@ -1324,7 +1360,8 @@ class L3NATAgent(firewall_l3_agent.FWaaSL3AgentRpcCallback,
         self._create_namespace(fip_ns_name)
         ri.fip_iptables_manager = iptables_manager.IptablesManager(
             root_helper=self.root_helper, namespace=fip_ns_name,
-            use_ipv6=self.use_ipv6)
+            use_ipv6=self.use_ipv6,
+            apply_service=self.iptables_apply_service)
         # no connection tracking needed in fip namespace
         ri.fip_iptables_manager.ipv4['raw'].add_rule('PREROUTING',
                                                      '-j CT --notrack')
@@ -1462,6 +1499,23 @@ class L3NATAgent(firewall_l3_agent.FWaaSL3AgentRpcCallback,
                 LOG.exception(_LE("DVR: Failed updating arp entry"))
                 self.fullsync = True
 
+    def _update_arp_entries(self, ri, entries):
+        """Add or delete arp entries of the router.
+
+        Each entry is a dict with the ip_address, mac_address, subnet_id and
+        operation, 'add' or 'delete', of an arp entry.
+        """
+        for entry in entries:
+            self._update_arp_entry(ri, entry['ip_address'],
+                                   entry['mac_address'], entry['subnet_id'],
+                                   entry['operation'])
+
+    def update_arp_entries(self, context, payload):
+        """Add and delete arp entries of a router.  Called from RPC."""
+        ri = self.router_info.get(payload['router_id'])
+        if ri:
+            self._update_arp_entries(ri, payload['arp_table'])
+
     def add_arp_entry(self, context, payload):
         """Add arp entry into router namespace.  Called from RPC."""
         arp_table = payload['arp_table']
@@ -1592,11 +1646,19 @@ class L3NATAgent(firewall_l3_agent.FWaaSL3AgentRpcCallback,
             LOG.debug("Finished a router update for %s", update.id)
             rp.fetched_and_processed(update.timestamp)
 
+    def _process_routers_worker(self):
+        while True:
+            try:
+                self._process_router_update()
+            except Exception:
+                LOG.exception(_LE("Failed to process a router update"))
+
     def _process_routers_loop(self):
         LOG.debug("Starting _process_routers_loop")
-        pool = eventlet.GreenPool(size=8)
-        while True:
-            pool.spawn_n(self._process_router_update)
+        pool = eventlet.GreenPool(size=self.conf.router_processing_workers)
+        for i in range(self.conf.router_processing_workers):
+            pool.spawn_n(self._process_routers_worker)
+        pool.waitall()
 
     @periodic_task.periodic_task
     def periodic_sync_routers_task(self, context):
@@ -1739,6 +1801,13 @@ class L3NATAgentWithStateReport(L3NATAgent):
         configurations['ex_gw_ports'] = num_ex_gw_ports
         configurations['interfaces'] = num_interfaces
         configurations['floating_ips'] = num_floating_ips
+        # The statistics change with every report, they are kept out of the
+        # configurations which the server compares to tell whether a report
+        # only carries a heartbeat and which the schedulers read
+        self.agent_state['statistics'] = {
+            'router_processing': self._queue.get_stats(),
+            'keepalived': dict(self.keepalived_stats),
+            'iptables_apply': dict(self.iptables_apply_service.stats)}
         try:
             self.state_rpc.report_state(self.context, self.agent_state,
                                         self.use_call)
@@ -13,12 +13,14 @@
 #    License for the specific language governing permissions and limitations
 #    under the License.
 
+import collections
 import os
 import shutil
 import signal
 
 from oslo.config import cfg
 
+from neutron.agent.linux import external_process
 from neutron.agent.linux import keepalived
 from neutron.common import constants as l3_constants
 from neutron.i18n import _LE
@@ -95,6 +97,8 @@ class RouterMixin(object):
 class AgentMixin(object):
     def __init__(self, host):
         self._init_ha_conf_path()
+        # Shared by the keepalived managers of all the HA routers
+        self.keepalived_stats = collections.Counter()
         super(AgentMixin, self).__init__(host)
 
     def _init_ha_conf_path(self):
@@ -108,7 +112,8 @@ class AgentMixin(object):
             keepalived.KeepalivedConf(),
             conf_path=self.conf.ha_confs_path,
             namespace=ri.ns_name,
-            root_helper=self.root_helper)
+            root_helper=self.root_helper,
+            stats=self.keepalived_stats)
 
         config = ri.keepalived_manager.config
 
@@ -228,5 +233,6 @@ class AgentMixin(object):
     @periodic_task.periodic_task
     def _ensure_keepalived_alive(self, context):
         # TODO(amuller): Use external_process.ProcessMonitor
+        running_pids = external_process.get_running_pids()
         for router in self.get_ha_routers():
-            router.keepalived_manager.revive()
+            router.keepalived_manager.revive(running_pids)
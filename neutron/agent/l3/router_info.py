@@ -19,7 +19,7 @@ from neutron.agent.linux import iptables_manager
 class RouterInfo(ha.RouterMixin):
 
     def __init__(self, router_id, root_helper, router,
-                 use_ipv6=False, ns_name=None):
+                 use_ipv6=False, ns_name=None, iptables_apply_service=None):
         self.router_id = router_id
         self.ex_gw_port = None
         self._snat_enabled = None
@@ -35,7 +35,8 @@ class RouterInfo(ha.RouterMixin):
         self.iptables_manager = iptables_manager.IptablesManager(
             root_helper=root_helper,
             use_ipv6=use_ipv6,
-            namespace=self.ns_name)
+            namespace=self.ns_name,
+            apply_service=iptables_apply_service)
         self.snat_iptables_manager = None
         self.routes = []
         # DVR Data
@@ -13,8 +13,11 @@
 #    under the License.
 #
 
+import collections
 import datetime
-import Queue
+import itertools
+import threading
+import time
 
 from oslo.utils import timeutils
 
@@ -23,6 +26,11 @@ PRIORITY_RPC = 0
 PRIORITY_SYNC_ROUTERS_TASK = 1
 DELETE_ROUTER = 1
 
+# One update out of this many is taken from the lower priorities when
+# updates of several priorities wait, so that a stream of RPC updates does
+# not hold back the routers of a full synchronization forever
+LOWER_PRIORITY_SHARE = 4
+
 
 class RouterUpdate(object):
     """Encapsulates a router update
@@ -39,6 +47,25 @@ class RouterUpdate(object):
         self.id = router_id
         self.action = action
         self.router = router
+        self.enqueued_at = None
+
+    def merge(self, other):
+        """Merge a later update for the same router into this one
+
+        The merged update keeps the highest priority and the latest
+        timestamp. When the two updates do not carry the same action, or
+        one of them carries no router data, the router is fetched again and
+        the agent brings it in line with whatever it gets.
+        """
+        self.priority = min(self.priority, other.priority)
+        if self.action == other.action and self.router and other.router:
+            if other.timestamp > self.timestamp:
+                self.router = other.router
+        else:
+            self.router = None
+        if self.action != other.action:
+            self.action = None
+        self.timestamp = max(self.timestamp, other.timestamp)
 
     def __lt__(self, other):
         """Implements priority among updates
@@ -136,12 +163,85 @@ class ExclusiveRouterProcessor(object):
 
 
 class RouterProcessingQueue(object):
-    """Manager of the queue of routers to process."""
+    """Manager of the queue of routers to process.
+
+    A router has at most one update waiting in the queue: later updates are
+    merged into it, so routers updated often do not delay the others and
+    the queue never holds more updates than there are routers. Updates of
+    the same priority are processed in the order their routers were queued,
+    and higher priorities go first except for one update out of
+    LOWER_PRIORITY_SHARE, which is taken from the lower priorities.
+    """
     def __init__(self):
-        self._queue = Queue.PriorityQueue()
+        self._queues = collections.defaultdict(collections.deque)
+        self._ready = threading.Semaphore(0)
+        self._updates = {}
+        self._counter = itertools.count()
+        self._taken = 0
+        self._processed = 0
+        self._merged = 0
+        self._latency_count = 0
+        self._latency_total = 0.0
+        self._latency_max = 0.0
 
     def add(self, update):
-        self._queue.put(update)
+        queued = self._updates.get(update.id)
+        if queued:
+            self._merged += 1
+            queued_update, key = queued
+            queued_update.merge(update)
+            if queued_update.priority < key[0]:
+                # The entry already in the queue is then ignored
+                key = self._put(queued_update)
+            self._updates[update.id] = (queued_update, key)
+        else:
+            update.enqueued_at = time.time()
+            self._updates[update.id] = (update, self._put(update))
+            self._ready.release()
+
+    def _put(self, update):
+        key = (update.priority, next(self._counter), update.id)
+        self._queues[update.priority].append(key)
+        return key
+
+    def _get(self):
+        self._ready.acquire()
+        self._taken += 1
+        priorities = sorted(p for p, keys in self._queues.items() if keys)
+        if self._taken % LOWER_PRIORITY_SHARE == 0:
+            priorities = priorities[1:] + priorities[:1]
+        for priority in priorities:
+            keys = self._queues[priority]
+            while keys:
+                key = keys.popleft()
+                update, current_key = self._updates.get(key[2], (None, None))
+                if key == current_key:
+                    del self._updates[key[2]]
+                    return update
+
+    def get_stats(self):
+        """Return the queue metrics.
+
+        The latencies, from queuing to processing, are those of the updates
+        processed since the previous call.
+        """
+        stats = {'queue_depth': len(self._updates),
+                 'processed': self._processed,
+                 'merged': self._merged,
+                 'mean_latency': (self._latency_total / self._latency_count
+                                  if self._latency_count else 0.0),
+                 'max_latency': self._latency_max}
+        self._latency_count = 0
+        self._latency_total = 0.0
+        self._latency_max = 0.0
+        return stats
+
+    def _record_processed(self, update):
+        latency = time.time() - update.enqueued_at
+        self._processed += 1
+        self._latency_count += 1
+        self._latency_total += latency
+        self._latency_max = max(self._latency_max, latency)
 
     def each_update_to_next_router(self):
         """Grabs the next router from the queue and processes
@@ -149,7 +249,7 @@ class RouterProcessingQueue(object):
         This method uses a for loop to process the router repeatedly until
         updates stop bubbling to the front of the queue.
         """
-        next_update = self._queue.get()
+        next_update = self._get()
 
         with ExclusiveRouterProcessor(next_update.id) as rp:
             # Queue the update whether this worker is the master or not.
@@ -160,3 +260,4 @@ class RouterProcessingQueue(object):
             # noop.
             for update in rp.updates():
                 yield (rp, update)
+                self._record_processed(update)
@@ -13,6 +13,7 @@
 #    under the License.
 
 import collections
+import os
 
 import eventlet
 from oslo.config import cfg
@@ -116,8 +117,17 @@ class ProcessManager(object):
 
     @property
     def active(self):
+        return self.is_active()
+
+    def is_active(self, running_pids=None):
+        """Whether the process is running.
+
+        :param running_pids: pids returned by get_running_pids(), saving
+                             the /proc lookup of processes which are gone.
+        """
         pid = self.pid
-        if pid is None:
+        if pid is None or (running_pids is not None and
+                           pid not in running_pids):
             return False
 
         cmdline = '/proc/%s/cmdline' % pid
@@ -128,6 +138,15 @@ class ProcessManager(object):
             return False
 
 
+def get_running_pids():
+    """Return the pids of all the running processes from a single /proc scan.
+
+    Checking many processes against this set is cheaper than looking up
+    each of them in /proc.
+    """
+    return set(int(pid) for pid in os.listdir('/proc') if pid.isdigit())
+
+
 ServiceId = collections.namedtuple('ServiceId', ['uuid', 'service'])
 
 
@@ -21,7 +21,10 @@
 import os
 import re
 import sys
+import time
 
+import eventlet
+from eventlet import event
 from oslo.config import cfg
 from oslo.utils import excutils
 
@@ -259,6 +262,57 @@ class IptablesTable(object):
             self.rules.remove(rule)
 
 
+class IptablesApplyService(object):
+    """Apply the rules of many IptablesManagers with bounded concurrency.
+
+    The managers created with the service hand their applies over to a pool
+    of workers, so that the rules of different namespaces are applied in
+    parallel, up to the number of workers. Applies of a manager requested
+    while a previous one is still waiting for a worker are merged with it,
+    as it will apply the latest rules anyway.
+    """
+
+    def __init__(self, workers):
+        self._pool = eventlet.GreenPool(workers)
+        self._pending = {}
+        self.stats = {'applies': 0, 'merged': 0, 'failures': 0,
+                      'wait_time': 0.0, 'apply_time': 0.0,
+                      'max_apply_time': 0.0}
+
+    def apply(self, manager):
+        """Apply the rules of manager and wait until they are applied."""
+        done = self._pending.get(manager)
+        if done:
+            self.stats['merged'] += 1
+        else:
+            done = self._pending[manager] = event.Event()
+            self._pool.spawn_n(self._apply, manager, done, time.time())
+        return done.wait()
+
+    def _apply(self, manager, done, queued_at):
+        # Rules changed from now on need another apply
+        del self._pending[manager]
+        started_at = time.time()
+        try:
+            result = manager._apply_locked()
+        except Exception:
+            self.stats['failures'] += 1
+            done.send_exception(*sys.exc_info())
+        else:
+            done.send(result)
+        finally:
+            duration = time.time() - started_at
+            self.stats['applies'] += 1
+            self.stats['wait_time'] += started_at - queued_at
+            self.stats['apply_time'] += duration
+            self.stats['max_apply_time'] = max(
+                self.stats['max_apply_time'], duration)
+            LOG.debug("Applied iptables rules of namespace %(ns)s in "
+                      "%(duration).3fs after waiting %(wait).3fs",
+                      {'ns': manager.namespace, 'duration': duration,
+                       'wait': started_at - queued_at})
+
+
 class IptablesManager(object):
     """Wrapper for iptables.
 
@@ -284,7 +338,7 @@ class IptablesManager(object):
 
     def __init__(self, _execute=None, state_less=False,
                  root_helper=None, use_ipv6=False, namespace=None,
-                 binary_name=binary_name):
+                 binary_name=binary_name, apply_service=None):
         if _execute:
             self.execute = _execute
         else:
@@ -294,6 +348,7 @@ class IptablesManager(object):
         self.use_ipv6 = use_ipv6
         self.root_helper = root_helper
         self.namespace = namespace
+        self.apply_service = apply_service
         self.iptables_apply_deferred = False
         self.wrap_name = binary_name[:16]
 
@@ -383,6 +438,11 @@ class IptablesManager(object):
         self._apply()
 
     def _apply(self):
+        if self.apply_service:
+            return self.apply_service.apply(self)
+        return self._apply_locked()
+
+    def _apply_locked(self):
         lock_name = 'iptables'
         if self.namespace:
             lock_name += '-' + self.namespace
@@ -690,3 +750,60 @@ class IptablesManager(object):
                 acc['bytes'] += int(data[1])
 
         return acc
+
+    def get_chains_traffic_counters(self, chains, wrap=True, zero=False):
+        """Return the traffic counters of several chains at once.
+
+        Each table holding some of the chains is listed as a whole, so that
+        a single command is run per table whatever the number of chains.
+        Listing a table with zero set resets the counters of all its
+        chains. Chains which do not exist are left out of the result.
+        """
+        names = set(get_chain_name(chain, wrap) for chain in chains)
+        cmd_tables = [('iptables', key, table)
+                      for key, table in self.ipv4.items()]
+        if self.use_ipv6:
+            cmd_tables += [('ip6tables', key, table)
+                           for key, table in self.ipv6.items()]
+        accs = {}
+        for cmd, table_name, table in cmd_tables:
+            chain_set = table._select_chain_set(wrap)
+            if not names.intersection(chain_set):
+                continue
+            args = [cmd, '-t', table_name, '-L', '-n', '-v', '-x']
+            if zero:
+                args.append('-Z')
+            if self.namespace:
+                args = ['ip', 'netns', 'exec', self.namespace] + args
+            current_table = self.execute(args, root_helper=self.root_helper)
+            table_accs = _parse_traffic_counters(current_table)
+            for name in names.intersection(table_accs):
+                acc = accs.setdefault(name, {'pkts': 0, 'bytes': 0})
+                acc['pkts'] += table_accs[name]['pkts']
+                acc['bytes'] += table_accs[name]['bytes']
+
+        for chain in chains:
+            if get_chain_name(chain, wrap) not in accs:
+                LOG.warn(_LW('Attempted to get traffic counters of chain %s '
+                             'which does not exist'), chain)
+        return accs
+
+
+def _parse_traffic_counters(listing):
+    """Return the sum of the traffic counters of each chain of a listing.
+
+    The listing is the output of iptables -L -n -v -x, in which each chain
+    starts with a 'Chain <name> ...' line followed by the column headers.
+    """
+    accs = {}
+    acc = None
+    for line in listing.split('\n'):
+        if line.startswith('Chain '):
+            acc = accs.setdefault(line.split()[1], {'pkts': 0, 'bytes': 0})
+            continue
+        data = line.split()
+        if (acc is not None and len(data) >= 2 and
+                data[0].isdigit() and data[1].isdigit()):
+            acc['pkts'] += int(data[0])
+            acc['bytes'] += int(data[1])
+    return accs
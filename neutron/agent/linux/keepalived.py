@@ -12,6 +12,7 @@
 # License for the specific language governing permissions and limitations
 # under the License.
 
+import collections
 import itertools
 import os
 import stat
@@ -308,7 +309,7 @@ class KeepalivedManager(KeepalivedNotifierMixin):
     """
 
     def __init__(self, resource_id, config, conf_path='/tmp',
-                 namespace=None, root_helper=None):
+                 namespace=None, root_helper=None, stats=None):
         self.resource_id = resource_id
         self.config = config
         self.namespace = namespace
@@ -317,16 +318,29 @@ class KeepalivedManager(KeepalivedNotifierMixin):
         self.conf = cfg.CONF
         self.process = None
         self.spawned = False
+        # Counts of reloads, of reloads skipped because the configuration
+        # did not change and of dead instances spawned again
+        self.stats = collections.Counter() if stats is None else stats
 
     def _output_config_file(self):
+        """Write the configuration file unless it is up to date.
+
+        :returns: the path of the file and whether its content changed.
+        """
         config_str = self.config.get_config_str()
         config_path = self._get_full_config_file_path('keepalived.conf')
+        try:
+            with open(config_path) as f:
+                if f.read() == config_str:
+                    return config_path, False
+        except IOError:
+            pass
         utils.replace_file(config_path, config_str)
 
-        return config_path
+        return config_path, True
 
     def spawn(self):
-        config_path = self._output_config_file()
+        config_path, changed = self._output_config_file()
 
         self.process = external_process.ProcessManager(
             self.conf,
@@ -342,7 +356,9 @@ class KeepalivedManager(KeepalivedNotifierMixin):
                    '-r', '%s-vrrp' % pid_file]
             return cmd
 
-        self.process.enable(callback)
+        # An instance left running by a previous agent must be reloaded if
+        # the configuration changed meanwhile
+        self.process.enable(callback, reload_cfg=changed)
 
         self.spawned = True
         LOG.debug('Keepalived spawned with config %s', config_path)
@@ -355,20 +371,30 @@ class KeepalivedManager(KeepalivedNotifierMixin):
 
     def restart(self):
         if self.process.active:
-            self._output_config_file()
-            self.process.reload_cfg()
+            if self._output_config_file()[1]:
+                self.process.reload_cfg()
+                self.stats['reloads'] += 1
+            else:
+                self.stats['unchanged'] += 1
         else:
             LOG.warn(_LW('A previous instance of keepalived seems to be dead, '
                          'unable to restart it, a new instance will be '
                          'spawned'))
             self.process.disable()
             self.spawn()
+            self.stats['respawns'] += 1
 
     def disable(self):
         if self.process:
             self.process.disable(sig='15')
             self.spawned = False
 
-    def revive(self):
-        if self.spawned and not self.process.active:
+    def revive(self, running_pids=None):
+        """Spawn keepalived again if it died.
+
+        :param running_pids: pids returned by
+                             external_process.get_running_pids(), to check
+                             many instances with a single scan of /proc.
+        """
+        if self.spawned and not self.process.is_active(running_pids):
             self.restart()
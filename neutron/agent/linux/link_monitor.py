@@ -0,0 +1,154 @@
+# Copyright 2015 OpenStack Foundation
+#
+#    Licensed under the Apache License, Version 2.0 (the "License"); you may
+#    not use this file except in compliance with the License. You may obtain
+#    a copy of the License at
+#
+#         http://www.apache.org/licenses/LICENSE-2.0
+#
+#    Unless required by applicable law or agreed to in writing, software
+#    distributed under the License is distributed on an "AS IS" BASIS, WITHOUT
+#    WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied. See the
+#    License for the specific language governing permissions and limitations
+#    under the License.
+
+"""Monitor the creation and removal of network links through netlink.
+
+Subscribing to the RTNLGRP_LINK multicast group of a NETLINK_ROUTE socket
+lets the kernel notify the agents of link changes as they happen, without
+spawning any process nor requiring privileges.
+"""
+
+import errno
+import socket
+import struct
+
+import eventlet
+from eventlet import event
+
+from neutron.i18n import _LE, _LW
+from neutron.openstack.common import log as logging
+
+LOG = logging.getLogger(__name__)
+
+NETLINK_ROUTE = 0
+RTMGRP_LINK = 0x1
+RTM_NEWLINK = 16
+RTM_DELLINK = 17
+IFLA_IFNAME = 3
+
+# struct nlmsghdr, struct ifinfomsg and struct rtattr
+NLMSGHDR = struct.Struct('=IHHII')
+IFINFOMSG = struct.Struct('=BxHiII')
+RTATTR = struct.Struct('=HH')
+
+RECV_BUFFER_SIZE = 65536
+DEFAULT_RESPAWN_INTERVAL = 1
+
+
+def _align(length):
+    return (length + 3) & ~3
+
+
+def _get_ifname(data, offset, end):
+    while offset + RTATTR.size <= end:
+        length, attr_type = RTATTR.unpack_from(data, offset)
+        if length < RTATTR.size:
+            break
+        if attr_type == IFLA_IFNAME:
+            return data[offset + RTATTR.size:offset + length].rstrip('\0')
+        offset += _align(length)
+
+
+def parse_link_events(data):
+    """Return the (message type, link name) of the link messages in data."""
+    events = []
+    offset = 0
+    while offset + NLMSGHDR.size <= len(data):
+        length, msg_type = NLMSGHDR.unpack_from(data, offset)[:2]
+        if length < NLMSGHDR.size:
+            break
+        if msg_type in (RTM_NEWLINK, RTM_DELLINK):
+            name = _get_ifname(data, offset + NLMSGHDR.size + IFINFOMSG.size,
+                               offset + length)
+            if name:
+                events.append((msg_type, name))
+        offset += _align(length)
+    return events
+
+
+class LinkMonitor(object):
+    """Wake up waiters when links matching a prefix change.
+
+    Lost notifications, e.g. when the socket buffer overflows, are reported
+    as changes so that the caller does a full scan of the links.
+    """
+
+    def __init__(self, prefix='',
+                 respawn_interval=DEFAULT_RESPAWN_INTERVAL):
+        self.prefix = prefix
+        self.respawn_interval = respawn_interval
+        self._changed = event.Event()
+        self._sock = None
+        self._thread = None
+
+    def _open(self):
+        sock = socket.socket(socket.AF_NETLINK, socket.SOCK_RAW,
+                             NETLINK_ROUTE)
+        sock.bind((0, RTMGRP_LINK))
+        return sock
+
+    def start(self):
+        self._sock = self._open()
+        self._thread = eventlet.spawn(self._run)
+
+    def stop(self):
+        if self._thread:
+            self._thread.kill()
+            self._thread = None
+        if self._sock:
+            self._sock.close()
+            self._sock = None
+
+    def _notify(self):
+        if not self._changed.ready():
+            self._changed.send()
+
+    def _reopen(self):
+        self._sock.close()
+        while True:
+            eventlet.sleep(self.respawn_interval)
+            try:
+                self._sock = self._open()
+                return
+            except socket.error as e:
+                LOG.error(_LE("Failed to open a netlink socket: %s"), e)
+
+    def _run(self):
+        while True:
+            try:
+                data = self._sock.recv(RECV_BUFFER_SIZE)
+            except socket.error as e:
+                if e.errno == errno.ENOBUFS:
+                    LOG.warning(_LW("Link notifications were lost"))
+                else:
+                    LOG.error(_LE("Error receiving link notifications: %s, "
+                                  "reopening the netlink socket"), e)
+                    self._reopen()
+                self._notify()
+                continue
+            if any(name.startswith(self.prefix)
+                   for _type, name in parse_link_events(data)):
+                self._notify()
+
+    def wait(self, timeout):
+        """Wait for changes up to timeout seconds.
+
+        Returns whether links changed since the previous call.
+        """
+        with eventlet.Timeout(timeout, False):
+            self._changed.wait()
+        changed = self._changed.ready()
+        if changed:
+            self._changed = event.Event()
+        return changed
@@ -0,0 +1,320 @@
+# Copyright 2015 OpenStack Foundation
+#
+#    Licensed under the Apache License, Version 2.0 (the "License"); you may
+#    not use this file except in compliance with the License. You may obtain
+#    a copy of the License at
+#
+#         http://www.apache.org/licenses/LICENSE-2.0
+#
+#    Unless required by applicable law or agreed to in writing, software
+#    distributed under the License is distributed on an "AS IS" BASIS, WITHOUT
+#    WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied. See the
+#    License for the specific language governing permissions and limitations
+#    under the License.
+
+"""Serve the metadata proxies of many namespaces from a single process.
+
+Running one neutron-ns-metadata-proxy per router or network costs a whole
+Python interpreter for each of them. The multiplexed proxy instead opens
+one listening socket inside each namespace and serves all of them from
+the same event loop, tagging the requests with the router or network the
+socket was opened for. The agents add and remove proxies through a UNIX
+domain control socket.
+"""
+
+import collections
+import contextlib
+import ctypes
+import ctypes.util
+import errno
+import os
+import socket
+import time
+
+import eventlet
+from eventlet import semaphore
+import eventlet.wsgi
+from oslo.config import cfg
+from oslo.serialization import jsonutils
+
+from neutron.agent.common import config
+from neutron.agent.linux import daemon
+from neutron.agent.linux import external_process
+from neutron.agent.linux import utils as linux_utils
+from neutron.agent.metadata import namespace_proxy
+from neutron.common import config as common_config
+from neutron.common import exceptions
+from neutron.common import utils
+from neutron.i18n import _LE, _LI
+from neutron.openstack.common import log as logging
+
+LOG = logging.getLogger(__name__)
+
+NETNS_RUN_DIR = '/var/run/netns'
+CLONE_NEWNET = 0x40000000
+# Seconds an agent waits for a freshly spawned daemon to accept requests
+CONTROL_SOCKET_TIMEOUT = 10
+
+_libc = None
+
+
+class ControlRequestFailed(exceptions.NeutronException):
+    message = _("Metadata proxy control request %(request)s failed: "
+                "%(reason)s")
+
+
+def _setns(fd):
+    global _libc
+    if _libc is None:
+        _libc = ctypes.CDLL(ctypes.util.find_library('c'), use_errno=True)
+    if _libc.setns(fd, CLONE_NEWNET) != 0:
+        err = ctypes.get_errno()
+        raise OSError(err, os.strerror(err))
+
+
+@contextlib.contextmanager
+def network_namespace(namespace):
+    """Switch the calling thread to the given network namespace.
+
+    The namespace of a socket is the one of the thread creating it, so the
+    sockets created within this context belong to the namespace even after
+    switching back. The body must not yield to other green threads: they
+    share the OS thread, and so the namespace.
+    """
+    if not namespace:
+        yield
+        return
+    with open('/proc/self/ns/net') as own:
+        with open(os.path.join(NETNS_RUN_DIR, namespace)) as target:
+            _setns(target.fileno())
+        try:
+            yield
+        finally:
+            _setns(own.fileno())
+
+
+Proxy = collections.namedtuple('Proxy',
+                               ['namespace', 'port', 'socket', 'thread'])
+
+
+class MultiplexedProxy(object):
+    """Metadata proxies listening in many namespaces within one process."""
+
+    def __init__(self, threads=1000):
+        self.threads = threads
+        self.proxies = {}
+        self._lock = semaphore.Semaphore()
+
+    def add(self, uuid, namespace, port, network_id=None, router_id=None):
+        """Start proxying the metadata requests received in a namespace.
+
+        Adding an already served uuid with the same namespace and port is a
+        no-op, so that agents can replay their proxies after a restart.
+        """
+        proxy = self.proxies.get(uuid)
+        if proxy:
+            if (proxy.namespace, proxy.port) == (namespace, port):
+                return
+            self.remove(uuid)
+        handler = namespace_proxy.NetworkMetadataProxyHandler(
+            network_id=network_id, router_id=router_id)
+        with network_namespace(namespace):
+            sock = eventlet.listen(('0.0.0.0', port),
+                                   backlog=cfg.CONF.backlog)
+        thread = eventlet.spawn(self._serve, sock, handler)
+        self.proxies[uuid] = Proxy(namespace, port, sock, thread)
+        LOG.debug('Serving metadata for %(uuid)s on port %(port)s of '
+                  'namespace %(namespace)s',
+                  {'uuid': uuid, 'port': port, 'namespace': namespace})
+
+    def remove(self, uuid):
+        proxy = self.proxies.pop(uuid, None)
+        if not proxy:
+            return
+        # The requests already accepted are served before the green thread
+        # exits, but no new connection is accepted once it has been killed.
+        proxy.thread.kill()
+        proxy.socket.close()
+        LOG.debug('Stopped serving metadata for %s', uuid)
+
+    def _serve(self, sock, handler):
+        eventlet.wsgi.server(
+            sock, handler, custom_pool=eventlet.GreenPool(self.threads),
+            log=logging.WritableLogger(LOG),
+            keepalive=cfg.CONF.wsgi_keep_alive,
+            socket_timeout=cfg.CONF.client_socket_timeout or None)
+
+    def dispatch(self, request):
+        """Execute a request received on the control socket."""
+        command = request.pop('command', None)
+        with self._lock:
+            if command == 'add':
+                self.add(**request)
+            elif command == 'remove':
+                self.remove(request['uuid'])
+            elif command == 'list':
+                return {'status': 'ok', 'proxies': sorted(self.proxies)}
+            else:
+                raise ValueError(_('Unknown command %s') % command)
+        return {'status': 'ok'}
+
+    def handle_control_connection(self, conn):
+        with contextlib.closing(conn.makefile('rw')) as stream:
+            for line in stream:
+                try:
+                    reply = self.dispatch(jsonutils.loads(line))
+                except Exception as e:
+                    LOG.exception(_LE('Failed to execute metadata proxy '
+                                      'control request %s'), line.strip())
+                    reply = {'status': 'error', 'message': unicode(e)}
+                stream.write(jsonutils.dumps(reply) + '\n')
+                stream.flush()
+        conn.close()
+
+    def serve_control(self, sock):
+        while True:
+            conn, _addr = sock.accept()
+            eventlet.spawn_n(self.handle_control_connection, conn)
+
+
+class MultiplexedProxyDaemon(daemon.Daemon):
+    def __init__(self, pidfile, control_socket, control_socket_user=None):
+        super(MultiplexedProxyDaemon, self).__init__(pidfile)
+        self.control_socket = control_socket
+        self.control_socket_user = control_socket_user
+
+    def _listen_control(self):
+        try:
+            os.unlink(self.control_socket)
+        except OSError as e:
+            if e.errno != errno.ENOENT:
+                raise
+        sock = eventlet.listen(self.control_socket, family=socket.AF_UNIX)
+        if self.control_socket_user is not None:
+            # The daemon runs as root but is driven by the agent
+            os.chown(self.control_socket, self.control_socket_user, -1)
+        os.chmod(self.control_socket, 0o600)
+        return sock
+
+    def run(self):
+        proxy = MultiplexedProxy()
+        sock = self._listen_control()
+        LOG.info(_LI('Multiplexed metadata proxy listening on %s'),
+                 self.control_socket)
+        proxy.serve_control(sock)
+
+
+class MultiplexedProxyManager(object):
+    """Agent side of the multiplexed metadata proxy.
+
+    The daemon is spawned on first use and the proxies registered by the
+    agent are replayed whenever it has to be spawned again.
+    """
+
+    def __init__(self, conf, name, root_helper):
+        self.conf = conf
+        self.root_helper = root_helper
+        self.proxies = {}
+        self.name = name
+        self.uuid = 'metadata-proxy-%s' % name
+        self.process_manager = external_process.ProcessManager(
+            conf, self.uuid, root_helper)
+        self.control_socket = linux_utils.get_conf_file_name(
+            conf.external_pids, self.uuid, 'ctl')
+
+    def _get_callback(self):
+
+        def callback(pid_file):
+            proxy_cmd = ['neutron-multiplexed-metadata-proxy',
+                         '--pid_file=%s' % pid_file,
+                         '--metadata_proxy_socket=%s' %
+                         self.conf.metadata_proxy_socket,
+                         '--control_socket=%s' % self.control_socket,
+                         '--control_socket_user=%d' % os.geteuid()]
+            proxy_cmd.extend(config.get_log_args(
+                self.conf, 'neutron-multiplexed-metadata-proxy-%s.log' %
+                self.name))
+            return proxy_cmd
+
+        return callback
+
+    def _ensure_daemon(self):
+        """Spawn the daemon if needed, returns True if it was spawned."""
+        if self.process_manager.active:
+            return False
+        self.process_manager.enable(self._get_callback())
+        for uuid, proxy in self.proxies.items():
+            self._request(dict(proxy, command='add', uuid=uuid),
+                          timeout=CONTROL_SOCKET_TIMEOUT)
+        return True
+
+    def _request(self, request, timeout=0):
+        deadline = time.time() + timeout
+        sock = socket.socket(socket.AF_UNIX, socket.SOCK_STREAM)
+        try:
+            while True:
+                try:
+                    sock.connect(self.control_socket)
+                    break
+                except socket.error as e:
+                    # A freshly spawned daemon may not be listening yet
+                    if (e.errno not in (errno.ENOENT, errno.ECONNREFUSED) or
+                            time.time() >= deadline):
+                        raise ControlRequestFailed(request=request, reason=e)
+                    eventlet.sleep(0.1)
+            with contextlib.closing(sock.makefile('rw')) as stream:
+                stream.write(jsonutils.dumps(request) + '\n')
+                stream.flush()
+                reply = jsonutils.loads(stream.readline() or '{}')
+        finally:
+            sock.close()
+        if reply.get('status') != 'ok':
+            raise ControlRequestFailed(request=request,
+                                       reason=reply.get('message'))
+        return reply
+
+    def add(self, uuid, namespace, port, network_id=None, router_id=None):
+        self.proxies[uuid] = {'namespace': namespace, 'port': port,
+                              'network_id': network_id,
+                              'router_id': router_id}
+        if not self._ensure_daemon():
+            self._request(dict(self.proxies[uuid], command='add', uuid=uuid))
+
+    def remove(self, uuid):
+        self.proxies.pop(uuid, None)
+        if self.process_manager.active:
+            self._request({'command': 'remove', 'uuid': uuid})
+
+
+def main():
+    opts = [
+        cfg.StrOpt('pid_file',
+                   help=_('Location of pid file of this process.')),
+        cfg.BoolOpt('daemonize',
+                    default=True,
+                    help=_('Run as daemon.')),
+        cfg.StrOpt('control_socket',
+                   help=_('Location of the UNIX domain socket the agent '
+                          'adds and removes proxies through.')),
+        cfg.IntOpt('control_socket_user',
+                   help=_('Id of the user allowed to connect to the control '
+                          'socket.')),
+        cfg.StrOpt('metadata_proxy_socket',
+                   default='$state_path/metadata_proxy',
+                   help=_('Location of Metadata Proxy UNIX domain '
+                          'socket'))
+    ]
+
+    cfg.CONF.register_cli_opts(opts)
+    # Don't get the default configuration file
+    cfg.CONF(project='neutron', default_config_files=[])
+    common_config.setup_logging()
+    utils.log_opt_values(LOG)
+    proxy = MultiplexedProxyDaemon(
+        cfg.CONF.pid_file, cfg.CONF.control_socket,
+        control_socket_user=cfg.CONF.control_socket_user)
+
+    if cfg.CONF.daemonize:
+        proxy.start()
+    else:
+        proxy.run()
@@ -79,6 +79,7 @@ class PluginApi(object):
         1.3 - get_device_details rpc signature upgrade to obtain 'host' and
               return value to include fixed_ips and device_owner for
               the device port
+        1.4 - Added update_devices_up and update_devices_down
     '''
 
     def __init__(self, topic):
@@ -117,6 +118,49 @@ class PluginApi(object):
         return cctxt.call(context, 'update_device_up', device=device,
                           agent_id=agent_id, host=host)
 
+    def update_devices_down(self, context, devices, agent_id, host=None):
+        """Report many devices down at once.
+
+        :returns: dict with the 'devices_down' details, as returned by
+                  update_device_down, and the 'failed_devices_down'
+        """
+        try:
+            cctxt = self.client.prepare(version='1.4')
+            return cctxt.call(context, 'update_devices_down',
+                              devices=devices, agent_id=agent_id, host=host)
+        except messaging.UnsupportedVersion:
+            res = {'devices_down': [], 'failed_devices_down': []}
+            for device in devices:
+                try:
+                    res['devices_down'].append(self.update_device_down(
+                        context, device, agent_id, host))
+                except Exception as e:
+                    LOG.debug("update_device_down failed for %(device)s: "
+                              "%(e)s", {'device': device, 'e': e})
+                    res['failed_devices_down'].append(device)
+            return res
+
+    def update_devices_up(self, context, devices, agent_id, host=None):
+        """Report many devices up at once.
+
+        :returns: dict with the 'devices_up' and the 'failed_devices_up'
+        """
+        try:
+            cctxt = self.client.prepare(version='1.4')
+            return cctxt.call(context, 'update_devices_up',
+                              devices=devices, agent_id=agent_id, host=host)
+        except messaging.UnsupportedVersion:
+            res = {'devices_up': [], 'failed_devices_up': []}
+            for device in devices:
+                try:
+                    self.update_device_up(context, device, agent_id, host)
+                    res['devices_up'].append(device)
+                except Exception as e:
+                    LOG.debug("update_device_up failed for %(device)s: "
+                              "%(e)s", {'device': device, 'e': e})
+                    res['failed_devices_up'].append(device)
+            return res
+
     def tunnel_sync(self, context, tunnel_ip, tunnel_type=None):
         cctxt = self.client.prepare()
         return cctxt.call(context, 'tunnel_sync', tunnel_ip=tunnel_ip,
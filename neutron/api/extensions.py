@@ -18,8 +18,10 @@ import abc
 import imp
 import itertools
 import os
+import tempfile
 
 from oslo.config import cfg
+from oslo.serialization import jsonutils
 import routes
 import six
 import webob.dec
@@ -392,6 +394,60 @@ def plugin_aware_extension_middleware_factory(global_config, **local_config):
     return _factory
 
 
+class ExtensionManifest(object):
+    """Aliases of the extension files, kept in a file between restarts.
+
+    The alias of an extension file is only trusted while the modification
+    time and the size of the file are those it had when it was loaded.
+    """
+
+    def __init__(self, path):
+        self.path = path
+        self._entries = {}
+        self._new_entries = {}
+        if not path:
+            return
+        try:
+            with open(path) as f:
+                self._entries = jsonutils.load(f)['extensions']
+        except (IOError, ValueError, KeyError, TypeError) as e:
+            LOG.debug("Extension manifest %(path)s not used: %(error)s",
+                      {'path': path, 'error': e})
+
+    @staticmethod
+    def _stat(ext_path):
+        stat = os.stat(ext_path)
+        return [stat.st_mtime, stat.st_size]
+
+    def get_alias(self, ext_path):
+        """Return the alias of an extension file, None if unknown."""
+        entry = self._entries.get(ext_path)
+        if entry and entry.get('stat') == self._stat(ext_path):
+            self._new_entries[ext_path] = entry
+            return entry.get('alias')
+
+    def set_alias(self, ext_path, alias):
+        self._new_entries[ext_path] = {'stat': self._stat(ext_path),
+                                       'alias': alias}
+
+    def save(self):
+        """Write the entries of the extension files loaded or skipped."""
+        if not self.path or self._new_entries == self._entries:
+            return
+        try:
+            # Renaming keeps the other servers from reading a partial file
+            with tempfile.NamedTemporaryFile(
+                    'w', dir=os.path.dirname(os.path.abspath(self.path)),
+                    delete=False) as f:
+                jsonutils.dump({'extensions': self._new_entries}, f)
+            os.rename(f.name, self.path)
+        except (IOError, OSError) as e:
+            LOG.warn(_LW("Unable to write the extension manifest %(path)s: "
+                         "%(error)s"), {'path': self.path, 'error': e})
+            return
+        self._entries = self._new_entries
+
+
 class ExtensionManager(object):
     """Load extensions from the configured extension path.
 
@@ -403,7 +459,9 @@ class ExtensionManager(object):
         LOG.info(_LI('Initializing extension manager.'))
         self.path = path
         self.extensions = {}
+        self._manifest = ExtensionManifest(cfg.CONF.api_extensions_manifest)
         self._load_all_extensions()
+        self._manifest.save()
         policy.reset()
 
     def get_resources(self):
@@ -510,6 +568,14 @@ class ExtensionManager(object):
             return False
         return True
 
+    def _is_alias_supported(self, alias):
+        """Check if an extension can be loaded, knowing its alias only.
+
+        The extension files whose alias is known from the manifest are not
+        imported when it is not supported.
+        """
+        return True
+
     def _load_all_extensions(self):
         """Load extensions from the configured path.
 
@@ -536,6 +602,9 @@ class ExtensionManager(object):
                 mod_name, file_ext = os.path.splitext(os.path.split(f)[-1])
                 ext_path = os.path.join(path, f)
                 if file_ext.lower() == '.py' and not mod_name.startswith('_'):
+                    alias = self._manifest.get_alias(ext_path)
+                    if alias and not self._is_alias_supported(alias):
+                        continue
                     mod = imp.load_source(mod_name, ext_path)
                     ext_name = mod_name[0].upper() + mod_name[1:]
                     new_ext_class = getattr(mod, ext_name, None)
@@ -546,6 +615,8 @@ class ExtensionManager(object):
                                   'file': ext_path})
                         continue
                     new_ext = new_ext_class()
+                    if hasattr(new_ext, 'get_alias'):
+                        self._manifest.set_alias(ext_path, new_ext.get_alias())
                     self.add_extension(new_ext)
             except Exception as exception:
                 LOG.warn(_LW("Extension file %(f)s wasn't loaded due to "
@@ -583,7 +654,9 @@ class PluginAwareExtensionManager(ExtensionManager):
                 self._plugins_implement_interface(extension))
 
     def _plugins_support(self, extension):
-        alias = extension.get_alias()
+        return self._is_alias_supported(extension.get_alias())
+
+    def _is_alias_supported(self, alias):
         supports_extension = any((hasattr(plugin,
                                           "supported_extension_aliases") and
                                   alias in plugin.supported_extension_aliases)
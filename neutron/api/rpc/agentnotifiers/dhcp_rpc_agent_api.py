@@ -13,12 +13,18 @@
 # See the License for the specific language governing permissions and
 # limitations under the License.
 
+import collections
+import time
+
+import eventlet
+from oslo.config import cfg
 from oslo import messaging
 
 from neutron.common import constants
 from neutron.common import rpc as n_rpc
 from neutron.common import topics
 from neutron.common import utils
+from neutron import context as n_context
 from neutron.i18n import _LE, _LW
 from neutron import manager
 from neutron.openstack.common import log as logging
@@ -26,10 +32,66 @@ from neutron.openstack.common import log as logging
 
 LOG = logging.getLogger(__name__)
 
+# The bulk counterparts of the port notifications
+BULK_PORT_METHODS = {'port_create_end': 'ports_create_end',
+                     'port_update_end': 'ports_update_end',
+                     'port_delete_end': 'ports_delete_end'}
+
+
+class PortNotificationBatcher(object):
+    """Collects the port notifications to send to the DHCP agents.
+
+    Notifications are sent dhcp_notification_batch_interval seconds after
+    the first one was collected. The consecutive notifications of a network
+    for the same operation are sent in a single message, in which only the
+    last update of a port is kept.
+    """
+
+    def __init__(self, notifier):
+        self._notifier = notifier
+        self._events = collections.OrderedDict()
+        self._flusher = None
+
+    def add(self, network_id, method, port):
+        self._events.setdefault(network_id, []).append((method, port))
+        if self._flusher is None:
+            self._flusher = eventlet.spawn_after(
+                cfg.CONF.dhcp_notification_batch_interval, self.flush)
+
+    def _group(self, events):
+        groups = []
+        for method, port in events:
+            if not groups or groups[-1][0] != method:
+                groups.append((method, collections.OrderedDict()))
+            groups[-1][1][port['id']] = port
+        return groups
+
+    def flush(self):
+        self._flusher = None
+        events = self._events
+        self._events = collections.OrderedDict()
+        context = n_context.get_admin_context()
+        for network_id, network_events in events.items():
+            for method, ports in self._group(network_events):
+                try:
+                    self._notifier._notify_ports(
+                        context, method, ports.values(), network_id)
+                except Exception:
+                    LOG.exception(_LE("Failed to send %(method)s for "
+                                      "%(count)d ports of network "
+                                      "%(net_id)s"),
+                                  {'method': method, 'count': len(ports),
+                                   'net_id': network_id})
+
 
 class DhcpAgentNotifyAPI(object):
-    """API for plugin to notify DHCP agent."""
-    # It seems dhcp agent does not support bulk operation
+    """API for plugin to notify DHCP agent.
+
+    API version history:
+        1.0 - Initial version.
+        1.1 - ports_create_end, ports_update_end and ports_delete_end:
+              port notifications of a network in bulk
+    """
     VALID_RESOURCES = ['network', 'subnet', 'port']
     VALID_METHOD_NAMES = ['network.create.end',
                           'network.update.end',
@@ -45,6 +107,13 @@ class DhcpAgentNotifyAPI(object):
         self._plugin = plugin
         target = messaging.Target(topic=topic, version='1.0')
         self.client = n_rpc.get_client(target)
+        # Maps the id of a network to the expiry time and the ids of the
+        # agents hosting it
+        self._network_agents = {}
+        self._purge_time = 0
+        self._batcher = PortNotificationBatcher(self)
+        cfg.CONF.import_opt('dhcp_agents_per_network',
+                            'neutron.db.agentschedulers_db')
 
     @property
     def plugin(self):
@@ -59,6 +128,7 @@ class DhcpAgentNotifyAPI(object):
         """
         new_agents = self.plugin.schedule_network(context, network) or []
         if new_agents:
+            self._invalidate_network_agents(network['id'])
             for agent in new_agents:
                 self._cast_message(
                     context, 'network_create_end',
@@ -100,32 +170,102 @@ class DhcpAgentNotifyAPI(object):
     def _is_reserved_dhcp_port(self, port):
         return port.get('device_id') == constants.DEVICE_ID_RESERVED_DHCP_PORT
 
+    def _get_network_agents(self, context, network_id):
+        """Return the agents hosting a network.
+
+        When dhcp_agents_cache_ttl is set, which agents host a network is
+        cached for a while, the agents themselves are read each time for
+        their admin state and heartbeat to be current. Networks without
+        agents are not cached, they might get scheduled by another server
+        at any time.
+        """
+        now = time.time()
+        expiry, agent_ids = self._network_agents.get(network_id, (0, None))
+        if expiry > now:
+            return self.plugin.get_agents_db(context,
+                                             filters={'id': agent_ids})
+        self._purge_network_agents(now)
+        agents = self.plugin.get_dhcp_agents_hosting_networks(
+            context, [network_id])
+        if agents and cfg.CONF.dhcp_agents_cache_ttl > 0:
+            self._network_agents[network_id] = (
+                now + cfg.CONF.dhcp_agents_cache_ttl,
+                [agent.id for agent in agents])
+        return agents
+
+    def _purge_network_agents(self, now):
+        """Forget the expired networks, at most once per cache ttl."""
+        if now < self._purge_time:
+            return
+        self._purge_time = now + cfg.CONF.dhcp_agents_cache_ttl
+        for network_id, (expiry, agent_ids) in self._network_agents.items():
+            if expiry <= now:
+                del self._network_agents[network_id]
+
+    def _invalidate_network_agents(self, network_id=None):
+        if network_id:
+            self._network_agents.pop(network_id, None)
+        else:
+            self._network_agents.clear()
+
+    def _schedule_network_if_required(self, context, method, payload,
+                                      network_id):
+        """Schedule the network of new ports when it needs more agents.
+
+        :return: the network if it was loaded and the agents hosting it
+        """
+        agents = self._get_network_agents(context, network_id)
+        if not self._is_schedule_required(method, payload, agents):
+            return None, agents
+        admin_ctx = (context if context.is_admin else context.elevated())
+        network = self.plugin.get_network(admin_ctx, network_id)
+        return network, self._schedule_network(admin_ctx, network, agents)
+
+    def _is_schedule_required(self, method, payload, agents):
+        if method == 'port_create_end':
+            ports = [payload['port']]
+        elif method == 'ports_create_end':
+            ports = payload['ports']
+        else:
+            return False
+        if all(self._is_reserved_dhcp_port(port) for port in ports):
+            return False
+        # The network is already hosted by as many agents as it can be
+        enabled_agents = [agent for agent in agents if agent.admin_state_up]
+        return len(enabled_agents) < cfg.CONF.dhcp_agents_per_network
+
+    def _is_scheduling_supported(self):
+        return utils.is_extension_supported(
+            self.plugin, constants.DHCP_AGENT_SCHEDULER_EXT_ALIAS)
+
     def _notify_agents(self, context, method, payload, network_id):
         """Notify all the agents that are hosting the network."""
         # fanout is required as we do not know who is "listening"
-        no_agents = not utils.is_extension_supported(
-            self.plugin, constants.DHCP_AGENT_SCHEDULER_EXT_ALIAS)
+        no_agents = not self._is_scheduling_supported()
         fanout_required = method == 'network_delete_end' or no_agents
 
         # we do nothing on network creation because we want to give the
         # admin the chance to associate an agent to the network manually
         cast_required = method != 'network_create_end'
 
+        if method == 'network_delete_end':
+            self._invalidate_network_agents(network_id)
+
         if fanout_required:
             self._fanout_message(context, method, payload)
         elif cast_required:
             admin_ctx = (context if context.is_admin else context.elevated())
-            network = self.plugin.get_network(admin_ctx, network_id)
-            agents = self.plugin.get_dhcp_agents_hosting_networks(
-                context, [network_id])
-
             # schedule the network first, if needed
-            schedule_required = (
-                method == 'port_create_end' and
-                not self._is_reserved_dhcp_port(payload['port']))
-            if schedule_required:
-                agents = self._schedule_network(admin_ctx, network, agents)
+            network, agents = self._schedule_network_if_required(
+                context, method, payload, network_id)
 
+            if not network:
+                if any(agent.admin_state_up for agent in agents):
+                    network = {'id': network_id}
+                else:
+                    # The network is only needed to tell whether the
+                    # notification was required
+                    network = self.plugin.get_network(admin_ctx, network_id)
             enabled_agents = self._get_enabled_agents(
                 context, network, agents, method, payload)
             for agent in enabled_agents:
@@ -135,23 +275,52 @@ class DhcpAgentNotifyAPI(object):
     def _cast_message(self, context, method, payload, host,
                       topic=topics.DHCP_AGENT):
         """Cast the payload to the dhcp agent running on the host."""
-        cctxt = self.client.prepare(topic=topic, server=host)
+        cctxt = self.client.prepare(topic=topic, server=host,
+                                    **self._get_version(method))
         cctxt.cast(context, method, payload=payload)
 
     def _fanout_message(self, context, method, payload):
         """Fanout the payload to all dhcp agents."""
-        cctxt = self.client.prepare(fanout=True)
+        cctxt = self.client.prepare(fanout=True, **self._get_version(method))
         cctxt.cast(context, method, payload=payload)
 
+    def _get_version(self, method):
+        if method in BULK_PORT_METHODS.values():
+            return {'version': '1.1'}
+        return {}
+
+    def _notify_ports(self, context, method, ports, network_id):
+        """Notify the agents hosting a network of operations on ports.
+
+        A single port is notified with the port message, several ones with
+        the bulk message.
+        """
+        if method == 'port_delete_end':
+            port_ids = [port['id'] for port in ports]
+            if len(port_ids) == 1:
+                payload = {'port_id': port_ids[0]}
+            else:
+                payload = {'port_ids': port_ids}
+        elif len(ports) == 1:
+            payload = {'port': ports[0]}
+        else:
+            payload = {'ports': ports}
+        if len(ports) > 1:
+            method = BULK_PORT_METHODS[method]
+        self._notify_agents(context, method, payload, network_id)
+
     def network_removed_from_agent(self, context, network_id, host):
+        self._invalidate_network_agents(network_id)
         self._cast_message(context, 'network_delete_end',
                            {'network_id': network_id}, host)
 
     def network_added_to_agent(self, context, network_id, host):
+        self._invalidate_network_agents(network_id)
         self._cast_message(context, 'network_create_end',
                            {'network': {'id': network_id}}, host)
 
     def agent_updated(self, context, admin_state_up, host):
+        self._invalidate_network_agents()
         self._cast_message(context, 'agent_updated',
                            {'admin_state_up': admin_state_up}, host)
 
@@ -171,7 +340,16 @@ class DhcpAgentNotifyAPI(object):
         if not network_id:
             return
         method_name = method_name.replace(".", "_")
-        if method_name.endswith("_delete_end"):
+        if (obj_type == 'port' and 'id' in obj_value and
+                cfg.CONF.dhcp_notification_batch_interval > 0):
+            if (method_name == 'port_create_end' and
+                    self._is_scheduling_supported()):
+                # The network is scheduled as soon as it gets ports, only
+                # the notification of the agents is delayed
+                self._schedule_network_if_required(context, method_name,
+                                                   data, network_id)
+            self._batcher.add(network_id, method_name, obj_value)
+        elif method_name.endswith("_delete_end"):
             if 'id' in obj_value:
                 self._notify_agents(context, method_name,
                                     {obj_type + '_id': obj_value['id']},
@@ -70,7 +70,7 @@ class L3AgentNotifyAPI(object):
                 cctxt.cast(context, method, routers=[router_id])
 
     def _agent_notification_arp(self, context, method, router_id,
-                                operation, data):
+                                operation, data, version='1.2'):
         """Notify arp details to l3 agents hosting router."""
         if not router_id:
             return
@@ -93,7 +93,7 @@ class L3AgentNotifyAPI(object):
                             'arp_table': data}
             cctxt = self.client.prepare(topic=l3_agent.topic,
                                         server=l3_agent.host,
-                                        version='1.2')
+                                        version=version)
             cctxt.cast(context, method, payload=dvr_arptable)
 
     def _notification(self, context, method, router_ids, operation,
@@ -148,6 +148,10 @@ class L3AgentNotifyAPI(object):
         self._agent_notification_arp(context, 'del_arp_entry', router_id,
                                      operation, arp_table)
 
+    def update_arp_entries(self, context, router_id, arp_entries):
+        self._agent_notification_arp(context, 'update_arp_entries', router_id,
+                                     None, arp_entries, version='1.3')
+
     def router_removed_from_agent(self, context, router_id, host):
         self._notification_host(context, 'router_removed_from_agent',
                                 {'router_id': router_id}, host)
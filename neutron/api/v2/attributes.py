@@ -19,7 +19,6 @@ import re
 from neutron.common import constants
 from neutron.common import exceptions as n_exc
 from neutron.openstack.common import log as logging
-from neutron.openstack.common import uuidutils
 
 
 LOG = logging.getLogger(__name__)
@@ -394,8 +393,13 @@ def _validate_regex_or_none(data, valid_values=None):
     return _validate_regex(data, valid_values)
 
 
+# The canonical form of the UUIDs, the only one uuidutils.is_uuid_like accepts
+_CANONICAL_UUID_RE = re.compile('[0-9a-f]{8}-[0-9a-f]{4}-[0-9a-f]{4}-'
+                                '[0-9a-f]{4}-[0-9a-f]{12}\\Z')
+
+
 def _validate_uuid(data, valid_values=None):
-    if not uuidutils.is_uuid_like(data):
+    if not (isinstance(data, basestring) and _CANONICAL_UUID_RE.match(data)):
         msg = _("'%s' is not a valid UUID") % data
         LOG.debug(msg)
         return msg
@@ -69,8 +69,10 @@ class Controller(object):
         self._native_bulk = self._is_native_bulk_supported()
         self._native_pagination = self._is_native_pagination_supported()
         self._native_sorting = self._is_native_sorting_supported()
+        self._slave_reads = self._is_slave_reads_supported()
         self._policy_attrs = [name for (name, info) in self._attr_info.items()
                               if info.get('required_by_policy')]
+        self._body_plan = RequestBodyPlan(self._resource, self._attr_info)
         self._notifier = n_rpc.get_notifier('network')
         # use plugin's dhcp notifier, if this is already instantiated
         agent_notifiers = getattr(plugin, 'agent_notifiers', {})
@@ -129,6 +131,14 @@ class Controller(object):
                                     % self._plugin.__class__.__name__)
         return getattr(self._plugin, native_sorting_attr_name, False)
 
+    def _is_slave_reads_supported(self):
+        # Plugins whose GET handlers write to the database (e.g. to
+        # synchronize status with a backend) must keep reading from the
+        # master, hence they can opt out of slave reads.
+        slave_reads_attr_name = ("_%s__slave_reads_support"
+                                 % self._plugin.__class__.__name__)
+        return getattr(self._plugin, slave_reads_attr_name, True)
+
     def _exclude_attributes_by_policy(self, context, data):
         """Identifies attributes to exclude according to authZ policies.
 
@@ -264,6 +274,13 @@ class Controller(object):
         if obj_list:
             fields_to_strip += self._exclude_attributes_by_policy(
                 request.context, obj_list[0])
+        # The policy checks are done before any of the response is sent, only
+        # the filtering and the serialization are left to the streaming so an
+        # error is still returned with its status
+        if (cfg.CONF.stream_collections and
+                not getattr(pagination_helper, 'limit', None)):
+            return {self._collection: self._iter_items(
+                request.context, obj_list, fields_to_strip)}
         collection = {self._collection:
                       [self._filter_attributes(
                           request.context, obj,
@@ -274,6 +291,16 @@ class Controller(object):
             collection[self._collection + "_links"] = pagination_links
         return collection
 
+    def _iter_items(self, context, obj_list, fields_to_strip):
+        """Filter the elements of a checked list one at a time.
+
+        The elements are filtered as _items does, but only as the response is
+        being serialized.
+        """
+        for obj in obj_list:
+            yield self._filter_attributes(context, obj,
+                                          fields_to_strip=fields_to_strip)
+
     def _item(self, request, id, do_authz=False, field_list=None,
               parent_id=None):
         """Retrieves and formats a single element of the requested entity."""
@@ -308,6 +335,7 @@ class Controller(object):
         parent_id = kwargs.get(self._parent_id_name)
         # Ensure policy engine is initialized
         policy.init()
+        request.context.use_slave = self._slave_reads
         return self._items(request, True, parent_id)
 
     def show(self, request, id, **kwargs):
@@ -321,6 +349,7 @@ class Controller(object):
             parent_id = kwargs.get(self._parent_id_name)
             # Ensure policy engine is initialized
             policy.init()
+            request.context.use_slave = self._slave_reads
             return {self._resource:
                     self._view(request.context,
                                self._item(request,
@@ -377,9 +406,8 @@ class Controller(object):
         self._notifier.info(request.context,
                             self._resource + '.create.start',
                             body)
-        body = Controller.prepare_request_body(request.context, body, True,
-                                               self._resource, self._attr_info,
-                                               allow_bulk=self._allow_bulk)
+        body = self._body_plan.prepare(request.context, body, True,
+                                       allow_bulk=self._allow_bulk)
         action = self._plugin_handlers[self.CREATE]
         # Check authz
         if self._collection in body:
@@ -499,9 +527,8 @@ class Controller(object):
         self._notifier.info(request.context,
                             self._resource + '.update.start',
                             payload)
-        body = Controller.prepare_request_body(request.context, body, False,
-                                               self._resource, self._attr_info,
-                                               allow_bulk=self._allow_bulk)
+        body = self._body_plan.prepare(request.context, body, False,
+                                       allow_bulk=self._allow_bulk)
         action = self._plugin_handlers[self.UPDATE]
         # Load object to check authz
         # but pass only attributes in the original body and required
@@ -577,8 +604,84 @@ class Controller(object):
         Attribute with default values are considered to be optional.
 
         body argument must be the deserialized body.
+
+        The checks are compiled for attr_info on every call, the controllers
+        compile theirs once.
         """
-        collection = resource + "s"
+        plan = RequestBodyPlan(resource, attr_info)
+        return plan.prepare(context, body, is_create, allow_bulk=allow_bulk)
+
+    @staticmethod
+    def _verify_attributes(res_dict, attr_info):
+        extra_keys = set(res_dict.keys()) - set(attr_info.keys())
+        if extra_keys:
+            msg = _("Unrecognized attribute(s) '%s'") % ', '.join(extra_keys)
+            raise webob.exc.HTTPBadRequest(msg)
+
+    def _validate_network_tenant_ownership(self, request, resource_item):
+        # TODO(salvatore-orlando): consider whether this check can be folded
+        # in the policy engine
+        if (request.context.is_admin or request.context.is_advsvc or
+                self._resource not in ('port', 'subnet')):
+            return
+        network = self._plugin.get_network(
+            request.context,
+            resource_item['network_id'])
+        # do not perform the check on shared networks
+        if network.get('shared'):
+            return
+
+        network_owner = network['tenant_id']
+
+        if network_owner != resource_item['tenant_id']:
+            msg = _("Tenant %(tenant_id)s not allowed to "
+                    "create %(resource)s on this network")
+            raise webob.exc.HTTPForbidden(msg % {
+                "tenant_id": resource_item['tenant_id'],
+                "resource": self._resource,
+            })
+
+
+class RequestBodyPlan(object):
+    """The checks of the request bodies of a resource, compiled once.
+
+    Walking the attribute map for every item of a request is costly on bulk
+    requests, so the attributes required, forbidden and defaulted on create
+    and update, as well as the converters and validators of the attributes,
+    are worked out once from the attribute map. The errors are found in
+    the order of the attribute map, as prepare_request_body always did.
+    """
+
+    def __init__(self, resource, attr_info):
+        self._resource = resource
+        self._collection = resource + "s"
+        self._attr_info = attr_info
+        self._attributes = frozenset(attr_info)
+        self._post_required = frozenset(
+            attr for attr, attr_vals in attr_info.iteritems()
+            if attr_vals.get('allow_post') and 'default' not in attr_vals)
+        self._post_forbidden = frozenset(
+            attr for attr, attr_vals in attr_info.iteritems()
+            if not attr_vals.get('allow_post'))
+        self._post_defaults = [
+            (attr, attr_vals['default'])
+            for attr, attr_vals in attr_info.iteritems()
+            if attr_vals.get('allow_post') and 'default' in attr_vals]
+        self._put_forbidden = frozenset(
+            attr for attr, attr_vals in attr_info.iteritems()
+            if not attr_vals.get('allow_put'))
+        self._conversions = []
+        for attr, attr_vals in attr_info.iteritems():
+            validators = [(rule, attributes.validators.get(rule), data)
+                          for rule, data in
+                          (attr_vals.get('validate') or {}).iteritems()]
+            if 'convert_to' in attr_vals or validators:
+                self._conversions.append(
+                    (attr, attr_vals.get('convert_to'), validators))
+
+    def prepare(self, context, body, is_create, allow_bulk=False):
+        """Check and convert a request body, see prepare_request_body."""
+        collection = self._collection
         if not body:
             raise webob.exc.HTTPBadRequest(_("Resource body required"))
 
@@ -590,54 +693,49 @@ class Controller(object):
             if not body[collection]:
                 raise webob.exc.HTTPBadRequest(_("Resources required"))
             bulk_body = [
-                Controller.prepare_request_body(
-                    context, item if resource in item else {resource: item},
-                    is_create, resource, attr_info, allow_bulk
+                self._prepare_item(
+                    context,
+                    item if self._resource in item
+                    else {self._resource: item},
+                    is_create
                 ) for item in body[collection]
             ]
             return {collection: bulk_body}
+        return self._prepare_item(context, body, is_create)
 
-        res_dict = body.get(resource)
+    def _prepare_item(self, context, body, is_create):
+        res_dict = body.get(self._resource)
         if res_dict is None:
-            msg = _("Unable to find '%s' in request body") % resource
+            msg = _("Unable to find '%s' in request body") % self._resource
             raise webob.exc.HTTPBadRequest(msg)
 
         Controller._populate_tenant_id(context, res_dict, is_create)
-        Controller._verify_attributes(res_dict, attr_info)
+        if not self._attributes.issuperset(res_dict):
+            Controller._verify_attributes(res_dict, self._attr_info)
 
         if is_create:  # POST
-            for attr, attr_vals in attr_info.iteritems():
-                if attr_vals['allow_post']:
-                    if ('default' not in attr_vals and
-                        attr not in res_dict):
-                        msg = _("Failed to parse request. Required "
-                                "attribute '%s' not specified") % attr
-                        raise webob.exc.HTTPBadRequest(msg)
-                    res_dict[attr] = res_dict.get(attr,
-                                                  attr_vals.get('default'))
-                else:
-                    if attr in res_dict:
-                        msg = _("Attribute '%s' not allowed in POST") % attr
-                        raise webob.exc.HTTPBadRequest(msg)
-        else:  # PUT
-            for attr, attr_vals in attr_info.iteritems():
-                if attr in res_dict and not attr_vals['allow_put']:
+            if (not self._post_required.issubset(res_dict) or
+                    not self._post_forbidden.isdisjoint(res_dict)):
+                self._check_post(res_dict)
+            for attr, default in self._post_defaults:
+                if attr not in res_dict:
+                    res_dict[attr] = default
+        elif not self._put_forbidden.isdisjoint(res_dict):  # PUT
+            for attr in self._attr_info:
+                if attr in self._put_forbidden and attr in res_dict:
                     msg = _("Cannot update read-only attribute %s") % attr
                     raise webob.exc.HTTPBadRequest(msg)
 
-        for attr, attr_vals in attr_info.iteritems():
-            if (attr not in res_dict or
-                res_dict[attr] is attributes.ATTR_NOT_SPECIFIED):
+        for attr, convert_to, validators in self._conversions:
+            value = res_dict.get(attr, attributes.ATTR_NOT_SPECIFIED)
+            if value is attributes.ATTR_NOT_SPECIFIED:
                 continue
             # Convert values if necessary
-            if 'convert_to' in attr_vals:
-                res_dict[attr] = attr_vals['convert_to'](res_dict[attr])
+            if convert_to:
+                value = res_dict[attr] = convert_to(value)
             # Check that configured values are correct
-            if 'validate' not in attr_vals:
-                continue
-            for rule in attr_vals['validate']:
-                res = attributes.validators[rule](res_dict[attr],
-                                                  attr_vals['validate'][rule])
+            for rule, validator, data in validators:
+                res = (validator or attributes.validators[rule])(value, data)
                 if res:
                     msg_dict = dict(attr=attr, reason=res)
                     msg = _("Invalid input for %(attr)s. "
@@ -645,35 +743,16 @@ class Controller(object):
                     raise webob.exc.HTTPBadRequest(msg)
         return body
 
-    @staticmethod
-    def _verify_attributes(res_dict, attr_info):
-        extra_keys = set(res_dict.keys()) - set(attr_info.keys())
-        if extra_keys:
-            msg = _("Unrecognized attribute(s) '%s'") % ', '.join(extra_keys)
-            raise webob.exc.HTTPBadRequest(msg)
-
-    def _validate_network_tenant_ownership(self, request, resource_item):
-        # TODO(salvatore-orlando): consider whether this check can be folded
-        # in the policy engine
-        if (request.context.is_admin or request.context.is_advsvc or
-                self._resource not in ('port', 'subnet')):
-            return
-        network = self._plugin.get_network(
-            request.context,
-            resource_item['network_id'])
-        # do not perform the check on shared networks
-        if network.get('shared'):
-            return
-
-        network_owner = network['tenant_id']
-
-        if network_owner != resource_item['tenant_id']:
-            msg = _("Tenant %(tenant_id)s not allowed to "
-                    "create %(resource)s on this network")
-            raise webob.exc.HTTPForbidden(msg % {
-                "tenant_id": resource_item['tenant_id'],
-                "resource": self._resource,
-            })
+    def _check_post(self, res_dict):
+        for attr in self._attr_info:
+            if attr in self._post_forbidden:
+                if attr in res_dict:
+                    msg = _("Attribute '%s' not allowed in POST") % attr
+                    raise webob.exc.HTTPBadRequest(msg)
+            elif attr in self._post_required and attr not in res_dict:
+                msg = _("Failed to parse request. Required "
+                        "attribute '%s' not specified") % attr
+                raise webob.exc.HTTPBadRequest(msg)
 
 
 def create_resource(collection, resource, plugin, params, allow_bulk=False,
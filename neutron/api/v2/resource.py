@@ -17,6 +17,7 @@
 Utility methods for working with WSGI servers redux
 """
 
+import collections
 import sys
 
 import netaddr
@@ -26,6 +27,7 @@ import webob.dec
 import webob.exc
 
 from neutron.common import exceptions
+from neutron.db import query_stats
 from neutron.i18n import _LE, _LI
 from neutron.openstack.common import log as logging
 from neutron.openstack.common import policy as common_policy
@@ -54,6 +56,7 @@ def Resource(controller, faults=None, deserializers=None, serializers=None):
     deserializers = default_deserializers
     serializers = default_serializers
     faults = faults or {}
+    name = getattr(controller, '_collection', controller.__class__.__name__)
 
     @webob.dec.wsgify(RequestClass=Request)
     def resource(request):
@@ -80,7 +83,9 @@ def Resource(controller, faults=None, deserializers=None, serializers=None):
 
             method = getattr(controller, action)
 
-            result = method(request=request, **args)
+            with query_stats.recording(request.context,
+                                       '%s.%s' % (name, action)):
+                result = method(request=request, **args)
         except (exceptions.NeutronException,
                 netaddr.AddrFormatError,
                 common_policy.PolicyNotAuthorized) as e:
@@ -134,6 +139,10 @@ def Resource(controller, faults=None, deserializers=None, serializers=None):
             raise webob.exc.HTTPInternalServerError(**kwargs)
 
         status = action_status.get(action, 200)
+        if _is_streamed(result) and hasattr(serializer, 'serialize_chunks'):
+            return webob.Response(request=request, status=status,
+                                  content_type=content_type,
+                                  app_iter=serializer.serialize_chunks(result))
         body = serializer.serialize(result)
         # NOTE(jkoelker) Comply with RFC2616 section 9.7
         if status == 204:
@@ -146,6 +155,12 @@ def Resource(controller, faults=None, deserializers=None, serializers=None):
     return resource
 
 
+def _is_streamed(result):
+    return isinstance(result, dict) and any(
+        isinstance(value, collections.Iterator)
+        for value in result.itervalues())
+
+
 def get_exception_data(e):
     """Extract the information about an exception.
 
@@ -23,6 +23,7 @@ import webob.exc
 from neutron.api import extensions
 from neutron.api.v2 import attributes
 from neutron.api.v2 import base
+from neutron.db import query_stats
 from neutron import manager
 from neutron.openstack.common import log as logging
 from neutron import wsgi
@@ -62,6 +63,22 @@ class Index(wsgi.Application):
         return webob.Response(body=body, content_type=content_type)
 
 
+class QueryStats(wsgi.Application):
+    """Report the statistics of the queries run by the requests."""
+
+    @webob.dec.wsgify(RequestClass=wsgi.Request)
+    def __call__(self, req):
+        if not req.context.is_admin:
+            raise webob.exc.HTTPForbidden()
+        if req.method == 'DELETE':
+            query_stats.reset_stats()
+            return webob.exc.HTTPNoContent()
+        response = dict(query_stats=query_stats.get_stats())
+        content_type = req.best_match_content_type()
+        body = wsgi.Serializer().serialize(response, content_type)
+        return webob.Response(body=body, content_type=content_type)
+
+
 class APIRouter(wsgi.Router):
 
     @classmethod
@@ -98,6 +115,10 @@ class APIRouter(wsgi.Router):
                                      **mapper_kwargs)
 
         mapper.connect('index', '/', controller=Index(RESOURCES))
+        if cfg.CONF.database.query_stats:
+            mapper.connect('query_stats', '/debug/query-stats',
+                           controller=QueryStats(),
+                           conditions=dict(method=['GET', 'DELETE']))
         for resource in RESOURCES:
             _map_resource(RESOURCES[resource], resource,
                           attributes.RESOURCE_ATTRIBUTE_MAP.get(
@@ -43,6 +43,12 @@ core_opts = [
                help=_("The API paste config file to use")),
     cfg.StrOpt('api_extensions_path', default="",
                help=_("The path for API extensions")),
+    cfg.StrOpt('api_extensions_manifest',
+               default='$state_path/api_extensions.json',
+               help=_("File keeping the aliases of the API extensions "
+                      "between restarts, so that the extensions not "
+                      "supported by the plugins are not imported. Every "
+                      "extension is imported when empty")),
     cfg.StrOpt('auth_strategy', default='keystone',
                help=_("The type of authentication to use")),
     cfg.StrOpt('core_plugin',
@@ -63,6 +69,11 @@ core_opts = [
                help=_("The maximum number of items returned in a single "
                       "response, value was 'infinite' or negative integer "
                       "means no limit")),
+    cfg.BoolOpt('stream_collections', default=False,
+                help=_("Serialize the resources listed by the API one at a "
+                       "time into a chunked response, instead of building "
+                       "the whole response before sending it. Paginated "
+                       "lists are not streamed")),
     cfg.IntOpt('max_dns_nameservers', default=5,
                help=_("Maximum number of DNS nameservers")),
     cfg.IntOpt('max_subnet_host_routes', default=20,
@@ -76,6 +87,21 @@ core_opts = [
     cfg.BoolOpt('dhcp_agent_notification', default=True,
                 help=_("Allow sending resource operation"
                        " notification to DHCP agent")),
+    cfg.FloatOpt('dhcp_notification_batch_interval', default=0,
+                 help=_("Seconds during which the port notifications to "
+                        "the DHCP agents are collected before being sent, "
+                        "those of a network in a single message. 0 sends "
+                        "every notification on its own, as DHCP agents "
+                        "older than the server expect; only set it once "
+                        "all the DHCP agents are upgraded.")),
+    cfg.IntOpt('dhcp_agents_cache_ttl', default=0,
+               help=_("Seconds during which the DHCP agents hosting a "
+                      "network are cached when notifying them. Only the "
+                      "bindings made by this server process refresh the "
+                      "cache, an agent scheduled to the network by another "
+                      "worker, server or by the DHCP agents themselves "
+                      "misses the port notifications sent meanwhile. 0 "
+                      "disables the cache.")),
     cfg.BoolOpt('allow_overlapping_ips', default=False,
                 help=_("Allow overlapping IP support in Neutron")),
     cfg.StrOpt('host', default=utils.get_hostname(),
@@ -20,6 +20,7 @@ from oslo.messaging import serializer as om_serializer
 
 from neutron.common import exceptions
 from neutron import context
+from neutron.db import query_stats
 from neutron.openstack.common import log as logging
 from neutron.openstack.common import service
 
@@ -90,6 +91,9 @@ def get_client(target, version_cap=None, serializer=None):
 def get_server(target, endpoints, serializer=None):
     assert TRANSPORT is not None
     serializer = RequestContextSerializer(serializer)
+    if cfg.CONF.database.query_stats:
+        endpoints = [query_stats.RecordingEndpoint(endpoint)
+                     for endpoint in endpoints]
     return messaging.get_rpc_server(TRANSPORT, target, endpoints,
                                     'eventlet', serializer)
 
@@ -64,6 +64,8 @@ class ContextBase(oslo_context.RequestContext):
             timestamp = datetime.datetime.utcnow()
         self.timestamp = timestamp
         self._session = None
+        # Whether the session of the context reads from the slave database
+        self.use_slave = False
         self.roles = roles or []
         self.is_advsvc = policy.check_is_advsvc(self)
         if self.is_admin is None:
@@ -156,7 +158,7 @@ class Context(ContextBase):
     @property
     def session(self):
         if self._session is None:
-            self._session = db_api.get_session()
+            self._session = db_api.get_session(use_slave=self.use_slave)
         return self._session
 
 
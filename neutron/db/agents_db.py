@@ -25,12 +25,14 @@ import sqlalchemy as sa
 from sqlalchemy.orm import exc
 from sqlalchemy import sql
 
+from neutron.db import api as db_api
 from neutron.db import model_base
 from neutron.db import models_v2
 from neutron.extensions import agent as ext_agent
-from neutron.i18n import _LW
+from neutron.i18n import _LE, _LW
 from neutron import manager
 from neutron.openstack.common import log as logging
+from neutron.openstack.common import loopingcall
 
 LOG = logging.getLogger(__name__)
 cfg.CONF.register_opt(
@@ -38,6 +40,31 @@ cfg.CONF.register_opt(
                help=_("Seconds to regard the agent is down; should be at "
                       "least twice report_interval, to be sure the "
                       "agent is down for good.")))
+cfg.CONF.register_opt(
+    cfg.IntOpt('agent_heartbeat_flush_interval', default=0,
+               help=_("Seconds between batched writes of agent heartbeats "
+                      "to the database. Reports which only refresh the "
+                      "heartbeat are kept in memory meanwhile. 0 writes "
+                      "every report immediately. agent_down_time should "
+                      "be larger than report_interval plus this value.")))
+
+# Size of the JSON dict the statistics of an agent are stored as
+MAX_STATISTICS_SIZE = 4095
+
+
+def _dump_statistics(agent):
+    """Return the statistics of an agent report as stored in the DB."""
+    statistics = agent.get('statistics')
+    if not statistics:
+        return
+    dumped = jsonutils.dumps(statistics)
+    if len(dumped) > MAX_STATISTICS_SIZE:
+        LOG.warn(_LW("Statistics of %(agent_type)s agent on host %(host)s "
+                     "exceed %(size)d bytes, they are not stored"),
+                 {'agent_type': agent['agent_type'], 'host': agent['host'],
+                  'size': MAX_STATISTICS_SIZE})
+        return
+    return dumped
 
 
 class Agent(model_base.BASEV2, models_v2.HasId):
@@ -67,10 +94,162 @@ class Agent(model_base.BASEV2, models_v2.HasId):
     description = sa.Column(sa.String(255))
     # configurations: a json dict string, I think 4095 is enough
     configurations = sa.Column(sa.String(4095), nullable=False)
+    # statistics: a json dict string refreshed by every report, kept apart
+    # from the configurations for a report with new statistics only to
+    # still be a heartbeat
+    statistics = sa.Column(sa.String(MAX_STATISTICS_SIZE))
+
+    @property
+    def last_heartbeat(self):
+        """Latest heartbeat, including one not yet flushed to the DB."""
+        return (heartbeats.get_heartbeat(self.agent_type, self.host) or
+                self.heartbeat_timestamp)
+
+    @property
+    def last_statistics(self):
+        """Latest statistics, including those not yet flushed to the DB."""
+        return heartbeats.get_statistics(self.agent_type, self.host,
+                                         self.statistics)
 
     @property
     def is_active(self):
-        return not AgentDbMixin.is_agent_down(self.heartbeat_timestamp)
+        return not AgentDbMixin.is_agent_down(self.last_heartbeat)
+
+
+class AgentHeartbeatCache(object):
+    """Keeps track of the heartbeats of agents reporting to this worker.
+
+    Reports which bring nothing new but the heartbeat are only recorded in
+    memory and written to the database in batches, with a single UPDATE
+    executed for all the buffered agents every
+    agent_heartbeat_flush_interval seconds. The statistics the agents send
+    along are buffered and written with their heartbeat. Anything else,
+    including the first report received by this worker for a given agent,
+    is written through as usual.
+
+    The database remains the source of truth shared by all the API and RPC
+    workers: a batched heartbeat is only applied to a row still carrying
+    the configuration this worker wrote or read, and when some rows did not
+    match, e.g. because the agent was deleted or reconfigured through
+    another worker, the involved agents are forgotten so that their next
+    report is written through.
+    """
+
+    def __init__(self):
+        # (agent_type, host) -> reported state as currently stored in the DB
+        self._agents = {}
+        # (agent_type, host) -> heartbeat not yet written to the DB
+        self._pending = {}
+        # (agent_type, host) -> statistics sent with the pending heartbeat
+        self._statistics = {}
+        self._flusher = None
+
+    @property
+    def enabled(self):
+        return cfg.CONF.agent_heartbeat_flush_interval > 0
+
+    def set_state(self, agent_db):
+        """Remember the state of an agent as it was written to the DB."""
+        if not self.enabled:
+            return
+        try:
+            configurations = jsonutils.loads(agent_db.configurations)
+        except Exception:
+            configurations = None
+        key = (agent_db.agent_type, agent_db.host)
+        self._agents[key] = {'binary': agent_db.binary,
+                             'topic': agent_db.topic,
+                             'configurations': agent_db.configurations,
+                             'configurations_dict': configurations}
+        self._pending.pop(key, None)
+        self._statistics.pop(key, None)
+
+    def forget(self, agent_type, host):
+        key = (agent_type, host)
+        self._agents.pop(key, None)
+        self._pending.pop(key, None)
+        self._statistics.pop(key, None)
+
+    def record(self, agent, heartbeat):
+        """Buffer the heartbeat of an agent report.
+
+        Return False if the report changes the agent state and has to be
+        written to the DB straight away.
+        """
+        if not self.enabled or agent.get('start_flag'):
+            return False
+        key = (agent['agent_type'], agent['host'])
+        state = self._agents.get(key)
+        if (not state or
+                state['binary'] != agent['binary'] or
+                state['topic'] != agent['topic'] or
+                state['configurations_dict'] !=
+                agent.get('configurations', {})):
+            return False
+        self._pending[key] = heartbeat
+        self._statistics[key] = _dump_statistics(agent)
+        self._start_flusher()
+        return True
+
+    def get_heartbeat(self, agent_type, host):
+        return self._pending.get((agent_type, host))
+
+    def get_statistics(self, agent_type, host, default=None):
+        return self._statistics.get((agent_type, host), default)
+
+    def _start_flusher(self):
+        # Started lazily, so that it runs in the worker receiving reports
+        # rather than in the parent process forking the workers.
+        if self._flusher:
+            return
+        interval = cfg.CONF.agent_heartbeat_flush_interval
+        self._flusher = loopingcall.FixedIntervalLoopingCall(self.flush)
+        self._flusher.start(interval=interval, initial_delay=interval)
+
+    def flush(self):
+        """Write the buffered heartbeats to the DB."""
+        pending, self._pending = self._pending, {}
+        statistics, self._statistics = self._statistics, {}
+        params = [{'_agent_type': key[0],
+                   '_host': key[1],
+                   '_configurations': self._agents[key]['configurations'],
+                   '_heartbeat': heartbeat,
+                   '_statistics': statistics.get(key)}
+                  for key, heartbeat in pending.iteritems()
+                  if key in self._agents]
+        if not params:
+            return
+        agents = Agent.__table__
+        stmt = agents.update().where(sa.and_(
+            agents.c.agent_type == sa.bindparam('_agent_type'),
+            agents.c.host == sa.bindparam('_host'),
+            agents.c.configurations == sa.bindparam('_configurations'))
+        ).values(heartbeat_timestamp=sa.bindparam('_heartbeat'),
+                 statistics=sa.bindparam('_statistics'))
+        session = db_api.get_session()
+        try:
+            with session.begin():
+                result = session.execute(stmt, params)
+        except Exception:
+            LOG.exception(_LE("Failed to write %d agent heartbeats"),
+                          len(params))
+            # Retry on next flush unless a newer heartbeat came in
+            for key, heartbeat in pending.iteritems():
+                if key not in self._pending:
+                    self._pending[key] = heartbeat
+                    self._statistics[key] = statistics.get(key)
+            return
+        if (session.bind.dialect.supports_sane_multi_rowcount and
+                result.rowcount != len(params)):
+            LOG.debug("%(updated)d out of %(total)d agent heartbeats "
+                      "applied, forgetting the batch",
+                      {'updated': result.rowcount, 'total': len(params)})
+            for key in pending:
+                if key not in self._pending:
+                    self._agents.pop(key, None)
+
+
+heartbeats = AgentHeartbeatCache()
 
 
 class AgentDbMixin(ext_agent.AgentPluginBase):
@@ -95,7 +274,7 @@ class AgentDbMixin(ext_agent.AgentPluginBase):
             LOG.debug('No enabled %(agent_type)s agent on host '
                       '%(host)s', {'agent_type': agent_type, 'host': host})
             return
-        if self.is_agent_down(agent.heartbeat_timestamp):
+        if not agent.is_active:
             LOG.warn(_LW('%(agent_type)s agent %(agent_id)s is not active'),
                      {'agent_type': agent_type, 'agent_id': agent.id})
         return agent
@@ -116,20 +295,36 @@ class AgentDbMixin(ext_agent.AgentPluginBase):
             conf = {}
         return conf
 
+    def get_statistics_dict(self, agent_db):
+        statistics = agent_db.last_statistics
+        if not statistics:
+            return {}
+        try:
+            return jsonutils.loads(statistics)
+        except Exception:
+            LOG.warn(_LW('Statistics for agent %(agent_type)s on host '
+                         '%(host)s are invalid.'),
+                     {'agent_type': agent_db.agent_type,
+                      'host': agent_db.host})
+            return {}
+
     def _make_agent_dict(self, agent, fields=None):
         attr = ext_agent.RESOURCE_ATTRIBUTE_MAP.get(
             ext_agent.RESOURCE_NAME + 's')
         res = dict((k, agent[k]) for k in attr
-                   if k not in ['alive', 'configurations'])
+                   if k not in ['alive', 'configurations', 'statistics'])
+        res['heartbeat_timestamp'] = agent.last_heartbeat
         res['alive'] = not AgentDbMixin.is_agent_down(
             res['heartbeat_timestamp'])
         res['configurations'] = self.get_configuration_dict(agent)
+        res['statistics'] = self.get_statistics_dict(agent)
         return self._fields(res, fields)
 
     def delete_agent(self, context, id):
         with context.session.begin(subtransactions=True):
             agent = self._get_agent(context, id)
             context.session.delete(agent)
+        heartbeats.forget(agent.agent_type, agent.host)
 
     def update_agent(self, context, id, agent):
         agent_data = agent['agent']
@@ -171,6 +366,7 @@ class AgentDbMixin(ext_agent.AgentPluginBase):
 
             configurations_dict = agent.get('configurations', {})
             res['configurations'] = jsonutils.dumps(configurations_dict)
+            res['statistics'] = _dump_statistics(agent)
             current_time = timeutils.utcnow()
             try:
                 agent_db = self._get_agent_by_type_and_host(
@@ -190,10 +386,13 @@ class AgentDbMixin(ext_agent.AgentPluginBase):
                 greenthread.sleep(0)
                 context.session.add(agent_db)
             greenthread.sleep(0)
+        heartbeats.set_state(agent_db)
 
     def create_or_update_agent(self, context, agent):
         """Create or update agent according to report."""
 
+        if heartbeats.record(agent, timeutils.utcnow()):
+            return
         try:
             return self._create_or_update_agent(context, agent)
         except db_exc.DBDuplicateEntry as e:
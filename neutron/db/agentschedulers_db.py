@@ -39,6 +39,11 @@ AGENTS_SCHEDULER_OPTS = [
                 help=_('Allow auto scheduling networks to DHCP agent.')),
     cfg.IntOpt('dhcp_agents_per_network', default=1,
                help=_('Number of DHCP agents scheduled to host a network.')),
+    cfg.StrOpt('dhcp_load_type', default='networks',
+               choices=['networks', 'subnets', 'ports'],
+               help=_('Representing the resource type whose load is being '
+                      'reported by the DHCP agents, used by the '
+                      'WeightScheduler to balance networks.')),
 ]
 
 cfg.CONF.register_opts(AGENTS_SCHEDULER_OPTS)
@@ -115,7 +120,7 @@ class DhcpAgentSchedulerDbMixin(dhcpagentscheduler
                 NetworkDhcpAgentBinding.network_id == network_ids[0])
         elif network_ids:
             query = query.filter(
-                NetworkDhcpAgentBinding.network_id in network_ids)
+                NetworkDhcpAgentBinding.network_id.in_(network_ids))
         if active is not None:
             query = (query.filter(agents_db.Agent.admin_state_up == active))
 
@@ -221,6 +226,11 @@ class DhcpAgentSchedulerDbMixin(dhcpagentscheduler
             return self.network_scheduler.schedule(
                 self, context, created_network)
 
+    def schedule_networks(self, context, networks):
+        if self.network_scheduler:
+            return self.network_scheduler.schedule_networks(
+                self, context, networks)
+
     def auto_schedule_networks(self, context, host):
         if self.network_scheduler:
             self.network_scheduler.auto_schedule_networks(self, context, host)
@@ -13,10 +13,51 @@
 #    License for the specific language governing permissions and limitations
 #    under the License.
 
+import functools
+import random
+import time
+
 from oslo.config import cfg
+from oslo.db import exception as db_exc
 from oslo.db.sqlalchemy import session
+from oslo.utils import timeutils
+import sqlalchemy as sa
+from sqlalchemy import exc as sql_exc
+from sqlalchemy import sql
+
+from neutron.db import query_stats
+from neutron.i18n import _LI, _LW
+from neutron.openstack.common import log as logging
+
+LOG = logging.getLogger(__name__)
+
+database_opts = [
+    cfg.IntOpt('slave_max_lag', default=5,
+               help=_("Seconds the slave database may lag behind the master "
+                      "before reads go to the master instead. The lag is "
+                      "estimated from the latest heartbeat of the agents. "
+                      "The lag is not checked when 0")),
+    cfg.IntOpt('deadlock_retries', default=10,
+               help=_("Times a transaction prone to deadlocks, such as the "
+                      "allocation of addresses, is retried when it "
+                      "deadlocks or times out waiting for a lock")),
+    cfg.FloatOpt('deadlock_retry_interval', default=0.05,
+                 help=_("Seconds to wait at most before the first retry of "
+                        "a deadlocked transaction. The bound doubles with "
+                        "each retry and the wait is picked at random below "
+                        "it, so that the transactions that deadlocked do "
+                        "not meet again")),
+    cfg.FloatOpt('deadlock_max_retry_interval', default=2.0,
+                 help=_("Seconds to wait at most between two retries of a "
+                        "deadlocked transaction")),
+]
+cfg.CONF.register_opts(database_opts, 'database')
+
+# Seconds during which the lag of the slave database is not checked again
+SLAVE_LAG_CHECK_INTERVAL = 1
 
 _FACADE = None
+_SLAVE_STATUS = {'checked_at': 0, 'usable': False}
 
 
 def _create_facade_lazily():
@@ -24,18 +65,118 @@ def _create_facade_lazily():
 
     if _FACADE is None:
         _FACADE = session.EngineFacade.from_config(cfg.CONF, sqlite_fk=True)
+        if cfg.CONF.database.query_stats:
+            query_stats.instrument(_FACADE.get_engine())
+            if cfg.CONF.database.slave_connection:
+                query_stats.instrument(_FACADE.get_engine(use_slave=True))
 
     return _FACADE
 
 
-def get_engine():
+def get_engine(use_slave=False):
     """Helper method to grab engine."""
     facade = _create_facade_lazily()
-    return facade.get_engine()
+    return facade.get_engine(use_slave=use_slave)
+
+
+def dispose_engines():
+    """Close the connections the engines keep in their pools."""
+    get_engine().pool.dispose()
+    if cfg.CONF.database.slave_connection:
+        get_engine(use_slave=True).pool.dispose()
+
 
+def get_session(autocommit=True, expire_on_commit=False, use_slave=False):
+    """Helper method to grab session.
 
-def get_session(autocommit=True, expire_on_commit=False):
-    """Helper method to grab session."""
+    :param use_slave: read from the slave database, when one is configured
+        and it does not lag behind the master by more than slave_max_lag
+        seconds. The session must not write.
+    """
     facade = _create_facade_lazily()
     return facade.get_session(autocommit=autocommit,
-                              expire_on_commit=expire_on_commit)
+                              expire_on_commit=expire_on_commit,
+                              use_slave=use_slave and is_slave_usable())
+
+
+def retry_on_deadlock(f):
+    """Retry a method running a transaction of its own when it deadlocks.
+
+    The method takes the request context after self. A deadlock rolls back
+    the whole transaction, so the method is not retried when it is called
+    within a transaction it does not own; the owner of that transaction is
+    left to retry it. The method must leave its arguments as it found
+    them, or be safe to call again with what it left. Each retry starts
+    from a session emptied of the objects the deadlocked attempt loaded.
+    """
+    @functools.wraps(f)
+    def wrapper(self, context, *args, **kwargs):
+        if context.session.is_active:
+            return f(self, context, *args, **kwargs)
+        retries = cfg.CONF.database.deadlock_retries
+        interval = cfg.CONF.database.deadlock_retry_interval
+        for attempt in range(retries + 1):
+            try:
+                return f(self, context, *args, **kwargs)
+            except db_exc.DBDeadlock:
+                if attempt == retries:
+                    LOG.warn(_LW("%(method)s still deadlocks after "
+                                 "%(retries)s retries"),
+                             {'method': f.__name__, 'retries': retries})
+                    raise
+                # The rolled back objects may still be referenced and
+                # conflict with those the retry loads or creates
+                context.session.expunge_all()
+            wait = random.uniform(
+                0, min(interval * 2 ** attempt,
+                       cfg.CONF.database.deadlock_max_retry_interval))
+            LOG.debug("%(method)s deadlocked, retrying in %(wait).3f "
+                      "seconds", {'method': f.__name__, 'wait': wait})
+            time.sleep(wait)
+    return wrapper
+
+
+def get_slave_lag():
+    """Return how far behind the master the slave database is, in seconds.
+
+    The agents write their heartbeat to the master every few seconds, the
+    lag is the time between the latest heartbeat on the master and on the
+    slave. No lag is seen when there are no agents.
+    """
+    query = sql.select([sql.func.max(
+        sql.column('heartbeat_timestamp', sa.DateTime))]).select_from(
+            sql.table('agents'))
+    master_heartbeat = get_engine().scalar(query)
+    if master_heartbeat is None:
+        return 0
+    slave_heartbeat = get_engine(use_slave=True).scalar(query)
+    if slave_heartbeat is None:
+        return float('inf')
+    return max(0, timeutils.delta_seconds(slave_heartbeat, master_heartbeat))
+
+
+def is_slave_usable():
+    """Tell whether reads can go to the slave database."""
+    if not cfg.CONF.database.slave_connection:
+        return False
+    max_lag = cfg.CONF.database.slave_max_lag
+    if max_lag <= 0:
+        return True
+    now = time.time()
+    if now - _SLAVE_STATUS['checked_at'] >= SLAVE_LAG_CHECK_INTERVAL:
+        _SLAVE_STATUS['checked_at'] = now
+        try:
+            lag = get_slave_lag()
+        except (db_exc.DBError, sql_exc.SQLAlchemyError) as e:
+            LOG.warn(_LW("Unable to check the lag of the slave database, "
+                         "reading from the master: %s"), e)
+            lag = float('inf')
+        usable = lag <= max_lag
+        if usable != _SLAVE_STATUS['usable']:
+            if usable:
+                LOG.info(_LI("Reading from the slave database"))
+            else:
+                LOG.warn(_LW("The slave database lags %s seconds behind the "
+                             "master, reading from the master"), lag)
+        _SLAVE_STATUS['usable'] = usable
+    return _SLAVE_STATUS['usable']
@@ -13,26 +13,30 @@
 #    License for the specific language governing permissions and limitations
 #    under the License.
 
+import datetime
 import random
 
 import netaddr
 from oslo.config import cfg
 from oslo.utils import excutils
+from oslo.utils import timeutils
 from sqlalchemy import and_
 from sqlalchemy import event
 from sqlalchemy import orm
 from sqlalchemy.orm import exc
+from sqlalchemy import sql
 
 from neutron.api.v2 import attributes
 from neutron.common import constants
 from neutron.common import exceptions as n_exc
 from neutron.common import ipv6_utils
 from neutron import context as ctx
+from neutron.db import api as db_api
 from neutron.db import common_db_mixin
 from neutron.db import models_v2
 from neutron.db import sqlalchemyutils
 from neutron.extensions import l3
-from neutron.i18n import _LE, _LI
+from neutron.i18n import _LE, _LI, _LW
 from neutron import manager
 from neutron import neutron_plugin_base_v2
 from neutron.openstack.common import log as logging
@@ -51,6 +55,12 @@ LOG = logging.getLogger(__name__)
 # IP allocations being cleaned up by cascade.
 AUTO_DELETE_PORT_OWNERS = [constants.DEVICE_OWNER_DHCP]
 
+# Seconds after which an IP allocation still waiting for its port is taken
+# as left over by a server which failed between allocating the addresses
+# of a port and creating it, and is reaped when the availability ranges of
+# its subnet are rebuilt.
+PORTLESS_IP_ALLOCATION_TIMEOUT = 600
+
 
 class NeutronDbPluginV2(neutron_plugin_base_v2.NeutronPluginBaseV2,
                         common_db_mixin.CommonDbMixin):
@@ -190,10 +200,87 @@ class NeutronDbPluginV2(neutron_plugin_base_v2.NeutronPluginBaseV2,
             network_id=network_id,
             port_id=port_id,
             ip_address=ip_address,
-            subnet_id=subnet_id
+            subnet_id=subnet_id,
+            allocated_at=timeutils.utcnow()
         )
         context.session.add(allocated)
 
+    @staticmethod
+    def _attach_ip_allocation(context, db_port, ip_address, subnet_id):
+        """Attach to a port an IP allocation stored without a port."""
+        try:
+            allocated = context.session.query(
+                models_v2.IPAllocation).filter_by(
+                    network_id=db_port['network_id'],
+                    subnet_id=subnet_id,
+                    ip_address=ip_address,
+                    port_id=None).one()
+        except exc.NoResultFound:
+            # The subnet was deleted since the address was allocated, or
+            # the allocation was reaped as stale
+            if not context.session.query(models_v2.Subnet).filter_by(
+                    id=subnet_id).first():
+                raise n_exc.SubnetNotFound(subnet_id=subnet_id)
+            raise n_exc.IpAddressGenerationFailure(
+                net_id=db_port['network_id'])
+        db_port.fixed_ips.append(allocated)
+
+    @staticmethod
+    def _reap_portless_ip_allocations(context, subnet_id):
+        """Delete the IP allocations of a subnet left without a port."""
+        cutoff = timeutils.utcnow() - datetime.timedelta(
+            seconds=PORTLESS_IP_ALLOCATION_TIMEOUT)
+        reaped = context.session.query(models_v2.IPAllocation).filter(
+            models_v2.IPAllocation.subnet_id == subnet_id,
+            models_v2.IPAllocation.port_id == sql.null(),
+            models_v2.IPAllocation.allocated_at < cutoff).delete(
+                synchronize_session=False)
+        if reaped:
+            LOG.warn(_LW("Reaped %(count)d IP allocations of subnet "
+                         "%(subnet_id)s left without a port"),
+                     {'count': reaped, 'subnet_id': subnet_id})
+
+    @staticmethod
+    def _recycle_ip(context, subnet_id, ip_address):
+        """Return an IP address to the availability ranges of its pool.
+
+        The address is left alone when it is out of the allocation pools
+        or already in a range, as the addresses of IPv6 SLAAC subnets are.
+        """
+        ip = netaddr.IPAddress(ip_address)
+        pools = context.session.query(models_v2.IPAllocationPool).filter_by(
+            subnet_id=subnet_id)
+        for pool in pools:
+            if (netaddr.IPAddress(pool['first_ip']) <= ip <=
+                    netaddr.IPAddress(pool['last_ip'])):
+                break
+        else:
+            return
+        ranges = context.session.query(
+            models_v2.IPAvailabilityRange).filter_by(
+                allocation_pool_id=pool['id']).with_lockmode('update')
+        before = after = None
+        for ip_range in ranges:
+            first = netaddr.IPAddress(ip_range['first_ip'])
+            last = netaddr.IPAddress(ip_range['last_ip'])
+            if first <= ip <= last:
+                return
+            elif last == ip - 1:
+                before = ip_range
+            elif first == ip + 1:
+                after = ip_range
+        LOG.debug("Recycled IP %(ip_address)s (%(subnet_id)s)",
+                  {'ip_address': ip_address, 'subnet_id': subnet_id})
+        if before:
+            before['last_ip'] = str(ip)
+        elif after:
+            after['first_ip'] = str(ip)
+        else:
+            context.session.add(models_v2.IPAvailabilityRange(
+                allocation_pool_id=pool['id'],
+                first_ip=str(ip),
+                last_ip=str(ip)))
+
     @staticmethod
     def _generate_ip(context, subnets):
         try:
@@ -261,6 +348,8 @@ class NeutronDbPluginV2(neutron_plugin_base_v2.NeutronPluginBaseV2,
             LOG.debug("Rebuilding availability ranges for subnet %s",
                       subnet)
 
+            NeutronDbPluginV2._reap_portless_ip_allocations(context,
+                                                            subnet['id'])
             # Create a set of all currently allocated addresses
             ip_qry_results = ip_qry.filter_by(subnet_id=subnet['id'])
             allocations = netaddr.IPSet([netaddr.IPAddress(i['ip_address'])
@@ -1312,9 +1401,29 @@ class NeutronDbPluginV2(neutron_plugin_base_v2.NeutronPluginBaseV2,
     def create_port_bulk(self, context, ports):
         return self._create_bulk('port', context, ports)
 
+    @db_api.retry_on_deadlock
     def create_port(self, context, port):
+        with context.session.begin(subtransactions=True):
+            ips = self._allocate_port_addresses(context, port)
+            return self._create_port_with_addresses(context, port, ips)
+
+    @db_api.retry_on_deadlock
+    def _allocate_port_addresses(self, context, port):
+        """Check a new port and allocate its MAC and IP addresses.
+
+        Called out of any transaction, the addresses are allocated in a
+        short transaction of their own, which is retried on deadlocks, and
+        the availability ranges of the subnets are not kept locked while
+        the port is created. The IP allocations are stored without a port
+        for the addresses not to be given to another port meanwhile, and
+        _release_port_addresses gives them back if the port then fails to
+        be created. Those a failing server leaves behind are reaped once
+        PORTLESS_IP_ALLOCATION_TIMEOUT has passed, when the availability
+        ranges of their subnet are rebuilt.
+
+        Return the IP addresses to give _create_port_with_addresses.
+        """
         p = port['port']
-        port_id = p.get('id') or uuidutils.generate_uuid()
         network_id = p['network_id']
         # NOTE(jkoelker) Get the tenant_id outside of the session to avoid
         #                unneeded db action if the operation raises
@@ -1343,6 +1452,33 @@ class NeutronDbPluginV2(neutron_plugin_base_v2.NeutronPluginBaseV2,
                     raise n_exc.MacAddressInUse(net_id=network_id,
                                                 mac=p['mac_address'])
 
+            ips = self._allocate_ips_for_port(context, port)
+            for ip in ips:
+                NeutronDbPluginV2._store_ip_allocation(
+                    context, ip['ip_address'], network_id, ip['subnet_id'],
+                    None)
+            return ips
+
+    def _release_port_addresses(self, context, network_id, ips):
+        """Give back the IP addresses allocated for a port not created."""
+        with context.session.begin(subtransactions=True):
+            for ip in ips:
+                NeutronDbPluginV2._delete_ip_allocation(
+                    context, network_id, ip['subnet_id'], ip['ip_address'])
+                NeutronDbPluginV2._recycle_ip(
+                    context, ip['subnet_id'], ip['ip_address'])
+
+    def _create_port_with_addresses(self, context, port, ips):
+        """Create a port given the addresses allocated for it."""
+        p = port['port']
+        port_id = p.get('id') or uuidutils.generate_uuid()
+        network_id = p['network_id']
+        tenant_id = self._get_tenant_id_for_create(context, p)
+
+        with context.session.begin(subtransactions=True):
+            # Ensure that the network still exists.
+            self._get_network(context, network_id)
+
             if 'status' not in p:
                 status = constants.PORT_STATUS_ACTIVE
             else:
@@ -1359,14 +1495,10 @@ class NeutronDbPluginV2(neutron_plugin_base_v2.NeutronPluginBaseV2,
                                      device_owner=p['device_owner'])
             context.session.add(db_port)
 
-            # Update the IP's for the port
-            ips = self._allocate_ips_for_port(context, port)
-            if ips:
-                for ip in ips:
-                    ip_address = ip['ip_address']
-                    subnet_id = ip['subnet_id']
-                    NeutronDbPluginV2._store_ip_allocation(
-                        context, ip_address, network_id, subnet_id, port_id)
+            # Attach the IP's allocated for the port
+            for ip in ips:
+                NeutronDbPluginV2._attach_ip_allocation(
+                    context, db_port, ip['ip_address'], ip['subnet_id'])
 
         return self._make_port_dict(db_port, process_extensions=False)
 
@@ -125,6 +125,7 @@ class L3AgentSchedulerDbMixin(l3agentscheduler.L3AgentSchedulerPluginBase,
             filter(sa.or_(l3_attrs_db.RouterExtraAttributes.ha == sql.false(),
                           l3_attrs_db.RouterExtraAttributes.ha == sql.null())))
         try:
+            router_ids = []
             for binding in down_bindings:
                 LOG.warn(_LW(
                     "Rescheduling router %(router)s from agent %(agent)s "
@@ -133,14 +134,14 @@ class L3AgentSchedulerDbMixin(l3agentscheduler.L3AgentSchedulerPluginBase,
                     {'router': binding.router_id,
                      'agent': binding.l3_agent_id,
                      'dead_time': agent_dead_limit})
+                router_ids.append(binding.router_id)
+            if router_ids:
                 try:
-                    self.reschedule_router(context, binding.router_id)
+                    self.reschedule_routers(context, router_ids)
                 except (l3agentscheduler.RouterReschedulingFailed,
                         messaging.RemoteError):
-                    # Catch individual router rescheduling errors here
-                    # so one broken one doesn't stop the iteration.
-                    LOG.exception(_LE("Failed to reschedule router %s"),
-                                  binding.router_id)
+                    LOG.exception(_LE("Failed to reschedule routers %s"),
+                                  router_ids)
         except db_exc.DBError:
             # Catch DB errors here so a transient DB connectivity issue
             # doesn't stop the loopingcall.
@@ -286,6 +287,53 @@ class L3AgentSchedulerDbMixin(l3agentscheduler.L3AgentSchedulerPluginBase,
             l3_notifier.router_added_to_agent(
                 context, [router_id], new_agent.host)
 
+    def reschedule_routers(self, context, router_ids):
+        """Reschedule many routers to new l3 agents at once.
+
+        The routers are removed from the agents currently hosting them
+        and scheduled again in a single pass of the scheduler. Routers
+        that cannot be scheduled anywhere else are bound back to their
+        previous agents. Agents are notified once per agent, not per router.
+
+        The scheduler binds the routers in a transaction of its own, which
+        falls back to binding them one at a time when a concurrent operation
+        conflicts with the batch, so this must not be called within an
+        ongoing transaction.
+
+        :returns: dict of router_id -> new agent
+        """
+        if not self.router_scheduler:
+            return {}
+
+        with context.session.begin(subtransactions=True):
+            bindings = self._get_l3_bindings_hosting_routers(context,
+                                                             router_ids)
+            old_agents = {}
+            for binding in bindings:
+                old_agents.setdefault(binding.router_id, []).append(
+                    binding.l3_agent)
+                context.session.delete(binding)
+
+        rescheduled = self.router_scheduler.schedule_routers(
+            self, context, router_ids)
+        for router_id in set(router_ids) - set(rescheduled):
+            LOG.error(_LE("Failed to reschedule router %s"), router_id)
+            for agent in old_agents.get(router_id, []):
+                self.router_scheduler.bind_router(context, router_id, agent)
+
+        l3_notifier = self.agent_notifiers.get(constants.AGENT_TYPE_L3)
+        if l3_notifier:
+            added = {}
+            for router_id, new_agent in rescheduled.iteritems():
+                for agent in old_agents.get(router_id, []):
+                    l3_notifier.router_removed_from_agent(
+                        context, router_id, agent.host)
+                added.setdefault(new_agent.host, []).append(router_id)
+            for host, host_router_ids in added.iteritems():
+                l3_notifier.router_added_to_agent(
+                    context, host_router_ids, host)
+        return rescheduled
+
     def list_routers_on_l3_agent(self, context, agent_id):
         query = context.session.query(RouterL3AgentBinding.router_id)
         query = query.filter(RouterL3AgentBinding.l3_agent_id == agent_id)
@@ -492,8 +540,8 @@ class L3AgentSchedulerDbMixin(l3agentscheduler.L3AgentSchedulerPluginBase,
 
     def schedule_routers(self, context, routers):
         """Schedule the routers to l3 agents."""
-        for router in routers:
-            self.schedule_router(context, router, candidates=None)
+        if self.router_scheduler:
+            self.router_scheduler.schedule_routers(self, context, routers)
 
     def get_l3_agent_with_min_routers(self, context, agent_ids):
         """Return l3 agent with the least number of routers."""
@@ -27,6 +27,7 @@ from neutron.db import model_base
 from neutron.db import models_v2
 from neutron.extensions import external_net
 from neutron.extensions import l3
+from neutron.extensions import portbindings
 from neutron.i18n import _LI
 from neutron import manager
 from neutron.openstack.common import log as logging
@@ -1026,33 +1027,58 @@ class L3_NAT_dbonly_mixin(l3.RouterPluginBase):
             return []
         return self.get_floatingips(context, {'router_id': router_ids})
 
+    def _make_sync_port_dict(self, port):
+        """Build the l3 agent view of a port straight from its DB row.
+
+        The agents only need the core port attributes and the bound host,
+        so the plugin's dict extension functions, which may issue further
+        queries for every single port, are deliberately skipped.
+        """
+        res = {'id': port['id'],
+               'name': port['name'],
+               'network_id': port['network_id'],
+               'tenant_id': port['tenant_id'],
+               'mac_address': port['mac_address'],
+               'admin_state_up': port['admin_state_up'],
+               'status': port['status'],
+               'fixed_ips': [{'subnet_id': ip['subnet_id'],
+                              'ip_address': ip['ip_address']}
+                             for ip in port['fixed_ips']],
+               'device_id': port['device_id'],
+               'device_owner': port['device_owner']}
+        # NOTE: both ML2 and the plugins relying on portbindings_db load the
+        # binding eagerly together with the port, so this costs no query.
+        binding = (getattr(port, 'port_binding', None) or
+                   getattr(port, 'portbinding', None))
+        if binding:
+            res[portbindings.HOST_ID] = binding.host
+        return res
+
+    def _get_sync_ports(self, context, port_qry):
+        """Return agent port dicts, with subnets, for a query on ports."""
+        ports = [self._make_sync_port_dict(port) for port in port_qry]
+        if ports:
+            self._populate_subnet_for_ports(context, ports)
+        return ports
+
     def get_sync_gw_ports(self, context, gw_port_ids):
         if not gw_port_ids:
             return []
-        filters = {'id': gw_port_ids}
-        gw_ports = self._core_plugin.get_ports(context, filters)
-        if gw_ports:
-            self._populate_subnet_for_ports(context, gw_ports)
-        return gw_ports
+        qry = context.session.query(models_v2.Port)
+        qry = qry.filter(models_v2.Port.id.in_(gw_port_ids))
+        return self._get_sync_ports(context, qry)
 
     def get_sync_interfaces(self, context, router_ids, device_owners=None):
         """Query router interfaces that relate to list of router_ids."""
         device_owners = device_owners or [DEVICE_OWNER_ROUTER_INTF]
         if not router_ids:
             return []
-        qry = context.session.query(RouterPort)
+        qry = context.session.query(models_v2.Port).join(RouterPort)
         qry = qry.filter(
-            Router.id.in_(router_ids),
+            RouterPort.router_id.in_(router_ids),
             RouterPort.port_type.in_(device_owners)
         )
-
-        # TODO(markmcclain): This is suboptimal but was left to reduce
-        # changeset size since it is late in cycle
-        ports = [rp.port.id for rp in qry]
-        interfaces = self._core_plugin.get_ports(context, {'id': ports})
-        if interfaces:
-            self._populate_subnet_for_ports(context, interfaces)
-        return interfaces
+        return self._get_sync_ports(context, qry)
 
     def _populate_subnet_for_ports(self, context, ports):
         """Populate ports with subnet.
@@ -1079,23 +1105,31 @@ class L3_NAT_dbonly_mixin(l3.RouterPluginBase):
                 yield (port, fixed_ips[0])
 
         network_ids = set(p['network_id'] for p, _ in each_port_with_ip())
-        filters = {'network_id': [id for id in network_ids]}
-        fields = ['id', 'cidr', 'gateway_ip',
-                  'network_id', 'ipv6_ra_mode']
+        if not network_ids:
+            return
+
+        # Only the columns sent to the agent are selected, which spares the
+        # eager loading of pools, routes and nameservers done for subnets.
+        qry = context.session.query(models_v2.Subnet.id,
+                                    models_v2.Subnet.cidr,
+                                    models_v2.Subnet.gateway_ip,
+                                    models_v2.Subnet.network_id,
+                                    models_v2.Subnet.ipv6_ra_mode)
+        qry = qry.filter(models_v2.Subnet.network_id.in_(network_ids))
 
         subnets_by_network = dict((id, []) for id in network_ids)
-        for subnet in self._core_plugin.get_subnets(context, filters, fields):
-            subnets_by_network[subnet['network_id']].append(subnet)
+        for subnet in qry:
+            subnets_by_network[subnet.network_id].append(subnet)
 
         for port, fixed_ip in each_port_with_ip():
             port['extra_subnets'] = []
             for subnet in subnets_by_network[port['network_id']]:
-                subnet_info = {'id': subnet['id'],
-                               'cidr': subnet['cidr'],
-                               'gateway_ip': subnet['gateway_ip'],
-                               'ipv6_ra_mode': subnet['ipv6_ra_mode']}
+                subnet_info = {'id': subnet.id,
+                               'cidr': subnet.cidr,
+                               'gateway_ip': subnet.gateway_ip,
+                               'ipv6_ra_mode': subnet.ipv6_ra_mode}
 
-                if subnet['id'] == fixed_ip['subnet_id']:
+                if subnet.id == fixed_ip['subnet_id']:
                     port['subnet'] = subnet_info
                 else:
                     port['extra_subnets'].append(subnet_info)
@@ -12,19 +12,25 @@
 #    License for the specific language governing permissions and limitations
 #    under the License.
 
+import collections
+import time
+
+import eventlet
 from oslo.config import cfg
+import sqlalchemy as sa
 
 from neutron.api.v2 import attributes
 from neutron.common import constants as l3_const
 from neutron.common import exceptions as n_exc
 from neutron.common import utils as n_utils
+from neutron import context as n_context
 from neutron.db import l3_attrs_db
 from neutron.db import l3_db
 from neutron.db import l3_dvrscheduler_db as l3_dvrsched_db
 from neutron.db import models_v2
 from neutron.extensions import l3
 from neutron.extensions import portbindings
-from neutron.i18n import _LI
+from neutron.i18n import _LE, _LI
 from neutron.openstack.common import log as logging
 
 
@@ -42,10 +48,96 @@ router_distributed_opts = [
                 default=False,
                 help=_("System-wide flag to determine the type of router "
                        "that tenants can create. Only admin can override.")),
+    cfg.FloatOpt('dvr_arp_batch_interval',
+                 default=0,
+                 help=_("Seconds during which the ARP entries of the VM "
+                        "ports of distributed routers are collected before "
+                        "being sent to the L3 agents, in a single message "
+                        "per router. 0 sends every entry on its own, as "
+                        "agents older than the update_arp_entries RPC "
+                        "expect; only set it once all the L3 agents are "
+                        "upgraded.")),
+    cfg.IntOpt('dvr_router_cache_ttl',
+               default=0,
+               help=_("Seconds during which the distributed router a "
+                      "subnet is attached to is cached when sending the "
+                      "ARP entries of its VM ports. Only the router "
+                      "interfaces added or removed by this server process "
+                      "refresh the cache, the entries of a subnet moved to "
+                      "another router by another worker or server are sent "
+                      "to the former router meanwhile. 0 disables the "
+                      "cache.")),
 ]
 cfg.CONF.register_opts(router_distributed_opts)
 
 
+class ArpEntryBatcher(object):
+    """Collects the ARP entries to send to the agents of DVR routers.
+
+    Entries are sent dvr_arp_batch_interval seconds after the first one was
+    collected. Within a batch only the last update of an IP address is kept
+    and the routers of the subnets involved are looked up at once.
+    """
+
+    def __init__(self, plugin):
+        self._plugin = plugin
+        self._entries = collections.OrderedDict()
+        self._flusher = None
+
+    def add(self, entry):
+        key = (entry['subnet_id'], entry['ip_address'])
+        self._entries.pop(key, None)
+        self._entries[key] = entry
+        if self._flusher is None:
+            self._flusher = eventlet.spawn_after(
+                cfg.CONF.dvr_arp_batch_interval, self.flush)
+
+    def flush(self):
+        self._flusher = None
+        entries = self._entries.values()
+        self._entries = collections.OrderedDict()
+        if not entries:
+            return
+        try:
+            self._plugin.notify_arp_entries(
+                n_context.get_admin_context(), entries)
+        except Exception:
+            LOG.exception(_LE("DVR: Failed to send %d ARP entries"),
+                          len(entries))
+
+
+class SubnetRouterCache(object):
+    """Caches the distributed router each subnet is attached to.
+
+    Subnets are cached for dvr_router_cache_ttl seconds, expired ones are
+    purged at most once per ttl.
+    """
+
+    def __init__(self):
+        self._routers = {}
+        self._purge_time = 0
+
+    def get(self, subnet_id, now):
+        expiry, router_id = self._routers.get(subnet_id, (0, None))
+        if expiry > now:
+            return router_id
+
+    def set(self, subnet_id, router_id, now):
+        ttl = cfg.CONF.dvr_router_cache_ttl
+        if ttl <= 0:
+            return
+        if now >= self._purge_time:
+            self._purge_time = now + ttl
+            for cached_id, (expiry, cached) in self._routers.items():
+                if expiry <= now:
+                    del self._routers[cached_id]
+        self._routers[subnet_id] = (now + ttl, router_id)
+
+    def invalidate(self, subnet_ids):
+        for subnet_id in subnet_ids:
+            self._routers.pop(subnet_id, None)
+
+
 class L3_NAT_with_dvr_db_mixin(l3_db.L3_NAT_db_mixin,
                                l3_attrs_db.ExtraAttributesMixin):
     """Mixin class to enable DVR support."""
@@ -242,6 +334,8 @@ class L3_NAT_with_dvr_db_mixin(l3_db.L3_NAT_db_mixin,
                 context.elevated(), router, port['network_id'],
                 port['fixed_ips'][0]['subnet_id'])
 
+        self._subnet_routers.invalidate(
+            fixed_ip['subnet_id'] for fixed_ip in port['fixed_ips'])
         router_interface_info = self._make_router_interface_info(
             router_id, port['tenant_id'], port['id'],
             port['fixed_ips'][0]['subnet_id'])
@@ -270,6 +364,8 @@ class L3_NAT_with_dvr_db_mixin(l3_db.L3_NAT_db_mixin,
             self.delete_csnat_router_interface_ports(
                 context.elevated(), router, subnet_id=subnet_id)
 
+        self._subnet_routers.invalidate(
+            fixed_ip['subnet_id'] for fixed_ip in port['fixed_ips'])
         router_interface_info = self._make_router_interface_info(
             router_id, port['tenant_id'], port['id'],
             port['fixed_ips'][0]['subnet_id'])
@@ -281,19 +377,13 @@ class L3_NAT_with_dvr_db_mixin(l3_db.L3_NAT_db_mixin,
         """Query router interfaces that relate to list of router_ids."""
         if not router_ids:
             return []
-        qry = context.session.query(l3_db.RouterPort)
+        qry = context.session.query(models_v2.Port).join(l3_db.RouterPort)
         qry = qry.filter(
             l3_db.RouterPort.router_id.in_(router_ids),
             l3_db.RouterPort.port_type == DEVICE_OWNER_DVR_SNAT
         )
-
-        # TODO(markmcclain): This is suboptimal but was left to reduce
-        # changeset size since it is late in cycle
-        ports = [rp.port.id for rp in qry]
-        interfaces = self._core_plugin.get_ports(context, {'id': ports})
+        interfaces = self._get_sync_ports(context, qry)
         LOG.debug("Return the SNAT ports: %s", interfaces)
-        if interfaces:
-            self._populate_subnet_for_ports(context, interfaces)
         return interfaces
 
     def _build_routers_list(self, context, routers, gw_ports):
@@ -552,11 +642,77 @@ class L3_NAT_with_dvr_db_mixin(l3_db.L3_NAT_db_mixin,
             self._populate_subnet_for_ports(context, port_list)
         return port_list
 
+    @property
+    def _arp_batcher(self):
+        if not hasattr(self, '_arp_entry_batcher'):
+            self._arp_entry_batcher = ArpEntryBatcher(self)
+        return self._arp_entry_batcher
+
+    @property
+    def _subnet_routers(self):
+        if not hasattr(self, '_subnet_router_cache'):
+            self._subnet_router_cache = SubnetRouterCache()
+        return self._subnet_router_cache
+
+    def _get_dvr_router_ids_by_subnet(self, context, subnet_ids):
+        """Map the subnets to the distributed router they are attached to.
+
+        When dvr_router_cache_ttl is set, the router of a subnet is cached
+        for a while. Subnets without distributed router are not cached,
+        they might get attached by another server at any time.
+        """
+        now = time.time()
+        router_ids = {}
+        missing = []
+        for subnet_id in subnet_ids:
+            router_id = self._subnet_routers.get(subnet_id, now)
+            if router_id:
+                router_ids[subnet_id] = router_id
+            else:
+                missing.append(subnet_id)
+        if not missing:
+            return router_ids
+        query = context.session.query(
+            l3_db.RouterPort.router_id, models_v2.IPAllocation.subnet_id)
+        query = query.join(
+            models_v2.IPAllocation,
+            models_v2.IPAllocation.port_id == l3_db.RouterPort.port_id)
+        query = query.join(
+            l3_attrs_db.RouterExtraAttributes,
+            l3_attrs_db.RouterExtraAttributes.router_id ==
+            l3_db.RouterPort.router_id)
+        query = query.filter(
+            l3_db.RouterPort.port_type == DEVICE_OWNER_DVR_INTERFACE,
+            models_v2.IPAllocation.subnet_id.in_(missing),
+            l3_attrs_db.RouterExtraAttributes.distributed == sa.true())
+        for router_id, subnet_id in query:
+            router_ids[subnet_id] = router_id
+            self._subnet_routers.set(subnet_id, router_id, now)
+        return router_ids
+
+    def notify_arp_entries(self, context, entries):
+        """Send ARP entries to the agents of the routers of their subnets.
+
+        The agents hosting a router get all the entries of the router in a
+        single update_arp_entries message.
+        """
+        router_ids = self._get_dvr_router_ids_by_subnet(
+            context, set(entry['subnet_id'] for entry in entries))
+        router_entries = collections.defaultdict(list)
+        for entry in entries:
+            router_id = router_ids.get(entry['subnet_id'])
+            if router_id:
+                router_entries[router_id].append(entry)
+        for router_id, arp_entries in router_entries.items():
+            self.l3_rpc_notifier.update_arp_entries(context, router_id,
+                                                    arp_entries)
+
     def dvr_vmarp_table_update(self, context, port_dict, action):
         """Notify the L3 agent of VM ARP table changes.
 
         Provide the details of the VM ARP to the L3 agent when
-        a Nova instance gets created or deleted.
+        a Nova instance gets created or deleted. The entries are sent in
+        batches unless dvr_arp_batch_interval is 0.
         """
         # Check this is a valid VM port
         if ("compute:" not in port_dict['device_owner'] or
@@ -564,22 +720,21 @@ class L3_NAT_with_dvr_db_mixin(l3_db.L3_NAT_db_mixin,
             return
         ip_address = port_dict['fixed_ips'][0]['ip_address']
         subnet = port_dict['fixed_ips'][0]['subnet_id']
-        filters = {'fixed_ips': {'subnet_id': [subnet]}}
-        ports = self._core_plugin.get_ports(context, filters=filters)
-        for port in ports:
-            if port['device_owner'] == DEVICE_OWNER_DVR_INTERFACE:
-                router_id = port['device_id']
-                router_dict = self._get_router(context, router_id)
-                if router_dict.extra_attributes.distributed:
-                    arp_table = {'ip_address': ip_address,
-                                 'mac_address': port_dict['mac_address'],
-                                 'subnet_id': subnet}
-                    if action == "add":
-                        notify_action = self.l3_rpc_notifier.add_arp_entry
-                    elif action == "del":
-                        notify_action = self.l3_rpc_notifier.del_arp_entry
-                    notify_action(context, router_id, arp_table)
-                    return
+        arp_table = {'ip_address': ip_address,
+                     'mac_address': port_dict['mac_address'],
+                     'subnet_id': subnet}
+        if cfg.CONF.dvr_arp_batch_interval > 0:
+            arp_table['operation'] = 'add' if action == "add" else 'delete'
+            self._arp_batcher.add(arp_table)
+            return
+        router_id = self._get_dvr_router_ids_by_subnet(
+            context, [subnet]).get(subnet)
+        if router_id:
+            if action == "add":
+                notify_action = self.l3_rpc_notifier.add_arp_entry
+            elif action == "del":
+                notify_action = self.l3_rpc_notifier.del_arp_entry
+            notify_action(context, router_id, arp_table)
 
     def delete_csnat_router_interface_ports(self, context,
                                             router, subnet_id=None):
@@ -0,0 +1,47 @@
+# Copyright 2015 OpenStack Foundation
+#
+#    Licensed under the Apache License, Version 2.0 (the "License"); you may
+#    not use this file except in compliance with the License. You may obtain
+#    a copy of the License at
+#
+#         http://www.apache.org/licenses/LICENSE-2.0
+#
+#    Unless required by applicable law or agreed to in writing, software
+#    distributed under the License is distributed on an "AS IS" BASIS, WITHOUT
+#    WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied. See the
+#    License for the specific language governing permissions and limitations
+#    under the License.
+#
+
+"""ml2_segment_allocated_index
+
+Revision ID: 2b6d9e8c1f4a
+Revises: 4d2c6fa3b1e9
+Create Date: 2015-01-27 14:31:05.402871
+
+"""
+
+# revision identifiers, used by Alembic.
+revision = '2b6d9e8c1f4a'
+down_revision = '4d2c6fa3b1e9'
+
+from alembic import op
+
+
+def upgrade():
+    op.create_index('ix_ml2_vlan_allocations_physical_network_allocated',
+                    'ml2_vlan_allocations',
+                    ['physical_network', 'allocated'])
+    op.create_index('ix_ml2_vxlan_allocations_allocated',
+                    'ml2_vxlan_allocations', ['allocated'])
+    op.create_index('ix_ml2_gre_allocations_allocated',
+                    'ml2_gre_allocations', ['allocated'])
+
+
+def downgrade():
+    op.drop_index('ix_ml2_gre_allocations_allocated',
+                  'ml2_gre_allocations')
+    op.drop_index('ix_ml2_vxlan_allocations_allocated',
+                  'ml2_vxlan_allocations')
+    op.drop_index('ix_ml2_vlan_allocations_physical_network_allocated',
+                  'ml2_vlan_allocations')
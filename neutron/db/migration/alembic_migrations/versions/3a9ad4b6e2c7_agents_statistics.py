@@ -0,0 +1,39 @@
+# Copyright 2015 OpenStack Foundation
+#
+#    Licensed under the Apache License, Version 2.0 (the "License"); you may
+#    not use this file except in compliance with the License. You may obtain
+#    a copy of the License at
+#
+#         http://www.apache.org/licenses/LICENSE-2.0
+#
+#    Unless required by applicable law or agreed to in writing, software
+#    distributed under the License is distributed on an "AS IS" BASIS, WITHOUT
+#    WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied. See the
+#    License for the specific language governing permissions and limitations
+#    under the License.
+#
+
+"""agents_statistics
+
+Revision ID: 3a9ad4b6e2c7
+Revises: 51c54792158e
+Create Date: 2015-02-04 16:05:21.584117
+
+"""
+
+# revision identifiers, used by Alembic.
+revision = '3a9ad4b6e2c7'
+down_revision = '51c54792158e'
+
+from alembic import op
+import sqlalchemy as sa
+
+
+def upgrade():
+    op.add_column('agents',
+                  sa.Column('statistics', sa.String(length=4095),
+                            nullable=True))
+
+
+def downgrade():
+    op.drop_column('agents', 'statistics')
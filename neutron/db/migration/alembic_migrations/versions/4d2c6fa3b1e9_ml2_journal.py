@@ -0,0 +1,56 @@
+# Copyright 2015 OpenStack Foundation
+#
+#    Licensed under the Apache License, Version 2.0 (the "License"); you may
+#    not use this file except in compliance with the License. You may obtain
+#    a copy of the License at
+#
+#         http://www.apache.org/licenses/LICENSE-2.0
+#
+#    Unless required by applicable law or agreed to in writing, software
+#    distributed under the License is distributed on an "AS IS" BASIS, WITHOUT
+#    WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied. See the
+#    License for the specific language governing permissions and limitations
+#    under the License.
+#
+
+"""ml2_journal
+
+Revision ID: 4d2c6fa3b1e9
+Revises: 57086602ca0a
+Create Date: 2015-01-20 10:12:43.218309
+
+"""
+
+# revision identifiers, used by Alembic.
+revision = '4d2c6fa3b1e9'
+down_revision = '57086602ca0a'
+
+from alembic import op
+import sqlalchemy as sa
+
+journal_states = sa.Enum('pending', 'processing', name='ml2_journal_states')
+
+
+def upgrade():
+    op.create_table(
+        'ml2_journal',
+        sa.Column('id', sa.Integer(), nullable=False, autoincrement=True),
+        sa.Column('driver', sa.String(length=64), nullable=False),
+        sa.Column('object_type', sa.String(length=36), nullable=False),
+        sa.Column('object_uuid', sa.String(length=36), nullable=False),
+        sa.Column('operation', sa.String(length=36), nullable=False),
+        sa.Column('data', sa.Text(), nullable=True),
+        sa.Column('dependencies', sa.Text(), nullable=True),
+        sa.Column('state', journal_states, nullable=False),
+        sa.Column('retry_count', sa.Integer(), nullable=False),
+        sa.Column('created_at', sa.DateTime(), nullable=False),
+        sa.Column('last_retried', sa.DateTime(), nullable=True),
+        sa.PrimaryKeyConstraint('id')
+    )
+    op.create_index('ix_ml2_journal_driver_state', 'ml2_journal',
+                    ['driver', 'state'])
+
+
+def downgrade():
+    op.drop_table('ml2_journal')
+    journal_states.drop(op.get_bind(), checkfirst=False)
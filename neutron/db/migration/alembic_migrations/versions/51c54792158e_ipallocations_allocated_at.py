@@ -0,0 +1,38 @@
+# Copyright 2015 OpenStack Foundation
+#
+#    Licensed under the Apache License, Version 2.0 (the "License"); you may
+#    not use this file except in compliance with the License. You may obtain
+#    a copy of the License at
+#
+#         http://www.apache.org/licenses/LICENSE-2.0
+#
+#    Unless required by applicable law or agreed to in writing, software
+#    distributed under the License is distributed on an "AS IS" BASIS, WITHOUT
+#    WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied. See the
+#    License for the specific language governing permissions and limitations
+#    under the License.
+#
+
+"""ipallocations_allocated_at
+
+Revision ID: 51c54792158e
+Revises: 2b6d9e8c1f4a
+Create Date: 2015-02-03 10:12:47.226930
+
+"""
+
+# revision identifiers, used by Alembic.
+revision = '51c54792158e'
+down_revision = '2b6d9e8c1f4a'
+
+from alembic import op
+import sqlalchemy as sa
+
+
+def upgrade():
+    op.add_column('ipallocations',
+                  sa.Column('allocated_at', sa.DateTime(), nullable=True))
+
+
+def downgrade():
+    op.drop_column('ipallocations', 'allocated_at')
@@ -106,6 +106,8 @@ class IPAllocation(model_base.BASEV2):
     network_id = sa.Column(sa.String(36), sa.ForeignKey("networks.id",
                                                         ondelete="CASCADE"),
                            nullable=False, primary_key=True)
+    # Tells how long an allocation has been waiting for its port
+    allocated_at = sa.Column(sa.DateTime, nullable=True)
 
 
 class Route(object):
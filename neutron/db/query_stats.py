@@ -0,0 +1,192 @@
+# Copyright 2015 OpenStack Foundation.
+# All Rights Reserved.
+#
+#    Licensed under the Apache License, Version 2.0 (the "License"); you may
+#    not use this file except in compliance with the License. You may obtain
+#    a copy of the License at
+#
+#         http://www.apache.org/licenses/LICENSE-2.0
+#
+#    Unless required by applicable law or agreed to in writing, software
+#    distributed under the License is distributed on an "AS IS" BASIS, WITHOUT
+#    WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied. See the
+#    License for the specific language governing permissions and limitations
+#    under the License.
+
+"""Statistics of the queries run by the API requests and the RPCs.
+
+When enabled, the queries run on behalf of an API request or of an RPC are
+counted and timed, keyed by the request id of its context. The requests
+running more queries, or spending more time in the database, than the
+thresholds are logged, and the statistics are aggregated by API action and
+RPC method.
+"""
+
+import contextlib
+import functools
+import heapq
+import time
+
+from oslo.config import cfg
+from sqlalchemy import event
+
+from neutron.i18n import _LW
+from neutron.openstack.common import local
+from neutron.openstack.common import log as logging
+
+LOG = logging.getLogger(__name__)
+
+query_stats_opts = [
+    cfg.BoolOpt('query_stats', default=False,
+                help=_("Record the number of queries run by each API request "
+                       "and RPC, and the time they take. Admins get the "
+                       "statistics with GET /v2.0/debug/query-stats")),
+    cfg.IntOpt('query_count_threshold', default=100,
+               help=_("Log the API requests and RPCs running more queries "
+                      "than this when query_stats is set. Not checked when "
+                      "0")),
+    cfg.FloatOpt('query_time_threshold', default=1.0,
+                 help=_("Log the API requests and RPCs spending more seconds "
+                        "in the database than this when query_stats is set. "
+                        "Not checked when 0")),
+]
+cfg.CONF.register_opts(query_stats_opts, 'database')
+
+# Number of the slowest statements kept by request and by action
+SLOWEST_STATEMENTS = 3
+
+# The statistics of the requests being handled, by request id
+_ACTIVE = {}
+# The statistics aggregated by API action and RPC method
+_AGGREGATES = {}
+
+
+def _keep_slowest(slowest, duration, statement):
+    if len(slowest) < SLOWEST_STATEMENTS:
+        heapq.heappush(slowest, (duration, statement))
+    elif duration > slowest[0][0]:
+        heapq.heapreplace(slowest, (duration, statement))
+
+
+def _format_slowest(slowest):
+    return [{'time': duration, 'statement': statement}
+            for duration, statement in sorted(slowest, reverse=True)]
+
+
+class QueryStats(object):
+    """The queries run on behalf of one request."""
+
+    def __init__(self, name, request_id):
+        self.name = name
+        self.request_id = request_id
+        self.queries = 0
+        self.time = 0.0
+        self.slowest = []
+
+    def add(self, statement, duration):
+        self.queries += 1
+        self.time += duration
+        _keep_slowest(self.slowest, duration, statement)
+
+    def exceeds_thresholds(self):
+        count_threshold = cfg.CONF.database.query_count_threshold
+        time_threshold = cfg.CONF.database.query_time_threshold
+        return ((count_threshold > 0 and self.queries > count_threshold) or
+                (time_threshold > 0 and self.time > time_threshold))
+
+
+def _get_current_stats():
+    context = getattr(local.store, 'context', None)
+    if context is not None:
+        return _ACTIVE.get(context.request_id)
+
+
+def _before_cursor_execute(conn, cursor, statement, parameters, context,
+                           executemany):
+    conn.info['query_started_at'] = time.time()
+
+
+def _after_cursor_execute(conn, cursor, statement, parameters, context,
+                          executemany):
+    stats = _get_current_stats()
+    if stats is not None:
+        stats.add(statement, time.time() - conn.info['query_started_at'])
+
+
+def instrument(engine):
+    """Count and time the queries run by an engine."""
+    event.listen(engine, 'before_cursor_execute', _before_cursor_execute)
+    event.listen(engine, 'after_cursor_execute', _after_cursor_execute)
+
+
+def _aggregate(stats):
+    aggregate = _AGGREGATES.get(stats.name)
+    if aggregate is None:
+        aggregate = _AGGREGATES[stats.name] = {
+            'calls': 0, 'queries': 0, 'time': 0.0,
+            'max_queries': 0, 'max_time': 0.0, 'slowest': []}
+    aggregate['calls'] += 1
+    aggregate['queries'] += stats.queries
+    aggregate['time'] += stats.time
+    aggregate['max_queries'] = max(aggregate['max_queries'], stats.queries)
+    aggregate['max_time'] = max(aggregate['max_time'], stats.time)
+    for duration, statement in stats.slowest:
+        _keep_slowest(aggregate['slowest'], duration, statement)
+
+
+@contextlib.contextmanager
+def recording(context, name):
+    """Record the queries run on behalf of a request.
+
+    :param context: the context of the request, the queries are attributed
+        to its request id.
+    :param name: the API action or RPC method handling the request, the
+        statistics are aggregated by name.
+    """
+    if (not cfg.CONF.database.query_stats or
+            context.request_id in _ACTIVE):
+        yield
+        return
+    stats = _ACTIVE[context.request_id] = QueryStats(name, context.request_id)
+    try:
+        yield
+    finally:
+        del _ACTIVE[context.request_id]
+        _aggregate(stats)
+        if stats.exceeds_thresholds():
+            LOG.warn(_LW("%(name)s ran %(queries)d queries in %(time).3f "
+                         "seconds for request %(request_id)s, the slowest: "
+                         "%(slowest)s"),
+                     {'name': name, 'queries': stats.queries,
+                      'time': stats.time, 'request_id': stats.request_id,
+                      'slowest': _format_slowest(stats.slowest)})
+
+
+def get_stats():
+    """Return the statistics aggregated by API action and RPC method."""
+    return dict((name, dict(aggregate,
+                            slowest=_format_slowest(aggregate['slowest'])))
+                for name, aggregate in _AGGREGATES.iteritems())
+
+
+def reset_stats():
+    _AGGREGATES.clear()
+
+
+class RecordingEndpoint(object):
+    """Record the queries run by the methods of an RPC endpoint."""
+
+    def __init__(self, endpoint):
+        self._endpoint = endpoint
+
+    def __getattr__(self, name):
+        attr = getattr(self._endpoint, name)
+        if name.startswith('_') or not callable(attr):
+            return attr
+        method_name = '%s.%s' % (self._endpoint.__class__.__name__, name)
+
+        @functools.wraps(attr)
+        def method(context, *args, **kwargs):
+            with recording(context, method_name):
+                return attr(context, *args, **kwargs)
+        return method
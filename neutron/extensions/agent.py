@@ -50,6 +50,8 @@ RESOURCE_ATTRIBUTE_MAP = {
                   'is_visible': True},
         'configurations': {'allow_post': False, 'allow_put': False,
                            'is_visible': True},
+        'statistics': {'allow_post': False, 'allow_put': False,
+                       'is_visible': True},
         'description': {'allow_post': False, 'allow_put': True,
                         'is_visible': True,
                         'validate': {'type:string': None}},
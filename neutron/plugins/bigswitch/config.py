@@ -65,6 +65,11 @@ restproxy_opts = [
     cfg.IntOpt('thread_pool_size', default=4,
                help=_("Maximum number of threads to spawn to handle large "
                       "volumes of port creations.")),
+    cfg.IntOpt('server_pool_size', default=10,
+               help=_("Maximum number of concurrent connections to each "
+                      "controller. Idle connections are kept open for the "
+                      "following requests unless cache_connections is "
+                      "False.")),
     cfg.StrOpt('neutron_id', default='neutron-' + utils.get_hostname(),
                deprecated_name='quantum_id',
                help=_("User defined identifier for this Neutron deployment")),
@@ -36,6 +36,7 @@ import weakref
 
 import eventlet
 import eventlet.corolocal
+from eventlet import semaphore
 from oslo.config import cfg
 from oslo.serialization import jsonutils
 from oslo.utils import excutils
@@ -104,8 +105,12 @@ class ServerProxy(object):
         self.capabilities = []
         # enable server to reference parent pool
         self.mypool = mypool
-        # cache connection here to avoid a SSL handshake for every connection
-        self.currentconn = None
+        # Connections are kept open between requests to avoid a SSL
+        # handshake for every request. Concurrent requests each use their own
+        # connection, up to server_pool_size of them.
+        self.idle_connections = []
+        self.connection_slots = semaphore.Semaphore(
+            cfg.CONF.RESTPROXY.server_pool_size)
         if auth:
             self.auth = 'Basic ' + base64.encodestring(auth).strip()
         self.combined_cert = combined_cert
@@ -162,66 +167,34 @@ class ServerProxy(object):
             # need a new connection if timeout has changed
             reconnect = True
 
-        if not self.currentconn or reconnect:
-            if self.currentconn:
-                self.currentconn.close()
-            if self.ssl:
-                self.currentconn = HTTPSConnectionWithValidation(
-                    self.server, self.port, timeout=timeout)
-                if self.currentconn is None:
-                    LOG.error(_LE('ServerProxy: Could not establish HTTPS '
-                                  'connection'))
-                    return 0, None, None, None
-                self.currentconn.combined_cert = self.combined_cert
-            else:
-                self.currentconn = httplib.HTTPConnection(
-                    self.server, self.port, timeout=timeout)
-                if self.currentconn is None:
-                    LOG.error(_LE('ServerProxy: Could not establish HTTP '
-                                  'connection'))
-                    return 0, None, None, None
-
-        try:
-            self.currentconn.request(action, uri, body, headers)
-            response = self.currentconn.getresponse()
-            respstr = response.read()
-            respdata = respstr
-            if response.status in self.success_codes:
-                hash_value = response.getheader(HASH_MATCH_HEADER)
-                # don't clear hash from DB if a hash header wasn't present
-                if hash_value is not None:
-                    hash_handler.put_hash(hash_value)
-                else:
-                    hash_handler.clear_lock()
-                try:
-                    respdata = jsonutils.loads(respstr)
-                except ValueError:
-                    # response was not JSON, ignore the exception
-                    pass
-            else:
-                # release lock so others don't have to wait for timeout
-                hash_handler.clear_lock()
-
-            ret = (response.status, response.reason, respstr, respdata)
-        except httplib.HTTPException:
-            # If we were using a cached connection, try again with a new one.
-            with excutils.save_and_reraise_exception() as ctxt:
-                self.currentconn.close()
-                if reconnect:
+        with self.connection_slots:
+            conn = self._get_connection(timeout, reconnect)
+            if conn is None:
+                return 0, None, None, None
+            try:
+                ret = self._send(conn, action, uri, body, headers,
+                                 hash_handler)
+            except httplib.HTTPException:
+                # If we were using a cached connection, try again with a new
+                # one.
+                with excutils.save_and_reraise_exception() as ctxt:
+                    conn.close()
                     # if reconnect is true, this was on a fresh connection so
                     # reraise since this server seems to be broken
-                    ctxt.reraise = True
-                else:
-                    # if reconnect is false, it was a cached connection so
-                    # try one more time before re-raising
-                    ctxt.reraise = False
+                    ctxt.reraise = reconnect
+                ret = None
+            except (socket.timeout, socket.error) as e:
+                conn.close()
+                LOG.error(_LE('ServerProxy: %(action)s failure, %(e)r'),
+                          {'action': action, 'e': e})
+                ret = 0, None, None, None
+            else:
+                self._release_connection(conn, reconnect)
+        if ret is None:
+            # retry outside of the connection slot so that a pool of one
+            # connection does not block on itself
             return self.rest_call(action, resource, data, headers,
                                   timeout=timeout, reconnect=True)
-        except (socket.timeout, socket.error) as e:
-            self.currentconn.close()
-            LOG.error(_LE('ServerProxy: %(action)s failure, %(e)r'),
-                      {'action': action, 'e': e})
-            ret = 0, None, None, None
         LOG.debug("ServerProxy: status=%(status)d, reason=%(reason)r, "
                   "ret=%(ret)s, data=%(data)r", {'status': ret[0],
                                                  'reason': ret[1],
@@ -229,6 +202,55 @@ class ServerProxy(object):
                                                  'data': ret[3]})
         return ret
 
+    def _get_connection(self, timeout, reconnect):
+        if not reconnect and self.idle_connections:
+            return self.idle_connections.pop()
+        if self.ssl:
+            conn = HTTPSConnectionWithValidation(
+                self.server, self.port, timeout=timeout)
+            if conn is None:
+                LOG.error(_LE('ServerProxy: Could not establish HTTPS '
+                              'connection'))
+                return None
+            conn.combined_cert = self.combined_cert
+        else:
+            conn = httplib.HTTPConnection(
+                self.server, self.port, timeout=timeout)
+            if conn is None:
+                LOG.error(_LE('ServerProxy: Could not establish HTTP '
+                              'connection'))
+        return conn
+
+    def _release_connection(self, conn, reconnect):
+        # connections opened for a single request, e.g. because the server
+        # doesn't support keep-alive or with another timeout, are not reused
+        if reconnect:
+            conn.close()
+        else:
+            self.idle_connections.append(conn)
+
+    def _send(self, conn, action, uri, body, headers, hash_handler):
+        conn.request(action, uri, body, headers)
+        response = conn.getresponse()
+        respstr = response.read()
+        respdata = respstr
+        if response.status in self.success_codes:
+            hash_value = response.getheader(HASH_MATCH_HEADER)
+            # don't clear hash from DB if a hash header wasn't present
+            if hash_value is not None:
+                hash_handler.put_hash(hash_value)
+            else:
+                hash_handler.clear_lock()
+            try:
+                respdata = jsonutils.loads(respstr)
+            except ValueError:
+                # response was not JSON, ignore the exception
+                pass
+        else:
+            # release lock so others don't have to wait for timeout
+            hash_handler.clear_lock()
+        return response.status, response.reason, respstr, respdata
+
 
 class ServerPool(object):
 
@@ -19,6 +19,8 @@
 # Based on the structure of the OpenVSwitch agent in the
 # Neutron OpenVSwitch Plugin.
 
+import collections
+import contextlib
 import os
 import sys
 import time
@@ -32,6 +34,7 @@ from six import moves
 
 from neutron.agent import l2population_rpc as l2pop_rpc
 from neutron.agent.linux import ip_lib
+from neutron.agent.linux import link_monitor
 from neutron.agent.linux import utils
 from neutron.agent import rpc as agent_rpc
 from neutron.agent import securitygroups_rpc as sg_rpc
@@ -84,6 +87,11 @@ class LinuxBridgeManager:
                                 'must be provided'))
         # Store network mapping to segments
         self.network_map = {}
+        # FDB entries programmed on each vxlan interface, so that the
+        # l2population updates not changing anything are skipped
+        self.fdb_bridge_entries = collections.defaultdict(set)
+        self.fdb_ip_entries = collections.defaultdict(dict)
+        self._fdb_batch = None
 
     def interface_exists_on_bridge(self, bridge, interface):
         directory = '/sys/class/net/%s/brif' % bridge
@@ -247,6 +255,7 @@ class LinuxBridgeManager:
                 args['proxy'] = True
             int_vxlan = self.ip.add_vxlan(interface, segmentation_id, **args)
             int_vxlan.link.set_up()
+            self.forget_fdb_entries(interface)
             LOG.debug("Done creating vxlan interface %s", interface)
         return interface
 
@@ -503,6 +512,7 @@ class LinuxBridgeManager:
             int_vxlan = self.ip.device(interface)
             int_vxlan.link.set_down()
             int_vxlan.link.delete()
+            self.forget_fdb_entries(interface)
             LOG.debug("Done deleting vxlan interface %s", interface)
 
     def get_tap_devices(self):
@@ -598,29 +608,99 @@ class LinuxBridgeManager:
 
         return (agent_ip in entries and mac in entries)
 
+    def forget_fdb_entries(self, interface):
+        self.fdb_bridge_entries.pop(interface, None)
+        self.fdb_ip_entries.pop(interface, None)
+
+    @contextlib.contextmanager
+    def fdb_batch(self):
+        """Apply the bridge FDB changes made within the context at once.
+
+        The changes are fed to a single 'bridge -batch' process, which the
+        rootwrap filter of the bridge command already allows. The ip neigh
+        changes are still applied one at a time, as 'ip -batch' would read
+        commands the ip filter cannot check, e.g. 'netns exec'.
+        """
+        if self._fdb_batch is not None:
+            # Nested batches are applied with the outermost one
+            yield
+            return
+        self._fdb_batch = batch = []
+        try:
+            yield
+        finally:
+            self._fdb_batch = None
+            if batch:
+                self._apply_fdb_batch(batch)
+
+    def _apply_fdb_batch(self, batch):
+        try:
+            utils.execute(['bridge', '-force', '-batch', '-'],
+                          process_input=''.join(' '.join(args) + '\n'
+                                                for args, interface in batch),
+                          root_helper=self.root_helper,
+                          log_fail_as_error=False)
+        except RuntimeError:
+            # Some changes may legitimately fail, e.g. removing missing
+            # entries. Forget the interfaces so that their entries are
+            # programmed again on the next update.
+            LOG.debug("Some of the %d batched FDB changes failed",
+                      len(batch))
+            for interface in set(interface for args, interface in batch):
+                self.forget_fdb_entries(interface)
+
+    def _execute_fdb(self, cmd):
+        """Run an FDB command and return whether it succeeded.
+
+        Some commands may legitimately fail, e.g. removing missing entries.
+        """
+        try:
+            utils.execute(cmd, root_helper=self.root_helper,
+                          log_fail_as_error=False)
+        except RuntimeError:
+            LOG.debug("FDB command %s failed", cmd)
+            return False
+        return True
+
+    def _execute_bridge_fdb(self, args, interface):
+        if self._fdb_batch is not None:
+            self._fdb_batch.append((['fdb'] + args, interface))
+            return True
+        return self._execute_fdb(['bridge', 'fdb'] + args)
+
     def add_fdb_ip_entry(self, mac, ip, interface):
-        utils.execute(['ip', 'neigh', 'replace', ip, 'lladdr', mac,
-                       'dev', interface, 'nud', 'permanent'],
-                      root_helper=self.root_helper,
-                      check_exit_code=False)
+        if self.fdb_ip_entries[interface].get(ip) == mac:
+            return
+        if self._execute_fdb(['ip', 'neigh', 'replace', ip, 'lladdr', mac,
+                              'dev', interface, 'nud', 'permanent']):
+            self.fdb_ip_entries[interface][ip] = mac
 
     def remove_fdb_ip_entry(self, mac, ip, interface):
-        utils.execute(['ip', 'neigh', 'del', ip, 'lladdr', mac,
-                       'dev', interface],
-                      root_helper=self.root_helper,
-                      check_exit_code=False)
+        if self.fdb_ip_entries[interface].get(ip) == mac:
+            del self.fdb_ip_entries[interface][ip]
+        self._execute_fdb(['ip', 'neigh', 'del', ip, 'lladdr', mac,
+                           'dev', interface])
 
     def add_fdb_bridge_entry(self, mac, agent_ip, interface, operation="add"):
-        utils.execute(['bridge', 'fdb', operation, mac, 'dev', interface,
-                       'dst', agent_ip],
-                      root_helper=self.root_helper,
-                      check_exit_code=False)
+        if (mac, agent_ip) in self.fdb_bridge_entries[interface]:
+            return
+        # Batched entries are remembered right away, so that the flooding
+        # entries of the next VTEPs are appended; a failed batch forgets them
+        if self._execute_bridge_fdb([operation, mac, 'dev', interface,
+                                     'dst', agent_ip], interface):
+            self.fdb_bridge_entries[interface].add((mac, agent_ip))
 
     def remove_fdb_bridge_entry(self, mac, agent_ip, interface):
-        utils.execute(['bridge', 'fdb', 'del', mac, 'dev', interface,
-                       'dst', agent_ip],
-                      root_helper=self.root_helper,
-                      check_exit_code=False)
+        self.fdb_bridge_entries[interface].discard((mac, agent_ip))
+        self._execute_bridge_fdb(['del', mac, 'dev', interface,
+                                  'dst', agent_ip], interface)
+
+    def _flooding_entry_exists(self, interface):
+        if any(mac == constants.FLOODING_ENTRY[0]
+               for mac, agent_ip in self.fdb_bridge_entries[interface]):
+            return True
+        return self.fdb_bridge_entry_exists(constants.FLOODING_ENTRY[0],
+                                            interface)
 
     def add_fdb_entries(self, agent_ip, ports, interface):
         for mac, ip in ports:
@@ -628,7 +708,7 @@ class LinuxBridgeManager:
                 self.add_fdb_ip_entry(mac, ip, interface)
                 self.add_fdb_bridge_entry(mac, agent_ip, interface)
             elif self.vxlan_mode == lconst.VXLAN_UCAST:
-                if self.fdb_bridge_entry_exists(mac, interface):
+                if self._flooding_entry_exists(interface):
                     self.add_fdb_bridge_entry(mac, agent_ip, interface,
                                               "append")
                 else:
@@ -676,6 +756,10 @@ class LinuxBridgeRpcCallbacks(sg_rpc.SecurityGroupAgentRpcCallbackMixin,
 
     def fdb_add(self, context, fdb_entries):
         LOG.debug("fdb_add received")
+        with self.agent.br_mgr.fdb_batch():
+            self._add_fdb_entries(fdb_entries)
+
+    def _add_fdb_entries(self, fdb_entries):
         for network_id, values in fdb_entries.items():
             segment = self.agent.br_mgr.network_map.get(network_id)
             if not segment:
@@ -698,6 +782,10 @@ class LinuxBridgeRpcCallbacks(sg_rpc.SecurityGroupAgentRpcCallbackMixin,
 
     def fdb_remove(self, context, fdb_entries):
         LOG.debug("fdb_remove received")
+        with self.agent.br_mgr.fdb_batch():
+            self._remove_fdb_entries(fdb_entries)
+
+    def _remove_fdb_entries(self, fdb_entries):
         for network_id, values in fdb_entries.items():
             segment = self.agent.br_mgr.network_map.get(network_id)
             if not segment:
@@ -745,12 +833,13 @@ class LinuxBridgeRpcCallbacks(sg_rpc.SecurityGroupAgentRpcCallbackMixin,
 
     def fdb_update(self, context, fdb_entries):
         LOG.debug("fdb_update received")
-        for action, values in fdb_entries.items():
-            method = '_fdb_' + action
-            if not hasattr(self, method):
-                raise NotImplementedError()
+        with self.agent.br_mgr.fdb_batch():
+            for action, values in fdb_entries.items():
+                method = '_fdb_' + action
+                if not hasattr(self, method):
+                    raise NotImplementedError()
 
-            getattr(self, method)(context, values)
+                getattr(self, method)(context, values)
 
 
 class LinuxBridgePluginApi(agent_rpc.PluginApi,
@@ -780,6 +869,10 @@ class LinuxBridgeNeutronAgentRPC(sg_rpc.SecurityGroupAgentRpcMixin):
 
         # stores received port_updates for processing by the main loop
         self.updated_devices = set()
+        self.link_monitor = None
+        if cfg.CONF.AGENT.monitor_links:
+            self.link_monitor = link_monitor.LinkMonitor(
+                prefix=constants.TAP_DEVICE_PREFIX)
         self.setup_rpc(interface_mappings.values())
         self.init_firewall()
 
@@ -871,6 +964,8 @@ class LinuxBridgeNeutronAgentRPC(sg_rpc.SecurityGroupAgentRpcMixin):
             # resync is needed
             return True
 
+        devices_up = []
+        devices_down = []
         for device_details in devices_details_list:
             device = device_details['device']
             LOG.debug("Port %s added", device)
@@ -894,44 +989,67 @@ class LinuxBridgeNeutronAgentRPC(sg_rpc.SecurityGroupAgentRpcMixin):
                         device_details['physical_network'],
                         segmentation_id,
                         device_details['port_id']):
-
-                        # update plugin about port status
-                        self.plugin_rpc.update_device_up(self.context,
-                                                         device,
-                                                         self.agent_id,
-                                                         cfg.CONF.host)
+                        devices_up.append(device)
                     else:
-                        self.plugin_rpc.update_device_down(self.context,
-                                                           device,
-                                                           self.agent_id,
-                                                           cfg.CONF.host)
+                        devices_down.append(device)
                 else:
                     self.remove_port_binding(device_details['network_id'],
                                              device_details['port_id'])
             else:
                 LOG.info(_LI("Device %s not defined on plugin"), device)
-        return False
+
+        # update plugin about port status
+        failed_devices = []
+        try:
+            if devices_up:
+                res = self.plugin_rpc.update_devices_up(self.context,
+                                                        devices_up,
+                                                        self.agent_id,
+                                                        cfg.CONF.host)
+                failed_devices.extend(res['failed_devices_up'])
+            if devices_down:
+                res = self.plugin_rpc.update_devices_down(self.context,
+                                                          devices_down,
+                                                          self.agent_id,
+                                                          cfg.CONF.host)
+                failed_devices.extend(res['failed_devices_down'])
+        except Exception as e:
+            LOG.debug("Unable to update status of devices "
+                      "%(devices)s: %(e)s",
+                      {'devices': devices_up + devices_down, 'e': e})
+            # resync is needed
+            return True
+        if failed_devices:
+            LOG.debug("Unable to update status of devices %s",
+                      failed_devices)
+        return bool(failed_devices)
 
     def treat_devices_removed(self, devices):
-        resync = False
         self.remove_devices_filter(devices)
         for device in devices:
             LOG.info(_LI("Attachment %s removed"), device)
-            details = None
-            try:
-                details = self.plugin_rpc.update_device_down(self.context,
-                                                             device,
-                                                             self.agent_id,
-                                                             cfg.CONF.host)
-            except Exception as e:
-                LOG.debug("port_removed failed for %(device)s: %(e)s",
-                          {'device': device, 'e': e})
-                resync = True
-            if details and details['exists']:
-                LOG.info(_LI("Port %s updated."), device)
+        resync = False
+        try:
+            res = self.plugin_rpc.update_devices_down(self.context,
+                                                      list(devices),
+                                                      self.agent_id,
+                                                      cfg.CONF.host)
+        except Exception as e:
+            LOG.debug("port_removed failed for %(devices)s: %(e)s",
+                      {'devices': devices, 'e': e})
+            res = {'devices_down': [], 'failed_devices_down': devices}
+            resync = True
+        for details in res['devices_down']:
+            if details['exists']:
+                LOG.info(_LI("Port %s updated."), details['device'])
             else:
-                LOG.debug("Device %s not defined on plugin", device)
-            self.br_mgr.remove_empty_bridges()
+                LOG.debug("Device %s not defined on plugin",
+                          details['device'])
+        if res['failed_devices_down']:
+            LOG.debug("port_removed failed for %s",
+                      res['failed_devices_down'])
+            resync = True
+        self.br_mgr.remove_empty_bridges()
         return resync
 
     def scan_devices(self, previous, sync):
@@ -980,10 +1098,40 @@ class LinuxBridgeNeutronAgentRPC(sg_rpc.SecurityGroupAgentRpcMixin):
                 or device_info.get('updated')
                 or device_info.get('removed'))
 
+    def _wait_for_changes(self, start, sync):
+        """Wait until the next iteration of the agent loop is required.
+
+        Without link monitoring, or to retry after a failure, the devices
+        are scanned every polling interval. Otherwise added and removed taps
+        wake the loop up immediately, port updates are checked for every
+        polling interval and all the devices are scanned anyway every
+        full_scan_interval.
+        """
+        if self.link_monitor and not sync:
+            deadline = start + cfg.CONF.AGENT.full_scan_interval
+            while not self.updated_devices:
+                timeout = min(self.polling_interval, deadline - time.time())
+                if timeout <= 0 or self.link_monitor.wait(timeout):
+                    break
+            return
+
+        # sleep till end of polling interval
+        elapsed = (time.time() - start)
+        if (elapsed < self.polling_interval):
+            time.sleep(self.polling_interval - elapsed)
+        else:
+            LOG.debug("Loop iteration exceeded interval "
+                      "(%(polling_interval)s vs. %(elapsed)s)!",
+                      {'polling_interval': self.polling_interval,
+                       'elapsed': elapsed})
+
     def daemon_loop(self):
         LOG.info(_LI("LinuxBridge Agent RPC Daemon Started!"))
         device_info = None
         sync = True
+        if self.link_monitor:
+            # Started before the first scan so that no change is missed
+            self.link_monitor.start()
 
         while True:
             start = time.time()
@@ -1003,15 +1151,7 @@ class LinuxBridgeNeutronAgentRPC(sg_rpc.SecurityGroupAgentRpcMixin):
                                   device_info)
                     sync = True
 
-            # sleep till end of polling interval
-            elapsed = (time.time() - start)
-            if (elapsed < self.polling_interval):
-                time.sleep(self.polling_interval - elapsed)
-            else:
-                LOG.debug("Loop iteration exceeded interval "
-                          "(%(polling_interval)s vs. %(elapsed)s)!",
-                          {'polling_interval': self.polling_interval,
-                           'elapsed': elapsed})
+            self._wait_for_changes(start, sync)
 
 
 def main():
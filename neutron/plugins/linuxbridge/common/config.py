@@ -62,6 +62,13 @@ agent_opts = [
                       "polling for local device changes.")),
     cfg.BoolOpt('rpc_support_old_agents', default=False,
                 help=_("Enable server RPC compatibility with old agents")),
+    cfg.BoolOpt('monitor_links', default=False,
+                help=_("Process tap devices as soon as they are added or "
+                       "removed by monitoring the kernel link events, and "
+                       "only scan all of them every full_scan_interval.")),
+    cfg.IntOpt('full_scan_interval', default=60,
+               help=_("The number of seconds between two scans of all the "
+                      "tap devices when monitor_links is enabled.")),
 ]
 
 
@@ -207,6 +207,43 @@ def get_port(session, port_id):
             return
 
 
+def get_ports(session, port_ids):
+    """Get port records for update within transaction.
+
+    port_ids may hold truncated uuids, as found in device names. Return
+    a dict mapping each requested port_id to its port record, ids
+    matching no port or several ports are left out.
+    """
+    ports = {}
+    for i in range(0, len(port_ids), MAX_PORTS_PER_QUERY):
+        chunk = port_ids[i:i + MAX_PORTS_PER_QUERY]
+        partial_uuids = set(port_id for port_id in chunk
+                            if not uuidutils.is_uuid_like(port_id))
+        full_uuids = set(chunk) - partial_uuids
+        or_criteria = [models_v2.Port.id.startswith(port_id)
+                       for port_id in partial_uuids]
+        if full_uuids:
+            or_criteria.append(models_v2.Port.id.in_(full_uuids))
+        with session.begin(subtransactions=True):
+            records = (session.query(models_v2.Port).
+                       filter(or_(*or_criteria)).all())
+        for port_id in full_uuids:
+            ports[port_id] = None
+        for record in records:
+            if record.id in full_uuids:
+                ports[record.id] = record
+            for port_id in partial_uuids:
+                if record.id.startswith(port_id):
+                    if port_id in ports:
+                        LOG.error(_LE("Multiple ports have port_id starting "
+                                      "with %s"), port_id)
+                        ports[port_id] = None
+                    else:
+                        ports[port_id] = record
+    return dict((port_id, record) for port_id, record in ports.iteritems()
+                if record is not None)
+
+
 def get_port_from_device_mac(device_mac):
     LOG.debug("get_port_from_device_mac() called for mac %s", device_mac)
     session = db_api.get_session()
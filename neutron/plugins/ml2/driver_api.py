@@ -625,6 +625,21 @@ class MechanismDriver(object):
         """
         pass
 
+    def update_ports_postcommit(self, contexts):
+        """Update many ports at once.
+
+        :param contexts: list of PortContext instances, one for each
+        updated port.
+
+        Called after a single transaction updated all the ports, for
+        instance when an agent reports the status of many devices.
+        The default implementation calls update_port_postcommit for
+        each port; drivers able to process the updates as a batch may
+        override it.
+        """
+        for context in contexts:
+            self.update_port_postcommit(context)
+
     def delete_port_precommit(self, context):
         """Delete resources of a port.
 
@@ -13,7 +13,13 @@
 #    License for the specific language governing permissions and limitations
 #    under the License.
 
+import functools
+import itertools
+import random
+
 from oslo.db import exception as db_exc
+from six import moves
+import sqlalchemy as sa
 
 from neutron.common import exceptions as exc
 from neutron.i18n import _LW
@@ -24,10 +30,36 @@ from neutron.plugins.ml2 import driver_api as api
 # Number of attempts to find a valid segment candidate and allocate it
 DB_MAX_ATTEMPTS = 10
 
+# Number of unallocated segments from which one is picked at random
+IDPOOL_SELECT_SIZE = 100
+
+# Number of segments inserted by statement when the pool is synchronized
+SYNC_BULK_SIZE = 1000
+
 
 LOG = log.getLogger(__name__)
 
 
+def retry_on_duplicate_segments(f):
+    """Synchronize the segment pools again when they changed meanwhile.
+
+    Servers starting together find the same segments missing and insert
+    them concurrently. The transaction of all but one fails on duplicate
+    segments, and is run again to only insert those still missing.
+    """
+    @functools.wraps(f)
+    def wrapper(self, *args, **kwargs):
+        for attempt in range(DB_MAX_ATTEMPTS):
+            try:
+                return f(self, *args, **kwargs)
+            except db_exc.DBDuplicateEntry:
+                if attempt == DB_MAX_ATTEMPTS - 1:
+                    raise
+                LOG.debug("%s segments were inserted by another server, "
+                          "synchronizing again", self.get_type())
+    return wrapper
+
+
 class TypeDriverHelper(api.TypeDriver):
     """TypeDriver Helper for segment allocation.
 
@@ -39,6 +71,9 @@ class TypeDriverHelper(api.TypeDriver):
         self.model = model
         self.primary_keys = set(dict(model.__table__.columns))
         self.primary_keys.remove("allocated")
+        # The column of the VLAN tag or tunnel ID of the segments
+        self.segmentation_key = (self.primary_keys -
+                                 set([api.PHYSICAL_NETWORK])).pop()
 
     def allocate_fully_specified_segment(self, session, **raw_segment):
         """Allocate segment fully specified by raw_segment.
@@ -106,17 +141,24 @@ class TypeDriverHelper(api.TypeDriver):
         with session.begin(subtransactions=True):
             select = (session.query(self.model).
                       filter_by(allocated=False, **filters))
+            key = getattr(self.model, self.segmentation_key)
+            lowest, highest = (session.query(sa.func.min(key),
+                                             sa.func.max(key)).
+                               filter_by(**filters).one())
+            if lowest is None:
+                # No resource available
+                return
 
             # Selected segment can be allocated before update by someone else,
             # We retry until update success or DB_MAX_ATTEMPTS attempts
             for attempt in range(1, DB_MAX_ATTEMPTS + 1):
-                alloc = select.first()
+                raw_segment = self._select_random_segment(select, key,
+                                                          lowest, highest)
 
-                if not alloc:
+                if not raw_segment:
                     # No resource available
                     return
 
-                raw_segment = dict((k, alloc[k]) for k in self.primary_keys)
                 LOG.debug("%(type)s segment allocate from pool, attempt "
                           "%(attempt)s started with %(segment)s ",
                           {"type": network_type, "attempt": attempt,
@@ -129,7 +171,8 @@ class TypeDriverHelper(api.TypeDriver):
                               "%(attempt)s success with %(segment)s ",
                               {"type": network_type, "attempt": attempt,
                                "segment": raw_segment})
-                    return alloc
+                    return (session.query(self.model).
+                            filter_by(**raw_segment).one())
 
                 # Segment allocated since select
                 LOG.debug("Allocate %(type)s segment from pool, "
@@ -142,3 +185,64 @@ class TypeDriverHelper(api.TypeDriver):
                         "after %(number)s failed attempts"),
                     {"type": network_type, "number": DB_MAX_ATTEMPTS})
         raise exc.NoNetworkFoundInMaximumAllowedAttempts()
+
+    def _select_random_segment(self, select, key, lowest, highest):
+        """Select an unallocated segment at random.
+
+        Concurrent allocations taking the first unallocated segment would
+        all fight over it. The segments are rather looked for from a random
+        ID, wrapping around to the lowest ID, along the primary key, and
+        one of the first found is picked.
+
+        Return the primary key of the segment as a dict or None.
+        """
+        columns = [getattr(self.model, k) for k in self.primary_keys]
+        start = random.randint(lowest, highest)
+        for candidates in (select.filter(key >= start),
+                           select.filter(key < start)):
+            segments = (candidates.with_entities(*columns).order_by(key).
+                        limit(IDPOOL_SELECT_SIZE).all())
+            if segments:
+                return dict(zip(self.primary_keys, random.choice(segments)))
+
+    def sync_segment_pool(self, session, ranges, **filters):
+        """Make the pool of segments filtered by filters match the ranges.
+
+        The unallocated segments outside the ranges are deleted by one
+        statement. The segments of a range are counted, and only when some
+        are missing are the IDs of the range read and the missing ones
+        inserted, in bulk. A restart with unchanged ranges reads no
+        segment.
+        """
+        key = getattr(self.model, self.segmentation_key)
+        pool = session.query(self.model).filter_by(**filters)
+        outside = pool.filter_by(allocated=False)
+        if ranges:
+            outside = outside.filter(~sa.or_(*[key.between(low, high)
+                                               for low, high in ranges]))
+        count = outside.delete(synchronize_session=False)
+        if count:
+            LOG.debug("Removed %(count)s %(type)s segments from pool "
+                      "%(filters)s", {'count': count, 'type': self.get_type(),
+                                      'filters': filters})
+
+        for low, high in ranges:
+            in_range = pool.filter(key.between(low, high))
+            present = in_range.with_entities(sa.func.count()).scalar()
+            if present == high - low + 1:
+                continue
+            existing = set()
+            if present:
+                existing = set(segment_id for segment_id, in
+                               in_range.with_entities(key))
+            missing = (segment_id for segment_id in
+                       moves.xrange(low, high + 1)
+                       if segment_id not in existing)
+            while True:
+                bulk = [dict(filters, allocated=False,
+                             **{self.segmentation_key: segment_id})
+                        for segment_id in itertools.islice(missing,
+                                                           SYNC_BULK_SIZE)]
+                if not bulk:
+                    break
+                session.execute(self.model.__table__.insert(), bulk)
@@ -24,9 +24,11 @@ from neutron.common import constants as n_const
 from neutron.common import exceptions as n_exc
 from neutron.common import utils
 from neutron.extensions import portbindings
+from neutron import manager
 from neutron.openstack.common import log
 from neutron.plugins.common import constants
 from neutron.plugins.ml2 import driver_api as api
+from neutron.plugins.ml2 import journal
 
 LOG = log.getLogger(__name__)
 
@@ -45,6 +47,14 @@ odl_opts = [
                help=_("HTTP timeout in seconds.")),
     cfg.IntOpt('session_timeout', default=30,
                help=_("Tomcat session timeout in minutes.")),
+    cfg.BoolOpt('enable_journal', default=False,
+                help=_("Record the operations in the ML2 journal and send "
+                       "them to OpenDaylight from a background worker "
+                       "instead of within the API requests.")),
+    cfg.IntOpt('max_connections', default=10,
+               help=_("Maximum number of concurrent HTTP connections to "
+                      "OpenDaylight. Idle connections are kept open and "
+                      "reused by the following requests.")),
 ]
 
 cfg.CONF.register_opts(odl_opts, "ml2_odl")
@@ -59,6 +69,21 @@ def try_del(d, keys):
             pass
 
 
+def get_session(max_connections):
+    """Return an HTTP session keeping its connections open for reuse.
+
+    Sending every request on a fresh connection costs a TCP and possibly a
+    TLS handshake each time. At most max_connections are opened per host,
+    further requests wait for one of them to be released.
+    """
+    session = requests.Session()
+    adapter = requests.adapters.HTTPAdapter(pool_maxsize=max_connections,
+                                            pool_block=True)
+    session.mount('http://', adapter)
+    session.mount('https://', adapter)
+    return session
+
+
 class OpendaylightAuthError(n_exc.NeutronException):
     message = '%(msg)s'
 
@@ -71,7 +96,7 @@ class JsessionId(requests.auth.AuthBase):
     set of cookies are obtained.
     """
 
-    def __init__(self, url, username, password):
+    def __init__(self, url, username, password, session=requests):
         """Initialization function for JsessionId."""
 
         # NOTE(kmestery) The 'limit' paramater is intended to limit how much
@@ -81,6 +106,7 @@ class JsessionId(requests.auth.AuthBase):
         self.url = str(url) + '/' + ODL_NETWORKS + '?limit=1'
         self.username = username
         self.password = password
+        self.session = session
         self.auth_cookies = None
         self.last_request = None
         self.expired = None
@@ -91,7 +117,8 @@ class JsessionId(requests.auth.AuthBase):
         """Make a REST call to obtain cookies for ODL authenticiation."""
 
         try:
-            r = requests.get(self.url, auth=(self.username, self.password))
+            r = self.session.get(self.url,
+                                 auth=(self.username, self.password))
             r.raise_for_status()
         except requests.exceptions.HTTPError as e:
             raise OpendaylightAuthError(msg="Failed to authenticate with "
@@ -115,6 +142,53 @@ class JsessionId(requests.auth.AuthBase):
         return r
 
 
+class PluginContext(object):
+    """Minimal driver context to synchronize outside of an operation."""
+
+    def __init__(self, plugin, plugin_context):
+        self._plugin = plugin
+        self._plugin_context = plugin_context
+
+
+class OpenDaylightJournalBackend(journal.JournalBackend):
+    """Send the operations recorded in the journal to OpenDaylight."""
+
+    def __init__(self, driver):
+        self.driver = driver
+
+    def can_batch(self, object_type, operation):
+        # OpenDaylight only accepts lists of resources on creation
+        return operation == 'create'
+
+    def send(self, context, object_type, operation, entries):
+        if operation == 'create':
+            resources = [journal.get_data(entry) for entry in entries]
+            if len(resources) == 1:
+                obj = {object_type[:-1]: resources[0]}
+            else:
+                obj = {object_type: resources}
+            self.driver.sendjson('post', object_type, obj)
+            return
+        for entry in entries:
+            urlpath = object_type + '/' + entry.object_uuid
+            if operation == 'update':
+                self.driver.sendjson('put', urlpath,
+                                     {object_type[:-1]:
+                                      journal.get_data(entry)})
+                continue
+            try:
+                self.driver.sendjson('delete', urlpath, None)
+            except requests.exceptions.HTTPError as e:
+                # Already deleted by a previous attempt or a full sync
+                if e.response.status_code != requests.codes.not_found:
+                    raise
+
+    def sync_full(self, context):
+        self.driver.out_of_sync = True
+        self.driver.sync_full(
+            PluginContext(manager.NeutronManager.get_plugin(), context))
+
+
 class OpenDaylightMechanismDriver(api.MechanismDriver):
 
     """Mechanism Driver for OpenDaylight.
@@ -135,9 +209,45 @@ class OpenDaylightMechanismDriver(api.MechanismDriver):
         for opt in required_opts:
             if not getattr(self, opt):
                 raise cfg.RequiredOptError(opt, 'ml2_odl')
-        self.auth = JsessionId(self.url, self.username, self.password)
+        self.session = get_session(cfg.CONF.ml2_odl.max_connections)
+        self.auth = JsessionId(self.url, self.username, self.password,
+                               self.session)
         self.vif_type = portbindings.VIF_TYPE_OVS
         self.vif_details = {portbindings.CAP_PORT_FILTER: True}
+        self.journal = None
+        if cfg.CONF.ml2_odl.enable_journal:
+            self.journal = journal.Journal(
+                'opendaylight', OpenDaylightJournalBackend(self),
+                sync_on_start=True)
+
+    # Precommit hooks record the operations when the journal is enabled.
+
+    def create_network_precommit(self, context):
+        self.record('create', ODL_NETWORKS, context)
+
+    def update_network_precommit(self, context):
+        self.record('update', ODL_NETWORKS, context)
+
+    def delete_network_precommit(self, context):
+        self.record('delete', ODL_NETWORKS, context)
+
+    def create_subnet_precommit(self, context):
+        self.record('create', ODL_SUBNETS, context)
+
+    def update_subnet_precommit(self, context):
+        self.record('update', ODL_SUBNETS, context)
+
+    def delete_subnet_precommit(self, context):
+        self.record('delete', ODL_SUBNETS, context)
+
+    def create_port_precommit(self, context):
+        self.record('create', ODL_PORTS, context)
+
+    def update_port_precommit(self, context):
+        self.record('update', ODL_PORTS, context)
+
+    def delete_port_precommit(self, context):
+        self.record('delete', ODL_PORTS, context)
 
     # Postcommit hooks are used to trigger synchronization.
 
@@ -168,9 +278,31 @@ class OpenDaylightMechanismDriver(api.MechanismDriver):
     def delete_port_postcommit(self, context):
         self.synchronize('delete', ODL_PORTS, context)
 
+    def record(self, operation, object_type, context):
+        """Record an operation in the journal, if enabled."""
+        if not self.journal:
+            return
+        resource = context.current
+        data = None
+        if operation != 'delete':
+            data = resource.copy()
+            attr_filter = (self.create_object_map if operation == 'create'
+                           else self.update_object_map)[object_type]
+            attr_filter(data, context)
+        dependencies = []
+        if object_type != ODL_NETWORKS:
+            dependencies.append(resource['network_id'])
+        if object_type == ODL_PORTS:
+            dependencies.extend(ip['subnet_id']
+                                for ip in resource['fixed_ips'])
+        self.journal.record(context._plugin_context, object_type,
+                            resource['id'], operation, data, dependencies)
+
     def synchronize(self, operation, object_type, context):
         """Synchronize ODL with Neutron following a configuration change."""
-        if self.out_of_sync:
+        if self.journal:
+            self.journal.wake()
+        elif self.out_of_sync:
             self.sync_full(context)
         else:
             self.sync_single_resource(operation, object_type, context)
@@ -293,9 +425,9 @@ class OpenDaylightMechanismDriver(api.MechanismDriver):
         url = '/'.join([self.url, urlpath])
         LOG.debug("Sending METHOD (%(method)s) URL (%(url)s) JSON (%(obj)s)",
                   {'method': method, 'url': url, 'obj': obj})
-        r = requests.request(method, url=url,
-                             headers=headers, data=data,
-                             auth=self.auth, timeout=self.timeout)
+        r = self.session.request(method, url=url,
+                                 headers=headers, data=data,
+                                 auth=self.auth, timeout=self.timeout)
         r.raise_for_status()
 
     def bind_port(self, context):
@@ -15,7 +15,6 @@
 
 from oslo.config import cfg
 from oslo.db import exception as db_exc
-from six import moves
 import sqlalchemy as sa
 from sqlalchemy import sql
 
@@ -25,6 +24,7 @@ from neutron.db import model_base
 from neutron.i18n import _LE, _LW
 from neutron.openstack.common import log
 from neutron.plugins.common import constants as p_const
+from neutron.plugins.ml2.drivers import helpers
 from neutron.plugins.ml2.drivers import type_tunnel
 
 LOG = log.getLogger(__name__)
@@ -47,7 +47,7 @@ class GreAllocation(model_base.BASEV2):
     gre_id = sa.Column(sa.Integer, nullable=False, primary_key=True,
                        autoincrement=False)
     allocated = sa.Column(sa.Boolean, nullable=False, default=False,
-                          server_default=sql.false())
+                          server_default=sql.false(), index=True)
 
 
 class GreEndpoints(model_base.BASEV2):
@@ -76,38 +76,22 @@ class GreTypeDriver(type_tunnel.TunnelTypeDriver):
                               "Service terminated!"))
             raise SystemExit()
 
+    @helpers.retry_on_duplicate_segments
     def sync_allocations(self):
 
         # determine current configured allocatable gres
-        gre_ids = set()
-        for gre_id_range in self.tunnel_ranges:
-            tun_min, tun_max = gre_id_range
+        gre_id_ranges = []
+        for tun_min, tun_max in self.tunnel_ranges:
             if tun_max + 1 - tun_min > 1000000:
                 LOG.error(_LE("Skipping unreasonable gre ID range "
                               "%(tun_min)s:%(tun_max)s"),
                           {'tun_min': tun_min, 'tun_max': tun_max})
             else:
-                gre_ids |= set(moves.xrange(tun_min, tun_max + 1))
+                gre_id_ranges.append((tun_min, tun_max))
 
         session = db_api.get_session()
         with session.begin(subtransactions=True):
-            # remove from table unallocated tunnels not currently allocatable
-            allocs = (session.query(GreAllocation).all())
-            for alloc in allocs:
-                try:
-                    # see if tunnel is allocatable
-                    gre_ids.remove(alloc.gre_id)
-                except KeyError:
-                    # it's not allocatable, so check if its allocated
-                    if not alloc.allocated:
-                        # it's not, so remove it from table
-                        LOG.debug("Removing tunnel %s from pool", alloc.gre_id)
-                        session.delete(alloc)
-
-            # add missing allocatable tunnels to table
-            for gre_id in sorted(gre_ids):
-                alloc = GreAllocation(gre_id=gre_id)
-                session.add(alloc)
+            self.sync_segment_pool(session, gre_id_ranges)
 
     def get_endpoints(self):
         """Get every gre endpoints from database."""
@@ -16,7 +16,6 @@
 import sys
 
 from oslo.config import cfg
-from six import moves
 import sqlalchemy as sa
 
 from neutron.common import constants as q_const
@@ -61,6 +60,11 @@ class VlanAllocation(model_base.BASEV2):
     """
 
     __tablename__ = 'ml2_vlan_allocations'
+    __table_args__ = (
+        sa.Index('ix_ml2_vlan_allocations_physical_network_allocated',
+                 'physical_network', 'allocated'),
+        model_base.BASEV2.__table_args__,
+    )
 
     physical_network = sa.Column(sa.String(64), nullable=False,
                                  primary_key=True)
@@ -94,65 +98,25 @@ class VlanTypeDriver(helpers.TypeDriverHelper):
             sys.exit(1)
         LOG.info(_LI("Network VLAN ranges: %s"), self.network_vlan_ranges)
 
+    @helpers.retry_on_duplicate_segments
     def _sync_vlan_allocations(self):
         session = db_api.get_session()
         with session.begin(subtransactions=True):
-            # get existing allocations for all physical networks
-            allocations = dict()
-            allocs = (session.query(VlanAllocation).
-                      with_lockmode('update'))
-            for alloc in allocs:
-                if alloc.physical_network not in allocations:
-                    allocations[alloc.physical_network] = set()
-                allocations[alloc.physical_network].add(alloc)
+            # remove from table unallocated vlans for any unconfigured
+            # physical networks
+            unconfigured = session.query(VlanAllocation).filter_by(
+                allocated=False)
+            if self.network_vlan_ranges:
+                unconfigured = unconfigured.filter(
+                    ~VlanAllocation.physical_network.in_(
+                        self.network_vlan_ranges.keys()))
+            unconfigured.delete(synchronize_session=False)
 
             # process vlan ranges for each configured physical network
             for (physical_network,
                  vlan_ranges) in self.network_vlan_ranges.items():
-                # determine current configured allocatable vlans for
-                # this physical network
-                vlan_ids = set()
-                for vlan_min, vlan_max in vlan_ranges:
-                    vlan_ids |= set(moves.xrange(vlan_min, vlan_max + 1))
-
-                # remove from table unallocated vlans not currently
-                # allocatable
-                if physical_network in allocations:
-                    for alloc in allocations[physical_network]:
-                        try:
-                            # see if vlan is allocatable
-                            vlan_ids.remove(alloc.vlan_id)
-                        except KeyError:
-                            # it's not allocatable, so check if its allocated
-                            if not alloc.allocated:
-                                # it's not, so remove it from table
-                                LOG.debug("Removing vlan %(vlan_id)s on "
-                                          "physical network "
-                                          "%(physical_network)s from pool",
-                                          {'vlan_id': alloc.vlan_id,
-                                           'physical_network':
-                                           physical_network})
-                                session.delete(alloc)
-                    del allocations[physical_network]
-
-                # add missing allocatable vlans to table
-                for vlan_id in sorted(vlan_ids):
-                    alloc = VlanAllocation(physical_network=physical_network,
-                                           vlan_id=vlan_id,
-                                           allocated=False)
-                    session.add(alloc)
-
-            # remove from table unallocated vlans for any unconfigured
-            # physical networks
-            for allocs in allocations.itervalues():
-                for alloc in allocs:
-                    if not alloc.allocated:
-                        LOG.debug("Removing vlan %(vlan_id)s on physical "
-                                  "network %(physical_network)s from pool",
-                                  {'vlan_id': alloc.vlan_id,
-                                   'physical_network':
-                                   alloc.physical_network})
-                        session.delete(alloc)
+                self.sync_segment_pool(session, vlan_ranges,
+                                       physical_network=physical_network)
 
     def get_type(self):
         return p_const.TYPE_VLAN
@@ -15,7 +15,6 @@
 
 from oslo.config import cfg
 from oslo.db import exception as db_exc
-from six import moves
 import sqlalchemy as sa
 from sqlalchemy import sql
 
@@ -25,6 +24,7 @@ from neutron.db import model_base
 from neutron.i18n import _LE, _LW
 from neutron.openstack.common import log
 from neutron.plugins.common import constants as p_const
+from neutron.plugins.ml2.drivers import helpers
 from neutron.plugins.ml2.drivers import type_tunnel
 
 LOG = log.getLogger(__name__)
@@ -53,7 +53,7 @@ class VxlanAllocation(model_base.BASEV2):
     vxlan_vni = sa.Column(sa.Integer, nullable=False, primary_key=True,
                           autoincrement=False)
     allocated = sa.Column(sa.Boolean, nullable=False, default=False,
-                          server_default=sql.false())
+                          server_default=sql.false(), index=True)
 
 
 class VxlanEndpoints(model_base.BASEV2):
@@ -83,48 +83,22 @@ class VxlanTypeDriver(type_tunnel.TunnelTypeDriver):
                               "Service terminated!"))
             raise SystemExit()
 
+    @helpers.retry_on_duplicate_segments
     def sync_allocations(self):
 
         # determine current configured allocatable vnis
-        vxlan_vnis = set()
+        vni_ranges = []
         for tun_min, tun_max in self.tunnel_ranges:
             if tun_max + 1 - tun_min > MAX_VXLAN_VNI:
                 LOG.error(_LE("Skipping unreasonable VXLAN VNI range "
                               "%(tun_min)s:%(tun_max)s"),
                           {'tun_min': tun_min, 'tun_max': tun_max})
             else:
-                vxlan_vnis |= set(moves.xrange(tun_min, tun_max + 1))
+                vni_ranges.append((tun_min, tun_max))
 
         session = db_api.get_session()
         with session.begin(subtransactions=True):
-            # remove from table unallocated tunnels not currently allocatable
-            # fetch results as list via all() because we'll be iterating
-            # through them twice
-            allocs = (session.query(VxlanAllocation).
-                      with_lockmode("update").all())
-            # collect all vnis present in db
-            existing_vnis = set(alloc.vxlan_vni for alloc in allocs)
-            # collect those vnis that needs to be deleted from db
-            vnis_to_remove = [alloc.vxlan_vni for alloc in allocs
-                              if (alloc.vxlan_vni not in vxlan_vnis and
-                                  not alloc.allocated)]
-            # Immediately delete vnis in chunks. This leaves no work for
-            # flush at the end of transaction
-            bulk_size = 100
-            chunked_vnis = (vnis_to_remove[i:i + bulk_size] for i in
-                            range(0, len(vnis_to_remove), bulk_size))
-            for vni_list in chunked_vnis:
-                session.query(VxlanAllocation).filter(
-                    VxlanAllocation.vxlan_vni.in_(vni_list)).delete(
-                        synchronize_session=False)
-            # collect vnis that need to be added
-            vnis = list(vxlan_vnis - existing_vnis)
-            chunked_vnis = (vnis[i:i + bulk_size] for i in
-                            range(0, len(vnis), bulk_size))
-            for vni_list in chunked_vnis:
-                bulk = [{'vxlan_vni': vni, 'allocated': False}
-                        for vni in vni_list]
-                session.execute(VxlanAllocation.__table__.insert(), bulk)
+            self.sync_segment_pool(session, vni_ranges)
 
     def get_endpoints(self):
         """Get every vxlan endpoints from database."""
@@ -0,0 +1,257 @@
+# Copyright (c) 2015 OpenStack Foundation
+# All Rights Reserved.
+#
+#    Licensed under the Apache License, Version 2.0 (the "License"); you may
+#    not use this file except in compliance with the License. You may obtain
+#    a copy of the License at
+#
+#         http://www.apache.org/licenses/LICENSE-2.0
+#
+#    Unless required by applicable law or agreed to in writing, software
+#    distributed under the License is distributed on an "AS IS" BASIS, WITHOUT
+#    WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied. See the
+#    License for the specific language governing permissions and limitations
+#    under the License.
+
+"""Journal of the operations mechanism drivers send to their backend.
+
+Drivers backed by an external controller can record their operations in
+the precommit phase, within the transaction of the change itself, and
+leave a background worker to send them. The API requests then no longer
+wait for the controller, and no operation is lost if it is unreachable.
+
+The worker processes the entries in order for each resource and the
+resources it depends on, sends consecutive operations of the same kind
+in a single batch when the backend supports it, retries failed entries
+and falls back to a full synchronization when they keep failing.
+"""
+
+import abc
+import datetime
+import os
+
+import eventlet
+from eventlet import event
+from oslo.config import cfg
+from oslo.serialization import jsonutils
+from oslo.utils import timeutils
+import six
+from sqlalchemy import func
+
+from neutron import context as n_context
+from neutron.i18n import _LE, _LI
+from neutron.openstack.common import log
+from neutron.plugins.ml2 import models
+
+LOG = log.getLogger(__name__)
+
+PENDING = 'pending'
+PROCESSING = 'processing'
+
+journal_opts = [
+    cfg.IntOpt('sync_interval', default=10,
+               help=_("Seconds between two runs of the journal worker "
+                      "when no operation wakes it up.")),
+    cfg.IntOpt('batch_size', default=100,
+               help=_("Maximum number of operations sent to a backend in "
+                      "a single batch.")),
+    cfg.IntOpt('max_retries', default=5,
+               help=_("Number of failed attempts to send an operation "
+                      "after which the backend is fully resynchronized.")),
+    cfg.IntOpt('processing_timeout', default=100,
+               help=_("Seconds after which an operation claimed by a "
+                      "worker which did not complete it is retried.")),
+]
+
+cfg.CONF.register_opts(journal_opts, "ml2_journal")
+
+
+@six.add_metaclass(abc.ABCMeta)
+class JournalBackend(object):
+    """Interface of the drivers draining a journal."""
+
+    @abc.abstractmethod
+    def send(self, context, object_type, operation, entries):
+        """Apply journal entries to the backend.
+
+        :param context: admin context
+        :param object_type: type of the resources of all the entries
+        :param operation: operation of all the entries
+        :param entries: list of JournalEntry, in journal order
+
+        The entries are removed from the journal when this method returns
+        and retried when it raises. More than one entry is only passed for
+        the operations can_batch() accepts.
+        """
+        pass
+
+    @abc.abstractmethod
+    def sync_full(self, context):
+        """Resynchronize the whole backend with the Neutron database.
+
+        Called when entries keep failing; all the entries recorded before
+        the synchronization started are then dropped.
+        """
+        pass
+
+    def can_batch(self, object_type, operation):
+        """Whether entries for this operation can be sent together."""
+        return False
+
+
+class Journal(object):
+    """Journal of the operations of one driver and its worker."""
+
+    def __init__(self, name, backend, sync_on_start=False):
+        self.name = name
+        self.backend = backend
+        self.out_of_sync = sync_on_start
+        self._worker_pid = None
+        self._wakeup = None
+
+    def record(self, context, object_type, object_uuid, operation,
+               data=None, dependencies=()):
+        """Add an entry within the current transaction.
+
+        The entry is processed after any other entry for the same resource
+        or a resource listed in its dependencies, or depending on it.
+        """
+        entry = models.JournalEntry(
+            driver=self.name, object_type=object_type,
+            object_uuid=object_uuid, operation=operation,
+            data=jsonutils.dumps(data) if data is not None else None,
+            dependencies=' '.join(dependencies), state=PENDING,
+            retry_count=0, created_at=timeutils.utcnow())
+        context.session.add(entry)
+
+    def wake(self):
+        """Make the worker of the current process process the journal."""
+        if self._worker_pid != os.getpid():
+            # Do not rely on a worker inherited from the parent process
+            self._worker_pid = os.getpid()
+            self._wakeup = event.Event()
+            eventlet.spawn_n(self._run)
+        elif not self._wakeup.ready():
+            self._wakeup.send()
+
+    def _run(self):
+        while True:
+            with eventlet.Timeout(cfg.CONF.ml2_journal.sync_interval, False):
+                self._wakeup.wait()
+            # Wake ups received while processing start another run
+            self._wakeup = event.Event()
+            try:
+                self.process(n_context.get_admin_context())
+            except Exception:
+                LOG.exception(_LE("Failed to process the %s journal"),
+                              self.name)
+
+    def process(self, context):
+        """Process the journal until it is empty or an entry fails."""
+        if self.out_of_sync:
+            self.sync_full(context)
+        while True:
+            batch = self._claim_batch(context)
+            if not batch:
+                return
+            entry = batch[0]
+            try:
+                self.backend.send(context, entry.object_type,
+                                  entry.operation, batch)
+            except Exception:
+                LOG.exception(_LE("Failed to send %(count)d %(operation)s "
+                                  "%(type)s operations of the %(name)s "
+                                  "journal"),
+                              {'count': len(batch), 'type': entry.object_type,
+                               'operation': entry.operation,
+                               'name': self.name})
+                self._release_batch(context, batch)
+                return
+            self._complete_batch(context, batch)
+
+    def sync_full(self, context):
+        """Resynchronize the backend and drop the entries it covers."""
+        entry = models.JournalEntry
+        last_id = context.session.query(func.max(entry.id)).filter(
+            entry.driver == self.name).scalar()
+        LOG.info(_LI("Fully synchronizing the %s backend"), self.name)
+        self.out_of_sync = True
+        self.backend.sync_full(context)
+        self.out_of_sync = False
+        if last_id is not None:
+            with context.session.begin(subtransactions=True):
+                context.session.query(entry).filter(
+                    entry.driver == self.name,
+                    entry.id <= last_id).delete(synchronize_session=False)
+
+    def _get_window(self, context):
+        entry = models.JournalEntry
+        with context.session.begin(subtransactions=True):
+            # Entries claimed by a worker which did not complete them
+            stale = timeutils.utcnow() - datetime.timedelta(
+                seconds=cfg.CONF.ml2_journal.processing_timeout)
+            context.session.query(entry).filter(
+                entry.driver == self.name, entry.state == PROCESSING,
+                entry.last_retried < stale).update(
+                    {'state': PENDING}, synchronize_session=False)
+            # Unrelated entries beyond the first batches are left for later
+            return (context.session.query(entry).
+                    filter(entry.driver == self.name).
+                    order_by(entry.id).
+                    limit(cfg.CONF.ml2_journal.batch_size * 10).all())
+
+    def _claim_batch(self, context):
+        """Claim the oldest entries which can be sent together."""
+        batch_size = cfg.CONF.ml2_journal.batch_size
+        blocked = set()
+        batch = []
+        for entry in self._get_window(context):
+            related = set([entry.object_uuid])
+            if entry.dependencies:
+                related.update(entry.dependencies.split())
+            if (entry.state == PENDING and not related & blocked and
+                    len(batch) < batch_size and
+                    (not batch or self._can_join(batch, entry)) and
+                    self._claim(context, entry)):
+                batch.append(entry)
+            else:
+                blocked |= related
+        return batch
+
+    def _can_join(self, batch, entry):
+        return ((entry.object_type, entry.operation) ==
+                (batch[0].object_type, batch[0].operation) and
+                self.backend.can_batch(entry.object_type, entry.operation))
+
+    def _claim(self, context, entry):
+        query = context.session.query(models.JournalEntry).filter_by(
+            id=entry.id, state=PENDING)
+        now = timeutils.utcnow()
+        # Another worker may have claimed the entry in the meantime
+        if not query.update({'state': PROCESSING, 'last_retried': now},
+                            synchronize_session=False):
+            return False
+        entry.state = PROCESSING
+        entry.last_retried = now
+        return True
+
+    def _complete_batch(self, context, batch):
+        entry = models.JournalEntry
+        with context.session.begin(subtransactions=True):
+            context.session.query(entry).filter(
+                entry.id.in_([e.id for e in batch])).delete(
+                    synchronize_session=False)
+
+    def _release_batch(self, context, batch):
+        max_retries = cfg.CONF.ml2_journal.max_retries
+        with context.session.begin(subtransactions=True):
+            for entry in batch:
+                entry.state = PENDING
+                entry.retry_count += 1
+        if any(entry.retry_count >= max_retries for entry in batch):
+            self.out_of_sync = True
+
+
+def get_data(entry):
+    """Return the data recorded with an entry."""
+    return jsonutils.loads(entry.data) if entry.data else None
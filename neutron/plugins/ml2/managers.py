@@ -527,6 +527,18 @@ class MechanismManager(stevedore.named.NamedExtensionManager):
         self._call_on_drivers("update_port_postcommit", context,
                               continue_on_failure=True)
 
+    def update_ports_postcommit(self, contexts):
+        """Notify all mechanism drivers after updating many ports.
+
+        :raises: neutron.plugins.ml2.common.MechanismDriverError
+        if any mechanism driver update_ports_postcommit call fails.
+
+        Called after the database transaction updating all the ports.
+        Errors are handled as in update_port_postcommit.
+        """
+        self._call_on_drivers("update_ports_postcommit", contexts,
+                              continue_on_failure=True)
+
     def delete_port_precommit(self, context):
         """Notify all mechanism drivers during port deletion.
 
@@ -117,3 +117,31 @@ class DVRPortBinding(model_base.BASEV2):
         backref=orm.backref("dvr_port_binding",
                             lazy='joined', uselist=False,
                             cascade='delete'))
+
+
+class JournalEntry(model_base.BASEV2):
+    """Represent an operation to be sent to the backend of a driver.
+
+    Entries are recorded in the transaction of the change they describe
+    and removed once the driver has applied them to its backend.
+    """
+
+    __tablename__ = 'ml2_journal'
+
+    id = sa.Column(sa.Integer, primary_key=True, autoincrement=True)
+    driver = sa.Column(sa.String(64), nullable=False)
+    object_type = sa.Column(sa.String(36), nullable=False)
+    object_uuid = sa.Column(sa.String(36), nullable=False)
+    operation = sa.Column(sa.String(36), nullable=False)
+    data = sa.Column(sa.Text)
+    dependencies = sa.Column(sa.Text)
+    state = sa.Column(sa.Enum('pending', 'processing',
+                              name='ml2_journal_states'),
+                      nullable=False, default='pending')
+    retry_count = sa.Column(sa.Integer, nullable=False, default=0)
+    created_at = sa.Column(sa.DateTime, nullable=False)
+    last_retried = sa.Column(sa.DateTime)
+
+    __table_args__ = (
+        sa.Index('ix_ml2_journal_driver_state', 'driver', 'state'),
+    )
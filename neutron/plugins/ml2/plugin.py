@@ -14,6 +14,8 @@
 #    under the License.
 
 import contextlib
+import copy
+
 from eventlet import greenthread
 
 from oslo.config import cfg
@@ -780,16 +782,15 @@ class Ml2Plugin(db_base_plugin_v2.NeutronDbPluginV2,
             # the fact that an error occurred.
             LOG.error(_LE("mechanism_manager.delete_subnet_postcommit failed"))
 
-    def create_port(self, context, port):
+    @db_api.retry_on_deadlock
+    def _create_port_db(self, context, port, ips):
         attrs = port['port']
-        attrs['status'] = const.PORT_STATUS_DOWN
-
         session = context.session
         with session.begin(subtransactions=True):
             self._ensure_default_security_group_on_port(context, port)
             sgids = self._get_security_groups_on_port(context, port)
             dhcp_opts = port['port'].get(edo_ext.EXTRADHCPOPTS, [])
-            result = super(Ml2Plugin, self).create_port(context, port)
+            result = self._create_port_with_addresses(context, port, ips)
             self.extension_manager.process_create_port(session, attrs, result)
             self._process_port_create_security_group(context, result, sgids)
             network = self.get_network(context, result['network_id'])
@@ -806,6 +807,27 @@ class Ml2Plugin(db_base_plugin_v2.NeutronDbPluginV2,
             self._process_port_create_extra_dhcp_opts(context, result,
                                                       dhcp_opts)
             self.mechanism_manager.create_port_precommit(mech_context)
+        return result, mech_context, new_host_port
+
+    def create_port(self, context, port):
+        attrs = port['port']
+        attrs['status'] = const.PORT_STATUS_DOWN
+
+        # The addresses are allocated before the port is created, in a
+        # transaction of their own, for the availability ranges of the
+        # subnets not to stay locked while the port is created.
+        in_transaction = context.session.is_active
+        ips = self._allocate_port_addresses(context, port)
+        try:
+            result, mech_context, new_host_port = self._create_port_db(
+                context, port, ips)
+        except Exception:
+            with excutils.save_and_reraise_exception():
+                # The transaction of the caller, if any, rolls back the
+                # addresses with the port
+                if not in_transaction:
+                    self._release_port_addresses(
+                        context, attrs['network_id'], ips)
 
         # Notification must be sent after the above transaction is complete
         self._notify_l3_agent_new_port(context, new_host_port)
@@ -831,7 +853,11 @@ class Ml2Plugin(db_base_plugin_v2.NeutronDbPluginV2,
                 self.delete_port(context, result['id'])
         return bound_context._port
 
-    def update_port(self, context, id, port):
+    @db_api.retry_on_deadlock
+    def _update_port_db(self, context, id, port):
+        # The fixed IPs of the request are consumed as they are updated, a
+        # retry must see them all again.
+        port = copy.deepcopy(port)
         attrs = port['port']
         need_port_update_notify = False
 
@@ -868,6 +894,12 @@ class Ml2Plugin(db_base_plugin_v2.NeutronDbPluginV2,
             need_port_update_notify |= self._process_port_binding(
                 mech_context, attrs)
             self.mechanism_manager.update_port_precommit(mech_context)
+        return (original_port, updated_port, mech_context, new_host_port,
+                need_port_update_notify)
+
+    def update_port(self, context, id, port):
+        (original_port, updated_port, mech_context, new_host_port,
+         need_port_update_notify) = self._update_port_db(context, id, port)
 
         # Notification must be sent after the above transaction is complete
         self._notify_l3_agent_new_port(context, new_host_port)
@@ -1169,6 +1201,67 @@ class Ml2Plugin(db_base_plugin_v2.NeutronDbPluginV2,
 
         return port['id']
 
+    def update_port_statuses(self, context, port_ids, status, host=None):
+        """Update the status of many ports in a single transaction.
+
+        port_ids may hold truncated uuids. If host is given, ports bound
+        to another host are left untouched. DVR interface ports, whose
+        status is tracked per host, are updated one at a time through
+        update_port_status.
+
+        :returns: dict mapping each port_id matching a port to the
+                  non-truncated port id, or to None when the port is
+                  not bound to host
+        """
+        found = {}
+        dvr_port_ids = []
+        mech_contexts = []
+        networks = {}
+        session = context.session
+        # REVISIT: see update_port_status on serializing this operation.
+        with contextlib.nested(lockutils.lock('db-access'),
+                               session.begin(subtransactions=True)):
+            ports = db.get_ports(session, port_ids)
+            for port_id, port in ports.iteritems():
+                if port['device_owner'] == const.DEVICE_OWNER_DVR_INTERFACE:
+                    dvr_port_ids.append(port_id)
+                    continue
+                if host and (not port.port_binding or
+                             port.port_binding.host != host):
+                    LOG.debug("Port %(port)s not bound to the agent host "
+                              "%(host)s", {'port': port_id, 'host': host})
+                    found[port_id] = None
+                    continue
+                found[port_id] = port['id']
+                if port.status == status:
+                    continue
+                original_port = self._make_port_dict(port)
+                port.status = status
+                updated_port = self._make_port_dict(port)
+                network_id = original_port['network_id']
+                if network_id not in networks:
+                    networks[network_id] = self.get_network(context,
+                                                            network_id)
+                mech_context = driver_context.PortContext(
+                    self, context, updated_port, networks[network_id],
+                    port.port_binding, original_port=original_port)
+                self.mechanism_manager.update_port_precommit(mech_context)
+                mech_contexts.append(mech_context)
+
+        for port_id in set(port_ids) - set(ports):
+            LOG.warning(_LW("Port %(port)s updated by agent not found"),
+                        {'port': port_id})
+        if mech_contexts:
+            self.mechanism_manager.update_ports_postcommit(mech_contexts)
+
+        for port_id in dvr_port_ids:
+            if host and not self.port_bound_to_host(context, port_id, host):
+                found[port_id] = None
+            else:
+                found[port_id] = self.update_port_status(context, port_id,
+                                                         status, host)
+        return found
+
     def port_bound_to_host(self, context, port_id, host):
         port = db.get_port(context.session, port_id)
         if not port:
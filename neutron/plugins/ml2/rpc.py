@@ -23,7 +23,7 @@ from neutron.common import rpc as n_rpc
 from neutron.common import topics
 from neutron.common import utils
 from neutron.extensions import portbindings
-from neutron.i18n import _LW
+from neutron.i18n import _LE, _LW
 from neutron import manager
 from neutron.openstack.common import log
 from neutron.plugins.common import constants as service_constants
@@ -44,7 +44,8 @@ class RpcCallbacks(type_tunnel.TunnelRpcCallbackMixin):
     #   1.3 get_device_details rpc signature upgrade to obtain 'host' and
     #       return value to include fixed_ips and device_owner for
     #       the device port
-    target = messaging.Target(version='1.3')
+    #   1.4 Support update_devices_up and update_devices_down
+    target = messaging.Target(version='1.4')
 
     def __init__(self, notifier, type_manager):
         self.setup_tunnel_callback_mixin(notifier, type_manager)
@@ -161,16 +162,108 @@ class RpcCallbacks(type_tunnel.TunnelRpcCallbackMixin):
         port_id = plugin.update_port_status(rpc_context, port_id,
                                             q_const.PORT_STATUS_ACTIVE,
                                             host)
+        self._update_dvr_arp_tables(rpc_context, plugin, [port_id])
+
+    def _update_dvr_arp_tables(self, rpc_context, plugin, port_ids):
         l3plugin = manager.NeutronManager.get_service_plugins().get(
             service_constants.L3_ROUTER_NAT)
         if (l3plugin and
             utils.is_extension_supported(l3plugin,
                                          q_const.L3_DISTRIBUTED_EXT_ALIAS)):
-            try:
-                port = plugin._get_port(rpc_context, port_id)
-                l3plugin.dvr_vmarp_table_update(rpc_context, port, "add")
-            except exceptions.PortNotFound:
-                LOG.debug('Port %s not found during ARP update', port_id)
+            for port_id in port_ids:
+                try:
+                    port = plugin._get_port(rpc_context, port_id)
+                    l3plugin.dvr_vmarp_table_update(rpc_context, port, "add")
+                except exceptions.PortNotFound:
+                    LOG.debug('Port %s not found during ARP update', port_id)
+
+    def _update_devices_status(self, rpc_context, devices, status, host):
+        """Set the status of the devices ports in a single transaction.
+
+        :returns: dict mapping each device whose port exists to the
+                  port id, or to None if the port is not bound to host
+        """
+        plugin = manager.NeutronManager.get_plugin()
+        port_ids = dict((device, plugin._device_to_port_id(device))
+                        for device in devices)
+        found = plugin.update_port_statuses(
+            rpc_context, list(set(port_ids.values())), status, host)
+        return dict((device, found[port_id])
+                    for device, port_id in port_ids.iteritems()
+                    if port_id in found)
+
+    def update_devices_down(self, rpc_context, **kwargs):
+        """Devices no longer exist on agent.
+
+        All the devices are processed in a single transaction. Should it
+        fail, they are processed one at a time so that only the devices
+        in error are reported as failed.
+        """
+        agent_id = kwargs.get('agent_id')
+        devices = kwargs.get('devices', [])
+        host = kwargs.get('host')
+        LOG.debug("Devices %(devices)s no longer exist at agent "
+                  "%(agent_id)s",
+                  {'devices': devices, 'agent_id': agent_id})
+        devices_down = []
+        failed_devices_down = []
+        try:
+            found = self._update_devices_status(
+                rpc_context, devices, q_const.PORT_STATUS_DOWN, host)
+            devices_down = [{'device': device, 'exists': device in found}
+                            for device in devices]
+        except Exception:
+            LOG.exception(_LE("Failed to update devices %s down, updating "
+                              "them one at a time"), devices)
+            for device in devices:
+                try:
+                    devices_down.append(self.update_device_down(
+                        rpc_context, device=device, agent_id=agent_id,
+                        host=host))
+                except Exception:
+                    LOG.exception(_LE("Failed to update device %s down"),
+                                  device)
+                    failed_devices_down.append(device)
+        return {'devices_down': devices_down,
+                'failed_devices_down': failed_devices_down}
+
+    def update_devices_up(self, rpc_context, **kwargs):
+        """Devices are up on agent.
+
+        All the devices are processed in a single transaction. Should it
+        fail, they are processed one at a time so that only the devices
+        in error are reported as failed.
+        """
+        agent_id = kwargs.get('agent_id')
+        devices = kwargs.get('devices', [])
+        host = kwargs.get('host')
+        LOG.debug("Devices %(devices)s up at agent %(agent_id)s",
+                  {'devices': devices, 'agent_id': agent_id})
+        plugin = manager.NeutronManager.get_plugin()
+        devices_up = []
+        failed_devices_up = []
+        try:
+            found = self._update_devices_status(
+                rpc_context, devices, q_const.PORT_STATUS_ACTIVE, host)
+            devices_up = list(devices)
+        except Exception:
+            LOG.exception(_LE("Failed to update devices %s up, updating "
+                              "them one at a time"), devices)
+            for device in devices:
+                try:
+                    self.update_device_up(rpc_context, device=device,
+                                          agent_id=agent_id, host=host)
+                    devices_up.append(device)
+                except Exception:
+                    LOG.exception(_LE("Failed to update device %s up"),
+                                  device)
+                    failed_devices_up.append(device)
+        else:
+            self._update_dvr_arp_tables(
+                rpc_context, plugin,
+                set(port_id for port_id in found.values() if port_id))
+        return {'devices_up': devices_up,
+                'failed_devices_up': failed_devices_up}
 
 
 class AgentNotifierApi(dvr_rpc.DVRAgentRpcApiMixin,
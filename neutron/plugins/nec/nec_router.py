@@ -277,6 +277,18 @@ class L3AgentSchedulerDbMixin(l3_agentschedulers_db.L3AgentSchedulerDbMixin):
             return super(L3AgentSchedulerDbMixin, self).schedule_router(
                 context, router, candidates=candidates)
 
+    def schedule_routers(self, context, routers):
+        # The routers are scheduled in bulk without going through
+        # schedule_router, only those hosted by an l3-agent are passed on.
+        if not routers:
+            return
+        routers = rdb.get_routers_by_provider(
+            context.session, nconst.ROUTER_PROVIDER_L3AGENT, routers)
+        if not routers:
+            return
+        return super(L3AgentSchedulerDbMixin, self).schedule_routers(
+            context, routers)
+
     def add_router_to_l3_agent(self, context, id, router_id):
         provider = self._get_provider_by_router_id(context, router_id)
         if provider != nconst.ROUTER_PROVIDER_L3AGENT:
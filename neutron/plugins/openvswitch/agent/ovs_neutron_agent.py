@@ -1093,8 +1093,31 @@ class OVSNeutronAgent(sg_rpc.SecurityGroupAgentRpcCallbackMixin,
                     br.delete_flows(in_port=ofport)
                     self.tun_br_ofports[tunnel_type].pop(remote_ip, None)
 
+    def _update_devices_status(self, devices_up, devices_down):
+        """Report the status of the devices to the plugin.
+
+        :returns: the devices whose status could not be updated
+        """
+        failed_devices = []
+        if devices_up:
+            LOG.debug("Setting status for %s to UP", devices_up)
+            res = self.plugin_rpc.update_devices_up(
+                self.context, devices_up, self.agent_id, cfg.CONF.host)
+            failed_devices.extend(res['failed_devices_up'])
+        if devices_down:
+            LOG.debug("Setting status for %s to DOWN", devices_down)
+            res = self.plugin_rpc.update_devices_down(
+                self.context, devices_down, self.agent_id, cfg.CONF.host)
+            failed_devices.extend(res['failed_devices_down'])
+        if failed_devices:
+            LOG.warn(_LW("Failed to update the status of devices %s"),
+                     failed_devices)
+        return failed_devices
+
     def treat_devices_added_or_updated(self, devices, ovs_restarted):
         skipped_devices = []
+        devices_up = []
+        devices_down = []
         try:
             devices_details_list = self.plugin_rpc.get_devices_details_list(
                 self.context,
@@ -1126,24 +1149,21 @@ class OVSNeutronAgent(sg_rpc.SecurityGroupAgentRpcCallbackMixin,
                                     details['fixed_ips'],
                                     details['device_owner'],
                                     ovs_restarted)
-                # update plugin about port status
-                # FIXME(salv-orlando): Failures while updating device status
-                # must be handled appropriately. Otherwise this might prevent
-                # neutron server from sending network-vif-* events to the nova
-                # API server, thus possibly preventing instance spawn.
                 if details.get('admin_state_up'):
-                    LOG.debug("Setting status for %s to UP", device)
-                    self.plugin_rpc.update_device_up(
-                        self.context, device, self.agent_id, cfg.CONF.host)
+                    devices_up.append(device)
                 else:
-                    LOG.debug("Setting status for %s to DOWN", device)
-                    self.plugin_rpc.update_device_down(
-                        self.context, device, self.agent_id, cfg.CONF.host)
+                    devices_down.append(device)
                 LOG.info(_LI("Configuration for device %s completed."), device)
             else:
                 LOG.warn(_LW("Device %s not defined on plugin"), device)
                 if (port and port.ofport != -1):
                     self.port_dead(port)
+        # update plugin about port status. Devices whose status could not
+        # be updated are skipped so that they are processed again in the
+        # next iteration, otherwise neutron server might not send the
+        # network-vif-* events to the nova API server.
+        skipped_devices.extend(
+            self._update_devices_status(devices_up, devices_down))
         return skipped_devices
 
     def treat_ancillary_devices_added(self, devices):
@@ -1156,54 +1176,56 @@ class OVSNeutronAgent(sg_rpc.SecurityGroupAgentRpcCallbackMixin,
         except Exception as e:
             raise DeviceListRetrievalError(devices=devices, error=e)
 
+        devices_up = []
         for details in devices_details_list:
             device = details['device']
             LOG.info(_LI("Ancillary Port %s added"), device)
+            devices_up.append(device)
 
-            # update plugin about port status
-            self.plugin_rpc.update_device_up(self.context,
-                                             device,
-                                             self.agent_id,
-                                             cfg.CONF.host)
+        # update plugin about port status
+        return self._update_devices_status(devices_up, [])
 
     def treat_devices_removed(self, devices):
-        resync = False
         self.sg_agent.remove_devices_filter(devices)
         for device in devices:
             LOG.info(_LI("Attachment %s removed"), device)
-            try:
-                self.plugin_rpc.update_device_down(self.context,
-                                                   device,
-                                                   self.agent_id,
-                                                   cfg.CONF.host)
-            except Exception as e:
-                LOG.debug("port_removed failed for %(device)s: %(e)s",
-                          {'device': device, 'e': e})
-                resync = True
-                continue
-            self.port_unbound(device)
-        return resync
+        try:
+            res = self.plugin_rpc.update_devices_down(self.context,
+                                                      list(devices),
+                                                      self.agent_id,
+                                                      cfg.CONF.host)
+        except Exception as e:
+            LOG.debug("port_removed failed for %(devices)s: %(e)s",
+                      {'devices': devices, 'e': e})
+            return True
+        for details in res['devices_down']:
+            self.port_unbound(details['device'])
+        for device in res['failed_devices_down']:
+            LOG.debug("port_removed failed for %s", device)
+        return bool(res['failed_devices_down'])
 
     def treat_ancillary_devices_removed(self, devices):
-        resync = False
         for device in devices:
             LOG.info(_LI("Attachment %s removed"), device)
-            try:
-                details = self.plugin_rpc.update_device_down(self.context,
-                                                             device,
-                                                             self.agent_id,
-                                                             cfg.CONF.host)
-            except Exception as e:
-                LOG.debug("port_removed failed for %(device)s: %(e)s",
-                          {'device': device, 'e': e})
-                resync = True
-                continue
+        try:
+            res = self.plugin_rpc.update_devices_down(self.context,
+                                                      list(devices),
+                                                      self.agent_id,
+                                                      cfg.CONF.host)
+        except Exception as e:
+            LOG.debug("port_removed failed for %(devices)s: %(e)s",
+                      {'devices': devices, 'e': e})
+            return True
+        for details in res['devices_down']:
             if details['exists']:
-                LOG.info(_LI("Port %s updated."), device)
+                LOG.info(_LI("Port %s updated."), details['device'])
                 # Nothing to do regarding local networking
             else:
-                LOG.debug("Device %s not defined on plugin", device)
-        return resync
+                LOG.debug("Device %s not defined on plugin",
+                          details['device'])
+        for device in res['failed_devices_down']:
+            LOG.debug("port_removed failed for %s", device)
+        return bool(res['failed_devices_down'])
 
     def process_network_ports(self, port_info, ovs_restarted):
         resync_a = False
@@ -1266,7 +1288,9 @@ class OVSNeutronAgent(sg_rpc.SecurityGroupAgentRpcCallbackMixin,
         if 'added' in port_info:
             start = time.time()
             try:
-                self.treat_ancillary_devices_added(port_info['added'])
+                failed_devices = self.treat_ancillary_devices_added(
+                    port_info['added'])
+                resync_a = bool(failed_devices)
                 LOG.debug("process_ancillary_network_ports - iteration: "
                           "%(iter_num)d - treat_ancillary_devices_added "
                           "completed in %(elapsed).3f",
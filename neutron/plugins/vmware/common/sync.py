@@ -13,8 +13,11 @@
 #    License for the specific language governing permissions and limitations
 #    under the License.
 
+import collections
 import random
+import time
 
+import eventlet
 from oslo.serialization import jsonutils
 from oslo.utils import timeutils
 
@@ -42,6 +45,12 @@ MAX_PAGE_SIZE = 5000
 
 LOG = log.getLogger(__name__)
 
+# The types of NSX resources which are synchronized, each one with its name
+# in NsxCache, the SyncParameters attribute holding its page cursor and the
+# NsxSynchronizer URI and method for updating the neutron resources
+SyncResource = collections.namedtuple(
+    'SyncResource', ['name', 'cursor', 'uri', 'synchronize'])
+
 
 class NsxCache(object):
     """A simple Cache for NSX resources.
@@ -156,6 +165,22 @@ class NsxCache(object):
                 self._get_resource_ids(self._lrouters, changed_only=True),
                 self._get_resource_ids(self._lswitchports, changed_only=True))
 
+    def process_resource_updates(self, resource_type, resources):
+        """Same as process_updates for a single type of resources.
+
+        :param resource_type: 'lswitches', 'lrouters' or 'lswitchports'
+        :returns: the ids of the changed resources of this type
+        """
+        cached = getattr(self, '_%s' % resource_type)
+        self._update_resources(cached, resources)
+        return self._get_resource_ids(cached, changed_only=True)
+
+    def process_resource_deletes(self, resource_type, changed_only=True):
+        """Same as process_deletes for a single type of resources."""
+        cached = getattr(self, '_%s' % resource_type)
+        self._delete_resources(cached)
+        return self._get_resource_ids(cached, changed_only=changed_only)
+
     def process_deletes(self):
         self._delete_resources(self._lswitches)
         self._delete_resources(self._lrouters)
@@ -175,6 +200,8 @@ class SyncParameters():
     Page cursors: markers for the next resource to fetch.
                  'start' means page cursor unset for fetching 1st page
     init_sync_performed: True if the initial synchronization concluded
+    num_chunks: Number of chunks of the current synchronization
+    remaining: Number of resources of each type left to fetch
     """
 
     def __init__(self, min_chunk_size):
@@ -186,6 +213,8 @@ class SyncParameters():
         self.lp_cursor = 'start'
         self.init_sync_performed = False
         self.total_size = 0
+        self.num_chunks = 1
+        self.remaining = {}
 
 
 def _start_loopingcall(min_chunk_size, state_sync_interval, func):
@@ -238,6 +267,16 @@ class NsxSynchronizer():
             raise nsx_exc.NsxPluginException(err_msg=err_msg)
         # Backoff time in case of failures while fetching sync data
         self._sync_backoff = 1
+        self._resources = (
+            SyncResource('lswitches', 'ls_cursor', self.LS_URI,
+                         self._synchronize_lswitches),
+            SyncResource('lrouters', 'lr_cursor', self.LR_URI,
+                         self._synchronize_lrouters),
+            SyncResource('lswitchports', 'lp_cursor', self.LP_URI,
+                         self._synchronize_lswitchports))
+        # Time spent fetching and synchronizing each type of resources
+        # during the last chunk
+        self._resource_stats = {}
         # Store the looping call in an instance variable to allow unit tests
         # for controlling its lifecycle
         self._sync_looping_call = _start_loopingcall(
@@ -565,40 +604,71 @@ class NsxSynchronizer():
             return results, cursor if page_size else 'start', total_size
         return [], cursor, None
 
-    def _fetch_nsx_data_chunk(self, sp):
-        base_chunk_size = sp.chunk_size
-        chunk_size = base_chunk_size + sp.extra_chunk_size
-        LOG.info(_LI("Fetching up to %s resources "
-                     "from NSX backend"), chunk_size)
-        fetched = ls_count = lr_count = lp_count = 0
-        lswitches = lrouters = lswitchports = []
-        if sp.ls_cursor or sp.ls_cursor == 'start':
-            (lswitches, sp.ls_cursor, ls_count) = self._fetch_data(
-                self.LS_URI, sp.ls_cursor, chunk_size)
-            fetched = len(lswitches)
-        if fetched < chunk_size and sp.lr_cursor or sp.lr_cursor == 'start':
-            (lrouters, sp.lr_cursor, lr_count) = self._fetch_data(
-                self.LR_URI, sp.lr_cursor, max(chunk_size - fetched, 0))
-        fetched += len(lrouters)
-        if fetched < chunk_size and sp.lp_cursor or sp.lp_cursor == 'start':
-            (lswitchports, sp.lp_cursor, lp_count) = self._fetch_data(
-                self.LP_URI, sp.lp_cursor, max(chunk_size - fetched, 0))
-        fetched += len(lswitchports)
+    def _get_page_sizes(self, sp):
+        """Return how many resources of each type to fetch in this chunk.
+
+        The first chunk fetches up to a whole chunk of each type, which also
+        tells how many resources there are. Subsequent chunks spread what
+        is left of each type over the remaining chunks, so that all the
+        types complete together.
+        """
+        page_sizes = {}
+        remaining_chunks = max(sp.num_chunks - sp.current_chunk, 1)
+        for resource in self._resources:
+            if not getattr(sp, resource.cursor):
+                continue
+            if sp.current_chunk == 0:
+                page_sizes[resource.name] = (sp.chunk_size +
+                                             sp.extra_chunk_size)
+            else:
+                remaining = sp.remaining.get(resource.name, 0)
+                page_sizes[resource.name] = max(
+                    (remaining / remaining_chunks) +
+                    (remaining % remaining_chunks != 0), 1)
+        return page_sizes
+
+    def _synchronize_resource(self, sp, resource, page_size):
+        """Fetch a page of a type of resources and synchronize them.
+
+        The deleted resources are processed once the last page of the type
+        was fetched.
+        """
+        start = time.time()
+        cursor = getattr(sp, resource.cursor)
+        results, next_cursor, count = self._fetch_data(
+            resource.uri, cursor, page_size)
+        setattr(sp, resource.cursor, next_cursor)
+        fetched = time.time()
         if sp.current_chunk == 0:
-            # No cursors were provided. Then it must be possible to
-            # calculate the total amount of data to fetch
-            sp.total_size = ls_count + lr_count + lp_count
-        LOG.debug("Total data size: %d", sp.total_size)
-        sp.chunk_size = self._get_chunk_size(sp)
-        # Calculate chunk size adjustment
-        sp.extra_chunk_size = sp.chunk_size - base_chunk_size
-        LOG.debug("Fetched %(num_lswitches)d logical switches, "
-                  "%(num_lswitchports)d logical switch ports,"
-                  "%(num_lrouters)d logical routers",
-                  {'num_lswitches': len(lswitches),
-                   'num_lswitchports': len(lswitchports),
-                   'num_lrouters': len(lrouters)})
-        return (lswitches, lrouters, lswitchports)
+            sp.remaining[resource.name] = count or 0
+        sp.remaining[resource.name] = max(
+            sp.remaining.get(resource.name, 0) - len(results), 0)
+        uuids = self._nsx_cache.process_resource_updates(resource.name,
+                                                         results)
+        scan_missing = False
+        if cursor and not next_cursor:
+            LOG.debug("Processing NSX cache for deleted %s", resource.name)
+            scan_missing = not sp.init_sync_performed
+            uuids = self._nsx_cache.process_resource_deletes(
+                resource.name, changed_only=not scan_missing)
+        # Each type of resources gets its own session
+        resource.synchronize(context.get_admin_context(), uuids,
+                             scan_missing=scan_missing)
+        self._resource_stats[resource.name] = {
+            'fetched': len(results),
+            'fetch_time': fetched - start,
+            'sync_time': time.time() - fetched}
+        return count
+
+    def get_resource_stats(self):
+        """Return the time spent on each type of resources in the last chunk.
+
+        For each type the number of resources fetched, the time fetching
+        them took and the time taken updating their neutron counterparts
+        are reported.
+        """
+        return dict((name, dict(stats))
+                    for name, stats in self._resource_stats.items())
 
     def _synchronize_state(self, sp):
         # If the plugin has been destroyed, stop the LoopingCall
@@ -608,12 +678,21 @@ class NsxSynchronizer():
         # Reset page cursor variables if necessary
         if sp.current_chunk == 0:
             sp.ls_cursor = sp.lr_cursor = sp.lp_cursor = 'start'
+            sp.remaining = {}
         LOG.info(_LI("Running state synchronization task. Chunk: %s"),
                  sp.current_chunk)
-        # Fetch chunk_size data from NSX
+        # Fetch and process the resource types concurrently, each page
+        # being synchronized with the database as soon as it arrives
+        page_sizes = self._get_page_sizes(sp)
+        self._resource_stats = {}
+        pool = eventlet.GreenPool(len(self._resources))
+        threads = [pool.spawn(self._synchronize_resource, sp, resource,
+                              page_sizes[resource.name])
+                   for resource in self._resources
+                   if resource.name in page_sizes]
+        pool.waitall()
         try:
-            (lswitches, lrouters, lswitchports) = (
-                self._fetch_nsx_data_chunk(sp))
+            counts = [thread.wait() for thread in threads]
         except (api_exc.RequestTimeout, api_exc.NsxApiException):
             sleep_interval = self._sync_backoff
             # Cap max back off to 64 seconds
@@ -622,43 +701,28 @@ class NsxSynchronizer():
                               "NSX backend. Will retry synchronization "
                               "in %d seconds"), sleep_interval)
             return sleep_interval
-        LOG.debug("Time elapsed querying NSX: %s",
-                  timeutils.utcnow() - start)
-        if sp.total_size:
+        for name, stats in sorted(self._resource_stats.items()):
+            LOG.debug("Synchronized %(fetched)d %(name)s: %(fetch_time).3f "
+                      "seconds fetching, %(sync_time).3f seconds updating "
+                      "neutron", dict(stats, name=name))
+        if sp.current_chunk == 0:
+            # No cursors were provided. Then it must be possible to
+            # calculate the total amount of data to fetch
+            sp.total_size = sum(count or 0 for count in counts)
+        LOG.debug("Total data size: %d", sp.total_size)
+        base_chunk_size = sp.chunk_size
+        sp.chunk_size = self._get_chunk_size(sp)
+        # Calculate chunk size adjustment
+        sp.extra_chunk_size = sp.chunk_size - base_chunk_size
+        if any(getattr(sp, resource.cursor) for resource in self._resources):
             num_chunks = ((sp.total_size / sp.chunk_size) +
                           (sp.total_size % sp.chunk_size != 0))
+            # There is at least a chunk left
+            num_chunks = max(num_chunks, sp.current_chunk + 2)
         else:
-            num_chunks = 1
+            num_chunks = sp.current_chunk + 1
+        sp.num_chunks = num_chunks
         LOG.debug("Number of chunks: %d", num_chunks)
-        # Find objects which have changed on NSX side and need
-        # to be synchronized
-        LOG.debug("Processing NSX cache for updated objects")
-        (ls_uuids, lr_uuids, lp_uuids) = self._nsx_cache.process_updates(
-            lswitches, lrouters, lswitchports)
-        # Process removed objects only at the last chunk
-        scan_missing = (sp.current_chunk == num_chunks - 1 and
-                        not sp.init_sync_performed)
-        if sp.current_chunk == num_chunks - 1:
-            LOG.debug("Processing NSX cache for deleted objects")
-            self._nsx_cache.process_deletes()
-            ls_uuids = self._nsx_cache.get_lswitches(
-                changed_only=not scan_missing)
-            lr_uuids = self._nsx_cache.get_lrouters(
-                changed_only=not scan_missing)
-            lp_uuids = self._nsx_cache.get_lswitchports(
-                changed_only=not scan_missing)
-        LOG.debug("Time elapsed hashing data: %s",
-                  timeutils.utcnow() - start)
-        # Get an admin context
-        ctx = context.get_admin_context()
-        # Synchronize with database
-        self._synchronize_lswitches(ctx, ls_uuids,
-                                    scan_missing=scan_missing)
-        self._synchronize_lrouters(ctx, lr_uuids,
-                                   scan_missing=scan_missing)
-        self._synchronize_lswitchports(ctx, lp_uuids,
-                                       scan_missing=scan_missing)
-        # Increase chunk counter
         LOG.info(_LI("Synchronization for chunk %(chunk_num)d of "
                      "%(total_chunks)d performed"),
                  {'chunk_num': sp.current_chunk + 1,
@@ -120,6 +120,8 @@ class NsxPluginV2(addr_pair_db.AllowedAddressPairsMixin,
     __native_bulk_support = True
     __native_pagination_support = True
     __native_sorting_support = True
+    # GET operations might write the status synchronized from the backend
+    __slave_reads_support = False
 
     # Map nova zones to cluster for easy retrieval
     novazone_cluster_map = {}
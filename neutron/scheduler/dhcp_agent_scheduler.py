@@ -17,11 +17,13 @@ import random
 
 from oslo.config import cfg
 from oslo.db import exception as db_exc
+from sqlalchemy import func
 from sqlalchemy import sql
 
 from neutron.common import constants
 from neutron.db import agents_db
 from neutron.db import agentschedulers_db
+from neutron.db import models_v2
 from neutron.i18n import _LI, _LW
 from neutron.openstack.common import log as logging
 
@@ -55,6 +57,64 @@ class ChanceScheduler(object):
                       {'network_id': network_id,
                        'agent_id': agent})
 
+    def _bulk_bind_networks(self, context, scheduled):
+        """Write many bindings at once, falling back one by one on races.
+
+        scheduled is a dict mapping network ids to lists of agents.
+        """
+        try:
+            with context.session.begin(subtransactions=True):
+                for network_id, agents in scheduled.iteritems():
+                    for agent in agents:
+                        binding = agentschedulers_db.NetworkDhcpAgentBinding(
+                            network_id=network_id, dhcp_agent_id=agent.id)
+                        context.session.add(binding)
+        except db_exc.DBDuplicateEntry:
+            LOG.debug('Concurrent scheduling detected, binding networks '
+                      'one at a time')
+            for network_id, agents in scheduled.iteritems():
+                self._schedule_bind_network(context, agents, network_id)
+
+    def _get_active_agents(self, context):
+        query = context.session.query(agents_db.Agent)
+        query = query.filter(agents_db.Agent.agent_type ==
+                             constants.AGENT_TYPE_DHCP,
+                             agents_db.Agent.admin_state_up == sql.true())
+        return [agent for agent in query if agent.is_active]
+
+    def _get_hosting_agents(self, context, network_ids):
+        """Return a dict mapping network ids to the agents hosting them.
+
+        A single query is issued whatever the number of networks.
+        """
+        hosting = dict((network_id, []) for network_id in network_ids)
+        if not network_ids:
+            return hosting
+        binding = agentschedulers_db.NetworkDhcpAgentBinding
+        query = context.session.query(binding.network_id, agents_db.Agent)
+        query = query.join(agents_db.Agent,
+                           agents_db.Agent.id == binding.dhcp_agent_id)
+        query = query.filter(binding.network_id.in_(network_ids))
+        for network_id, agent in query:
+            hosting[network_id].append(agent)
+        return hosting
+
+    def _count_active(self, agents):
+        # An agent set admin down keeps counting towards the agents of its
+        # networks, they are only moved once the agent is removed from them
+        return len([agent for agent in agents if agent.is_active])
+
+    def _get_agents_load(self, context, agents):
+        """Return the load of the agents, or None if not relevant."""
+        return None
+
+    def _get_networks_weight(self, context, network_ids):
+        """Return how much each network adds to an agent load."""
+        return dict((network_id, 1) for network_id in network_ids)
+
+    def _choose_agents(self, candidates, n_agents, load):
+        return random.sample(candidates, n_agents)
+
     def schedule(self, plugin, context, network):
         """Schedule the network to active DHCP agent(s).
 
@@ -81,25 +141,65 @@ class ChanceScheduler(object):
                 return
             active_dhcp_agents = [
                 agent for agent in set(enabled_dhcp_agents)
-                if not agents_db.AgentDbMixin.is_agent_down(
-                    agent['heartbeat_timestamp'])
-                and agent not in dhcp_agents
+                if agent.is_active and agent not in dhcp_agents
             ]
             if not active_dhcp_agents:
                 LOG.warn(_LW('No more DHCP agents'))
                 return
             n_agents = min(len(active_dhcp_agents), n_agents)
-            chosen_agents = random.sample(active_dhcp_agents, n_agents)
+            load = self._get_agents_load(context, active_dhcp_agents)
+            chosen_agents = self._choose_agents(active_dhcp_agents, n_agents,
+                                                load)
         self._schedule_bind_network(context, chosen_agents, network['id'])
         return chosen_agents
 
+    def schedule_networks(self, plugin, context, networks):
+        """Schedule many networks to active DHCP agent(s) at once.
+
+        Candidates, current bindings and agent load are loaded once for
+        all the networks, which are then assigned in a single pass while
+        accounting in memory for the load they add, and the bindings are
+        written in one transaction. This must not be called within an
+        ongoing transaction.
+
+        A dict mapping network ids to the scheduled agents is returned.
+        """
+        agents_per_network = cfg.CONF.dhcp_agents_per_network
+        network_ids = [network['id'] for network in networks]
+        scheduled = {}
+        with context.session.begin(subtransactions=True):
+            active_dhcp_agents = self._get_active_agents(context)
+            if not active_dhcp_agents:
+                LOG.warn(_LW('No more DHCP agents'))
+                return scheduled
+            hosting = self._get_hosting_agents(context, network_ids)
+            load = self._get_agents_load(context, active_dhcp_agents)
+            weights = (load is not None and
+                       self._get_networks_weight(context, network_ids))
+            for network_id in network_ids:
+                hosted_by = hosting[network_id]
+                n_agents = agents_per_network - self._count_active(hosted_by)
+                candidates = [agent for agent in active_dhcp_agents
+                              if agent not in hosted_by]
+                n_agents = min(len(candidates), n_agents)
+                if n_agents <= 0:
+                    continue
+                chosen_agents = self._choose_agents(candidates, n_agents,
+                                                    load)
+                scheduled[network_id] = chosen_agents
+                if load is not None:
+                    for agent in chosen_agents:
+                        load[agent.id] += weights[network_id]
+        self._bulk_bind_networks(context, scheduled)
+        return scheduled
+
     def auto_schedule_networks(self, plugin, context, host):
         """Schedule non-hosted networks to the DHCP agent on
         the specified host.
         """
         agents_per_network = cfg.CONF.dhcp_agents_per_network
-        # a list of (agent, net_ids) tuples
-        bindings_to_add = []
+        # a dict of {net_id: [agent]}
+        bindings_to_add = {}
         with context.session.begin(subtransactions=True):
             fields = ['network_id', 'enable_dhcp']
             subnets = plugin.get_subnets(context, fields=fields)
@@ -114,21 +214,65 @@ class ChanceScheduler(object):
                                  agents_db.Agent.host == host,
                                  agents_db.Agent.admin_state_up == sql.true())
             dhcp_agents = query.all()
+            hosting = self._get_hosting_agents(context, list(net_ids))
             for dhcp_agent in dhcp_agents:
-                if agents_db.AgentDbMixin.is_agent_down(
-                    dhcp_agent.heartbeat_timestamp):
+                if not dhcp_agent.is_active:
                     LOG.warn(_LW('DHCP agent %s is not active'), dhcp_agent.id)
                     continue
                 for net_id in net_ids:
-                    agents = plugin.get_dhcp_agents_hosting_networks(
-                        context, [net_id], active=True)
-                    if len(agents) >= agents_per_network:
+                    hosted_by = hosting[net_id]
+                    if self._count_active(hosted_by) >= agents_per_network:
                         continue
-                    if any(dhcp_agent.id == agent.id for agent in agents):
+                    if dhcp_agent in hosted_by:
                         continue
-                    bindings_to_add.append((dhcp_agent, net_id))
+                    hosted_by.append(dhcp_agent)
+                    bindings_to_add.setdefault(net_id, []).append(dhcp_agent)
         # do it outside transaction so particular scheduling results don't
         # make other to fail
-        for agent, net_id in bindings_to_add:
-            self._schedule_bind_network(context, [agent], net_id)
+        self._bulk_bind_networks(context, bindings_to_add)
         return True
+
+
+class WeightScheduler(ChanceScheduler):
+    """Allocate networks to the least loaded DHCP agents.
+
+    The load of an agent is the number of networks, subnets or ports it
+    hosts, according to dhcp_load_type, and is computed for all the
+    candidate agents with a single aggregate query.
+    """
+
+    def _get_load_query(self, context, columns):
+        binding = agentschedulers_db.NetworkDhcpAgentBinding
+        load_type = cfg.CONF.dhcp_load_type
+        if load_type == 'networks':
+            return context.session.query(
+                *(columns + [func.count(binding.network_id)]))
+        model = models_v2.Subnet if load_type == 'subnets' else models_v2.Port
+        query = context.session.query(*(columns + [func.count(model.id)]))
+        return query.join(model, model.network_id == binding.network_id)
+
+    def _get_agents_load(self, context, agents):
+        binding = agentschedulers_db.NetworkDhcpAgentBinding
+        load = dict((agent.id, 0) for agent in agents)
+        query = self._get_load_query(context, [binding.dhcp_agent_id])
+        query = query.filter(binding.dhcp_agent_id.in_(load.keys()))
+        load.update(query.group_by(binding.dhcp_agent_id))
+        return load
+
+    def _get_networks_weight(self, context, network_ids):
+        if cfg.CONF.dhcp_load_type == 'networks':
+            return super(WeightScheduler, self)._get_networks_weight(
+                context, network_ids)
+        model = (models_v2.Subnet if cfg.CONF.dhcp_load_type == 'subnets'
+                 else models_v2.Port)
+        weights = dict((network_id, 0) for network_id in network_ids)
+        query = context.session.query(model.network_id, func.count(model.id))
+        query = query.filter(model.network_id.in_(network_ids))
+        weights.update(query.group_by(model.network_id))
+        return weights
+
+    def _choose_agents(self, candidates, n_agents, load):
+        # Shuffle first so that equally loaded agents are picked randomly
+        candidates = random.sample(candidates, len(candidates))
+        candidates.sort(key=lambda agent: load[agent.id])
+        return candidates[:n_agents]
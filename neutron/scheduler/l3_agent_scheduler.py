@@ -20,10 +20,12 @@ import random
 from oslo.config import cfg
 from oslo.db import exception as db_exc
 import six
+from sqlalchemy import func
 from sqlalchemy import sql
 
 from neutron.common import constants
 from neutron.common import utils
+from neutron.db import agents_db
 from neutron.db import l3_agentschedulers_db
 from neutron.db import l3_db
 from neutron.db import l3_hamode_db
@@ -196,6 +198,7 @@ class L3Scheduler(object):
             return candidates
 
     def bind_routers(self, context, plugin, routers, l3_agent):
+        scheduled = {}
         for router in routers:
             if router.get('ha'):
                 if not self.router_has_binding(context, router['id'],
@@ -204,7 +207,35 @@ class L3Scheduler(object):
                         plugin, context, router['id'],
                         router['tenant_id'], l3_agent)
             else:
-                self.bind_router(context, router['id'], l3_agent)
+                scheduled[router['id']] = l3_agent
+        if scheduled:
+            self.bulk_bind_routers(context, scheduled)
+
+    def bulk_bind_routers(self, context, scheduled):
+        """Bind many routers to their chosen l3 agents in one transaction.
+
+        :param scheduled: dict of router_id -> chosen agent
+        If a concurrent operation already bound or removed any of the
+        routers, fall back to binding the routers one at a time.
+        """
+        try:
+            with context.session.begin(subtransactions=True):
+                for router_id, agent in scheduled.iteritems():
+                    binding = l3_agentschedulers_db.RouterL3AgentBinding()
+                    binding.l3_agent = agent
+                    binding.router_id = router_id
+                    context.session.add(binding)
+        except (db_exc.DBDuplicateEntry, db_exc.DBReferenceError):
+            LOG.debug('Bulk binding of %d routers conflicted with a '
+                      'concurrent operation, binding them one at a time',
+                      len(scheduled))
+            for router_id, agent in scheduled.iteritems():
+                self.bind_router(context, router_id, agent)
+            return
+
+        LOG.debug('Routers %s are scheduled to L3 agents',
+                  dict((router_id, agent.id)
+                       for router_id, agent in scheduled.iteritems()))
 
     def bind_router(self, context, router_id, chosen_agent):
         """Bind the router to the l3 agent which has been chosen."""
@@ -266,6 +297,99 @@ class L3Scheduler(object):
             self.bind_router(context, router_id, chosen_agent)
         return chosen_agent
 
+    def _get_hosted_router_ids(self, context, router_ids):
+        """Return the ids of the routers hosted by an enabled l3 agent."""
+        binding_model = l3_agentschedulers_db.RouterL3AgentBinding
+        query = context.session.query(binding_model.router_id).join(
+            agents_db.Agent).filter(
+                binding_model.router_id.in_(router_ids),
+                agents_db.Agent.admin_state_up == sql.true())
+        return set(router_id for router_id, in query)
+
+    def _get_routers_count(self, context, agents):
+        """Return the number of routers bound to each of the agents."""
+        binding_model = l3_agentschedulers_db.RouterL3AgentBinding
+        load = dict((agent.id, 0) for agent in agents)
+        query = context.session.query(
+            binding_model.l3_agent_id,
+            func.count(binding_model.router_id)).filter(
+                binding_model.l3_agent_id.in_(load.keys())).group_by(
+                    binding_model.l3_agent_id)
+        load.update(query)
+        return load
+
+    def schedule_routers(self, plugin, context, router_ids):
+        """Schedule many routers to active L3 agents in a single pass.
+
+        Routers already hosted by an enabled agent are skipped.
+        Distributed and HA routers are handed to schedule() one at a
+        time. The remaining legacy routers share a single computation of
+        the active agents, of their load and of the candidates per
+        external network; agents are chosen with in-memory load
+        accounting and the bindings are written in one batch.
+
+        :returns: dict of router_id -> chosen agent
+        """
+        scheduled = {}
+        if not router_ids:
+            return scheduled
+        routers = plugin.get_routers(context, filters={'id': router_ids})
+        hosted = self._get_hosted_router_ids(context, router_ids)
+        legacy_routers = []
+        for router in routers:
+            if router.get('distributed') or router.get('ha'):
+                chosen_agent = self.schedule(plugin, context, router['id'])
+                if chosen_agent:
+                    scheduled[router['id']] = chosen_agent
+            elif router['id'] in hosted:
+                LOG.debug('Router %s has already been hosted by an L3 '
+                          'agent', router['id'])
+            else:
+                legacy_routers.append(router)
+        if not legacy_routers:
+            return scheduled
+
+        active_l3_agents = plugin.get_l3_agents(context, active=True)
+        if not active_l3_agents:
+            LOG.warn(_LW('No active L3 agents'))
+            return scheduled
+        # Candidates only depend on the external network of a router,
+        # unless an agent without namespaces is dedicated to a router.
+        per_router = any(
+            not plugin.get_configuration_dict(agent).get(
+                'use_namespaces', True)
+            for agent in active_l3_agents)
+        load = self._get_routers_count(context, active_l3_agents)
+        candidates_cache = {}
+        for router in legacy_routers:
+            key = ((router['external_gateway_info'] or {}).get('network_id'),
+                   router['id'] if per_router else None)
+            if key not in candidates_cache:
+                candidates_cache[key] = plugin.get_l3_agent_candidates(
+                    context, router, active_l3_agents)
+            candidates = candidates_cache[key]
+            if not candidates:
+                LOG.warn(_LW('No L3 agents can host the router %s'),
+                         router['id'])
+                continue
+            chosen_agent = self._choose_router_agent_by_load(
+                plugin, context, candidates, load)
+            load[chosen_agent.id] += 1
+            scheduled[router['id']] = chosen_agent
+
+        if scheduled:
+            self.bulk_bind_routers(context, scheduled)
+        return scheduled
+
+    def _choose_router_agent_by_load(self, plugin, context, candidates,
+                                     load):
+        """Choose an agent from candidates given the known agents load.
+
+        :param load: dict of agent_id -> number of routers, kept up to
+                     date by the caller while scheduling a batch
+        """
+        return self._choose_router_agent(plugin, context, candidates)
+
     @abc.abstractmethod
     def _choose_router_agent(self, plugin, context, candidates):
         """Choose an agent from candidates based on a specific policy."""
@@ -359,6 +483,10 @@ class ChanceScheduler(L3Scheduler):
     def _choose_router_agent(self, plugin, context, candidates):
         return random.choice(candidates)
 
+    def _choose_router_agent_by_load(self, plugin, context, candidates,
+                                     load):
+        return random.choice(candidates)
+
     def _choose_router_agents_for_ha(self, plugin, context, candidates):
         num_agents = self.get_num_of_agents_for_ha(len(candidates))
         return random.sample(candidates, num_agents)
@@ -378,6 +506,12 @@ class LeastRoutersScheduler(L3Scheduler):
             context, candidate_ids)
         return chosen_agent
 
+    def _choose_router_agent_by_load(self, plugin, context, candidates,
+                                     load):
+        min_load = min(load[candidate.id] for candidate in candidates)
+        return random.choice([candidate for candidate in candidates
+                              if load[candidate.id] == min_load])
+
     def _choose_router_agents_for_ha(self, plugin, context, candidates):
         num_agents = self.get_num_of_agents_for_ha(len(candidates))
         ordered_agents = plugin.get_l3_agents_ordered_by_num_routers(
@@ -13,6 +13,7 @@
 #    License for the specific language governing permissions and limitations
 #    under the License.
 
+import gc
 import inspect
 import logging as std_logging
 import os
@@ -119,7 +120,7 @@ class RpcWorker(object):
         # We may have just forked from parent process.  A quick disposal of the
         # existing sql connections avoids producing errors later when they are
         # discovered to be broken.
-        session.get_engine().pool.dispose()
+        session.dispose_engines()
         self._servers = self._plugin.start_rpc_listeners()
 
     def wait(self):
@@ -156,6 +157,7 @@ def serve_rpc():
             rpc.start()
             return rpc
         else:
+            _prepare_workers_fork()
             launcher = common_service.ProcessLauncher(wait_interval=1.0)
             launcher.launch_service(rpc, workers=cfg.CONF.rpc_workers)
             return launcher
@@ -165,11 +167,30 @@ def serve_rpc():
                               'details.'))
 
 
+def _prepare_workers_fork():
+    """Get the process ready to fork workers sharing its memory.
+
+    The plugins, the extensions and the API application are all loaded by
+    the time workers are forked, the workers then only open their own
+    connections. The database connections of this process are closed so
+    that no worker inherits them, and the garbage collector is run: the
+    objects created while loading then sit in the oldest generation, which
+    the collections of the workers rarely go through and so rarely copy.
+    """
+    session.dispose_engines()
+    gc.collect()
+    if hasattr(gc, 'freeze'):
+        # Keep the collections of the workers away from them altogether
+        gc.freeze()
+
+
 def _run_wsgi(app_name):
     app = config.load_paste_app(app_name)
     if not app:
         LOG.error(_LE('No known API applications configured.'))
         return
+    if cfg.CONF.api_workers > 0:
+        _prepare_workers_fork()
     server = wsgi.Server("Neutron")
     server.start(app, cfg.CONF.bind_port, cfg.CONF.bind_host,
                  workers=cfg.CONF.api_workers)
@@ -12,6 +12,7 @@
 # License for the specific language governing permissions and limitations
 # under the License.
 
+import eventlet
 from oslo.config import cfg
 from oslo.utils import importutils
 import six
@@ -35,10 +36,17 @@ TOP_CHAIN = WRAP_NAME + "-FORWARD"
 RULE = '-r-'
 LABEL = '-l-'
 
+IptablesDriverOpts = [
+    cfg.IntOpt('traffic_counters_workers', default=16,
+               help=_("Number of router namespaces whose traffic counters "
+                      "are read at the same time")),
+]
+
 config.register_interface_driver_opts_helper(cfg.CONF)
 config.register_use_namespaces_opts_helper(cfg.CONF)
 config.register_root_helper(cfg.CONF)
 cfg.CONF.register_opts(interface.OPTS)
+cfg.CONF.register_opts(IptablesDriverOpts)
 
 
 class IptablesManagerTransaction(object):
@@ -260,24 +268,29 @@ class IptablesMeteringDriver(abstract_driver.MeteringAbstractDriver):
         for router in routers:
             self._process_disassociate_metering_label(router)
 
+    def _get_router_traffic_counters(self, rm):
+        chains = dict((iptables_manager.get_chain_name(
+            WRAP_NAME + LABEL + label_id, wrap=False), label_id)
+            for label_id in rm.metering_labels)
+        if not chains:
+            return {}
+        chain_accs = rm.iptables_manager.get_chains_traffic_counters(
+            chains, wrap=False, zero=True)
+        return dict((chains[chain], acc)
+                    for chain, acc in chain_accs.items())
+
     @log.log
     def get_traffic_counters(self, context, routers):
-        accs = {}
-        for router in routers:
-            rm = self.routers.get(router['id'])
-            if not rm:
-                continue
-
-            for label_id, label in rm.metering_labels.items():
-                chain = iptables_manager.get_chain_name(WRAP_NAME + LABEL +
-                                                        label_id, wrap=False)
-
-                chain_acc = rm.iptables_manager.get_traffic_counters(
-                    chain, wrap=False, zero=True)
-
-                if not chain_acc:
-                    continue
+        """Read the counters of all the labels of each router at once.
 
+        The namespaces of the routers are processed concurrently.
+        """
+        rms = [self.routers[router['id']] for router in routers
+               if router['id'] in self.routers]
+        pool = eventlet.GreenPool(self.conf.traffic_counters_workers)
+        accs = {}
+        for router_accs in pool.imap(self._get_router_traffic_counters, rms):
+            for label_id, chain_acc in router_accs.items():
                 acc = accs.get(label_id, {'pkts': 0, 'bytes': 0})
 
                 acc['pkts'] += chain_acc['pkts']
@@ -12,6 +12,8 @@
 # License for the specific language governing permissions and limitations
 # under the License.
 
+import mock
+
 from neutron.agent.linux import keepalived
 from neutron.tests import base
 
@@ -239,3 +241,39 @@ class KeepalivedVirtualRouteTestCase(base.BaseTestCase):
     def test_virtual_route_without_dev(self):
         route = keepalived.KeepalivedVirtualRoute('50.0.0.0/8', '1.2.3.4')
         self.assertEqual('50.0.0.0/8 via 1.2.3.4', route.build_config())
+
+
+class KeepalivedManagerTestCase(base.BaseTestCase,
+                                KeepalivedConfBaseMixin):
+    def setUp(self):
+        super(KeepalivedManagerTestCase, self).setUp()
+        self.manager = keepalived.KeepalivedManager(
+            'router1', self._get_config(), conf_path=self.temp_dir)
+        process_manager = mock.patch.object(
+            keepalived.external_process, 'ProcessManager').start()
+        self.process = process_manager.return_value
+        self.process.active = True
+        self.manager.spawn()
+
+    def test_spawn_reloads_running_instance_on_change(self):
+        self.process.enable.assert_called_once_with(mock.ANY,
+                                                    reload_cfg=True)
+        self.manager.spawn()
+        self.process.enable.assert_called_with(mock.ANY, reload_cfg=False)
+
+    def test_restart_reloads_only_on_change(self):
+        self.manager.restart()
+        self.assertFalse(self.process.reload_cfg.called)
+        self.manager.config.get_instance(1).track_interfaces.append('eth9')
+        self.manager.restart()
+        self.manager.restart()
+        self.process.reload_cfg.assert_called_once_with()
+        self.assertEqual({'reloads': 1, 'unchanged': 2},
+                         self.manager.stats)
+
+    def test_revive_checks_running_pids(self):
+        self.process.is_active.return_value = False
+        self.process.active = False
+        self.manager.revive(set([42]))
+        self.process.is_active.assert_called_once_with(set([42]))
+        self.assertEqual(1, self.manager.stats['respawns'])
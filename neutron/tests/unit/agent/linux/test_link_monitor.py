@@ -0,0 +1,109 @@
+# Copyright 2015 OpenStack Foundation
+#
+#    Licensed under the Apache License, Version 2.0 (the "License"); you may
+#    not use this file except in compliance with the License. You may obtain
+#    a copy of the License at
+#
+#         http://www.apache.org/licenses/LICENSE-2.0
+#
+#    Unless required by applicable law or agreed to in writing, software
+#    distributed under the License is distributed on an "AS IS" BASIS, WITHOUT
+#    WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied. See the
+#    License for the specific language governing permissions and limitations
+#    under the License.
+
+import errno
+import socket
+
+import mock
+
+from neutron.agent.linux import link_monitor
+from neutron.tests import base
+
+
+def link_message(msg_type, name, other_attrs=1):
+    attrs = ''
+    for i in range(other_attrs):
+        # IFLA_MTU
+        attrs += link_monitor.RTATTR.pack(8, 4) + '\x00\x05\x00\x00'
+    padded = name + '\0' * (4 - len(name) % 4)
+    attrs += link_monitor.RTATTR.pack(
+        link_monitor.RTATTR.size + len(name) + 1,
+        link_monitor.IFLA_IFNAME) + padded
+    body = link_monitor.IFINFOMSG.pack(0, 1, 5, 0, 0) + attrs
+    return link_monitor.NLMSGHDR.pack(
+        link_monitor.NLMSGHDR.size + len(body), msg_type, 0, 0, 0) + body
+
+
+class TestParseLinkEvents(base.BaseTestCase):
+
+    def test_parse_link_events(self):
+        data = (link_message(link_monitor.RTM_NEWLINK, 'tap1234') +
+                link_message(link_monitor.RTM_DELLINK, 'eth0', 0) +
+                # RTM_NEWADDR
+                link_monitor.NLMSGHDR.pack(link_monitor.NLMSGHDR.size,
+                                           20, 0, 0, 0))
+        self.assertEqual([(link_monitor.RTM_NEWLINK, 'tap1234'),
+                          (link_monitor.RTM_DELLINK, 'eth0')],
+                         link_monitor.parse_link_events(data))
+
+    def test_parse_truncated_message(self):
+        data = link_message(link_monitor.RTM_NEWLINK, 'tap1234')
+        self.assertEqual([], link_monitor.parse_link_events(data[:10]))
+        bogus = link_monitor.NLMSGHDR.pack(0, link_monitor.RTM_NEWLINK,
+                                           0, 0, 0)
+        self.assertEqual([], link_monitor.parse_link_events(bogus))
+
+
+class TestLinkMonitor(base.BaseTestCase):
+
+    def setUp(self):
+        super(TestLinkMonitor, self).setUp()
+        self.monitor = link_monitor.LinkMonitor(prefix='tap',
+                                                respawn_interval=0)
+        self.sock = mock.Mock()
+        mock.patch.object(self.monitor, '_open',
+                          return_value=self.sock).start()
+
+    def _run(self, *received):
+        # Stop the loop once everything was received
+        self.sock.recv.side_effect = list(received) + [SystemExit()]
+        self.monitor._sock = self.sock
+        self.assertRaises(SystemExit, self.monitor._run)
+
+    def test_wait_times_out_without_changes(self):
+        self.assertFalse(self.monitor.wait(0))
+
+    def test_matching_links_wake_up_waiters(self):
+        self._run(link_message(link_monitor.RTM_NEWLINK, 'eth1'))
+        self.assertFalse(self.monitor.wait(0))
+        self._run(link_message(link_monitor.RTM_NEWLINK, 'eth1'),
+                  link_message(link_monitor.RTM_DELLINK, 'tap1234'))
+        self.assertTrue(self.monitor.wait(0))
+        # Changes are consumed by the wait
+        self.assertFalse(self.monitor.wait(0))
+
+    def test_lost_notifications_wake_up_waiters(self):
+        self._run(socket.error(errno.ENOBUFS, 'No buffer space available'))
+        self.assertTrue(self.monitor.wait(0))
+        self.assertFalse(self.sock.close.called)
+
+    def test_socket_reopened_on_error(self):
+        new_sock = mock.Mock()
+        new_sock.recv.side_effect = SystemExit()
+        self.monitor._open.side_effect = [socket.error(), new_sock]
+        self.sock.recv.side_effect = socket.error(errno.EBADF,
+                                                  'Bad file descriptor')
+        self.monitor._sock = self.sock
+        self.assertRaises(SystemExit, self.monitor._run)
+        self.assertTrue(self.sock.close.called)
+        self.assertIs(new_sock, self.monitor._sock)
+        self.assertTrue(self.monitor.wait(0))
+
+    def test_start_stop(self):
+        with mock.patch('eventlet.spawn') as spawn:
+            self.monitor.start()
+            self.monitor.stop()
+        spawn.assert_called_once_with(self.monitor._run)
+        spawn.return_value.kill.assert_called_once_with()
+        self.sock.close.assert_called_once_with()
@@ -16,6 +16,7 @@
 import datetime
 import mock
 
+from oslo.config import cfg
 from oslo.utils import timeutils
 
 from neutron.api.rpc.agentnotifiers import dhcp_rpc_agent_api
@@ -125,6 +126,8 @@ class TestDhcpAgentNotifyAPI(base.BaseTestCase):
                 agent.admin_state_up = True
                 agent.heartbeat_timestamp = timeutils.utcnow()
                 g.return_value = [agent]
+                self.notifier.plugin.get_dhcp_agents_hosting_networks.\
+                    return_value = []
                 dummy_payload = {'port': {}}
                 self.notifier._notify_agents(mock.Mock(), method,
                                              dummy_payload, 'foo_network_id')
@@ -154,3 +157,136 @@ class TestDhcpAgentNotifyAPI(base.BaseTestCase):
     def test__cast_message(self):
         self.notifier._cast_message(mock.ANY, mock.ANY, mock.ANY)
         self.assertEqual(1, self.mock_cast.call_count)
+
+    def test__get_network_agents_not_cached_by_default(self):
+        get_agents = self.notifier.plugin.get_dhcp_agents_hosting_networks
+        get_agents.return_value = [agents_db.Agent(id='agent_id')]
+        for i in range(3):
+            self.notifier._get_network_agents(mock.ANY, 'foo_net_id')
+        self.assertEqual(3, get_agents.call_count)
+        self.assertEqual({}, self.notifier._network_agents)
+
+    def test__get_network_agents_cached(self):
+        cfg.CONF.set_override('dhcp_agents_cache_ttl', 10)
+        agent = agents_db.Agent(id='agent_id')
+        get_agents = self.notifier.plugin.get_dhcp_agents_hosting_networks
+        get_agents.return_value = [agent]
+        get_agents_db = self.notifier.plugin.get_agents_db
+        get_agents_db.return_value = [agent]
+        for i in range(3):
+            self.assertEqual(
+                [agent],
+                self.notifier._get_network_agents(mock.ANY, 'foo_net_id'))
+        self.assertEqual(1, get_agents.call_count)
+        # Only the ids of the agents are cached, they are read again
+        self.assertEqual(
+            [mock.call(mock.ANY, filters={'id': ['agent_id']})] * 2,
+            get_agents_db.call_args_list)
+
+    def test__get_network_agents_expired_purged(self):
+        cfg.CONF.set_override('dhcp_agents_cache_ttl', 10)
+        get_agents = self.notifier.plugin.get_dhcp_agents_hosting_networks
+        get_agents.return_value = [agents_db.Agent(id='agent_id')]
+        with mock.patch.object(dhcp_rpc_agent_api.time, 'time') as now:
+            now.return_value = 100
+            self.notifier._get_network_agents(mock.ANY, 'net1')
+            now.return_value = 105
+            self.notifier._get_network_agents(mock.ANY, 'net2')
+            now.return_value = 112
+            self.notifier._get_network_agents(mock.ANY, 'net3')
+        self.assertEqual(['net2', 'net3'],
+                         sorted(self.notifier._network_agents))
+
+    def test__get_network_agents_not_cached_without_agents(self):
+        get_agents = self.notifier.plugin.get_dhcp_agents_hosting_networks
+        get_agents.return_value = []
+        for i in range(3):
+            self.notifier._get_network_agents(mock.ANY, 'foo_net_id')
+        self.assertEqual(3, get_agents.call_count)
+
+    def test__get_network_agents_invalidated_on_binding_change(self):
+        cfg.CONF.set_override('dhcp_agents_cache_ttl', 10)
+        get_agents = self.notifier.plugin.get_dhcp_agents_hosting_networks
+        get_agents.return_value = [agents_db.Agent()]
+        self.notifier._get_network_agents(mock.ANY, 'foo_net_id')
+        self.notifier.network_added_to_agent(mock.ANY, 'foo_net_id', 'host')
+        self.notifier._get_network_agents(mock.ANY, 'foo_net_id')
+        self.notifier.agent_updated(mock.ANY, False, 'host')
+        self.notifier._get_network_agents(mock.ANY, 'foo_net_id')
+        self.assertEqual(3, get_agents.call_count)
+
+    def test__notify_agents_no_scheduling_when_hosted(self):
+        cfg.CONF.set_override('dhcp_agents_per_network', 1)
+        agent = agents_db.Agent()
+        agent.admin_state_up = True
+        agent.heartbeat_timestamp = timeutils.utcnow()
+        agent.host = 'host'
+        agent.topic = 'dhcp_agent'
+        self.notifier.plugin.get_dhcp_agents_hosting_networks.return_value = (
+            [agent])
+        payload = {'port': {'id': 'foo_port_id'}}
+        self.notifier._notify_agents(mock.Mock(), 'port_create_end',
+                                     payload, 'foo_network_id')
+        self.assertFalse(self.notifier.plugin.schedule_network.called)
+        self.assertFalse(self.notifier.plugin.get_network.called)
+        self.mock_cast.assert_called_once_with(
+            mock.ANY, 'port_create_end', payload, 'host', 'dhcp_agent')
+
+    def _notify_ports(self, events):
+        with mock.patch.object(dhcp_rpc_agent_api.eventlet,
+                               'spawn_after') as spawn_after:
+            for method, port in events:
+                self.notifier.notify(mock.Mock(), {'port': port}, method)
+        self.assertEqual(1, spawn_after.call_count)
+        with mock.patch.object(self.notifier, '_notify_agents') as notify:
+            self.notifier._batcher.flush()
+        return notify.call_args_list
+
+    def test_notify_ports_batched(self):
+        cfg.CONF.set_override('dhcp_notification_batch_interval', 0.1)
+        self.mock_util.return_value = False
+        port1 = {'id': 'port1', 'network_id': 'net1'}
+        port2 = {'id': 'port2', 'network_id': 'net1'}
+        port3 = {'id': 'port3', 'network_id': 'net2'}
+        calls = self._notify_ports(
+            [('port.create.end', port1), ('port.create.end', port2),
+             ('port.create.end', port3), ('port.update.end', port1),
+             ('port.update.end', port2), ('port.update.end', port1),
+             ('port.delete.end', port1), ('port.delete.end', port2)])
+        self.assertEqual(
+            [mock.call(mock.ANY, 'ports_create_end',
+                       {'ports': [port1, port2]}, 'net1'),
+             mock.call(mock.ANY, 'ports_update_end',
+                       {'ports': [port1, port2]}, 'net1'),
+             mock.call(mock.ANY, 'ports_delete_end',
+                       {'port_ids': ['port1', 'port2']}, 'net1'),
+             mock.call(mock.ANY, 'port_create_end', {'port': port3}, 'net2')],
+            calls)
+
+    def test_notify_ports_schedules_one_flush(self):
+        cfg.CONF.set_override('dhcp_notification_batch_interval', 60)
+        batcher = self.notifier._batcher
+        port = {'id': 'port1', 'network_id': 'net1'}
+        self.notifier.notify(mock.ANY, {'port': port}, 'port.update.end')
+        flusher = batcher._flusher
+        # The flush is pending, the green thread has not started yet
+        self.notifier.notify(mock.ANY, {'port': port}, 'port.update.end')
+        self.assertIs(flusher, batcher._flusher)
+        flusher.cancel()
+
+    def test_notify_ports_not_batched(self):
+        cfg.CONF.set_override('dhcp_notification_batch_interval', 0)
+        port = {'id': 'port1', 'network_id': 'net1'}
+        with mock.patch.object(self.notifier, '_notify_agents') as notify:
+            self.notifier.notify(mock.ANY, {'port': port}, 'port.create.end')
+            self.notifier.notify(mock.ANY, {'port': port}, 'port.delete.end')
+        self.assertEqual(
+            [mock.call(mock.ANY, 'port_create_end', {'port': port}, 'net1'),
+             mock.call(mock.ANY, 'port_delete_end', {'port_id': 'port1'},
+                       'net1')],
+            notify.call_args_list)
+
+    def test_bulk_message_version(self):
+        self.assertEqual({'version': '1.1'},
+                         self.notifier._get_version('ports_create_end'))
+        self.assertEqual({}, self.notifier._get_version('port_create_end'))
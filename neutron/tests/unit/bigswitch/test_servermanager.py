@@ -16,6 +16,7 @@ import httplib
 import socket
 import ssl
 
+import eventlet
 import mock
 from oslo.config import cfg
 from oslo.db import exception as db_exc
@@ -327,6 +328,70 @@ class ServerManagerTests(test_rp.BigSwitchProxyPluginV2TestCase):
             # 1 for the first call, 2 for the second with retry
             self.assertEqual(rv.request.call_count, 3)
 
+    def test_connections_reused_with_keep_alive(self):
+        sp = servermanager.ServerPool()
+        with mock.patch(HTTPCON) as conmock:
+            rv = conmock.return_value
+            rv.getresponse.return_value.getheader.return_value = 'HASH'
+            sp.servers[0].capabilities = ['keep-alive']
+            for i in range(3):
+                sp.servers[0].rest_call('GET', '/')
+        self.assertEqual(1, conmock.call_count)
+        self.assertFalse(rv.close.called)
+        self.assertEqual([rv], sp.servers[0].idle_connections)
+
+    def test_connections_not_reused_without_keep_alive(self):
+        sp = servermanager.ServerPool()
+        with mock.patch(HTTPCON) as conmock:
+            rv = conmock.return_value
+            rv.getresponse.return_value.getheader.return_value = 'HASH'
+            sp.servers[0].rest_call('GET', '/')
+            sp.servers[0].rest_call('GET', '/')
+        self.assertEqual(2, conmock.call_count)
+        self.assertEqual(2, rv.close.call_count)
+        self.assertEqual([], sp.servers[0].idle_connections)
+
+    def test_concurrent_requests_use_their_own_connection(self):
+        sp = servermanager.ServerPool()
+        server = sp.servers[0]
+        server.capabilities = ['keep-alive']
+        conns = []
+
+        def new_connection(*args, **kwargs):
+            conn = mock.Mock()
+            conn.getresponse.return_value.getheader.return_value = 'HASH'
+            conn.getresponse.return_value.status = 200
+            conn.getresponse.return_value.read.side_effect = (
+                lambda: eventlet.sleep(0) or '')
+            conns.append(conn)
+            return conn
+        with mock.patch(HTTPCON, side_effect=new_connection):
+            pool = eventlet.GreenPool()
+            for i in range(3):
+                pool.spawn(server.rest_call, 'GET', '/')
+            pool.waitall()
+            self.assertEqual(3, len(conns))
+            server.rest_call('GET', '/')
+        self.assertEqual(3, len(conns))
+        self.assertEqual(3, len(server.idle_connections))
+
+    def test_connection_pool_size_bounds_concurrency(self):
+        cfg.CONF.set_override('server_pool_size', 1, 'RESTPROXY')
+        sp = servermanager.ServerPool()
+        server = sp.servers[0]
+        server.capabilities = ['keep-alive']
+        with mock.patch(HTTPCON) as conmock:
+            rv = conmock.return_value
+            rv.getresponse.return_value.getheader.return_value = 'HASH'
+            rv.getresponse.return_value.read.side_effect = (
+                lambda: eventlet.sleep(0) or '')
+            pool = eventlet.GreenPool()
+            for i in range(3):
+                pool.spawn(server.rest_call, 'GET', '/')
+            pool.waitall()
+        self.assertEqual(1, conmock.call_count)
+        self.assertEqual(3, rv.request.call_count)
+
     def test_socket_error(self):
         sp = servermanager.ServerPool()
         with mock.patch(HTTPCON) as conmock:
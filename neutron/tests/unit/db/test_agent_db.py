@@ -13,7 +13,10 @@
 # See the License for the specific language governing permissions and
 # limitations under the License.
 
+import datetime
+
 import mock
+from oslo.config import cfg
 from oslo.db import exception as exc
 from oslo.utils import timeutils
 
@@ -97,6 +100,27 @@ class TestAgentsDbMixin(testlib_api.SqlTestCase):
         agent = agents[0]
         self._assert_ref_fields_are_equal(self.agent_status, agent)
 
+    def test_create_or_update_agent_statistics(self):
+        statistics = {'router_processing': {'queue_depth': 3}}
+        self.plugin.create_or_update_agent(
+            self.context, dict(self.agent_status, statistics=statistics))
+
+        agent = self.plugin.get_agents(self.context)[0]
+        self.assertEqual(statistics, agent['statistics'])
+        self.plugin.create_or_update_agent(self.context, self.agent_status)
+        agent = self.plugin.get_agent(self.context, agent['id'])
+        self.assertEqual({}, agent['statistics'])
+
+    def test_create_or_update_agent_statistics_too_large(self):
+        statistics = {'big': 'x' * agents_db.MAX_STATISTICS_SIZE}
+        with mock.patch.object(agents_db.LOG, 'warn') as warn:
+            self.plugin.create_or_update_agent(
+                self.context, dict(self.agent_status, statistics=statistics))
+
+        self.assertEqual(1, warn.call_count)
+        agent = self.plugin.get_agents(self.context)[0]
+        self.assertEqual({}, agent['statistics'])
+
     def test_create_or_update_agent_concurrent_insert(self):
         # NOTE(rpodolyaka): emulate violation of the unique constraint caused
         #                   by a concurrent insert. Ensure we make another
@@ -111,3 +135,115 @@ class TestAgentsDbMixin(testlib_api.SqlTestCase):
 
             self.assertEqual(add_mock.call_count, 2,
                              "Agent entry creation hasn't been retried")
+
+
+class TestAgentHeartbeatCache(testlib_api.SqlTestCase):
+    def setUp(self):
+        super(TestAgentHeartbeatCache, self).setUp()
+        cfg.CONF.set_override('agent_heartbeat_flush_interval', 10)
+        self.context = context.get_admin_context()
+        self.plugin = FakePlugin()
+        self.heartbeats = agents_db.AgentHeartbeatCache()
+        mock.patch.object(agents_db, 'heartbeats', self.heartbeats).start()
+        mock.patch.object(self.heartbeats, '_start_flusher').start()
+
+        self.agent_status = {
+            'agent_type': 'Open vSwitch agent',
+            'binary': 'neutron-openvswitch-agent',
+            'host': 'overcloud-notcompute',
+            'topic': 'N/A',
+            'configurations': {'bridge_mappings': {}}
+        }
+
+    def _get_agent_db(self):
+        self.context.session.expire_all()
+        return self.plugin._get_agent_by_type_and_host(
+            self.context, self.agent_status['agent_type'],
+            self.agent_status['host'])
+
+    def _report(self, report_time, **kwargs):
+        agent_status = dict(self.agent_status, **kwargs)
+        with mock.patch.object(timeutils, 'utcnow',
+                               return_value=report_time):
+            self.plugin.create_or_update_agent(self.context, agent_status)
+
+    def test_heartbeat_buffered_until_flush(self):
+        start = timeutils.utcnow()
+        later = start + datetime.timedelta(seconds=30)
+        self._report(start)
+        self._report(later)
+
+        agent_db = self._get_agent_db()
+        self.assertEqual(start, agent_db.heartbeat_timestamp)
+        self.assertEqual(later, agent_db.last_heartbeat)
+        self.assertEqual(
+            later, self.plugin.get_agents(self.context)[0][
+                'heartbeat_timestamp'])
+
+        self.heartbeats.flush()
+        self.assertEqual(later, self._get_agent_db().heartbeat_timestamp)
+        self.assertIsNone(self.heartbeats.get_heartbeat(
+            self.agent_status['agent_type'], self.agent_status['host']))
+
+    def test_statistics_buffered_with_heartbeat(self):
+        start = timeutils.utcnow()
+        later = start + datetime.timedelta(seconds=30)
+        self._report(start, statistics={'processed': 1})
+        self._report(later, statistics={'processed': 2})
+
+        self.assertEqual('{"processed": 1}', self._get_agent_db().statistics)
+        self.assertEqual({'processed': 2},
+                         self.plugin.get_agents(self.context)[0][
+                             'statistics'])
+
+        self.heartbeats.flush()
+        agent_db = self._get_agent_db()
+        self.assertEqual(later, agent_db.heartbeat_timestamp)
+        self.assertEqual({'processed': 2},
+                         self.plugin.get_statistics_dict(agent_db))
+
+    def test_configuration_change_written_through(self):
+        start = timeutils.utcnow()
+        later = start + datetime.timedelta(seconds=30)
+        self._report(start)
+        self._report(later, configurations={'bridge_mappings': {'a': 'b'}})
+
+        agent_db = self._get_agent_db()
+        self.assertEqual(later, agent_db.heartbeat_timestamp)
+        self.assertEqual({'bridge_mappings': {'a': 'b'}},
+                         self.plugin.get_configuration_dict(agent_db))
+
+    def test_start_flag_written_through(self):
+        start = timeutils.utcnow()
+        later = start + datetime.timedelta(seconds=30)
+        self._report(start)
+        self._report(later, start_flag=True)
+
+        self.assertEqual(later, self._get_agent_db().started_at)
+
+    def test_flush_forgets_agents_changed_elsewhere(self):
+        start = timeutils.utcnow()
+        later = start + datetime.timedelta(seconds=30)
+        self._report(start)
+        self._report(later)
+        # Another worker stores a different configuration meanwhile
+        with self.context.session.begin():
+            self._get_agent_db().configurations = '{}'
+
+        self.heartbeats.flush()
+        self.assertEqual(start, self._get_agent_db().heartbeat_timestamp)
+        self.assertFalse(self.heartbeats.record(self.agent_status, later))
+
+    def test_deleted_agent_forgotten(self):
+        self._report(timeutils.utcnow())
+        self.plugin.delete_agent(self.context, self._get_agent_db().id)
+
+        self.assertFalse(self.heartbeats.record(self.agent_status,
+                                                timeutils.utcnow()))
+
+    def test_disabled_by_default(self):
+        cfg.CONF.clear_override('agent_heartbeat_flush_interval')
+        self._report(timeutils.utcnow())
+
+        self.assertFalse(self.heartbeats.record(self.agent_status,
+                                                timeutils.utcnow()))
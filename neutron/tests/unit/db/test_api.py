@@ -0,0 +1,190 @@
+# Copyright (c) 2015 OpenStack Foundation.
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#    http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or
+# implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+import datetime
+import os
+
+import mock
+from oslo.config import cfg
+from oslo.db import exception as db_exc
+from oslo.db.sqlalchemy import session
+
+from neutron.db import agents_db
+from neutron.db import api as db_api
+from neutron.tests import base
+
+HEARTBEAT = datetime.datetime(2015, 1, 1, 12, 0, 0)
+
+
+class TestSlaveDatabase(base.BaseTestCase):
+
+    def setUp(self):
+        super(TestSlaveDatabase, self).setUp()
+        slave_connection = 'sqlite:///%s' % os.path.join(
+            self.temp_dir, 'slave.sqlite')
+        cfg.CONF.set_override('slave_connection', slave_connection,
+                              'database')
+        facade = session.EngineFacade(
+            'sqlite:///%s' % os.path.join(self.temp_dir, 'master.sqlite'),
+            slave_connection=slave_connection, sqlite_fk=True)
+        mock.patch.object(db_api, '_FACADE', facade).start()
+        mock.patch.dict(db_api._SLAVE_STATUS,
+                        {'checked_at': 0, 'usable': False}).start()
+        self.master = facade.get_engine()
+        self.slave = facade.get_engine(use_slave=True)
+        for engine in (self.master, self.slave):
+            agents_db.Agent.__table__.create(engine)
+
+    def _add_heartbeat(self, engine, heartbeat):
+        engine.execute(agents_db.Agent.__table__.insert().values(
+            id=heartbeat.isoformat(), agent_type='L3 agent', binary='b',
+            topic='t', host=heartbeat.isoformat(), admin_state_up=True,
+            created_at=heartbeat, started_at=heartbeat,
+            heartbeat_timestamp=heartbeat, configurations='{}'))
+
+    def _assert_reads_from(self, engine):
+        self.assertIs(engine, db_api.get_session(use_slave=True).bind)
+
+    def test_slave_used_without_agents(self):
+        self._assert_reads_from(self.slave)
+
+    def test_master_used_without_slave(self):
+        cfg.CONF.set_override('slave_connection', None, 'database')
+
+        self._assert_reads_from(self.master)
+
+    def test_master_used_when_not_asked_for_slave(self):
+        self.assertIs(self.master, db_api.get_session().bind)
+
+    def test_slave_used_when_in_sync(self):
+        self._add_heartbeat(self.master, HEARTBEAT)
+        self._add_heartbeat(self.slave, HEARTBEAT)
+
+        self._assert_reads_from(self.slave)
+
+    def test_slave_used_when_lagging_less_than_max_lag(self):
+        self._add_heartbeat(self.master, HEARTBEAT)
+        self._add_heartbeat(self.slave,
+                            HEARTBEAT - datetime.timedelta(seconds=4))
+
+        self._assert_reads_from(self.slave)
+
+    def test_master_used_when_slave_lags(self):
+        self._add_heartbeat(self.master, HEARTBEAT)
+        self._add_heartbeat(self.slave,
+                            HEARTBEAT - datetime.timedelta(seconds=10))
+
+        self.assertEqual(10, db_api.get_slave_lag())
+        self._assert_reads_from(self.master)
+
+    def test_master_used_when_slave_empty(self):
+        self._add_heartbeat(self.master, HEARTBEAT)
+
+        self._assert_reads_from(self.master)
+
+    def test_lag_not_checked_without_max_lag(self):
+        cfg.CONF.set_override('slave_max_lag', 0, 'database')
+        self._add_heartbeat(self.master, HEARTBEAT)
+
+        self._assert_reads_from(self.slave)
+
+    def test_master_used_when_lag_check_fails(self):
+        self._add_heartbeat(self.master, HEARTBEAT)
+        agents_db.Agent.__table__.drop(self.slave)
+
+        self._assert_reads_from(self.master)
+
+    def test_lag_checked_once_per_interval(self):
+        with mock.patch.object(db_api, 'get_slave_lag',
+                               return_value=0) as get_slave_lag:
+            with mock.patch('time.time', return_value=100):
+                self._assert_reads_from(self.slave)
+                get_slave_lag.return_value = 10
+                self._assert_reads_from(self.slave)
+            with mock.patch('time.time',
+                            return_value=100 +
+                            db_api.SLAVE_LAG_CHECK_INTERVAL):
+                self._assert_reads_from(self.master)
+
+        self.assertEqual(2, get_slave_lag.call_count)
+
+
+class TestRetryOnDeadlock(base.BaseTestCase):
+
+    def setUp(self):
+        super(TestRetryOnDeadlock, self).setUp()
+        self.sleep = mock.patch('time.sleep').start()
+        self.context = mock.Mock()
+        self.context.session.is_active = False
+        self.method = mock.Mock(__name__='method', return_value='result')
+        self.retried = db_api.retry_on_deadlock(self.method)
+
+    def test_result_returned(self):
+        self.assertEqual('result', self.retried('self', self.context, 'arg'))
+        self.method.assert_called_once_with('self', self.context, 'arg')
+        self.assertFalse(self.sleep.called)
+
+    def test_retried_on_deadlock(self):
+        self.method.side_effect = [db_exc.DBDeadlock(), db_exc.DBDeadlock(),
+                                   'result']
+
+        self.assertEqual('result', self.retried('self', self.context))
+        self.assertEqual(3, self.method.call_count)
+        self.assertEqual(2, self.sleep.call_count)
+
+    def test_session_emptied_before_retry(self):
+        def deadlock_once(*args):
+            self.assertFalse(self.context.session.expunge_all.called)
+            self.method.side_effect = None
+            raise db_exc.DBDeadlock()
+        self.method.side_effect = deadlock_once
+
+        self.retried('self', self.context)
+        self.context.session.expunge_all.assert_called_once_with()
+
+    def test_deadlock_raised_after_retries(self):
+        cfg.CONF.set_override('deadlock_retries', 2, 'database')
+        self.method.side_effect = db_exc.DBDeadlock()
+
+        self.assertRaises(db_exc.DBDeadlock,
+                          self.retried, 'self', self.context)
+        self.assertEqual(3, self.method.call_count)
+
+    def test_waits_are_random_and_bounded(self):
+        cfg.CONF.set_override('deadlock_retries', 4, 'database')
+        cfg.CONF.set_override('deadlock_retry_interval', 1, 'database')
+        cfg.CONF.set_override('deadlock_max_retry_interval', 3, 'database')
+        self.method.side_effect = db_exc.DBDeadlock()
+
+        with mock.patch('random.uniform', side_effect=lambda a, b: b):
+            self.assertRaises(db_exc.DBDeadlock,
+                              self.retried, 'self', self.context)
+        self.assertEqual([mock.call(1), mock.call(2), mock.call(3),
+                          mock.call(3)], self.sleep.call_args_list)
+
+    def test_other_errors_not_retried(self):
+        self.method.side_effect = db_exc.DBDuplicateEntry()
+
+        self.assertRaises(db_exc.DBDuplicateEntry,
+                          self.retried, 'self', self.context)
+        self.assertEqual(1, self.method.call_count)
+
+    def test_not_retried_within_transaction(self):
+        self.context.session.is_active = True
+        self.method.side_effect = db_exc.DBDeadlock()
+
+        self.assertRaises(db_exc.DBDeadlock,
+                          self.retried, 'self', self.context)
+        self.assertEqual(1, self.method.call_count)
@@ -310,3 +310,162 @@ class L3DvrTestCase(testlib_api.SqlTestCase):
         self.assertIn(fip, router[l3_const.FLOATINGIP_KEY])
         self.assertIn('fip_interface',
             router[l3_const.FLOATINGIP_AGENT_INTF_KEY])
+
+    def _attach_subnet(self, router, subnet_id, port_type):
+        models_v2 = l3_dvr_db.models_v2
+        network_id = _uuid()
+        port_id = _uuid()
+        with self.ctx.session.begin(subtransactions=True):
+            self.ctx.session.add(models_v2.Network(id=network_id))
+            self.ctx.session.add(models_v2.Subnet(
+                id=subnet_id, network_id=network_id, ip_version=4,
+                cidr='10.0.0.0/24'))
+            self.ctx.session.add(models_v2.Port(
+                id=port_id, network_id=network_id, mac_address=_uuid()[:17],
+                admin_state_up=True, status='ACTIVE', device_id=router.id,
+                device_owner=port_type))
+            self.ctx.session.add(l3_dvr_db.l3_db.RouterPort(
+                router_id=router.id, port_id=port_id, port_type=port_type))
+            self.ctx.session.add(models_v2.IPAllocation(
+                port_id=port_id, ip_address='10.0.0.1', subnet_id=subnet_id,
+                network_id=network_id))
+
+    def test__get_dvr_router_ids_by_subnet(self):
+        dvr = self._create_router({'name': 'dvr', 'admin_state_up': True,
+                                   'distributed': True})
+        legacy = self._create_router({'name': 'legacy',
+                                      'admin_state_up': True})
+        subnets = [_uuid() for i in range(4)]
+        for subnet_id in subnets[:2]:
+            self._attach_subnet(dvr, subnet_id,
+                                l3_const.DEVICE_OWNER_DVR_INTERFACE)
+        self._attach_subnet(dvr, subnets[2],
+                            l3_const.DEVICE_OWNER_ROUTER_SNAT)
+        self._attach_subnet(legacy, subnets[3],
+                            l3_const.DEVICE_OWNER_ROUTER_INTF)
+        self.assertEqual(
+            {subnets[0]: dvr.id, subnets[1]: dvr.id},
+            self.mixin._get_dvr_router_ids_by_subnet(self.ctx, subnets))
+
+    def test__get_dvr_router_ids_by_subnet_cached(self):
+        l3_dvr_db.cfg.CONF.set_override('dvr_router_cache_ttl', 10)
+        dvr = self._create_router({'name': 'dvr', 'admin_state_up': True,
+                                   'distributed': True})
+        subnet_id, other_subnet_id = _uuid(), _uuid()
+        self._attach_subnet(dvr, subnet_id,
+                            l3_const.DEVICE_OWNER_DVR_INTERFACE)
+        self.mixin._get_dvr_router_ids_by_subnet(self.ctx, [subnet_id])
+        with mock.patch.object(self.ctx.session, 'query') as query:
+            self.assertEqual(
+                {subnet_id: dvr.id},
+                self.mixin._get_dvr_router_ids_by_subnet(self.ctx,
+                                                         [subnet_id]))
+            self.assertFalse(query.called)
+            # Subnets without distributed router are looked up each time
+            self.mixin._get_dvr_router_ids_by_subnet(
+                self.ctx, [subnet_id, other_subnet_id])
+            self.assertTrue(query.called)
+
+    def test__get_dvr_router_ids_by_subnet_not_cached_by_default(self):
+        dvr = self._create_router({'name': 'dvr', 'admin_state_up': True,
+                                   'distributed': True})
+        subnet_id = _uuid()
+        self._attach_subnet(dvr, subnet_id,
+                            l3_const.DEVICE_OWNER_DVR_INTERFACE)
+        self.mixin._get_dvr_router_ids_by_subnet(self.ctx, [subnet_id])
+        with mock.patch.object(self.ctx.session, 'query') as query:
+            self.mixin._get_dvr_router_ids_by_subnet(self.ctx, [subnet_id])
+            self.assertTrue(query.called)
+
+    def test_remove_router_interface_invalidates_subnet_router(self):
+        l3_dvr_db.cfg.CONF.set_override('dvr_router_cache_ttl', 10)
+        cache = self.mixin._subnet_routers
+        cache.set('subnet1', 'router1', l3_dvr_db.time.time())
+        port = {'id': 'port1', 'tenant_id': 'tenant',
+                'fixed_ips': [{'subnet_id': 'subnet1'}]}
+        router = mock.Mock()
+        router.extra_attributes.distributed = True
+        router.gw_port = None
+        with contextlib.nested(
+            mock.patch.object(self.mixin, '_get_router',
+                              return_value=router),
+            mock.patch.object(self.mixin, '_remove_interface_by_subnet',
+                              return_value=(port, mock.Mock())),
+            mock.patch.object(self.mixin, 'notify_router_interface_action')
+        ):
+            self.mixin.remove_router_interface(
+                self.ctx, 'router1', {'subnet_id': 'subnet1'})
+        self.assertIsNone(cache.get('subnet1', l3_dvr_db.time.time()))
+
+    def _arp_entry(self, subnet_id, ip_address, operation='add'):
+        return {'ip_address': ip_address, 'mac_address': 'fa:16:3e:00:00:01',
+                'subnet_id': subnet_id, 'operation': operation}
+
+    def test_notify_arp_entries_groups_entries_by_router(self):
+        entries = [self._arp_entry('subnet1', '10.0.0.3'),
+                   self._arp_entry('subnet2', '10.0.1.3'),
+                   self._arp_entry('subnet1', '10.0.0.4', 'delete'),
+                   self._arp_entry('subnet3', '10.0.2.3')]
+        with contextlib.nested(
+            mock.patch.object(self.mixin, '_get_dvr_router_ids_by_subnet',
+                              return_value={'subnet1': 'router1',
+                                            'subnet2': 'router2'}),
+            mock.patch.object(self.mixin, '_l3_rpc_notifier', create=True)
+        ) as (get_routers, notifier):
+            self.mixin.notify_arp_entries(self.ctx, entries)
+        get_routers.assert_called_once_with(
+            self.ctx, set(['subnet1', 'subnet2', 'subnet3']))
+        notifier.update_arp_entries.assert_has_calls(
+            [mock.call(self.ctx, 'router1', [entries[0], entries[2]]),
+             mock.call(self.ctx, 'router2', [entries[1]])], any_order=True)
+        self.assertEqual(2, notifier.update_arp_entries.call_count)
+
+    def _vm_port(self):
+        return {'device_owner': 'compute:nova',
+                'mac_address': 'fa:16:3e:00:00:01',
+                'fixed_ips': [{'ip_address': '10.0.0.3',
+                               'subnet_id': 'subnet1'}]}
+
+    def test_dvr_vmarp_table_update_batches_entries(self):
+        l3_dvr_db.cfg.CONF.set_override('dvr_arp_batch_interval', 0.2)
+        with mock.patch.object(l3_dvr_db.eventlet, 'spawn_after') as spawn:
+            self.mixin.dvr_vmarp_table_update(self.ctx, self._vm_port(),
+                                              'add')
+            self.mixin.dvr_vmarp_table_update(self.ctx, self._vm_port(),
+                                              'del')
+        batcher = self.mixin._arp_batcher
+        spawn.assert_called_once_with(
+            l3_dvr_db.cfg.CONF.dvr_arp_batch_interval, batcher.flush)
+        with mock.patch.object(self.mixin, 'notify_arp_entries') as notify:
+            batcher.flush()
+            batcher.flush()
+        # Only the last update of an address is sent
+        notify.assert_called_once_with(
+            mock.ANY, [self._arp_entry('subnet1', '10.0.0.3', 'delete')])
+
+    def test_dvr_vmarp_table_update_schedules_one_flush(self):
+        l3_dvr_db.cfg.CONF.set_override('dvr_arp_batch_interval', 60)
+        batcher = self.mixin._arp_batcher
+        with mock.patch.object(self.mixin, 'notify_arp_entries'):
+            self.mixin.dvr_vmarp_table_update(self.ctx, self._vm_port(),
+                                              'add')
+            flusher = batcher._flusher
+            # The flush is pending, the green thread has not started yet
+            self.mixin.dvr_vmarp_table_update(self.ctx, self._vm_port(),
+                                              'del')
+            self.assertIs(flusher, batcher._flusher)
+            flusher.cancel()
+
+    def test_dvr_vmarp_table_update_without_batching(self):
+        l3_dvr_db.cfg.CONF.set_override('dvr_arp_batch_interval', 0)
+        with contextlib.nested(
+            mock.patch.object(self.mixin, '_get_dvr_router_ids_by_subnet',
+                              return_value={'subnet1': 'router1'}),
+            mock.patch.object(self.mixin, '_l3_rpc_notifier', create=True)
+        ) as (get_routers, notifier):
+            self.mixin.dvr_vmarp_table_update(self.ctx, self._vm_port(),
+                                              'add')
+        notifier.add_arp_entry.assert_called_once_with(
+            self.ctx, 'router1', {'ip_address': '10.0.0.3',
+                                  'mac_address': 'fa:16:3e:00:00:01',
+                                  'subnet_id': 'subnet1'})
@@ -0,0 +1,160 @@
+# Copyright 2015 OpenStack Foundation.
+# All Rights Reserved.
+#
+#    Licensed under the Apache License, Version 2.0 (the "License"); you may
+#    not use this file except in compliance with the License. You may obtain
+#    a copy of the License at
+#
+#         http://www.apache.org/licenses/LICENSE-2.0
+#
+#    Unless required by applicable law or agreed to in writing, software
+#    distributed under the License is distributed on an "AS IS" BASIS, WITHOUT
+#    WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied. See the
+#    License for the specific language governing permissions and limitations
+#    under the License.
+
+import mock
+from oslo.config import cfg
+import sqlalchemy as sa
+import webob
+import webtest
+
+from neutron.api.v2 import router
+from neutron.common import rpc as n_rpc
+from neutron import context
+from neutron.db import query_stats
+from neutron.tests import base
+
+
+class TestQueryStats(base.BaseTestCase):
+
+    def setUp(self):
+        super(TestQueryStats, self).setUp()
+        cfg.CONF.set_override('query_stats', True, 'database')
+        mock.patch.dict(query_stats._AGGREGATES, clear=True).start()
+        self.engine = sa.create_engine('sqlite://')
+        query_stats.instrument(self.engine)
+        self.context = context.Context('user', 'tenant')
+
+    def _query(self, count=1):
+        for i in range(count):
+            self.engine.execute('SELECT 1')
+
+    def test_recording(self):
+        with query_stats.recording(self.context, 'ports.index'):
+            self._query(2)
+
+        stats = query_stats.get_stats()['ports.index']
+        self.assertEqual(1, stats['calls'])
+        self.assertEqual(2, stats['queries'])
+        self.assertEqual(2, stats['max_queries'])
+        self.assertEqual(['SELECT 1', 'SELECT 1'],
+                         [query['statement'] for query in stats['slowest']])
+
+    def test_recording_aggregates_calls(self):
+        for count in (1, 3):
+            with query_stats.recording(context.Context('user', 'tenant'),
+                                       'ports.index'):
+                self._query(count)
+
+        stats = query_stats.get_stats()['ports.index']
+        self.assertEqual(2, stats['calls'])
+        self.assertEqual(4, stats['queries'])
+        self.assertEqual(3, stats['max_queries'])
+        self.assertEqual(query_stats.SLOWEST_STATEMENTS,
+                         len(stats['slowest']))
+
+    def test_recording_disabled(self):
+        cfg.CONF.set_override('query_stats', False, 'database')
+
+        with query_stats.recording(self.context, 'ports.index'):
+            self._query()
+
+        self.assertEqual({}, query_stats.get_stats())
+
+    def test_queries_of_other_requests_not_recorded(self):
+        with query_stats.recording(self.context, 'ports.index'):
+            context.Context('user', 'tenant')
+            self._query()
+
+        self.assertEqual(0, query_stats.get_stats()['ports.index']['queries'])
+
+    def test_nested_recording_counted_once(self):
+        with query_stats.recording(self.context, 'ports.index'):
+            with query_stats.recording(self.context, 'ports.show'):
+                self._query()
+
+        self.assertEqual(['ports.index'], query_stats.get_stats().keys())
+
+    def test_recording_logs_offenders(self):
+        cfg.CONF.set_override('query_count_threshold', 1, 'database')
+        with mock.patch.object(query_stats.LOG, 'warn') as warn:
+            with query_stats.recording(self.context, 'ports.index'):
+                self._query()
+            self.assertFalse(warn.called)
+            with query_stats.recording(self.context, 'ports.index'):
+                self._query(2)
+
+        self.assertEqual(1, warn.call_count)
+        self.assertEqual(self.context.request_id,
+                         warn.call_args[0][1]['request_id'])
+
+    def test_recording_endpoint(self):
+        class Callbacks(object):
+            target = mock.sentinel.target
+
+            def get_device(callbacks, context, device):
+                self._query()
+                return device
+
+        endpoint = query_stats.RecordingEndpoint(Callbacks())
+
+        self.assertEqual(mock.sentinel.target, endpoint.target)
+        self.assertEqual('device',
+                         endpoint.get_device(self.context, device='device'))
+        self.assertEqual(
+            1, query_stats.get_stats()['Callbacks.get_device']['queries'])
+
+    def test_rpc_server_records_endpoints(self):
+        with mock.patch.object(n_rpc, 'TRANSPORT'):
+            with mock.patch.object(n_rpc.messaging,
+                                   'get_rpc_server') as get_rpc_server:
+                n_rpc.get_server(mock.sentinel.target, [mock.Mock()])
+
+        endpoints = get_rpc_server.call_args[0][2]
+        self.assertIsInstance(endpoints[0], query_stats.RecordingEndpoint)
+
+
+class TestQueryStatsController(base.BaseTestCase):
+
+    def setUp(self):
+        super(TestQueryStatsController, self).setUp()
+        mock.patch.dict(query_stats._AGGREGATES,
+                        {'ports.index': {'calls': 1, 'queries': 2,
+                                         'time': 0.5, 'max_queries': 2,
+                                         'max_time': 0.5,
+                                         'slowest': [(0.5, 'SELECT 1')]}},
+                        clear=True).start()
+        self.app = webtest.TestApp(router.QueryStats())
+
+    def _request(self, method, ctx):
+        return getattr(self.app, method)(
+            '/', expect_errors=True, extra_environ={'neutron.context': ctx})
+
+    def test_get_stats(self):
+        res = self._request('get', context.get_admin_context())
+
+        self.assertEqual(webob.exc.HTTPOk.code, res.status_int)
+        self.assertEqual([{'time': 0.5, 'statement': 'SELECT 1'}],
+                         res.json['query_stats']['ports.index']['slowest'])
+
+    def test_reset_stats(self):
+        res = self._request('delete', context.get_admin_context())
+
+        self.assertEqual(webob.exc.HTTPNoContent.code, res.status_int)
+        self.assertEqual({}, query_stats.get_stats())
+
+    def test_get_stats_not_admin(self):
+        res = self._request('get', context.Context('user', 'tenant'))
+
+        self.assertEqual(webob.exc.HTTPForbidden.code, res.status_int)
@@ -105,6 +105,7 @@ class TestLinuxBridgeAgent(base.BaseTestCase):
                                     'get_interface_mac')
         self.get_mac = self.get_mac_p.start()
         self.get_mac.return_value = '00:00:00:00:00:01'
+        cfg.CONF.set_override('monitor_links', True, 'AGENT')
         self.agent = linuxbridge_neutron_agent.LinuxBridgeNeutronAgentRPC({},
                                                                           0,
                                                                           None)
@@ -115,11 +116,12 @@ class TestLinuxBridgeAgent(base.BaseTestCase):
                                                                      None)
         devices = [DEVICE_1]
         with contextlib.nested(
-            mock.patch.object(agent.plugin_rpc, "update_device_down"),
+            mock.patch.object(agent.plugin_rpc, "update_devices_down"),
             mock.patch.object(agent, "remove_devices_filter")
         ) as (fn_udd, fn_rdf):
-            fn_udd.return_value = {'device': DEVICE_1,
-                                   'exists': True}
+            fn_udd.return_value = {'devices_down': [{'device': DEVICE_1,
+                                                     'exists': True}],
+                                   'failed_devices_down': []}
             with mock.patch.object(linuxbridge_neutron_agent.LOG,
                                    'info') as log:
                 resync = agent.treat_devices_removed(devices)
@@ -134,11 +136,12 @@ class TestLinuxBridgeAgent(base.BaseTestCase):
                                                                      None)
         devices = [DEVICE_1]
         with contextlib.nested(
-            mock.patch.object(agent.plugin_rpc, "update_device_down"),
+            mock.patch.object(agent.plugin_rpc, "update_devices_down"),
             mock.patch.object(agent, "remove_devices_filter")
         ) as (fn_udd, fn_rdf):
-            fn_udd.return_value = {'device': DEVICE_1,
-                                   'exists': False}
+            fn_udd.return_value = {'devices_down': [{'device': DEVICE_1,
+                                                     'exists': False}],
+                                   'failed_devices_down': []}
             with mock.patch.object(linuxbridge_neutron_agent.LOG,
                                    'debug') as log:
                 resync = agent.treat_devices_removed(devices)
@@ -153,7 +156,7 @@ class TestLinuxBridgeAgent(base.BaseTestCase):
                                                                      None)
         devices = [DEVICE_1]
         with contextlib.nested(
-            mock.patch.object(agent.plugin_rpc, "update_device_down"),
+            mock.patch.object(agent.plugin_rpc, "update_devices_down"),
             mock.patch.object(agent, "remove_devices_filter")
         ) as (fn_udd, fn_rdf):
             fn_udd.side_effect = Exception()
@@ -281,6 +284,54 @@ class TestLinuxBridgeAgent(base.BaseTestCase):
         self._test_scan_devices(previous, updated, fake_current, expected,
                                 sync=True)
 
+    def test_link_monitor_disabled_by_default(self):
+        cfg.CONF.clear_override('monitor_links', 'AGENT')
+        agent = linuxbridge_neutron_agent.LinuxBridgeNeutronAgentRPC({},
+                                                                     0,
+                                                                     None)
+        self.assertIsNone(agent.link_monitor)
+
+    def _test_wait_for_changes(self, changes, updated=(), sync=False):
+        self.agent.polling_interval = 2
+        self.agent.updated_devices = set(updated)
+        cfg.CONF.set_override('full_scan_interval', 5, 'AGENT')
+        with contextlib.nested(
+            mock.patch.object(self.agent.link_monitor, 'wait',
+                              side_effect=changes),
+            mock.patch('time.time', return_value=100),
+            mock.patch('time.sleep')
+        ) as (wait, time, sleep):
+            self.agent._wait_for_changes(100, sync)
+        return wait, time, sleep
+
+    def test_wait_for_changes_woken_up_by_links(self):
+        wait, time, sleep = self._test_wait_for_changes([False, True])
+        self.assertEqual([mock.call(2), mock.call(2)], wait.mock_calls)
+        self.assertFalse(sleep.called)
+
+    def test_wait_for_changes_port_updates(self):
+        wait, time, sleep = self._test_wait_for_changes([], updated=['tap1'])
+        self.assertFalse(wait.called)
+        self.assertFalse(sleep.called)
+
+    def test_wait_for_changes_full_scan(self):
+        self.agent.polling_interval = 2
+        self.agent.updated_devices = set()
+        cfg.CONF.set_override('full_scan_interval', 5, 'AGENT')
+        with contextlib.nested(
+            mock.patch.object(self.agent.link_monitor, 'wait',
+                              return_value=False),
+            mock.patch('time.time', side_effect=[100, 102, 104, 105])
+        ) as (wait, time):
+            self.agent._wait_for_changes(100, False)
+        self.assertEqual([mock.call(2), mock.call(2), mock.call(1)],
+                         wait.mock_calls)
+
+    def test_wait_for_changes_polls_on_sync(self):
+        wait, time, sleep = self._test_wait_for_changes([], sync=True)
+        self.assertFalse(wait.called)
+        sleep.assert_called_once_with(2)
+
     def test_process_network_devices(self):
         agent = self.agent
         device_info = {'current': set(),
@@ -312,6 +363,8 @@ class TestLinuxBridgeAgent(base.BaseTestCase):
                         'physical_network': 'physnet1'}
         agent.plugin_rpc = mock.Mock()
         agent.plugin_rpc.get_devices_details_list.return_value = [mock_details]
+        agent.plugin_rpc.update_devices_up.return_value = {
+            'devices_up': ['dev123'], 'failed_devices_up': []}
         agent.br_mgr = mock.Mock()
         agent.br_mgr.add_interface.return_value = True
         resync_needed = agent.treat_devices_added_updated(set(['tap1']))
@@ -320,7 +373,25 @@ class TestLinuxBridgeAgent(base.BaseTestCase):
         agent.br_mgr.add_interface.assert_called_with('net123', 'vlan',
                                                       'physnet1', 100,
                                                       'port123')
-        self.assertTrue(agent.plugin_rpc.update_device_up.called)
+        agent.plugin_rpc.update_devices_up.assert_called_once_with(
+            mock.ANY, ['dev123'], mock.ANY, mock.ANY)
+
+    def test_treat_devices_added_updated_failed_device(self):
+        agent = self.agent
+        mock_details = {'device': 'dev123',
+                        'port_id': 'port123',
+                        'network_id': 'net123',
+                        'admin_state_up': True,
+                        'network_type': 'vlan',
+                        'segmentation_id': 100,
+                        'physical_network': 'physnet1'}
+        agent.plugin_rpc = mock.Mock()
+        agent.plugin_rpc.get_devices_details_list.return_value = [mock_details]
+        agent.plugin_rpc.update_devices_up.return_value = {
+            'devices_up': [], 'failed_devices_up': ['dev123']}
+        agent.br_mgr = mock.Mock()
+        agent.br_mgr.add_interface.return_value = True
+        self.assertTrue(agent.treat_devices_added_updated(set(['tap1'])))
 
     def test_treat_devices_added_updated_admin_state_up_false(self):
         agent = self.agent
@@ -338,7 +409,7 @@ class TestLinuxBridgeAgent(base.BaseTestCase):
 
         self.assertFalse(resync_needed)
         agent.remove_port_binding.assert_called_with('net123', 'port123')
-        self.assertFalse(agent.plugin_rpc.update_device_up.called)
+        self.assertFalse(agent.plugin_rpc.update_devices_up.called)
 
 
 class TestLinuxBridgeManager(base.BaseTestCase):
@@ -985,21 +1056,82 @@ class TestLinuxBridgeRpcCallbacks(base.BaseTestCase):
             expected = [
                 mock.call(['bridge', 'fdb', 'show', 'dev', 'vxlan-1'],
                           root_helper=self.root_helper),
-                mock.call(['bridge', 'fdb', 'add',
-                           constants.FLOODING_ENTRY[0],
-                           'dev', 'vxlan-1', 'dst', 'agent_ip'],
-                          root_helper=self.root_helper,
-                          check_exit_code=False),
                 mock.call(['ip', 'neigh', 'replace', 'port_ip', 'lladdr',
                            'port_mac', 'dev', 'vxlan-1', 'nud', 'permanent'],
                           root_helper=self.root_helper,
-                          check_exit_code=False),
-                mock.call(['bridge', 'fdb', 'add', 'port_mac', 'dev',
-                           'vxlan-1', 'dst', 'agent_ip'],
+                          log_fail_as_error=False),
+                mock.call(['bridge', '-force', '-batch', '-'],
+                          process_input='fdb add %s dev vxlan-1 dst agent_ip\n'
+                                        'fdb add port_mac dev vxlan-1 '
+                                        'dst agent_ip\n' %
+                                        constants.FLOODING_ENTRY[0],
                           root_helper=self.root_helper,
-                          check_exit_code=False),
+                          log_fail_as_error=False),
             ]
-            execute_fn.assert_has_calls(expected)
+            self.assertEqual(expected, execute_fn.call_args_list)
+
+            # Entries already programmed are skipped
+            execute_fn.reset_mock()
+            self.lb_rpc.fdb_add(None, fdb_entries)
+            self.assertFalse(execute_fn.called)
+
+    def test_fdb_add_failed_entries_not_remembered(self):
+        fdb_entries = {'net_id':
+                       {'ports':
+                        {'agent_ip': [['port_mac', 'port_ip']]},
+                        'network_type': 'vxlan',
+                        'segment_id': 1}}
+
+        with mock.patch.object(utils, 'execute',
+                               side_effect=RuntimeError()) as execute_fn:
+            self.lb_rpc.fdb_add(None, fdb_entries)
+            self.assertEqual(2, execute_fn.call_count)
+
+        with mock.patch.object(utils, 'execute',
+                               return_value='') as execute_fn:
+            self.lb_rpc.fdb_add(None, fdb_entries)
+            self.assertEqual(2, execute_fn.call_count)
+
+    def test_fdb_add_failed_batch_forgets_interface(self):
+        br_mgr = self.lb_rpc.agent.br_mgr
+        br_mgr.fdb_bridge_entries['vxlan-1'].add(('other_mac', 'agent_ip'))
+        fdb_entries = {'net_id':
+                       {'ports':
+                        {'agent_ip': [['port_mac', 'port_ip']]},
+                        'network_type': 'vxlan',
+                        'segment_id': 1}}
+
+        with mock.patch.object(utils, 'execute',
+                               side_effect=['', RuntimeError()]):
+            self.lb_rpc.fdb_add(None, fdb_entries)
+
+        self.assertNotIn('vxlan-1', br_mgr.fdb_bridge_entries)
+
+    def test_fdb_flooding_entries_appended(self):
+        fdb_entries = {'net_id':
+                       {'ports':
+                        {'agent_ip_1': [constants.FLOODING_ENTRY],
+                         'agent_ip_2': [constants.FLOODING_ENTRY]},
+                        'network_type': 'vxlan',
+                        'segment_id': 1}}
+
+        with mock.patch.object(utils, 'execute',
+                               return_value='') as execute_fn:
+            self.lb_rpc.fdb_add(None, fdb_entries)
+            # The kernel is only queried for the first flooding entry
+            self.assertEqual(2, execute_fn.call_count)
+            commands = execute_fn.call_args[1]['process_input'].splitlines()
+            self.assertEqual(['add', 'append'],
+                             sorted(c.split()[1] for c in commands))
+
+    def test_fdb_entries_forgotten_with_vxlan(self):
+        self.lb_rpc.agent.br_mgr.fdb_bridge_entries['vxlan-1'].add(
+            ('port_mac', 'agent_ip'))
+        with mock.patch.object(ip_lib, 'device_exists', return_value=True):
+            with mock.patch.object(self.lb_rpc.agent.br_mgr.ip, 'device'):
+                self.lb_rpc.agent.br_mgr.delete_vxlan('vxlan-1')
+        self.assertNotIn('vxlan-1',
+                         self.lb_rpc.agent.br_mgr.fdb_bridge_entries)
 
     def test_fdb_ignore(self):
         fdb_entries = {'net_id':
@@ -1043,21 +1175,19 @@ class TestLinuxBridgeRpcCallbacks(base.BaseTestCase):
             self.lb_rpc.fdb_remove(None, fdb_entries)
 
             expected = [
-                mock.call(['bridge', 'fdb', 'del',
-                           constants.FLOODING_ENTRY[0],
-                           'dev', 'vxlan-1', 'dst', 'agent_ip'],
-                          root_helper=self.root_helper,
-                          check_exit_code=False),
                 mock.call(['ip', 'neigh', 'del', 'port_ip', 'lladdr',
                            'port_mac', 'dev', 'vxlan-1'],
                           root_helper=self.root_helper,
-                          check_exit_code=False),
-                mock.call(['bridge', 'fdb', 'del', 'port_mac',
-                           'dev', 'vxlan-1', 'dst', 'agent_ip'],
+                          log_fail_as_error=False),
+                mock.call(['bridge', '-force', '-batch', '-'],
+                          process_input='fdb del %s dev vxlan-1 dst agent_ip\n'
+                                        'fdb del port_mac dev vxlan-1 '
+                                        'dst agent_ip\n' %
+                                        constants.FLOODING_ENTRY[0],
                           root_helper=self.root_helper,
-                          check_exit_code=False),
+                          log_fail_as_error=False),
             ]
-            execute_fn.assert_has_calls(expected)
+            self.assertEqual(expected, execute_fn.call_args_list)
 
     def test_fdb_update_chg_ip(self):
         fdb_entries = {'chg_ip':
@@ -1074,10 +1204,10 @@ class TestLinuxBridgeRpcCallbacks(base.BaseTestCase):
                 mock.call(['ip', 'neigh', 'replace', 'port_ip_2', 'lladdr',
                            'port_mac', 'dev', 'vxlan-1', 'nud', 'permanent'],
                           root_helper=self.root_helper,
-                          check_exit_code=False),
+                          log_fail_as_error=False),
                 mock.call(['ip', 'neigh', 'del', 'port_ip_1', 'lladdr',
                            'port_mac', 'dev', 'vxlan-1'],
                           root_helper=self.root_helper,
-                          check_exit_code=False)
+                          log_fail_as_error=False)
             ]
-            execute_fn.assert_has_calls(expected)
+            self.assertEqual(expected, execute_fn.call_args_list)
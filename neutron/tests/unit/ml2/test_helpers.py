@@ -16,6 +16,7 @@
 import fixtures
 import logging as std_logging
 import mock
+from oslo.db import exception as db_exc
 from sqlalchemy.orm import query
 
 from neutron.common import exceptions as exc
@@ -146,3 +147,77 @@ class HelpersTest(testlib_api.SqlTestCase):
                     self.driver.allocate_partially_specified_segment,
                     self.session)
                 log_warning.assert_called_once_with(mock.ANY, mock.ANY)
+
+    def test_allocate_partial_segment_from_random_start(self):
+        with mock.patch('random.randint', return_value=VLAN_MAX - 1):
+            observed = self.driver.allocate_partially_specified_segment(
+                self.session)
+        self.assertIn(observed.vlan_id, (VLAN_MAX - 1, VLAN_MAX))
+
+    def test_allocate_partial_segment_wraps_around(self):
+        raw_segment = dict(physical_network=TENANT_NET, vlan_id=VLAN_MAX)
+        self.driver.allocate_fully_specified_segment(self.session,
+                                                     **raw_segment)
+        with mock.patch('random.randint', return_value=VLAN_MAX):
+            observed = self.driver.allocate_partially_specified_segment(
+                self.session)
+        self.assertTrue(VLAN_MIN <= observed.vlan_id < VLAN_MAX)
+
+    def _get_vlan_ids(self, **filters):
+        query = self.session.query(type_vlan.VlanAllocation).filter_by(
+            physical_network=TENANT_NET, **filters)
+        return set(alloc.vlan_id for alloc in query)
+
+    def test_sync_segment_pool(self):
+        allocated = dict(physical_network=TENANT_NET, vlan_id=VLAN_MAX)
+        self.driver.allocate_fully_specified_segment(self.session,
+                                                     **allocated)
+        with self.session.begin():
+            self.driver.sync_segment_pool(
+                self.session, [(VLAN_MIN - 2, VLAN_MIN + 1), (10, 11)],
+                physical_network=TENANT_NET)
+
+        self.assertEqual(set([VLAN_MIN - 2, VLAN_MIN - 1, VLAN_MIN,
+                              VLAN_MIN + 1, 10, 11, VLAN_MAX]),
+                         self._get_vlan_ids())
+        self.assertEqual(set([VLAN_MAX]), self._get_vlan_ids(allocated=True))
+
+    def test_sync_segment_pool_unchanged_reads_no_segment(self):
+        # The connection check and BEGIN, one DELETE and one count
+        with self.assert_max_queries(4):
+            with self.session.begin():
+                self.driver.sync_segment_pool(
+                    self.session, [(VLAN_MIN, VLAN_MAX)],
+                    physical_network=TENANT_NET)
+
+        self.assertEqual(set(range(VLAN_MIN, VLAN_MAX + 1)),
+                         self._get_vlan_ids())
+
+    def test_sync_retried_on_duplicate_segments(self):
+        self.driver.network_vlan_ranges = {'phys_net3': [(1, 10)]}
+        sync = self.driver.sync_segment_pool
+
+        def inserted_meanwhile(session, ranges, **filters):
+            if sync_segment_pool.call_count == 1:
+                raise db_exc.DBDuplicateEntry()
+            return sync(session, ranges, **filters)
+
+        with mock.patch.object(self.driver, 'sync_segment_pool',
+                               side_effect=inserted_meanwhile
+                               ) as sync_segment_pool:
+            self.driver._sync_vlan_allocations()
+
+        self.assertEqual(2, sync_segment_pool.call_count)
+        self.assertEqual(10, self.session.query(
+            type_vlan.VlanAllocation).filter_by(
+                physical_network='phys_net3').count())
+
+    def test_sync_segment_pool_in_bulk(self):
+        with mock.patch.object(helpers, 'SYNC_BULK_SIZE', 3):
+            with self.session.begin():
+                self.driver.sync_segment_pool(
+                    self.session, [(1, 10)], physical_network='phys_net3')
+
+        self.assertEqual(10, self.session.query(
+            type_vlan.VlanAllocation).filter_by(
+                physical_network='phys_net3').count())
@@ -0,0 +1,260 @@
+# Copyright (c) 2015 OpenStack Foundation
+# All Rights Reserved.
+#
+#    Licensed under the Apache License, Version 2.0 (the "License"); you may
+#    not use this file except in compliance with the License. You may obtain
+#    a copy of the License at
+#
+#         http://www.apache.org/licenses/LICENSE-2.0
+#
+#    Unless required by applicable law or agreed to in writing, software
+#    distributed under the License is distributed on an "AS IS" BASIS, WITHOUT
+#    WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied. See the
+#    License for the specific language governing permissions and limitations
+#    under the License.
+
+import contextlib
+import datetime
+
+import mock
+from oslo.config import cfg
+from oslo.utils import timeutils
+
+from neutron import context
+from neutron.plugins.ml2 import journal
+from neutron.plugins.ml2 import models
+from neutron.tests.unit import testlib_api
+
+
+class FakeBackend(journal.JournalBackend):
+
+    def __init__(self):
+        self.sent = []
+        self.synced = 0
+        self.failures = 0
+
+    def can_batch(self, object_type, operation):
+        return operation == 'create'
+
+    def send(self, context, object_type, operation, entries):
+        if self.failures:
+            self.failures -= 1
+            raise Exception('boom')
+        self.sent.append((object_type, operation,
+                          [(e.object_uuid, journal.get_data(e))
+                           for e in entries]))
+
+    def sync_full(self, context):
+        self.synced += 1
+
+
+class JournalTestCase(testlib_api.SqlTestCase):
+
+    def setUp(self):
+        super(JournalTestCase, self).setUp()
+        self.ctx = context.get_admin_context()
+        self.backend = FakeBackend()
+        self.journal = journal.Journal('fake', self.backend)
+        mock.patch.object(journal.LOG, 'exception').start()
+
+    def _record(self, object_type, uuid, operation, data=None,
+                dependencies=()):
+        with self.ctx.session.begin(subtransactions=True):
+            self.journal.record(self.ctx, object_type, uuid, operation,
+                                data, dependencies)
+
+    def _entries(self):
+        return (self.ctx.session.query(models.JournalEntry).
+                order_by(models.JournalEntry.id).all())
+
+    def test_record(self):
+        self._record('ports', 'p1', 'create', {'name': 'p1'}, ['n1', 's1'])
+        entry = self._entries()[0]
+        self.assertEqual(('fake', 'ports', 'p1', 'create', 'n1 s1',
+                          journal.PENDING, 0),
+                         (entry.driver, entry.object_type, entry.object_uuid,
+                          entry.operation, entry.dependencies, entry.state,
+                          entry.retry_count))
+        self.assertEqual({'name': 'p1'}, journal.get_data(entry))
+
+    def test_record_rolled_back_with_transaction(self):
+        try:
+            with self.ctx.session.begin():
+                self.journal.record(self.ctx, 'ports', 'p1', 'create')
+                raise ValueError()
+        except ValueError:
+            pass
+        self.assertEqual([], self._entries())
+
+    def test_process_batches_consecutive_creates(self):
+        self._record('networks', 'n1', 'create', {'id': 'n1'})
+        self._record('networks', 'n2', 'create', {'id': 'n2'})
+        self._record('networks', 'n1', 'update', {'name': 'a'})
+        self._record('networks', 'n2', 'delete')
+        self.journal.process(self.ctx)
+        self.assertEqual(
+            [('networks', 'create', [('n1', {'id': 'n1'}),
+                                     ('n2', {'id': 'n2'})]),
+             ('networks', 'update', [('n1', {'name': 'a'})]),
+             ('networks', 'delete', [('n2', None)])],
+            self.backend.sent)
+        self.assertEqual([], self._entries())
+
+    def test_process_respects_batch_size(self):
+        cfg.CONF.set_override('batch_size', 2, 'ml2_journal')
+        for i in range(5):
+            self._record('networks', 'n%d' % i, 'create')
+        self.journal.process(self.ctx)
+        self.assertEqual([2, 2, 1],
+                         [len(batch) for _t, _o, batch in self.backend.sent])
+
+    def test_unrelated_entries_skip_blocked_ones(self):
+        self._record('networks', 'n1', 'create')
+        with self.ctx.session.begin():
+            self._entries()[0].state = journal.PROCESSING
+            self._entries()[0].last_retried = timeutils.utcnow()
+        self._record('subnets', 's1', 'create', dependencies=['n1'])
+        self._record('networks', 'n1', 'update')
+        self._record('networks', 'n2', 'create')
+        self._record('ports', 'p2', 'create', dependencies=['n2'])
+        self.journal.process(self.ctx)
+        # Everything related to n1 waits for the entry being processed
+        self.assertEqual([('networks', 'create', [('n2', None)]),
+                          ('ports', 'create', [('p2', None)])],
+                         self.backend.sent)
+        self.assertEqual(['n1', 's1', 'n1'],
+                         [e.object_uuid for e in self._entries()])
+
+    def test_dependents_block_deletion(self):
+        self._record('ports', 'p1', 'delete', dependencies=['n1'])
+        with self.ctx.session.begin():
+            self._entries()[0].state = journal.PROCESSING
+            self._entries()[0].last_retried = timeutils.utcnow()
+        self._record('networks', 'n1', 'delete')
+        self.journal.process(self.ctx)
+        self.assertEqual([], self.backend.sent)
+
+    def test_stale_processing_entries_are_retried(self):
+        self._record('networks', 'n1', 'create')
+        with self.ctx.session.begin():
+            self._entries()[0].state = journal.PROCESSING
+            self._entries()[0].last_retried = (
+                timeutils.utcnow() - datetime.timedelta(hours=1))
+        self.journal.process(self.ctx)
+        self.assertEqual([('networks', 'create', [('n1', None)])],
+                         self.backend.sent)
+
+    def test_failure_stops_processing_and_keeps_entries(self):
+        self._record('networks', 'n1', 'create')
+        self._record('networks', 'n1', 'update')
+        self.backend.failures = 1
+        self.journal.process(self.ctx)
+        self.assertEqual([], self.backend.sent)
+        entries = self._entries()
+        self.assertEqual([journal.PENDING, journal.PENDING],
+                         [e.state for e in entries])
+        self.assertEqual([1, 0], [e.retry_count for e in entries])
+        self.assertFalse(self.journal.out_of_sync)
+
+        self.journal.process(self.ctx)
+        self.assertEqual(2, len(self.backend.sent))
+        self.assertEqual([], self._entries())
+
+    def test_repeated_failures_fall_back_to_full_sync(self):
+        cfg.CONF.set_override('max_retries', 2, 'ml2_journal')
+        self._record('networks', 'n1', 'create')
+        self.backend.failures = 2
+        self.journal.process(self.ctx)
+        self.journal.process(self.ctx)
+        self.assertTrue(self.journal.out_of_sync)
+        self._record('networks', 'n2', 'create')
+        with mock.patch.object(self.journal, '_claim_batch',
+                               return_value=[]):
+            self.journal.process(self.ctx)
+        self.assertEqual(1, self.backend.synced)
+        self.assertFalse(self.journal.out_of_sync)
+        self.assertEqual([], self._entries())
+
+    def test_full_sync_keeps_later_entries(self):
+        self._record('networks', 'n1', 'create')
+
+        def sync_full(ctx):
+            self._record('networks', 'n2', 'create')
+        with mock.patch.object(self.backend, 'sync_full',
+                               side_effect=sync_full):
+            self.journal.sync_full(self.ctx)
+        self.assertEqual(['n2'], [e.object_uuid for e in self._entries()])
+
+    def test_full_sync_failure_keeps_entries(self):
+        self._record('networks', 'n1', 'create')
+        with mock.patch.object(self.backend, 'sync_full',
+                               side_effect=ValueError()):
+            self.assertRaises(ValueError, self.journal.sync_full, self.ctx)
+        self.assertTrue(self.journal.out_of_sync)
+        self.assertEqual(1, len(self._entries()))
+
+    def test_sync_on_start(self):
+        self.journal = journal.Journal('fake', self.backend,
+                                       sync_on_start=True)
+        self.journal.process(self.ctx)
+        self.journal.process(self.ctx)
+        self.assertEqual(1, self.backend.synced)
+
+    def test_entry_claimed_by_another_worker_is_skipped(self):
+        self._record('networks', 'n1', 'create')
+        self._record('networks', 'n2', 'create')
+        real_claim = self.journal._claim
+
+        def claim(ctx, entry):
+            if entry.object_uuid == 'n1':
+                return False
+            return real_claim(ctx, entry)
+        with mock.patch.object(self.journal, '_claim', side_effect=claim):
+            batch = self.journal._claim_batch(self.ctx)
+        self.assertEqual(['n2'], [e.object_uuid for e in batch])
+
+    def test_claim(self):
+        self._record('networks', 'n1', 'create')
+        entry = self._entries()[0]
+        self.assertTrue(self.journal._claim(self.ctx, entry))
+        self.assertEqual(journal.PROCESSING, entry.state)
+        self.assertFalse(self.journal._claim(self.ctx, entry))
+
+    def test_other_drivers_entries_are_ignored(self):
+        other = journal.Journal('other', FakeBackend())
+        with self.ctx.session.begin():
+            other.record(self.ctx, 'networks', 'n1', 'create')
+        self.journal.process(self.ctx)
+        self.assertEqual([], self.backend.sent)
+        self.assertEqual(1, len(self._entries()))
+
+
+class JournalWorkerTestCase(testlib_api.SqlTestCase):
+
+    def setUp(self):
+        super(JournalWorkerTestCase, self).setUp()
+        self.journal = journal.Journal('fake', FakeBackend())
+
+    def test_wake_spawns_worker_once_per_process(self):
+        with mock.patch('eventlet.spawn_n') as spawn:
+            self.journal.wake()
+            self.journal.wake()
+            self.assertEqual(1, spawn.call_count)
+            self.assertTrue(self.journal._wakeup.ready())
+            with mock.patch('os.getpid', return_value=-1):
+                self.journal.wake()
+            self.assertEqual(2, spawn.call_count)
+
+    def test_worker_processes_journal(self):
+        cfg.CONF.set_override('sync_interval', 0, 'ml2_journal')
+        with contextlib.nested(
+            mock.patch.object(self.journal, 'process'),
+            mock.patch('eventlet.spawn_n')
+        ) as (process, spawn):
+            process.side_effect = [Exception(), None, SystemExit()]
+            self.journal.wake()
+            self.journal._wakeup.send()
+            with mock.patch.object(journal.LOG, 'exception') as log:
+                self.assertRaises(SystemExit, self.journal._run)
+            self.assertEqual(3, process.call_count)
+            self.assertEqual(1, log.call_count)
@@ -13,20 +13,25 @@
 #    License for the specific language governing permissions and limitations
 #    under the License.
 
+import contextlib
+
 import mock
 from oslo.serialization import jsonutils
 import requests
 
+from neutron import manager
 from neutron.plugins.common import constants
 from neutron.plugins.ml2 import config as config
 from neutron.plugins.ml2 import driver_api as api
 from neutron.plugins.ml2.drivers import mechanism_odl
+from neutron.plugins.ml2 import journal
 from neutron.plugins.ml2 import plugin
 from neutron.tests import base
 from neutron.tests.unit.ml2 import test_ml2_plugin as test_plugin
 from neutron.tests.unit import testlib_api
 
 PLUGIN_NAME = 'neutron.plugins.ml2.plugin.Ml2Plugin'
+SENDJSON = mechanism_odl.OpenDaylightMechanismDriver.sendjson
 
 
 class OpenDaylightTestCase(test_plugin.Ml2PluginV2TestCase):
@@ -222,7 +227,7 @@ class OpenDaylightMechanismDriverTestCase(base.BaseTestCase):
                                exc_class=None, *args, **kwargs):
         self.mech.out_of_sync = False
         request_response = self._get_mock_request_response(status_code)
-        with mock.patch('requests.request',
+        with mock.patch('requests.sessions.Session.request',
                         return_value=request_response) as mock_method:
             if exc_class is not None:
                 self.assertRaises(exc_class, method, context)
@@ -368,3 +373,120 @@ class OpenDaylightMechanismDriverTestCase(base.BaseTestCase):
         # Validate a network type not currently supported
         segment[api.NETWORK_TYPE] = 'mpls'
         self.assertFalse(self.mech.check_segment(segment))
+
+    def test_requests_share_a_bounded_session(self):
+        config.cfg.CONF.set_override('max_connections', 3, 'ml2_odl')
+        self.mech.initialize()
+        adapter = self.mech.session.get_adapter(config.cfg.CONF.ml2_odl.url)
+        self.assertEqual(3, adapter._pool_maxsize)
+        self.assertTrue(adapter._pool_block)
+        self.assertIs(self.mech.session, self.mech.auth.session)
+        request_response = self._get_mock_request_response(
+            requests.codes.created)
+        with mock.patch.object(self.mech.session, 'request',
+                               return_value=request_response) as request:
+            self.mech.sendjson('post', 'networks', None)
+            self.mech.sendjson('post', 'ports', None)
+        self.assertEqual(2, request.call_count)
+
+
+class FakeOpenDaylight(object):
+    """Stand-in for the OpenDaylight REST interface."""
+
+    def __init__(self):
+        self.received = []
+        self.status = requests.codes.created
+
+    def request(self, method, url, data=None, **kwargs):
+        method = method.upper()
+        path = url.split('/controller/nb/v2/neutron', 1)[-1]
+        if method == 'GET':
+            # Only the authentication requests carry a query string
+            status = (requests.codes.ok if '?' in path
+                      else requests.codes.not_found)
+        else:
+            self.received.append((method, path,
+                                  data and jsonutils.loads(data)))
+            status = self.status
+        response = requests.Response()
+        response.status_code = status
+        return response
+
+
+class OpenDaylightJournalTestCase(test_plugin.Ml2PluginV2TestCase):
+    _mechanism_drivers = ['logger', 'opendaylight']
+
+    def setUp(self):
+        self.odl = FakeOpenDaylight()
+        mock.patch('requests.sessions.Session.request',
+                   side_effect=self.odl.request).start()
+        config.cfg.CONF.set_override(
+            'url', 'http://127.0.0.1:8080/controller/nb/v2/neutron',
+            'ml2_odl')
+        config.cfg.CONF.set_override('username', 'someuser', 'ml2_odl')
+        config.cfg.CONF.set_override('password', 'somepass', 'ml2_odl')
+        config.cfg.CONF.set_override('enable_journal', True, 'ml2_odl')
+        # Other test cases replace sendjson on the class
+        mock.patch.object(mechanism_odl.OpenDaylightMechanismDriver,
+                          'sendjson', SENDJSON).start()
+        self.wake = mock.patch.object(journal.Journal, 'wake').start()
+        super(OpenDaylightJournalTestCase, self).setUp()
+        plugin = manager.NeutronManager.get_plugin()
+        self.journal = (plugin.mechanism_manager.
+                        mech_drivers['opendaylight'].obj.journal)
+        self.journal.out_of_sync = False
+
+    def _received(self):
+        return [(method, path) for method, path, body in self.odl.received]
+
+    def test_postcommit_does_not_wait_for_controller(self):
+        with self.port():
+            self.assertTrue(self.wake.called)
+            self.assertEqual([], self.odl.received)
+
+    def test_journal_sends_operations_in_order(self):
+        with self.port() as port:
+            self.journal.process(self.context)
+            self.assertEqual([('POST', '/networks'), ('POST', '/subnets'),
+                              ('POST', '/ports')], self._received())
+            body = self.odl.received[2][2]
+            self.assertEqual(port['port']['id'], body['port']['id'])
+            self.assertNotIn('status', body['port'])
+            del self.odl.received[:]
+
+            self._update('ports', port['port']['id'],
+                         {'port': {'name': 'new'}})
+            self._delete('ports', port['port']['id'])
+        self.journal.process(self.context)
+        port_path = '/ports/%s' % port['port']['id']
+        self.assertEqual([('PUT', port_path), ('DELETE', port_path)],
+                         self._received())
+        self.assertEqual('new', self.odl.received[0][2]['port']['name'])
+
+    def test_journal_batches_creations(self):
+        with contextlib.nested(self.network(), self.network()):
+            self.journal.process(self.context)
+            self.assertEqual([('POST', '/networks')], self._received())
+            self.assertEqual(2, len(self.odl.received[0][2]['networks']))
+
+    def test_journal_retries_failed_operations(self):
+        self.odl.status = requests.codes.internal_server_error
+        with self.network():
+            self.journal.process(self.context)
+            self.assertEqual([('POST', '/networks')], self._received())
+            self.odl.status = requests.codes.created
+            self.journal.process(self.context)
+            self.assertEqual([('POST', '/networks')] * 2, self._received())
+
+    def test_journal_full_sync(self):
+        with self.network() as network:
+            self.journal.out_of_sync = True
+            self.journal.process(self.context)
+            self.assertFalse(self.journal.out_of_sync)
+            self.assertEqual([('POST', '/networks'), ('POST', '/subnets'),
+                              ('POST', '/ports')], self._received())
+            self.assertEqual(network['network']['id'],
+                             self.odl.received[0][2]['network'][0]['id'])
+            self.assertIsNone(journal.Journal._claim_batch(self.journal,
+                                                           self.context)
+                              or None)
@@ -14,17 +14,23 @@
 #    under the License.
 
 import contextlib
+import datetime
 import mock
 import testtools
 import uuid
 import webob
 
+from oslo.db import exception as db_exc
+from oslo.utils import timeutils
+
+from neutron.api.v2 import attributes
 from neutron.common import constants
 from neutron.common import exceptions as exc
 from neutron.common import utils
 from neutron import context
 from neutron.db import db_base_plugin_v2 as base_plugin
 from neutron.db import l3_db
+from neutron.db import models_v2
 from neutron.extensions import external_net as external_net
 from neutron.extensions import l3agentscheduler
 from neutron.extensions import multiprovidernet as mpnet
@@ -128,11 +134,208 @@ class TestMl2SubnetsV2(test_plugin.TestSubnetsV2,
 
 class TestMl2PortsV2(test_plugin.TestPortsV2, Ml2PluginV2TestCase):
 
+    def test_list_ports_query_budget(self):
+        with self.subnet() as subnet:
+            with contextlib.nested(self.port(subnet=subnet),
+                                   self.port(subnet=subnet),
+                                   self.port(subnet=subnet)):
+                with self.assert_max_queries(2):
+                    self._list('ports')
+
+    def test_create_port_retried_on_deadlock(self):
+        plugin = manager.NeutronManager.get_plugin()
+        create = plugin._create_port_with_addresses
+
+        def deadlock_once(*args):
+            if create_port_with_addresses.call_count == 1:
+                raise db_exc.DBDeadlock()
+            return create(*args)
+
+        with contextlib.nested(
+            mock.patch.object(plugin, '_create_port_with_addresses',
+                              side_effect=deadlock_once),
+            mock.patch.object(plugin, '_allocate_port_addresses',
+                              wraps=plugin._allocate_port_addresses),
+            mock.patch('time.sleep')
+        ) as (create_port_with_addresses, allocate_port_addresses, sleep):
+            with self.subnet() as subnet:
+                with self.port(subnet=subnet) as port:
+                    ips = port['port']['fixed_ips']
+                    self.assertEqual('10.0.0.2', ips[0]['ip_address'])
+        self.assertEqual(1, allocate_port_addresses.call_count)
+        self.assertEqual(2, create_port_with_addresses.call_count)
+
+    def test_update_port_retried_on_deadlock(self):
+        plugin = manager.NeutronManager.get_plugin()
+        with self.subnet() as subnet:
+            with self.port(subnet=subnet) as port:
+                fixed_ips = port['port']['fixed_ips'] + [
+                    {'subnet_id': subnet['subnet']['id'],
+                     'ip_address': '10.0.0.10'}]
+                data = {'port': {'fixed_ips': fixed_ips}}
+                # The objects of the deadlocked attempt are kept alive, as
+                # they are until the garbage collector runs, and the retry
+                # must not find them in its session
+                held = []
+                left = []
+
+                def deadlock_once(mech_context):
+                    session = mech_context._plugin_context.session
+                    if not held:
+                        session.flush()
+                        held.extend(session)
+                        raise db_exc.DBDeadlock()
+                    left.extend(obj for obj in held if obj in session)
+
+                with contextlib.nested(
+                    mock.patch.object(plugin.mechanism_manager,
+                                      'update_port_precommit',
+                                      side_effect=deadlock_once),
+                    mock.patch('time.sleep')
+                ):
+                    res = self._update('ports', port['port']['id'], data)
+                self.assertEqual([], left)
+                ips = res['port']['fixed_ips']
+                self.assertEqual(['10.0.0.2', '10.0.0.10'],
+                                 [ip['ip_address'] for ip in ips])
+
+    def test_create_port_failure_releases_addresses(self):
+        plugin = manager.NeutronManager.get_plugin()
+        in_use = []
+
+        def precommit(mech_context):
+            port = mech_context.current
+            ip = port['fixed_ips'][0]
+            in_use.append(not plugin._check_unique_ip(
+                context.get_admin_context(), port['network_id'],
+                ip['subnet_id'], ip['ip_address']))
+            raise ml2_exc.MechanismDriverError()
+
+        with self.subnet() as subnet:
+            with mock.patch.object(plugin.mechanism_manager,
+                                   'create_port_precommit',
+                                   side_effect=precommit):
+                res = self._create_port(self.fmt,
+                                        subnet['subnet']['network_id'])
+            self.assertEqual(500, res.status_int)
+            self.assertEqual([True], in_use)
+            ctx = context.get_admin_context()
+            self.assertFalse(ctx.session.query(
+                models_v2.IPAllocation).count())
+            with self.port(subnet=subnet) as port:
+                ips = port['port']['fixed_ips']
+                self.assertEqual('10.0.0.2', ips[0]['ip_address'])
+
+    def _allocate_port_addresses(self, network_id):
+        plugin = manager.NeutronManager.get_plugin()
+        port = {'port': {'network_id': network_id,
+                         'tenant_id': self._tenant_id,
+                         'mac_address': attributes.ATTR_NOT_SPECIFIED,
+                         'fixed_ips': attributes.ATTR_NOT_SPECIFIED,
+                         'device_owner': 'compute:nova'}}
+        return plugin._allocate_port_addresses(context.get_admin_context(),
+                                               port)
+
+    def test_create_port_allocation_reaped_meanwhile(self):
+        plugin = manager.NeutronManager.get_plugin()
+        real_allocate = plugin._allocate_port_addresses
+
+        def allocate(ctx, port):
+            ips = real_allocate(ctx, port)
+            # The allocations are reaped before the port is created
+            other_ctx = context.get_admin_context()
+            with other_ctx.session.begin():
+                other_ctx.session.query(models_v2.IPAllocation).delete()
+            return ips
+
+        with self.subnet() as subnet:
+            with mock.patch.object(plugin, '_allocate_port_addresses',
+                                   side_effect=allocate):
+                res = self._create_port(self.fmt,
+                                        subnet['subnet']['network_id'])
+            self.assertEqual(webob.exc.HTTPConflict.code, res.status_int)
+            with self.port(subnet=subnet) as port:
+                ips = port['port']['fixed_ips']
+                self.assertEqual('10.0.0.2', ips[0]['ip_address'])
+
+    def test_create_port_stale_portless_allocation_reaped(self):
+        with self.subnet(cidr='10.0.0.0/30') as subnet:
+            network_id = subnet['subnet']['network_id']
+            ips = self._allocate_port_addresses(network_id)
+            self.assertEqual('10.0.0.2', ips[0]['ip_address'])
+            # The only address is held for a port not yet created
+            res = self._create_port(self.fmt, network_id)
+            self.assertEqual(webob.exc.HTTPConflict.code, res.status_int)
+
+            ctx = context.get_admin_context()
+            with ctx.session.begin():
+                ctx.session.query(models_v2.IPAllocation).update(
+                    {'allocated_at': timeutils.utcnow() -
+                     datetime.timedelta(hours=1)})
+            with self.port(subnet=subnet) as port:
+                ips = port['port']['fixed_ips']
+                self.assertEqual('10.0.0.2', ips[0]['ip_address'])
+
     def test_update_port_status_build(self):
         with self.port() as port:
             self.assertEqual('DOWN', port['port']['status'])
             self.assertEqual('DOWN', self.port_create_status)
 
+    def _set_port_host(self, ctx, port_id, host):
+        with ctx.session.begin(subtransactions=True):
+            ctx.session.query(models.PortBinding).filter_by(
+                port_id=port_id).update({'host': host})
+
+    def test_update_port_statuses(self):
+        ctx = context.get_admin_context()
+        plugin = manager.NeutronManager.get_plugin()
+        with self.subnet() as subnet:
+            with contextlib.nested(
+                self.port(subnet=subnet), self.port(subnet=subnet),
+                self.port(subnet=subnet)
+            ) as (port1, port2, port3):
+                port1_id = port1['port']['id']
+                port2_id = port2['port']['id']
+                port3_id = port3['port']['id']
+                self._set_port_host(ctx, port1_id, 'host1')
+                self._set_port_host(ctx, port2_id, 'host1')
+                self._set_port_host(ctx, port3_id, 'host2')
+                with mock.patch.object(
+                        plugin.mechanism_manager,
+                        'update_ports_postcommit') as postcommit:
+                    found = plugin.update_port_statuses(
+                        ctx, [port1_id[:11], port2_id, port3_id, 'unknown'],
+                        constants.PORT_STATUS_ACTIVE, 'host1')
+                self.assertEqual({port1_id[:11]: port1_id,
+                                  port2_id: port2_id,
+                                  port3_id: None}, found)
+                self.assertEqual(1, postcommit.call_count)
+                self.assertEqual(
+                    set([port1_id, port2_id]),
+                    set(mech_context.current['id']
+                        for mech_context in postcommit.call_args[0][0]))
+                statuses = dict((port['id'], port['status'])
+                                for port in plugin.get_ports(ctx))
+                self.assertEqual(
+                    [constants.PORT_STATUS_ACTIVE,
+                     constants.PORT_STATUS_ACTIVE,
+                     constants.PORT_STATUS_DOWN],
+                    [statuses[port_id]
+                     for port_id in (port1_id, port2_id, port3_id)])
+
+    def test_update_port_statuses_unchanged_status(self):
+        ctx = context.get_admin_context()
+        plugin = manager.NeutronManager.get_plugin()
+        with self.port() as port:
+            port_id = port['port']['id']
+            self._set_port_host(ctx, port_id, 'host1')
+            with mock.patch.object(plugin.mechanism_manager,
+                                   'update_ports_postcommit') as postcommit:
+                found = plugin.update_port_statuses(
+                    ctx, [port_id], constants.PORT_STATUS_DOWN, 'host1')
+            self.assertEqual({port_id: port_id}, found)
+            self.assertFalse(postcommit.called)
+
     def test_update_non_existent_port(self):
         ctx = context.get_admin_context()
         plugin = manager.NeutronManager.get_plugin()
@@ -1054,8 +1257,11 @@ class TestMl2PluginCreateUpdateDeletePort(base.BaseTestCase):
     def test_create_port_rpc_outside_transaction(self):
         with contextlib.nested(
             mock.patch.object(ml2_plugin.Ml2Plugin, '__init__'),
-            mock.patch.object(base_plugin.NeutronDbPluginV2, 'create_port'),
-        ) as (init, super_create_port):
+            mock.patch.object(base_plugin.NeutronDbPluginV2,
+                              '_allocate_port_addresses'),
+            mock.patch.object(base_plugin.NeutronDbPluginV2,
+                              '_create_port_with_addresses'),
+        ) as (init, allocate_port_addresses, create_port_with_addresses):
             init.return_value = None
 
             new_host_port = mock.Mock()
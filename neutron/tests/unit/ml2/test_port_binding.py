@@ -13,6 +13,8 @@
 #    License for the specific language governing permissions and limitations
 #    under the License.
 
+import contextlib
+
 import mock
 
 from neutron import context
@@ -99,6 +101,21 @@ class PortBindingTestCase(test_plugin.NeutronDbPluginV2TestCase):
                                 portbindings.VIF_TYPE_OVS,
                                 True, True, 'ACTIVE')
 
+    def test_get_devices_details_list_query_budget(self):
+        host_arg = {portbindings.HOST_ID: 'host-ovs-no_filter',
+                    'arg_list': (portbindings.HOST_ID,)}
+        with self.subnet() as subnet:
+            with contextlib.nested(self.port(subnet=subnet, **host_arg),
+                                   self.port(subnet=subnet, **host_arg),
+                                   self.port(subnet=subnet, **host_arg)
+                                   ) as ports:
+                devices = [port['port']['id'] for port in ports]
+                # The details of each device are still read on their own
+                with self.assert_max_queries(18 * len(devices)):
+                    self.plugin.endpoints[0].get_devices_details_list(
+                        context.get_admin_context(), agent_id='theAgentId',
+                        devices=devices, host='host-ovs-no_filter')
+
     def test_update_port_binding_no_binding(self):
         ctx = context.get_admin_context()
         with self.port(name='name') as port:
@@ -162,6 +162,62 @@ class RpcCallbacksTestCase(base.BaseTestCase):
             'fake_context', 'fake_port_id', constants.PORT_STATUS_DOWN,
             'fake_host')
 
+    def _test_update_devices(self, method, status, found,
+                             extensions=('router',)):
+        self.plugin._device_to_port_id.side_effect = (
+            lambda device: device[3:])
+        self.plugin.update_port_statuses.return_value = found
+        type(self.l3plugin).supported_extension_aliases = (
+            mock.PropertyMock(return_value=list(extensions)))
+        res = method('fake_context', devices=['tapport1', 'tapport2'],
+                     agent_id='fake_agent', host='fake_host')
+        self.plugin.update_port_statuses.assert_called_once_with(
+            'fake_context', mock.ANY, status, 'fake_host')
+        self.assertEqual(
+            ['port1', 'port2'],
+            sorted(self.plugin.update_port_statuses.call_args[0][1]))
+        return res
+
+    def test_update_devices_up(self):
+        res = self._test_update_devices(
+            self.callbacks.update_devices_up, constants.PORT_STATUS_ACTIVE,
+            {'port1': 'port1-full'})
+        self.assertEqual({'devices_up': ['tapport1', 'tapport2'],
+                          'failed_devices_up': []}, res)
+
+    def test_update_devices_up_with_dvr(self):
+        self._test_update_devices(
+            self.callbacks.update_devices_up, constants.PORT_STATUS_ACTIVE,
+            {'port1': 'port1-full', 'port2': None},
+            extensions=('router', 'dvr'))
+        # port2 is not bound to the host
+        self.plugin._get_port.assert_called_once_with('fake_context',
+                                                      'port1-full')
+        self.assertTrue(self.l3plugin.dvr_vmarp_table_update.called)
+
+    def test_update_devices_down(self):
+        res = self._test_update_devices(
+            self.callbacks.update_devices_down, constants.PORT_STATUS_DOWN,
+            {'port1': 'port1-full'})
+        self.assertEqual(
+            {'devices_down': [{'device': 'tapport1', 'exists': True},
+                              {'device': 'tapport2', 'exists': False}],
+             'failed_devices_down': []}, res)
+
+    def test_update_devices_down_falls_back_per_device(self):
+        self.plugin._device_to_port_id.side_effect = (
+            lambda device: device[3:])
+        self.plugin.update_port_statuses.side_effect = Exception()
+        self.plugin.port_bound_to_host.return_value = True
+        self.plugin.update_port_status.side_effect = ['port1-full',
+                                                      Exception()]
+        res = self.callbacks.update_devices_down(
+            'fake_context', devices=['tapport1', 'tapport2'],
+            agent_id='fake_agent', host='fake_host')
+        self.assertEqual(
+            {'devices_down': [{'device': 'tapport1', 'exists': True}],
+             'failed_devices_down': ['tapport2']}, res)
+
 
 class RpcApiTestCase(base.BaseTestCase):
 
@@ -251,6 +307,22 @@ class RpcApiTestCase(base.BaseTestCase):
                            agent_id='fake_agent_id',
                            host='fake_host')
 
+    def test_update_devices_down(self):
+        rpcapi = agent_rpc.PluginApi(topics.PLUGIN)
+        self._test_rpc_api(rpcapi, None,
+                           'update_devices_down', rpc_method='call',
+                           devices=['fake_device1', 'fake_device2'],
+                           agent_id='fake_agent_id', host='fake_host',
+                           version='1.4')
+
+    def test_update_devices_up(self):
+        rpcapi = agent_rpc.PluginApi(topics.PLUGIN)
+        self._test_rpc_api(rpcapi, None,
+                           'update_devices_up', rpc_method='call',
+                           devices=['fake_device1', 'fake_device2'],
+                           agent_id='fake_agent_id', host='fake_host',
+                           version='1.4')
+
     def test_tunnel_sync(self):
         rpcapi = agent_rpc.PluginApi(topics.PLUGIN)
         self._test_rpc_api(rpcapi, None,
@@ -17,6 +17,7 @@ import contextlib
 
 from neutron.api.rpc.handlers import l3_rpc
 from neutron.common import constants
+from neutron import manager
 from neutron.tests.unit.nec import test_nec_plugin
 from neutron.tests.unit.openvswitch import test_agent_scheduler
 
@@ -108,6 +109,22 @@ class NecL3AgentSchedulerWithOpenFlowRouter(
         self.assertFalse(len(l3_agents_1['agents']))
         self.assertFalse(len(l3_agents_2['agents']))
 
+    def test_schedule_routers_skips_openflow_router(self):
+        with contextlib.nested(
+            self.router(),
+            self.router(arg_list=('provider',), provider='openflow')
+        ) as (r1, r2):
+            self._register_agent_states()
+            plugin = manager.NeutronManager.get_plugin()
+            plugin.schedule_routers(self.adminContext,
+                                    [r1['router']['id'], r2['router']['id']])
+            l3_agents_1 = self._list_l3_agents_hosting_router(
+                r1['router']['id'])
+            l3_agents_2 = self._list_l3_agents_hosting_router(
+                r2['router']['id'])
+        self.assertEqual(1, len(l3_agents_1['agents']))
+        self.assertFalse(len(l3_agents_2['agents']))
+
     def test_add_router_to_l3_agent_for_openflow_router(self):
         with self.router(arg_list=('provider',), provider='openflow') as r1:
             self._register_agent_states()
@@ -661,7 +661,7 @@ class OvsAgentSchedulerTestCase(OvsAgentSchedulerTestCaseBase):
             plugin = manager.NeutronManager.get_service_plugins().get(
                 service_constants.L3_ROUTER_NAT)
             mock.patch.object(
-                plugin, 'reschedule_router',
+                plugin, 'reschedule_routers',
                 side_effect=[
                     db_exc.DBError(), messaging.RemoteError(),
                     l3agentscheduler.RouterReschedulingFailed(router_id='f',
@@ -678,7 +678,7 @@ class OvsAgentSchedulerTestCase(OvsAgentSchedulerTestCaseBase):
                               self._take_down_agent_and_run_reschedule,
                               L3_HOSTA)
 
-    def test_router_rescheduler_iterates_after_reschedule_failure(self):
+    def test_router_rescheduler_reschedules_routers_in_one_batch(self):
         plugin = manager.NeutronManager.get_service_plugins().get(
             service_constants.L3_ROUTER_NAT)
         l3_rpc_cb = l3_rpc.L3RpcCallback()
@@ -687,16 +687,33 @@ class OvsAgentSchedulerTestCase(OvsAgentSchedulerTestCaseBase):
             # schedule the routers to host A
             l3_rpc_cb.sync_routers(self.adminContext, host=L3_HOSTA)
 
-            rs_mock = mock.patch.object(
-                plugin, 'reschedule_router',
-                side_effect=l3agentscheduler.RouterReschedulingFailed(
-                    router_id='f', agent_id='f'),
-            ).start()
+            rs_mock = mock.patch.object(plugin, 'reschedule_routers').start()
             self._take_down_agent_and_run_reschedule(L3_HOSTA)
-            # make sure both had a reschedule attempt even though first failed
-            rs_mock.assert_has_calls([mock.call(mock.ANY, r1['router']['id']),
-                                      mock.call(mock.ANY, r2['router']['id'])],
-                                     any_order=True)
+            rs_mock.assert_called_once_with(mock.ANY, mock.ANY)
+            self.assertEqual(
+                set([r1['router']['id'], r2['router']['id']]),
+                set(rs_mock.call_args[0][1]))
+
+    def test_router_rescheduler_notifies_once_per_agent(self):
+        plugin = manager.NeutronManager.get_service_plugins().get(
+            service_constants.L3_ROUTER_NAT)
+        l3_rpc_cb = l3_rpc.L3RpcCallback()
+        self._register_agent_states()
+        with contextlib.nested(self.router(), self.router()) as (r1, r2):
+            # schedule the routers to host A
+            l3_rpc_cb.sync_routers(self.adminContext, host=L3_HOSTA)
+
+            l3_notifier = plugin.agent_notifiers[constants.AGENT_TYPE_L3]
+            with contextlib.nested(
+                mock.patch.object(l3_notifier, 'router_added_to_agent'),
+                mock.patch.object(l3_notifier, 'router_removed_from_agent')
+            ) as (added, removed):
+                self._take_down_agent_and_run_reschedule(L3_HOSTA)
+            added.assert_called_once_with(mock.ANY, mock.ANY, L3_HOSTB)
+            self.assertEqual(
+                set([r1['router']['id'], r2['router']['id']]),
+                set(added.call_args[0][1]))
+            self.assertEqual(2, removed.call_count)
 
     def test_router_is_not_rescheduled_from_alive_agent(self):
         with self.router():
@@ -706,7 +723,8 @@ class OvsAgentSchedulerTestCase(OvsAgentSchedulerTestCaseBase):
             # schedule the router to host A
             l3_rpc_cb.sync_routers(self.adminContext, host=L3_HOSTA)
             with mock.patch('neutron.db.l3_agentschedulers_db.'
-                            'L3AgentSchedulerDbMixin.reschedule_router') as rr:
+                            'L3AgentSchedulerDbMixin.reschedule_routers'
+                            ) as rr:
                 # take down some unrelated agent and run reschedule check
                 self._take_down_agent_and_run_reschedule(DHCP_HOSTC)
                 self.assertFalse(rr.called)
@@ -371,3 +371,33 @@ class IptablesDriverTestCase(base.BaseTestCase):
                                         wrap=False)]
 
         self.v4filter_inst.assert_has_calls(calls)
+
+    def test_get_traffic_counters(self):
+        self.metering.add_metering_label(None, TEST_ROUTERS)
+        counters = {'neutron-meter-l-c5df2fe5-c60': {'pkts': 1, 'bytes': 10},
+                    'neutron-meter-l-eeef45da-c60': {'pkts': 2, 'bytes': 20}}
+
+        def get_chains_traffic_counters(chains, wrap=True, zero=False):
+            return dict((chain, counters[chain]) for chain in chains)
+        self.iptables_inst.get_chains_traffic_counters.side_effect = (
+            get_chains_traffic_counters)
+
+        accs = self.metering.get_traffic_counters(None, TEST_ROUTERS)
+        self.assertEqual(
+            {'c5df2fe5-c600-4a2a-b2f4-c0fb6df73c83': {'pkts': 1, 'bytes': 10},
+             'eeef45da-c600-4a2a-b2f4-c0fb6df73c83': {'pkts': 2,
+                                                      'bytes': 20}},
+            accs)
+        # The counters of all the labels of a router are read at once
+        self.iptables_inst.get_chains_traffic_counters.assert_has_calls(
+            [mock.call({'neutron-meter-l-c5df2fe5-c60':
+                        'c5df2fe5-c600-4a2a-b2f4-c0fb6df73c83'},
+                       wrap=False, zero=True),
+             mock.call({'neutron-meter-l-eeef45da-c60':
+                        'eeef45da-c600-4a2a-b2f4-c0fb6df73c83'},
+                       wrap=False, zero=True)], any_order=True)
+
+    def test_get_traffic_counters_unknown_router(self):
+        accs = self.metering.get_traffic_counters(None, TEST_ROUTERS)
+        self.assertEqual({}, accs)
+        self.assertFalse(self.iptables_inst.get_chains_traffic_counters.called)
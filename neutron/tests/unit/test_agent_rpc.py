@@ -70,6 +70,48 @@ class AgentRPCPluginApi(base.BaseTestCase):
     def test_update_device_down(self):
         self._test_rpc_call('update_device_down')
 
+    def test_update_devices_down(self):
+        self._test_rpc_call('update_devices_down')
+
+    def test_update_devices_up(self):
+        self._test_rpc_call('update_devices_up')
+
+    def test_update_devices_up_unsupported(self):
+        agent = rpc.PluginApi('fake_topic')
+        ctxt = oslo_context.RequestContext('fake_user', 'fake_project')
+        with contextlib.nested(
+            mock.patch.object(agent.client, 'call'),
+            mock.patch.object(agent.client, 'prepare'),
+        ) as (
+            mock_call, mock_prepare
+        ):
+            mock_prepare.return_value = agent.client
+            mock_call.side_effect = [messaging.UnsupportedVersion('1.4'),
+                                     None, Exception()]
+            actual_val = agent.update_devices_up(
+                ctxt, ['fake_device1', 'fake_device2'], 'fake_agent_id')
+        self.assertEqual({'devices_up': ['fake_device1'],
+                          'failed_devices_up': ['fake_device2']}, actual_val)
+
+    def test_update_devices_down_unsupported(self):
+        agent = rpc.PluginApi('fake_topic')
+        ctxt = oslo_context.RequestContext('fake_user', 'fake_project')
+        details = {'device': 'fake_device1', 'exists': True}
+        with contextlib.nested(
+            mock.patch.object(agent.client, 'call'),
+            mock.patch.object(agent.client, 'prepare'),
+        ) as (
+            mock_call, mock_prepare
+        ):
+            mock_prepare.return_value = agent.client
+            mock_call.side_effect = [messaging.UnsupportedVersion('1.4'),
+                                     details, Exception()]
+            actual_val = agent.update_devices_down(
+                ctxt, ['fake_device1', 'fake_device2'], 'fake_agent_id')
+        self.assertEqual({'devices_down': [details],
+                          'failed_devices_down': ['fake_device2']},
+                         actual_val)
+
     def test_tunnel_sync(self):
         self._test_rpc_call('tunnel_sync')
 
@@ -563,6 +563,96 @@ class JSONV2TestCase(APIv2TestBase, testlib_api.WebTestCase):
         tenant_id = _uuid()
         self._test_list(tenant_id + "bad", tenant_id)
 
+    def test_list_streamed_keystone(self):
+        cfg.CONF.set_override('stream_collections', True)
+        tenant_id = _uuid()
+        self._test_list(tenant_id, tenant_id)
+
+    def test_list_streamed_keystone_bad(self):
+        cfg.CONF.set_override('stream_collections', True)
+        tenant_id = _uuid()
+        self._test_list(tenant_id + "bad", tenant_id)
+
+    def test_list_streamed_like_buffered(self):
+        tenant_id = _uuid()
+        env = {'neutron.context': context.Context('', tenant_id)}
+        instance = self.plugin.return_value
+        instance.get_networks.return_value = [
+            {'id': _uuid(), 'name': 'net%d' % i, 'admin_state_up': True,
+             'status': "ACTIVE", 'tenant_id': tenant_id if i % 2 else _uuid(),
+             'shared': False, 'subnets': [], 'hidden': 'hidden'}
+            for i in range(5)]
+        path = _get_path('networks', fmt=self.fmt)
+        buffered = self.api.get(path, extra_environ=env)
+        cfg.CONF.set_override('stream_collections', True)
+
+        streamed = self.api.get(path, extra_environ=env)
+
+        self.assertEqual(2, len(self.deserialize(streamed)['networks']))
+        self.assertEqual(buffered.body, streamed.body)
+        # webtest sets the length of every response, unlike the server
+        response = webob.Request.blank(path, environ=env).get_response(
+            self.api.app)
+        self.assertIsNone(response.content_length)
+
+    def test_list_streamed_policy_error_returned(self):
+        cfg.CONF.set_override('stream_collections', True)
+        tenant_id = _uuid()
+        env = {'neutron.context': context.Context('', tenant_id)}
+        instance = self.plugin.return_value
+        instance.get_networks.return_value = [
+            {'id': _uuid(), 'tenant_id': tenant_id} for i in range(2)]
+
+        with mock.patch.object(policy, 'check',
+                               side_effect=[True, Exception()]):
+            res = self.api.get(_get_path('networks', fmt=self.fmt),
+                               extra_environ=env, expect_errors=True)
+
+        self.assertEqual(exc.HTTPInternalServerError.code, res.status_int)
+
+    def test_list_pagination_not_streamed(self):
+        cfg.CONF.set_override('stream_collections', True)
+
+        self.test_list_pagination()
+
+    def test_list_reads_from_slave(self):
+        instance = self.plugin.return_value
+        instance.get_networks.return_value = []
+
+        self.api.get(_get_path('networks', fmt=self.fmt))
+
+        ctx = instance.get_networks.call_args[0][0]
+        self.assertTrue(ctx.use_slave)
+
+    def test_show_reads_from_slave(self):
+        instance = self.plugin.return_value
+        instance.get_network.return_value = {'tenant_id': _uuid()}
+
+        self.api.get(_get_path('networks', id=_uuid(), fmt=self.fmt))
+
+        ctx = instance.get_network.call_args[0][0]
+        self.assertTrue(ctx.use_slave)
+
+    def _test_slave_reads_not_supported(self, path, method):
+        instance = self.plugin.return_value
+        instance._NeutronPluginBaseV2__slave_reads_support = False
+        getattr(instance, method).return_value = (
+            [] if method == 'get_networks' else {'tenant_id': _uuid()})
+        api = webtest.TestApp(router.APIRouter())
+
+        api.get(path)
+
+        ctx = getattr(instance, method).call_args[0][0]
+        self.assertFalse(ctx.use_slave)
+
+    def test_list_slave_reads_not_supported(self):
+        self._test_slave_reads_not_supported(
+            _get_path('networks', fmt=self.fmt), 'get_networks')
+
+    def test_show_slave_reads_not_supported(self):
+        self._test_slave_reads_not_supported(
+            _get_path('networks', id=_uuid(), fmt=self.fmt), 'get_network')
+
     def test_list_pagination(self):
         id1 = str(_uuid())
         id2 = str(_uuid())
@@ -762,6 +852,8 @@ class JSONV2TestCase(APIv2TestBase, testlib_api.WebTestCase):
         net = res['network']
         self.assertEqual(net['id'], net_id)
         self.assertEqual(net['status'], "ACTIVE")
+        ctx = instance.create_network.call_args[0][0]
+        self.assertFalse(ctx.use_slave)
 
     def test_create_use_defaults(self):
         net_id = _uuid()
@@ -1522,3 +1614,88 @@ class CreateResourceTestCase(base.BaseTestCase):
     def test_resource_creation(self):
         resource = v2_base.create_resource('fakes', 'fake', None, {})
         self.assertIsInstance(resource, webob.dec.wsgify)
+
+
+class RequestBodyPlanTestCase(base.BaseTestCase):
+
+    ATTR_INFO = {
+        'id': {'allow_post': False, 'allow_put': False},
+        'name': {'allow_post': True, 'allow_put': True, 'default': '',
+                 'validate': {'type:string': 8}},
+        'network_id': {'allow_post': True, 'allow_put': False,
+                       'validate': {'type:uuid': None}},
+        'admin_state_up': {'allow_post': True, 'allow_put': True,
+                           'default': True,
+                           'convert_to': attributes.convert_to_boolean},
+        'tenant_id': {'allow_post': True, 'allow_put': False,
+                      'validate': {'type:string': None}},
+    }
+
+    def setUp(self):
+        super(RequestBodyPlanTestCase, self).setUp()
+        self.plan = v2_base.RequestBodyPlan('port', self.ATTR_INFO)
+        self.context = context.Context('user', 'tenant')
+        self.network_id = _uuid()
+
+    def _assert_bad_request(self, message, body, is_create=True):
+        for prepare in (
+                lambda: self.plan.prepare(self.context, body, is_create),
+                lambda: v2_base.Controller.prepare_request_body(
+                    self.context, body, is_create, 'port', self.ATTR_INFO)):
+            e = self.assertRaises(exc.HTTPBadRequest, prepare)
+            self.assertEqual(message, str(e))
+
+    def test_create_fills_defaults_and_converts(self):
+        body = {'port': {'network_id': self.network_id,
+                         'admin_state_up': 'false'}}
+
+        self.assertEqual(
+            {'port': {'network_id': self.network_id, 'name': '',
+                      'admin_state_up': False, 'tenant_id': 'tenant'}},
+            self.plan.prepare(self.context, body, True))
+
+    def test_create_bulk(self):
+        body = {'ports': [{'network_id': self.network_id},
+                          {'port': {'network_id': self.network_id}}]}
+
+        with mock.patch.object(v2_base.LOG, 'debug') as debug:
+            result = self.plan.prepare(self.context, body, True,
+                                       allow_bulk=True)
+
+        self.assertEqual([self.network_id] * 2,
+                         [item['port']['network_id']
+                          for item in result['ports']])
+        self.assertEqual(1, debug.call_count)
+
+    def test_create_missing_attribute(self):
+        self._assert_bad_request(
+            "Failed to parse request. Required attribute 'network_id' "
+            "not specified", {'port': {}})
+
+    def test_create_forbidden_attribute(self):
+        self._assert_bad_request(
+            "Attribute 'id' not allowed in POST",
+            {'port': {'id': _uuid(), 'network_id': self.network_id}})
+
+    def test_unrecognized_attribute(self):
+        self._assert_bad_request(
+            "Unrecognized attribute(s) 'foo'",
+            {'port': {'network_id': self.network_id, 'foo': 'bar'}})
+
+    def test_invalid_attribute(self):
+        self._assert_bad_request(
+            "Invalid input for name. Reason: 'too long name' exceeds "
+            "maximum length of 8.",
+            {'port': {'network_id': self.network_id,
+                      'name': 'too long name'}})
+
+    def test_update_read_only_attribute(self):
+        self._assert_bad_request(
+            "Cannot update read-only attribute network_id",
+            {'port': {'network_id': self.network_id}}, is_create=False)
+
+    def test_update(self):
+        body = {'port': {'name': 'port', 'admin_state_up': 0}}
+
+        self.assertEqual({'port': {'name': 'port', 'admin_state_up': False}},
+                         self.plan.prepare(self.context, body, False))
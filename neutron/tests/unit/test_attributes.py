@@ -584,6 +584,17 @@ class TestAttributes(base.BaseTestCase):
         msg = attributes._validate_uuid('00000000-ffff-ffff-ffff-000000000000')
         self.assertIsNone(msg)
 
+        msg = attributes._validate_uuid(
+            u'00000000-ffff-ffff-ffff-000000000000')
+        self.assertIsNone(msg)
+
+        for data in ('00000000-FFFF-FFFF-FFFF-000000000000',
+                     '00000000ffffffffffff000000000000',
+                     '{00000000-ffff-ffff-ffff-000000000000}',
+                     '00000000-ffff-ffff-ffff-000000000000\n', 123, None):
+            msg = attributes._validate_uuid(data)
+            self.assertEqual("'%s' is not a valid UUID" % data, msg)
+
     def test_validate_uuid_list(self):
         # check not a list
         uuids = [None,
@@ -4109,6 +4109,52 @@ class TestNeutronDbPluginV2(base.BaseTestCase):
                           ['b', '192.168.1.100', '192.168.1.109'],
                           ['b', '192.168.1.112', '192.168.1.120']], actual)
 
+    def _recycle_ip(self, ip_address, ranges):
+        pool_qry = mock.Mock()
+        pool_qry.filter_by.return_value = [{'id': 'a',
+                                            'first_ip': '192.168.1.2',
+                                            'last_ip': '192.168.1.20'}]
+        range_qry = mock.Mock()
+        range_qry.filter_by.return_value = range_qry
+        range_qry.with_lockmode.return_value = ranges
+
+        def return_queries_side_effect(*args, **kwargs):
+            if args[0] == models_v2.IPAllocationPool:
+                return pool_qry
+            if args[0] == models_v2.IPAvailabilityRange:
+                return range_qry
+
+        context = mock.Mock()
+        context.session.query.side_effect = return_queries_side_effect
+        db_base_plugin_v2.NeutronDbPluginV2._recycle_ip(context, 's',
+                                                        ip_address)
+        return [[args[0].allocation_pool_id, args[0].first_ip,
+                 args[0].last_ip]
+                for _name, args, _kwargs in context.session.add.mock_calls]
+
+    def test_recycle_ip_extends_range(self):
+        ranges = [{'first_ip': '192.168.1.2', 'last_ip': '192.168.1.4'},
+                  {'first_ip': '192.168.1.7', 'last_ip': '192.168.1.20'}]
+
+        self.assertEqual([], self._recycle_ip('192.168.1.6', ranges))
+        self.assertEqual('192.168.1.6', ranges[1]['first_ip'])
+        self.assertEqual([], self._recycle_ip('192.168.1.5', ranges))
+        self.assertEqual('192.168.1.5', ranges[0]['last_ip'])
+
+    def test_recycle_ip_adds_range(self):
+        ranges = [{'first_ip': '192.168.1.8', 'last_ip': '192.168.1.20'}]
+
+        self.assertEqual([['a', '192.168.1.5', '192.168.1.5']],
+                         self._recycle_ip('192.168.1.5', ranges))
+
+    def test_recycle_ip_available_or_out_of_pools(self):
+        ranges = [{'first_ip': '192.168.1.2', 'last_ip': '192.168.1.20'}]
+
+        self.assertEqual([], self._recycle_ip('192.168.1.5', ranges))
+        self.assertEqual([], self._recycle_ip('192.168.1.21', []))
+        self.assertEqual([{'first_ip': '192.168.1.2',
+                           'last_ip': '192.168.1.20'}], ranges)
+
 
 class NeutronDbPluginV2AsMixinTestCase(testlib_api.SqlTestCase):
     """Tests for NeutronDbPluginV2 as Mixin.
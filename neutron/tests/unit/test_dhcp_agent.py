@@ -800,6 +800,29 @@ class TestDhcpAgentEventHandler(base.BaseTestCase):
     def test_enable_isolated_metadata_proxy_with_dist_network(self):
         self._test_metadata_network(fake_dist_network)
 
+    def test_enable_isolated_metadata_proxy_multiplexed(self):
+        self.dhcp.metadata_proxy_manager = mock.Mock()
+        self.dhcp.enable_isolated_metadata_proxy(fake_network)
+        self.dhcp.metadata_proxy_manager.add.assert_called_once_with(
+            fake_network.id, fake_network.namespace, dhcp.METADATA_PORT,
+            network_id=fake_network.id, router_id=None)
+        self.assertFalse(self.external_process.called)
+
+    def test_enable_isolated_metadata_proxy_multiplexed_metadata_network(self):
+        cfg.CONF.set_override('enable_metadata_network', True)
+        self.dhcp.metadata_proxy_manager = mock.Mock()
+        self.dhcp.enable_isolated_metadata_proxy(fake_meta_network)
+        self.dhcp.metadata_proxy_manager.add.assert_called_once_with(
+            fake_meta_network.id, fake_meta_network.namespace,
+            dhcp.METADATA_PORT, network_id=None, router_id='forzanapoli')
+
+    def test_disable_isolated_metadata_proxy_multiplexed(self):
+        self.dhcp.metadata_proxy_manager = mock.Mock()
+        self.dhcp.disable_isolated_metadata_proxy(fake_network)
+        self.dhcp.metadata_proxy_manager.remove.assert_called_once_with(
+            fake_network.id)
+        self.assertFalse(self.external_process.called)
+
     def test_network_create_end(self):
         payload = dict(network=dict(id=fake_network.id))
 
@@ -956,6 +979,32 @@ class TestDhcpAgentEventHandler(base.BaseTestCase):
         self.cache.assert_has_calls([mock.call.get_port_by_id('unknown')])
         self.assertEqual(self.call_driver.call_count, 0)
 
+    def test_ports_update_end(self):
+        payload = dict(ports=[fake_port1, fake_port2])
+        self.cache.get_network_by_id.return_value = fake_network
+        self.dhcp.ports_update_end(None, payload)
+        self.cache.assert_has_calls(
+            [mock.call.get_network_by_id(fake_port1.network_id),
+             mock.call.put_port(mock.ANY),
+             mock.call.get_network_by_id(fake_port2.network_id),
+             mock.call.put_port(mock.ANY)])
+        # The allocations of the network are reloaded once
+        self.call_driver.assert_called_once_with('reload_allocations',
+                                                 fake_network)
+
+    def test_ports_delete_end(self):
+        payload = dict(port_ids=[fake_port1.id, fake_port2.id, 'unknown'])
+        self.cache.get_network_by_id.return_value = fake_network
+        self.cache.get_port_by_id.side_effect = [fake_port1, fake_port2,
+                                                 None]
+
+        self.dhcp.ports_delete_end(None, payload)
+        self.cache.assert_has_calls(
+            [mock.call.remove_port(fake_port1),
+             mock.call.remove_port(fake_port2)], any_order=True)
+        self.call_driver.assert_called_once_with('reload_allocations',
+                                                 fake_network)
+
 
 class TestDhcpPluginApiProxy(base.BaseTestCase):
     def _test_dhcp_api(self, method, **kwargs):
@@ -69,6 +69,18 @@ class TestDhcpRpcCallback(base.BaseTestCase):
                     {'id': 'b', 'subnets': [subnet], 'ports': []}]
         self.assertEqual(expected, networks)
 
+    def test_get_active_networks_info_reads_from_master(self):
+        self.plugin.get_networks.return_value = [{'id': 'a'}]
+        context = mock.Mock()
+
+        self.callbacks.get_active_networks_info(context, host='host')
+
+        self.assertFalse(context.reader.called)
+        self.plugin.assert_has_calls(
+            [mock.call.get_networks(context, filters=mock.ANY),
+             mock.call.get_ports(context, filters=mock.ANY),
+             mock.call.get_subnets(context, filters=mock.ANY)])
+
     def _test__port_action_with_failures(self, exc=None, action=None):
         port = {
             'network_id': 'foo_network_id',
@@ -15,6 +15,7 @@
 
 import mock
 
+from oslo.config import cfg
 from oslo.utils import timeutils
 
 from neutron.common import constants
@@ -27,10 +28,10 @@ from neutron.scheduler import dhcp_agent_scheduler
 from neutron.tests.unit import testlib_api
 
 
-class DhcpSchedulerTestCase(testlib_api.SqlTestCase):
+class DhcpSchedulerTestBase(testlib_api.SqlTestCase):
 
     def setUp(self):
-        super(DhcpSchedulerTestCase, self).setUp()
+        super(DhcpSchedulerTestBase, self).setUp()
         self.ctx = context.get_admin_context()
         self.network_id = 'foo_network_id'
         self._save_networks([self.network_id])
@@ -69,6 +70,9 @@ class DhcpSchedulerTestCase(testlib_api.SqlTestCase):
         for result in results:
             self.assertEqual(network_id, result.network_id)
 
+
+class DhcpSchedulerTestCase(DhcpSchedulerTestBase):
+
     def test_schedule_bind_network_single_agent(self):
         agents = self._get_agents(['host-a'])
         self._save_agents(agents)
@@ -123,3 +127,96 @@ class DhcpSchedulerTestCase(testlib_api.SqlTestCase):
             self.ctx.session.query(agentschedulers_db.NetworkDhcpAgentBinding)
             .all())
         self.assertEqual(1, len(results))
+
+    def test_schedule_networks(self):
+        network_ids = ['net-%d' % i for i in range(4)]
+        self._save_networks(network_ids)
+        agents = self._get_agents(['host-a', 'host-b'])
+        self._save_agents(agents)
+        self._test_schedule_bind_network([agents[0]], network_ids[0])
+        scheduler = dhcp_agent_scheduler.ChanceScheduler()
+
+        scheduled = scheduler.schedule_networks(
+            mock.MagicMock(), self.ctx, [{'id': n} for n in network_ids])
+        self.assertEqual(set(network_ids[1:]), set(scheduled))
+        results = (
+            self.ctx.session.query(agentschedulers_db.NetworkDhcpAgentBinding)
+            .all())
+        self.assertEqual(4, len(results))
+
+    def test_schedule_networks_admin_down_agent_counted(self):
+        agents = self._get_agents(['host-a', 'host-b'])
+        agents[0].admin_state_up = False
+        self._save_agents(agents)
+        self._test_schedule_bind_network([agents[0]], self.network_id)
+        scheduler = dhcp_agent_scheduler.ChanceScheduler()
+
+        scheduled = scheduler.schedule_networks(
+            mock.MagicMock(), self.ctx, [{'id': self.network_id}])
+        self.assertEqual({}, scheduled)
+
+    def test_schedule_networks_no_agents(self):
+        scheduler = dhcp_agent_scheduler.ChanceScheduler()
+        scheduled = scheduler.schedule_networks(
+            mock.MagicMock(), self.ctx, [{'id': self.network_id}])
+        self.assertEqual({}, scheduled)
+
+
+class DhcpWeightSchedulerTestCase(DhcpSchedulerTestBase):
+
+    def setUp(self):
+        super(DhcpWeightSchedulerTestCase, self).setUp()
+        self.scheduler = dhcp_agent_scheduler.WeightScheduler()
+        self.agents = self._get_agents(['host-a', 'host-b', 'host-c'])
+        self._save_agents(self.agents)
+
+    def _get_agents_load(self):
+        return self.scheduler._get_agents_load(self.ctx, self.agents)
+
+    def test_agents_load_networks(self):
+        self._save_networks(['net-1', 'net-2'])
+        self._test_schedule_bind_network([self.agents[0]], 'net-1')
+        self._test_schedule_bind_network([self.agents[0]], 'net-2')
+        self._test_schedule_bind_network([self.agents[1]], self.network_id)
+
+        load = self._get_agents_load()
+        self.assertEqual({self.agents[0].id: 2,
+                          self.agents[1].id: 1,
+                          self.agents[2].id: 0}, load)
+
+    def test_agents_load_ports(self):
+        cfg.CONF.set_override('dhcp_load_type', 'ports')
+        self._test_schedule_bind_network([self.agents[1]], self.network_id)
+        with self.ctx.session.begin(subtransactions=True):
+            for i in range(3):
+                self.ctx.session.add(models_v2.Port(
+                    network_id=self.network_id, mac_address='aa:%d' % i,
+                    admin_state_up=True, status='ACTIVE', device_id='',
+                    device_owner=''))
+
+        load = self._get_agents_load()
+        self.assertEqual({self.agents[0].id: 0,
+                          self.agents[1].id: 3,
+                          self.agents[2].id: 0}, load)
+
+    def test_schedule_picks_least_loaded_agent(self):
+        self._save_networks(['net-1', 'net-2'])
+        self._test_schedule_bind_network([self.agents[0]], 'net-1')
+        self._test_schedule_bind_network([self.agents[1]], 'net-2')
+        plugin = mock.MagicMock()
+        plugin.get_dhcp_agents_hosting_networks.return_value = []
+        plugin.get_agents_db.return_value = self.agents
+
+        chosen = self.scheduler.schedule(plugin, self.ctx,
+                                         {'id': self.network_id})
+        self.assertEqual([self.agents[2]], chosen)
+
+    def test_schedule_networks_balances_load(self):
+        network_ids = ['net-%d' % i for i in range(9)]
+        self._save_networks(network_ids)
+        self._test_schedule_bind_network([self.agents[0]], self.network_id)
+
+        self.scheduler.schedule_networks(
+            mock.MagicMock(), self.ctx, [{'id': n} for n in network_ids])
+        load = self._get_agents_load()
+        self.assertEqual([3, 3, 4], sorted(load.values()))
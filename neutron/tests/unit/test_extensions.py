@@ -14,8 +14,10 @@
 #    under the License.
 
 import abc
+import os
 
 import mock
+from oslo.config import cfg
 from oslo.serialization import jsonutils
 import routes
 import webob
@@ -596,6 +598,57 @@ class PluginAwareExtensionManagerTest(base.BaseTestCase):
                           extensions.PluginAwareExtensionManager,
                           '', plugin_info)
 
+    def _load_test_extensions(self, supported_extensions):
+        stub_plugin = ext_stubs.StubPlugin(
+            supported_extensions=supported_extensions)
+        with mock.patch.object(extensions.imp, 'load_source',
+                               wraps=extensions.imp.load_source) as load:
+            ext_mgr = extensions.PluginAwareExtensionManager(
+                extensions_path, {constants.CORE: stub_plugin})
+        loaded = [os.path.basename(args[1]) for args, kwargs
+                  in load.call_args_list]
+        return ext_mgr, loaded
+
+    def test_manifest_keeps_the_aliases_of_the_extensions(self):
+        self._load_test_extensions(["v2attrs"])
+
+        manifest = extensions.ExtensionManifest(
+            os.path.join(self.temp_dir, 'api_extensions.json'))
+        v2attributes = os.path.join(extensions_path, 'v2attributes.py')
+        foxinsocks = os.path.join(extensions_path, 'foxinsocks.py')
+        self.assertEqual("v2attrs", manifest.get_alias(v2attributes))
+        self.assertEqual("FOXNSOX", manifest.get_alias(foxinsocks))
+
+    def test_unsupported_extensions_of_manifest_are_not_imported(self):
+        _ext_mgr, loaded = self._load_test_extensions(["v2attrs"])
+        self.assertIn('foxinsocks.py', loaded)
+
+        ext_mgr, loaded = self._load_test_extensions(["v2attrs"])
+
+        self.assertEqual(['v2attributes.py'], loaded)
+        self.assertEqual(["v2attrs"], ext_mgr.extensions.keys())
+
+    def test_modified_extensions_of_manifest_are_imported(self):
+        self._load_test_extensions(["v2attrs"])
+        foxinsocks = os.path.join(extensions_path, 'foxinsocks.py')
+        stat = os.stat(foxinsocks)
+        self.addCleanup(os.utime, foxinsocks, (stat.st_atime, stat.st_mtime))
+        os.utime(foxinsocks, (stat.st_atime, stat.st_mtime + 1))
+
+        _ext_mgr, loaded = self._load_test_extensions(["v2attrs"])
+
+        self.assertEqual(['foxinsocks.py', 'v2attributes.py'], loaded)
+
+    def test_manifest_not_used_when_not_configured(self):
+        cfg.CONF.set_override('api_extensions_manifest', '')
+        self._load_test_extensions(["v2attrs"])
+
+        _ext_mgr, loaded = self._load_test_extensions(["v2attrs"])
+
+        self.assertEqual(4, len(loaded))
+        self.assertFalse(os.path.exists(
+            os.path.join(self.temp_dir, 'api_extensions.json')))
+
 
 class ExtensionControllerTest(testlib_api.WebTestCase):
 
@@ -16,6 +16,7 @@
 import os
 import sys
 
+import eventlet
 import mock
 from oslo.config import cfg
 
@@ -1023,6 +1024,75 @@ class IptablesManagerStateFulTestCase(base.BaseTestCase):
     def test_get_traffic_counters_with_zero_with_ipv6(self):
         self._test_get_traffic_counters_with_zero_helper(True)
 
+    def _test_get_chains_traffic_counters_helper(self, use_ipv6):
+        self.iptables = iptables_manager.IptablesManager(
+            root_helper=self.root_helper,
+            namespace='qrouter-1',
+            use_ipv6=use_ipv6)
+        self.execute = mock.patch.object(self.iptables, "execute").start()
+        self.iptables.ipv4['filter'].add_chain('chain1', wrap=False)
+        self.iptables.ipv4['filter'].add_chain('chain2', wrap=False)
+        if use_ipv6:
+            self.iptables.ipv6['filter'].add_chain('chain1', wrap=False)
+
+        iptables_dump = (
+            'Chain INPUT (policy ACCEPT 400 packets, 65901 bytes)\n'
+            '    pkts      bytes target     prot opt in     out     source'
+            '               destination         \n'
+            '     400   65901 chain1     all  --  *      *       0.0.0.0/0'
+            '            0.0.0.0/0           \n'
+            '\n'
+            'Chain chain1 (1 references)\n'
+            '    pkts      bytes target     prot opt in     out     source'
+            '               destination         \n'
+            '     100    1000            all  --  *      *       0.0.0.0/0'
+            '            0.0.0.0/0           \n'
+            '      20     300            all  --  *      *       0.0.0.0/0'
+            '            0.0.0.0/0           \n'
+            '\n'
+            'Chain chain2 (1 references)\n'
+            '    pkts      bytes target     prot opt in     out     source'
+            '               destination         \n'
+            '\n'
+            'Chain chain3 (0 references)\n'
+            '    pkts      bytes target     prot opt in     out     source'
+            '               destination         \n'
+            '       5       50            all  --  *      *       0.0.0.0/0'
+            '            0.0.0.0/0           \n')
+        exp_chain1 = {'pkts': 120, 'bytes': 1300}
+
+        expected_calls_and_values = [
+            (mock.call(['ip', 'netns', 'exec', 'qrouter-1', 'iptables',
+                        '-t', 'filter', '-L', '-n', '-v', '-x', '-Z'],
+                       root_helper=self.root_helper),
+             iptables_dump)]
+        if use_ipv6:
+            expected_calls_and_values.append(
+                (mock.call(['ip', 'netns', 'exec', 'qrouter-1', 'ip6tables',
+                            '-t', 'filter', '-L', '-n', '-v', '-x', '-Z'],
+                           root_helper=self.root_helper),
+                 iptables_dump))
+            exp_chain1 = {'pkts': 240, 'bytes': 2600}
+
+        tools.setup_mock_calls(self.execute, expected_calls_and_values)
+
+        with mock.patch.object(iptables_manager, "LOG") as log:
+            accs = self.iptables.get_chains_traffic_counters(
+                ['chain1', 'chain2', 'chain4'], wrap=False, zero=True)
+        self.assertEqual({'chain1': exp_chain1,
+                          'chain2': {'pkts': 0, 'bytes': 0}}, accs)
+        log.warn.assert_called_once_with(
+            'Attempted to get traffic counters of chain %s which '
+            'does not exist', 'chain4')
+
+        tools.verify_mock_calls(self.execute, expected_calls_and_values)
+
+    def test_get_chains_traffic_counters(self):
+        self._test_get_chains_traffic_counters_helper(False)
+
+    def test_get_chains_traffic_counters_with_ipv6(self):
+        self._test_get_chains_traffic_counters_helper(True)
+
     def _test_find_last_entry(self, find_str):
         filter_list = [':neutron-filter-top - [0:0]',
                        ':%(bn)s-FORWARD - [0:0]',
@@ -1058,3 +1128,76 @@ class IptablesManagerStateLessTestCase(base.BaseTestCase):
 
     def test_nat_not_found(self):
         self.assertNotIn('nat', self.iptables.ipv4)
+
+
+class IptablesApplyServiceTestCase(base.BaseTestCase):
+
+    def setUp(self):
+        super(IptablesApplyServiceTestCase, self).setUp()
+        cfg.CONF.register_opts(a_cfg.IPTABLES_OPTS, 'AGENT')
+        self.service = iptables_manager.IptablesApplyService(2)
+        self.applied = []
+        self.release = eventlet.event.Event()
+
+    def _manager(self, namespace):
+        manager = iptables_manager.IptablesManager(
+            namespace=namespace, apply_service=self.service)
+
+        def apply_locked():
+            self.applied.append(namespace)
+            self.release.wait()
+            return namespace
+        manager._apply_locked = apply_locked
+        return manager
+
+    def _run_ready_threads(self):
+        for i in range(3):
+            eventlet.sleep(0)
+
+    def test_apply_through_service(self):
+        manager = self._manager('ns1')
+        self.release.send()
+        manager.apply()
+        self.assertEqual(['ns1'], self.applied)
+        self.assertEqual(1, self.service.stats['applies'])
+
+    def test_namespaces_applied_in_parallel(self):
+        managers = [self._manager('ns%d' % i) for i in range(2)]
+        threads = [eventlet.spawn(m.apply) for m in managers]
+        self._run_ready_threads()
+        # Both applies started before either completed
+        self.assertEqual(['ns0', 'ns1'], self.applied)
+        self.release.send()
+        for thread in threads:
+            thread.wait()
+
+    def test_waiting_applies_are_merged(self):
+        busy = [self._manager('busy%d' % i) for i in range(2)]
+        manager = self._manager('ns1')
+        threads = [eventlet.spawn(m.apply) for m in busy]
+        self._run_ready_threads()
+        # The workers are busy, so the applies of ns1 wait and are merged
+        threads += [eventlet.spawn(manager.apply) for i in range(3)]
+        self._run_ready_threads()
+        self.release.send()
+        for thread in threads:
+            thread.wait()
+        self.assertEqual(['busy0', 'busy1', 'ns1'], self.applied)
+        self.assertEqual(2, self.service.stats['merged'])
+
+    def test_apply_started_is_not_merged(self):
+        manager = self._manager('ns1')
+        first = eventlet.spawn(manager.apply)
+        self._run_ready_threads()
+        second = eventlet.spawn(manager.apply)
+        self._run_ready_threads()
+        self.release.send()
+        first.wait()
+        second.wait()
+        self.assertEqual(['ns1', 'ns1'], self.applied)
+
+    def test_apply_failure_raised_to_waiters(self):
+        manager = self._manager('ns1')
+        manager._apply_locked = mock.Mock(side_effect=RuntimeError())
+        self.assertRaises(RuntimeError, manager.apply)
+        self.assertEqual(1, self.service.stats['failures'])
@@ -27,6 +27,7 @@ from neutron.agent.l3 import agent as l3_agent
 from neutron.agent.l3 import ha
 from neutron.agent.l3 import link_local_allocator as lla
 from neutron.agent.l3 import router_info as l3router
+from neutron.agent.l3 import router_processing_queue as l3_queue
 from neutron.agent.linux import interface
 from neutron.agent.linux import ra
 from neutron.common import config as base_config
@@ -183,7 +184,8 @@ class TestBasicRouterOperations(base.BaseTestCase):
         mock.patch('neutron.agent.l3.ha.AgentMixin'
                    '._init_ha_conf_path').start()
         mock.patch('neutron.agent.linux.keepalived.KeepalivedNotifierMixin'
-                   '._get_full_config_file_path').start()
+                   '._get_full_config_file_path',
+                   return_value='/non/existent/path').start()
 
         self.utils_exec_p = mock.patch(
             'neutron.agent.linux.utils.execute')
@@ -730,14 +732,47 @@ class TestBasicRouterOperations(base.BaseTestCase):
 
         # Test basic case
         ports[0]['subnet']['id'] = _get_subnet_id(ports[0])
-        agent._set_subnet_arp_info(ri, ports[0])
-        self.mock_ip_dev.neigh.add.assert_called_once_with(
-            4, '1.2.3.4', '00:11:22:33:44:55')
+        with mock.patch.object(agent, '_update_arp_entries') as update:
+            agent._set_subnet_arp_info(ri, ports[0])
+            update.assert_called_once_with(
+                ri, [{'ip_address': '1.2.3.4',
+                      'mac_address': '00:11:22:33:44:55',
+                      'subnet_id': _get_subnet_id(ports[0]),
+                      'operation': 'add'}])
 
-        # Test negative case
-        router['distributed'] = False
-        agent._set_subnet_arp_info(ri, ports[0])
-        self.mock_ip_dev.neigh.add.never_called()
+            # Test negative case
+            router['distributed'] = False
+            agent._set_subnet_arp_info(ri, ports[0])
+            self.assertEqual(1, update.call_count)
+
+    def _arp_entries_router(self, agent):
+        router = prepare_router_data(num_internal_ports=2)
+        agent._router_added(router['id'], router)
+        ri = agent.router_info[router['id']]
+        ports = router[l3_constants.INTERFACE_KEY]
+        entries = [{'ip_address': '1.7.23.11',
+                    'mac_address': '00:11:22:33:44:55',
+                    'subnet_id': _get_subnet_id(ports[0]),
+                    'operation': 'add'},
+                   {'ip_address': '1.7.23.12',
+                    'mac_address': '00:11:22:33:44:66',
+                    'subnet_id': _get_subnet_id(ports[1]),
+                    'operation': 'delete'},
+                   {'ip_address': '1.7.23.13',
+                    'mac_address': '00:11:22:33:44:77',
+                    'subnet_id': 'not-attached',
+                    'operation': 'add'}]
+        return ri, ports, entries
+
+    def test_update_arp_entries(self):
+        agent = l3_agent.L3NATAgent(HOSTNAME, self.conf)
+        ri, ports, entries = self._arp_entries_router(agent)
+        agent.update_arp_entries(None, {'router_id': ri.router_id,
+                                        'arp_table': entries})
+        self.mock_ip_dev.neigh.add.assert_called_once_with(
+            4, '1.7.23.11', '00:11:22:33:44:55')
+        self.mock_ip_dev.neigh.delete.assert_called_once_with(
+            4, '1.7.23.12', '00:11:22:33:44:66')
 
     def test_add_arp_entry(self):
         agent = l3_agent.L3NATAgent(HOSTNAME, self.conf)
@@ -754,6 +789,15 @@ class TestBasicRouterOperations(base.BaseTestCase):
         self.mock_ip_dev.neigh.add.assert_called_once_with(
             4, '1.7.23.11', '00:11:22:33:44:55')
 
+    def test_router_added_applies_iptables_through_service(self):
+        agent = l3_agent.L3NATAgent(HOSTNAME, self.conf)
+        router = prepare_router_data()
+        with mock.patch.object(agent.iptables_apply_service,
+                               'apply') as apply:
+            agent._router_added(router['id'], router)
+        ri = agent.router_info[router['id']]
+        apply.assert_called_once_with(ri.iptables_manager)
+
     def test_add_arp_entry_no_routerinfo(self):
         agent = l3_agent.L3NATAgent(HOSTNAME, self.conf)
         router = prepare_router_data(num_internal_ports=2)
@@ -1574,6 +1618,73 @@ vrrp_instance VR_1 {
         agent.routers_updated(None, [FAKE_ID])
         self.assertEqual(1, agent._queue.add.call_count)
 
+    def test_process_routers_worker_survives_failures(self):
+        agent = l3_agent.L3NATAgent(HOSTNAME, self.conf)
+        with contextlib.nested(
+            mock.patch.object(agent, '_process_router_update',
+                              side_effect=[Exception(), None, SystemExit()]),
+            mock.patch.object(l3_agent.LOG, 'exception')
+        ) as (process, log):
+            self.assertRaises(SystemExit, agent._process_routers_worker)
+        self.assertEqual(3, process.call_count)
+        self.assertEqual(1, log.call_count)
+
+    def test_process_routers_loop_starts_workers(self):
+        self.conf.set_override('router_processing_workers', 3)
+        agent = l3_agent.L3NATAgent(HOSTNAME, self.conf)
+        with mock.patch.object(l3_agent.eventlet, 'GreenPool') as pool:
+            agent._process_routers_loop()
+        pool.assert_called_once_with(size=3)
+        self.assertEqual(3, pool.return_value.spawn_n.call_count)
+
+    def test_report_state_includes_router_processing_stats(self):
+        agent_config.register_agent_state_opts_helper(self.conf)
+        self.conf.set_override('report_interval', 0, 'AGENT')
+        with mock.patch.object(l3_agent.agent_rpc,
+                               'PluginReportStateAPI') as state_rpc:
+            agent = l3_agent.L3NATAgentWithStateReport(HOSTNAME, self.conf)
+            agent._queue.add(l3_queue.RouterUpdate(FAKE_ID, 0))
+            agent._report_state()
+        state = state_rpc.return_value.report_state.call_args[0][1]
+        self.assertEqual(
+            1, state['statistics']['router_processing']['queue_depth'])
+        self.assertNotIn('router_processing', state['configurations'])
+
+    def test_report_state_includes_keepalived_stats(self):
+        agent_config.register_agent_state_opts_helper(self.conf)
+        self.conf.set_override('report_interval', 0, 'AGENT')
+        with mock.patch.object(l3_agent.agent_rpc,
+                               'PluginReportStateAPI') as state_rpc:
+            agent = l3_agent.L3NATAgentWithStateReport(HOSTNAME, self.conf)
+            agent.keepalived_stats['reloads'] += 2
+            agent._report_state()
+        state = state_rpc.return_value.report_state.call_args[0][1]
+        self.assertEqual({'reloads': 2}, state['statistics']['keepalived'])
+        self.assertNotIn('keepalived', state['configurations'])
+
+    def test_report_state_includes_iptables_apply_stats(self):
+        agent_config.register_agent_state_opts_helper(self.conf)
+        self.conf.set_override('report_interval', 0, 'AGENT')
+        with mock.patch.object(l3_agent.agent_rpc,
+                               'PluginReportStateAPI') as state_rpc:
+            agent = l3_agent.L3NATAgentWithStateReport(HOSTNAME, self.conf)
+            agent.iptables_apply_service.stats['applies'] += 3
+            agent._report_state()
+        state = state_rpc.return_value.report_state.call_args[0][1]
+        self.assertEqual(3, state['statistics']['iptables_apply']['applies'])
+
+    def test_ensure_keepalived_alive_scans_proc_once(self):
+        agent = l3_agent.L3NATAgent(HOSTNAME, self.conf)
+        routers = [mock.Mock(is_ha=True) for i in range(3)]
+        agent.router_info = dict(enumerate(routers))
+        with mock.patch.object(ha.external_process,
+                               'get_running_pids') as get_running_pids:
+            agent._ensure_keepalived_alive(None)
+        get_running_pids.assert_called_once_with()
+        for router in routers:
+            router.keepalived_manager.revive.assert_called_once_with(
+                get_running_pids.return_value)
+
     def test_removed_from_agent(self):
         agent = l3_agent.L3NATAgent(HOSTNAME, self.conf)
         agent._queue = mock.Mock()
@@ -1660,6 +1771,22 @@ vrrp_instance VR_1 {
     def test_disable_metadata_proxy_spawn(self):
         self._configure_metadata_proxy(enableflag=False)
 
+    def test_multiplexed_metadata_proxy(self):
+        self.conf.set_override('metadata_proxy_multiplexed', True)
+        with mock.patch('neutron.agent.metadata.multiplexed_proxy.'
+                        'MultiplexedProxyManager') as manager_cls:
+            agent = l3_agent.L3NATAgent(HOSTNAME, self.conf)
+            manager_cls.assert_called_once_with(self.conf, 'l3-agent',
+                                                'sudo')
+            manager = manager_cls.return_value
+            agent._spawn_metadata_proxy('router_id', 'qrouter-router_id')
+            manager.add.assert_called_once_with(
+                'router_id', 'qrouter-router_id', self.conf.metadata_port,
+                router_id='router_id')
+            agent._destroy_metadata_proxy('router_id', 'qrouter-router_id')
+            manager.remove.assert_called_once_with('router_id')
+        self.assertFalse(self.external_process.called)
+
     def test_metadata_nat_rules(self):
         self.conf.set_override('enable_metadata_proxy', False)
         agent = l3_agent.L3NATAgent(HOSTNAME, self.conf)
@@ -21,6 +21,7 @@ import mock
 import netaddr
 from oslo.config import cfg
 from oslo.utils import importutils
+from sqlalchemy import event as sa_event
 from webob import exc
 
 from neutron.api.rpc.agentnotifiers import l3_rpc_agent_api
@@ -29,6 +30,7 @@ from neutron.api.v2 import attributes
 from neutron.common import constants as l3_constants
 from neutron.common import exceptions as n_exc
 from neutron import context
+from neutron.db import api as db_api
 from neutron.db import common_db_mixin
 from neutron.db import db_base_plugin_v2
 from neutron.db import external_net_db
@@ -2127,6 +2129,54 @@ class L3AgentDbTestCaseBase(L3NatTestCaseMixin):
         self._test_notify_op_agent(self._test_floatingips_op_agent)
 
 
+class L3AgentSyncDataTestCaseMixin(object):
+
+    """Tests of the routers synchronized to the L3 agents by the plugins
+    which use the l3_db implementation of get_sync_data.
+    """
+
+    def _count_sync_data_queries(self, router_ids):
+        statements = []
+
+        def _record(conn, cursor, statement, *args):
+            statements.append(statement)
+
+        engine = db_api.get_engine()
+        sa_event.listen(engine, 'before_cursor_execute', _record)
+        try:
+            routers = self.plugin.get_sync_data(
+                context.get_admin_context(), router_ids)
+        finally:
+            sa_event.remove(engine, 'before_cursor_execute', _record)
+        return routers, len(statements)
+
+    def test_l3_agent_routers_query_count_independent_of_routers(self):
+        with contextlib.nested(self.router(), self.router(),
+                               self.router()) as routers:
+            with contextlib.nested(self.port(), self.port(),
+                                   self.port()) as ports:
+                router_ids = [r['router']['id'] for r in routers]
+                interfaces = zip(router_ids, [p['port']['id'] for p in ports])
+                self._router_interface_action('add', router_ids[0],
+                                              None, ports[0]['port']['id'])
+                sync_one, count_one = self._count_sync_data_queries(None)
+                for router_id, port_id in interfaces[1:]:
+                    self._router_interface_action('add', router_id,
+                                                  None, port_id)
+                sync_all, count_all = self._count_sync_data_queries(None)
+
+                self.assertEqual(3, len(sync_all))
+                for router in sync_all:
+                    router_intfs = router[l3_constants.INTERFACE_KEY]
+                    self.assertEqual(1, len(router_intfs))
+                    self.assertIn('subnet', router_intfs[0])
+                self.assertEqual(count_one, count_all)
+
+                for router_id, port_id in interfaces:
+                    self._router_interface_action('remove', router_id,
+                                                  None, port_id)
+
+
 class L3BaseForIntTests(test_db_plugin.NeutronDbPluginV2TestCase,
                         testlib_plugin.NotificationSetupHelper):
 
@@ -2303,7 +2353,8 @@ class L3RpcCallbackTestCase(base.BaseTestCase):
         self.assertEqual(expected_message, actual_message)
 
 
-class L3AgentDbIntTestCase(L3BaseForIntTests, L3AgentDbTestCaseBase):
+class L3AgentDbIntTestCase(L3BaseForIntTests, L3AgentDbTestCaseBase,
+                           L3AgentSyncDataTestCaseMixin):
 
     """Unit tests for methods called by the L3 agent for
     the case where core plugin implements L3 routing.
@@ -2315,7 +2366,8 @@ class L3AgentDbIntTestCase(L3BaseForIntTests, L3AgentDbTestCaseBase):
         self.plugin = self.core_plugin
 
 
-class L3AgentDbSepTestCase(L3BaseForSepTests, L3AgentDbTestCaseBase):
+class L3AgentDbSepTestCase(L3BaseForSepTests, L3AgentDbTestCaseBase,
+                           L3AgentSyncDataTestCaseMixin):
 
     """Unit tests for methods called by the L3 agent for the
     case where separate service plugin implements L3 routing.
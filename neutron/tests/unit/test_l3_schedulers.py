@@ -210,10 +210,23 @@ class L3SchedulerBaseTestCase(base.BaseTestCase):
         self._test_get_routers_can_schedule(routers, None, [])
 
     def test_bind_routers_centralized(self):
-        routers = [{'id': 'foo_router'}]
+        routers = [{'id': 'foo_router'}, {'id': 'bar_router'}]
+        agent = agents_db.Agent(id='foo_agent')
+        with mock.patch.object(self.scheduler,
+                               'bulk_bind_routers') as mock_bind:
+            self.scheduler.bind_routers(mock.ANY, mock.ANY, routers, agent)
+        mock_bind.assert_called_once_with(
+            mock.ANY, {'foo_router': agent, 'bar_router': agent})
+
+    def test_bulk_bind_routers_falls_back_on_conflict(self):
+        context = mock.Mock()
+        context.session.begin.side_effect = db_exc.DBDuplicateEntry()
+        scheduled = {'foo_router': mock.ANY, 'bar_router': mock.ANY}
         with mock.patch.object(self.scheduler, 'bind_router') as mock_bind:
-            self.scheduler.bind_routers(mock.ANY, mock.ANY, routers, mock.ANY)
-        mock_bind.assert_called_once_with(mock.ANY, 'foo_router', mock.ANY)
+            self.scheduler.bulk_bind_routers(context, scheduled)
+        mock_bind.assert_has_calls(
+            [mock.call(context, 'foo_router', mock.ANY),
+             mock.call(context, 'bar_router', mock.ANY)], any_order=True)
 
     def _test_bind_routers_ha(self, has_binding):
         routers = [{'id': 'foo_router', 'ha': True, 'tenant_id': '42'}]
@@ -831,6 +844,135 @@ class L3AgentLeastRoutersSchedulerTestCase(L3SchedulerTestCase):
 
                         self.assertNotEqual(agent_id1, agent_id3)
 
+    def _create_routers(self, count, ext_net_id=None):
+        router_ids = []
+        for i in range(count):
+            router = self._make_router(self.fmt, 'tenant_id', 'r%d' % i)
+            router_id = router['router']['id']
+            if ext_net_id:
+                self._add_external_gateway_to_router(router_id, ext_net_id)
+            router_ids.append(router_id)
+        return router_ids
+
+    def _get_routers_per_agent(self):
+        bindings = self.adminContext.session.query(
+            l3_agentschedulers_db.RouterL3AgentBinding)
+        load = dict.fromkeys([self.agent_id1, self.agent_id2], 0)
+        for binding in bindings:
+            load[binding.l3_agent_id] += 1
+        return load
+
+    def test_schedule_routers_balances_load(self):
+        with self.subnet() as subnet:
+            ext_net_id = subnet['subnet']['network_id']
+            self._set_net_external(ext_net_id)
+            # adding a gateway schedules the router, keep them unscheduled
+            # to exercise the batch
+            self._set_l3_agent_admin_state(self.adminContext,
+                                           self.agent_id1, False)
+            self._set_l3_agent_admin_state(self.adminContext,
+                                           self.agent_id2, False)
+            router_ids = (self._create_routers(4, ext_net_id) +
+                          self._create_routers(2))
+            self._set_l3_agent_admin_state(self.adminContext,
+                                           self.agent_id1, True)
+            self._set_l3_agent_admin_state(self.adminContext,
+                                           self.agent_id2, True)
+            with contextlib.nested(
+                mock.patch.object(self.plugin, 'get_l3_agent_candidates',
+                                  wraps=self.plugin.get_l3_agent_candidates),
+                mock.patch.object(self.plugin, 'get_l3_agent_with_min_routers')
+            ) as (candidates, min_routers):
+                scheduled = self.plugin.router_scheduler.schedule_routers(
+                    self.plugin, self.adminContext, router_ids)
+            self.assertEqual(set(router_ids), set(scheduled))
+            # candidates are computed once per external network
+            self.assertEqual(2, candidates.call_count)
+            self.assertFalse(min_routers.called)
+            self.assertEqual({self.agent_id1: 3, self.agent_id2: 3},
+                             self._get_routers_per_agent())
+
+    def test_schedule_routers_accounts_existing_load(self):
+        self._set_l3_agent_admin_state(self.adminContext,
+                                       self.agent_id2, False)
+        self.plugin.router_scheduler.schedule_routers(
+            self.plugin, self.adminContext, self._create_routers(3))
+        self._set_l3_agent_admin_state(self.adminContext,
+                                       self.agent_id2, True)
+        self.plugin.router_scheduler.schedule_routers(
+            self.plugin, self.adminContext, self._create_routers(5))
+        self.assertEqual({self.agent_id1: 4, self.agent_id2: 4},
+                         self._get_routers_per_agent())
+
+    def test_schedule_routers_skips_hosted_routers(self):
+        router_ids = self._create_routers(2)
+        self.plugin.router_scheduler.schedule_routers(
+            self.plugin, self.adminContext, router_ids)
+        load = self._get_routers_per_agent()
+        with mock.patch.object(self.plugin.router_scheduler,
+                               'bulk_bind_routers') as bulk_bind:
+            scheduled = self.plugin.router_scheduler.schedule_routers(
+                self.plugin, self.adminContext, router_ids)
+        self.assertEqual({}, scheduled)
+        self.assertFalse(bulk_bind.called)
+        self.assertEqual(load, self._get_routers_per_agent())
+
+    def test_reschedule_routers(self):
+        self._set_l3_agent_admin_state(self.adminContext,
+                                       self.agent_id2, False)
+        router_ids = self._create_routers(4)
+        self.plugin.router_scheduler.schedule_routers(
+            self.plugin, self.adminContext, router_ids)
+        self._set_l3_agent_admin_state(self.adminContext,
+                                       self.agent_id2, True)
+        self._set_l3_agent_dead(self.agent_id1)
+        rescheduled = self.plugin.reschedule_routers(self.adminContext,
+                                                     router_ids)
+        self.assertEqual(set(router_ids), set(rescheduled))
+        self.assertEqual({self.agent_id1: 0, self.agent_id2: 4},
+                         self._get_routers_per_agent())
+
+    def test_reschedule_routers_bulk_bind_conflict(self):
+        self._set_l3_agent_admin_state(self.adminContext,
+                                       self.agent_id2, False)
+        router_ids = self._create_routers(3)
+        scheduler = self.plugin.router_scheduler
+        scheduler.schedule_routers(self.plugin, self.adminContext, router_ids)
+        self._set_l3_agent_admin_state(self.adminContext,
+                                       self.agent_id2, True)
+        self._set_l3_agent_dead(self.agent_id1)
+        real_bulk_bind_routers = scheduler.bulk_bind_routers
+
+        def bulk_bind_routers(context, scheduled):
+            # A concurrent operation binds one of the routers first
+            other_context = q_context.get_admin_context()
+            router_id, agent = scheduled.items()[0]
+            with other_context.session.begin():
+                other_context.session.add(
+                    l3_agentschedulers_db.RouterL3AgentBinding(
+                        router_id=router_id, l3_agent_id=agent.id))
+            real_bulk_bind_routers(context, scheduled)
+
+        with mock.patch.object(scheduler, 'bulk_bind_routers',
+                               side_effect=bulk_bind_routers):
+            rescheduled = self.plugin.reschedule_routers(self.adminContext,
+                                                         router_ids)
+        self.assertEqual(set(router_ids), set(rescheduled))
+        self.assertEqual({self.agent_id1: 0, self.agent_id2: 3},
+                         self._get_routers_per_agent())
+
+    def test_reschedule_routers_keeps_unschedulable_routers(self):
+        router_ids = self._create_routers(2)
+        self.plugin.router_scheduler.schedule_routers(
+            self.plugin, self.adminContext, router_ids)
+        self._set_l3_agent_dead(self.agent_id1)
+        self._set_l3_agent_dead(self.agent_id2)
+        load = self._get_routers_per_agent()
+        rescheduled = self.plugin.reschedule_routers(self.adminContext,
+                                                     router_ids)
+        self.assertEqual({}, rescheduled)
+        self.assertEqual(load, self._get_routers_per_agent())
+
 
 class L3DvrScheduler(l3_db.L3_NAT_db_mixin,
                      l3_dvrscheduler_db.L3_DVRsch_db_mixin):
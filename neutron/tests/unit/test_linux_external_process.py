@@ -185,6 +185,20 @@ class TestProcessManager(base.BaseTestCase):
             manager = ep.ProcessManager(self.conf, 'uuid')
             self.assertFalse(manager.active)
 
+    def test_is_active_not_in_running_pids(self):
+        with mock.patch('__builtin__.open') as mock_open:
+            with mock.patch.object(ep.ProcessManager, 'pid') as pid:
+                pid.__get__ = mock.Mock(return_value=4)
+                manager = ep.ProcessManager(self.conf, 'uuid')
+                self.assertFalse(manager.is_active(set([1, 5])))
+            self.assertFalse(mock_open.called)
+
+    def test_get_running_pids(self):
+        with mock.patch('os.listdir',
+                        return_value=['1', '42', 'self', 'net']) as listdir:
+            self.assertEqual(set([1, 42]), ep.get_running_pids())
+        listdir.assert_called_once_with('/proc')
+
     def test_active_cmd_mismatch(self):
         with mock.patch('__builtin__.open') as mock_open:
             mock_open.return_value.__enter__ = lambda s: s
@@ -0,0 +1,318 @@
+# Copyright 2015 OpenStack Foundation
+#
+#    Licensed under the Apache License, Version 2.0 (the "License"); you may
+#    not use this file except in compliance with the License. You may obtain
+#    a copy of the License at
+#
+#         http://www.apache.org/licenses/LICENSE-2.0
+#
+#    Unless required by applicable law or agreed to in writing, software
+#    distributed under the License is distributed on an "AS IS" BASIS, WITHOUT
+#    WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied. See the
+#    License for the specific language governing permissions and limitations
+#    under the License.
+
+import contextlib
+import os
+import socket
+import stat
+import urllib2
+
+import fixtures
+import mock
+from oslo.config import cfg
+from oslo.serialization import jsonutils
+import testtools
+import webob
+
+from neutron.agent.metadata import multiplexed_proxy as mux_proxy
+from neutron.agent.metadata import namespace_proxy as ns_proxy
+from neutron.tests import base
+
+
+class TestNetworkNamespace(base.BaseTestCase):
+    def test_no_namespace(self):
+        with mock.patch.object(mux_proxy, '_setns') as setns:
+            with mux_proxy.network_namespace(None):
+                pass
+            self.assertFalse(setns.called)
+
+    def test_switch_and_restore(self):
+        own = mock.MagicMock()
+        target = mock.MagicMock()
+        own.__enter__.return_value.fileno.return_value = 3
+        target.__enter__.return_value.fileno.return_value = 4
+        with contextlib.nested(
+            mock.patch.object(mux_proxy, 'open', create=True,
+                              side_effect=[own, target]),
+            mock.patch.object(mux_proxy, '_setns')
+        ) as (open_mock, setns):
+            with mux_proxy.network_namespace('qrouter-1'):
+                setns.assert_called_once_with(4)
+            open_mock.assert_has_calls([
+                mock.call('/proc/self/ns/net'),
+                mock.call('/var/run/netns/qrouter-1')])
+            setns.assert_has_calls([mock.call(4), mock.call(3)])
+
+    def test_restore_on_error(self):
+        with contextlib.nested(
+            mock.patch.object(mux_proxy, 'open', create=True),
+            mock.patch.object(mux_proxy, '_setns')
+        ) as (open_mock, setns):
+            with testtools.ExpectedException(ValueError):
+                with mux_proxy.network_namespace('qrouter-1'):
+                    raise ValueError()
+            self.assertEqual(2, setns.call_count)
+
+
+class TestMultiplexedProxy(base.BaseTestCase):
+    def setUp(self):
+        super(TestMultiplexedProxy, self).setUp()
+        self.proxy = mux_proxy.MultiplexedProxy()
+        self.addCleanup(self._remove_all)
+
+    def _remove_all(self):
+        for uuid in list(self.proxy.proxies):
+            self.proxy.remove(uuid)
+
+    def _port(self, uuid):
+        return self.proxy.proxies[uuid].socket.getsockname()[1]
+
+    def test_add_serves_requests_tagged_with_id(self):
+        def proxy_request(handler, *args):
+            return webob.Response(body=handler.router_id or handler.network_id)
+
+        with mock.patch.object(ns_proxy.NetworkMetadataProxyHandler,
+                               '_proxy_request', autospec=True,
+                               side_effect=proxy_request):
+            self.proxy.add('r1', None, 0, router_id='r1')
+            self.proxy.add('n1', None, 0, network_id='n1')
+            for uuid in ('r1', 'n1'):
+                url = 'http://127.0.0.1:%d/latest' % self._port(uuid)
+                self.assertEqual(uuid, urllib2.urlopen(url).read())
+
+    def test_add_listens_in_namespace(self):
+        with contextlib.nested(
+            mock.patch.object(mux_proxy, 'network_namespace'),
+            mock.patch('eventlet.listen'),
+            mock.patch('eventlet.spawn')
+        ) as (netns, listen, spawn):
+            self.proxy.add('r1', 'qrouter-r1', 9697, router_id='r1')
+            netns.assert_called_once_with('qrouter-r1')
+            listen.assert_called_once_with(('0.0.0.0', 9697),
+                                           backlog=cfg.CONF.backlog)
+            self.proxy.proxies.clear()
+
+    def test_add_same_proxy_is_noop(self):
+        self.proxy.add('r1', None, 0, router_id='r1')
+        sock = self.proxy.proxies['r1'].socket
+        self.proxy.add('r1', None, 0, router_id='r1')
+        self.assertIs(sock, self.proxy.proxies['r1'].socket)
+
+    def test_add_moved_proxy_replaces_it(self):
+        self.proxy.add('r1', None, 0, router_id='r1')
+        port = self._port('r1')
+        with contextlib.nested(
+            mock.patch.object(mux_proxy, 'network_namespace'),
+            mock.patch.object(self.proxy, 'remove', wraps=self.proxy.remove)
+        ) as (netns, remove):
+            self.proxy.add('r1', 'qrouter-r1', 0, router_id='r1')
+        remove.assert_called_once_with('r1')
+        self.assertEqual('qrouter-r1', self.proxy.proxies['r1'].namespace)
+        self.assertNotEqual(port, self._port('r1'))
+
+    def test_remove_closes_socket(self):
+        self.proxy.add('r1', None, 0, router_id='r1')
+        port = self._port('r1')
+        self.proxy.remove('r1')
+        self.assertNotIn('r1', self.proxy.proxies)
+        client = socket.socket()
+        self.addCleanup(client.close)
+        self.assertRaises(socket.error, client.connect, ('127.0.0.1', port))
+
+    def test_remove_unknown_proxy(self):
+        self.proxy.remove('unknown')
+
+    def test_dispatch(self):
+        with contextlib.nested(
+            mock.patch.object(self.proxy, 'add'),
+            mock.patch.object(self.proxy, 'remove')
+        ) as (add, remove):
+            self.assertEqual({'status': 'ok'}, self.proxy.dispatch(
+                {'command': 'add', 'uuid': 'r1', 'namespace': 'ns',
+                 'port': 80, 'router_id': 'r1'}))
+            self.assertEqual({'status': 'ok'}, self.proxy.dispatch(
+                {'command': 'remove', 'uuid': 'r1'}))
+            add.assert_called_once_with(uuid='r1', namespace='ns', port=80,
+                                        router_id='r1')
+            remove.assert_called_once_with('r1')
+
+    def test_dispatch_list(self):
+        self.proxy.proxies = {'b': None, 'a': None}
+        self.assertEqual({'status': 'ok', 'proxies': ['a', 'b']},
+                         self.proxy.dispatch({'command': 'list'}))
+        self.proxy.proxies = {}
+
+    def test_dispatch_unknown_command(self):
+        self.assertRaises(ValueError, self.proxy.dispatch,
+                          {'command': 'reboot'})
+
+    def _control(self, *requests):
+        server, client = socket.socketpair()
+        for request in requests:
+            client.sendall(request + '\n')
+        client.shutdown(socket.SHUT_WR)
+        self.proxy.handle_control_connection(server)
+        replies = client.makefile().read().splitlines()
+        client.close()
+        return [jsonutils.loads(reply) for reply in replies]
+
+    def test_handle_control_connection(self):
+        with mock.patch.object(mux_proxy, 'LOG'):
+            replies = self._control(
+                jsonutils.dumps({'command': 'remove', 'uuid': 'r1'}),
+                jsonutils.dumps({'command': 'reboot'}),
+                'not json')
+        self.assertEqual('ok', replies[0]['status'])
+        self.assertEqual('error', replies[1]['status'])
+        self.assertIn('reboot', replies[1]['message'])
+        self.assertEqual('error', replies[2]['status'])
+
+
+class TestMultiplexedProxyDaemon(base.BaseTestCase):
+    def setUp(self):
+        super(TestMultiplexedProxyDaemon, self).setUp()
+        self.control_socket = self.useFixture(fixtures.TempDir()).join('ctl')
+        with mock.patch('neutron.agent.linux.daemon.Pidfile'):
+            self.daemon = mux_proxy.MultiplexedProxyDaemon(
+                'pidfile', self.control_socket, control_socket_user=42)
+
+    def test_listen_control(self):
+        open(self.control_socket, 'w').close()
+        with mock.patch('os.chown') as chown:
+            sock = self.daemon._listen_control()
+        self.addCleanup(sock.close)
+        chown.assert_called_once_with(self.control_socket, 42, -1)
+        self.assertTrue(stat.S_ISSOCK(os.stat(self.control_socket).st_mode))
+        self.assertEqual(0o600,
+                         stat.S_IMODE(os.stat(self.control_socket).st_mode))
+
+    def test_run(self):
+        with contextlib.nested(
+            mock.patch.object(self.daemon, '_listen_control'),
+            mock.patch.object(mux_proxy.MultiplexedProxy, 'serve_control')
+        ) as (listen, serve):
+            self.daemon.run()
+            serve.assert_called_once_with(listen.return_value)
+
+
+class TestMultiplexedProxyManager(base.BaseTestCase):
+    def setUp(self):
+        super(TestMultiplexedProxyManager, self).setUp()
+        self.conf = mock.Mock(external_pids='/pids',
+                              metadata_proxy_socket='/metadata_proxy')
+        with mock.patch('neutron.agent.linux.external_process.'
+                        'ProcessManager') as pm:
+            self.manager = mux_proxy.MultiplexedProxyManager(
+                self.conf, 'l3-agent', 'sudo')
+        pm.assert_called_once_with(self.conf, 'metadata-proxy-l3-agent',
+                                   'sudo')
+        self.process_manager = pm.return_value
+        self.request = mock.patch.object(self.manager, '_request').start()
+
+    def test_control_socket(self):
+        self.assertEqual('/pids/metadata-proxy-l3-agent.ctl',
+                         self.manager.control_socket)
+
+    def test_add_to_running_daemon(self):
+        self.process_manager.active = True
+        self.manager.add('r1', 'qrouter-r1', 9697, router_id='r1')
+        self.assertFalse(self.process_manager.enable.called)
+        self.request.assert_called_once_with(
+            {'command': 'add', 'uuid': 'r1', 'namespace': 'qrouter-r1',
+             'port': 9697, 'router_id': 'r1', 'network_id': None})
+
+    def test_add_spawns_daemon_and_replays_proxies(self):
+        self.process_manager.active = True
+        self.manager.add('r1', 'qrouter-r1', 9697, router_id='r1')
+        self.request.reset_mock()
+        self.process_manager.active = False
+        self.manager.add('r2', 'qrouter-r2', 9697, router_id='r2')
+        self.process_manager.enable.assert_called_once_with(mock.ANY)
+        self.assertEqual(
+            set(['r1', 'r2']),
+            set(c[0][0]['uuid'] for c in self.request.call_args_list))
+        for call in self.request.call_args_list:
+            self.assertEqual(mux_proxy.CONTROL_SOCKET_TIMEOUT,
+                             call[1]['timeout'])
+
+    def test_remove(self):
+        self.process_manager.active = True
+        self.manager.add('r1', 'qrouter-r1', 9697, router_id='r1')
+        self.manager.remove('r1')
+        self.assertEqual({}, self.manager.proxies)
+        self.request.assert_called_with({'command': 'remove', 'uuid': 'r1'})
+
+    def test_remove_without_daemon(self):
+        self.process_manager.active = False
+        self.manager.remove('r1')
+        self.assertFalse(self.request.called)
+        self.assertFalse(self.process_manager.enable.called)
+
+    def test_callback(self):
+        self.conf.log_file = None
+        self.conf.log_dir = None
+        self.conf.use_syslog = False
+        self.conf.debug = False
+        self.conf.verbose = False
+        callback = self.manager._get_callback()
+        with mock.patch('os.geteuid', return_value=42):
+            cmd = callback('/pids/metadata-proxy-l3-agent.pid')
+        self.assertEqual(
+            ['neutron-multiplexed-metadata-proxy',
+             '--pid_file=/pids/metadata-proxy-l3-agent.pid',
+             '--metadata_proxy_socket=/metadata_proxy',
+             '--control_socket=/pids/metadata-proxy-l3-agent.ctl',
+             '--control_socket_user=42'], cmd[:5])
+
+
+class TestMultiplexedProxyManagerRequest(base.BaseTestCase):
+    def setUp(self):
+        super(TestMultiplexedProxyManagerRequest, self).setUp()
+        conf = mock.Mock(external_pids='/pids')
+        with mock.patch('neutron.agent.linux.external_process.'
+                        'ProcessManager'):
+            self.manager = mux_proxy.MultiplexedProxyManager(
+                conf, 'l3-agent', 'sudo')
+        self.socket = mock.patch('socket.socket').start().return_value
+        self.stream = self.socket.makefile.return_value
+
+    def test_request(self):
+        self.stream.readline.return_value = '{"status": "ok"}\n'
+        reply = self.manager._request({'command': 'list'})
+        self.assertEqual({'status': 'ok'}, reply)
+        self.socket.connect.assert_called_once_with(
+            '/pids/metadata-proxy-l3-agent.ctl')
+        self.stream.write.assert_called_once_with('{"command": "list"}\n')
+        self.assertTrue(self.socket.close.called)
+
+    def test_request_error(self):
+        self.stream.readline.return_value = (
+            '{"status": "error", "message": "boom"}\n')
+        with testtools.ExpectedException(mux_proxy.ControlRequestFailed,
+                                         '.*boom'):
+            self.manager._request({'command': 'list'})
+
+    def test_request_retries_until_daemon_listens(self):
+        self.stream.readline.return_value = '{"status": "ok"}\n'
+        self.socket.connect.side_effect = [
+            socket.error(2, 'No such file'), None]
+        with mock.patch('eventlet.sleep') as sleep:
+            self.manager._request({'command': 'list'}, timeout=10)
+        self.assertEqual(2, self.socket.connect.call_count)
+        sleep.assert_called_once_with(0.1)
+
+    def test_request_no_daemon(self):
+        self.socket.connect.side_effect = socket.error(111, 'Refused')
+        self.assertRaises(mux_proxy.ControlRequestFailed,
+                          self.manager._request, {'command': 'list'})
@@ -100,3 +100,93 @@ class TestExclusiveRouterProcessor(base.BaseTestCase):
             raise Exception("Only the master should process a router")
 
         self.assertEqual(2, len([i for i in master.updates()]))
+
+
+class TestRouterProcessingQueue(base.BaseTestCase):
+    def setUp(self):
+        super(TestRouterProcessingQueue, self).setUp()
+        self.queue = l3_queue.RouterProcessingQueue()
+        # Routers never processed, unlike the routers of the other tests
+        self.id_1 = _uuid()
+        self.id_2 = _uuid()
+
+    def _next_update(self):
+        updates = list(self.queue.each_update_to_next_router())
+        self.assertEqual(1, len(updates))
+        return updates[0][1]
+
+    def test_updates_processed_by_priority_then_order(self):
+        self.queue.add(l3_queue.RouterUpdate(self.id_1, 1))
+        self.queue.add(l3_queue.RouterUpdate(self.id_2, 1))
+        rpc_id = _uuid()
+        self.queue.add(l3_queue.RouterUpdate(rpc_id, l3_queue.PRIORITY_RPC))
+        self.assertEqual([rpc_id, self.id_1, self.id_2],
+                         [self._next_update().id for i in range(3)])
+
+    def test_lower_priorities_get_a_share(self):
+        self.queue.add(l3_queue.RouterUpdate(self.id_1, 1))
+        rpc_ids = [_uuid() for i in range(l3_queue.LOWER_PRIORITY_SHARE)]
+        for rpc_id in rpc_ids:
+            self.queue.add(l3_queue.RouterUpdate(rpc_id,
+                                                 l3_queue.PRIORITY_RPC))
+        expected = rpc_ids[:-1] + [self.id_1] + rpc_ids[-1:]
+        self.assertEqual(expected, [self._next_update().id
+                                    for i in range(len(expected))])
+
+    def test_updates_of_waiting_router_merged(self):
+        self.queue.add(l3_queue.RouterUpdate(self.id_1, 1))
+        self.queue.add(l3_queue.RouterUpdate(self.id_2, 1))
+        for i in range(3):
+            self.queue.add(l3_queue.RouterUpdate(self.id_1, 1))
+        self.assertEqual([self.id_1, self.id_2],
+                         [self._next_update().id for i in range(2)])
+        self.assertEqual(3, self.queue.get_stats()['merged'])
+
+    def test_merged_update_takes_highest_priority(self):
+        self.queue.add(l3_queue.RouterUpdate(self.id_2, 1))
+        self.queue.add(l3_queue.RouterUpdate(self.id_1, 1))
+        self.queue.add(l3_queue.RouterUpdate(self.id_1, l3_queue.PRIORITY_RPC))
+        self.assertEqual([self.id_1, self.id_2],
+                         [self._next_update().id for i in range(2)])
+        self.assertEqual(0, self.queue.get_stats()['queue_depth'])
+
+    def test_stats(self):
+        self.queue.add(l3_queue.RouterUpdate(self.id_1, 1))
+        self.queue.add(l3_queue.RouterUpdate(self.id_2, 1))
+        self.assertEqual(2, self.queue.get_stats()['queue_depth'])
+        self._next_update()
+        stats = self.queue.get_stats()
+        self.assertEqual((1, 1), (stats['queue_depth'], stats['processed']))
+        self.assertTrue(stats['max_latency'] >= stats['mean_latency'] > 0)
+        # Latencies cover the updates processed since the previous call
+        self.assertEqual(0, self.queue.get_stats()['max_latency'])
+
+
+class TestRouterUpdateMerge(base.BaseTestCase):
+    def _update(self, priority=1, action=None, router=None, age=0):
+        return l3_queue.RouterUpdate(
+            FAKE_ID, priority, action=action, router=router,
+            timestamp=(datetime.datetime.utcnow() -
+                       datetime.timedelta(seconds=age)))
+
+    def test_merge_keeps_latest_router_data(self):
+        update = self._update(router={'id': 'old'}, age=10)
+        update.merge(self._update(router={'id': 'new'}))
+        self.assertEqual({'id': 'new'}, update.router)
+        update.merge(self._update(router={'id': 'older'}, age=20))
+        self.assertEqual({'id': 'new'}, update.router)
+
+    def test_merge_without_router_data_fetches_again(self):
+        update = self._update(router={'id': 'old'}, age=10)
+        update.merge(self._update(priority=l3_queue.PRIORITY_RPC))
+        self.assertIsNone(update.router)
+        self.assertEqual(l3_queue.PRIORITY_RPC, update.priority)
+
+    def test_merge_of_different_actions_reconciles(self):
+        update = self._update(action=l3_queue.DELETE_ROUTER)
+        update.merge(self._update(router={'id': 'new'}))
+        self.assertIsNone(update.action)
+        self.assertIsNone(update.router)
+        update = self._update(action=l3_queue.DELETE_ROUTER, age=10)
+        update.merge(self._update(action=l3_queue.DELETE_ROUTER))
+        self.assertEqual(l3_queue.DELETE_ROUTER, update.action)
@@ -0,0 +1,76 @@
+# Copyright 2015 OpenStack Foundation.
+# All Rights Reserved.
+#
+#    Licensed under the Apache License, Version 2.0 (the "License"); you may
+#    not use this file except in compliance with the License. You may obtain
+#    a copy of the License at
+#
+#         http://www.apache.org/licenses/LICENSE-2.0
+#
+#    Unless required by applicable law or agreed to in writing, software
+#    distributed under the License is distributed on an "AS IS" BASIS, WITHOUT
+#    WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied. See the
+#    License for the specific language governing permissions and limitations
+#    under the License.
+
+import mock
+from oslo.config import cfg
+
+from neutron import service
+from neutron.tests import base
+
+
+class TestPrepareWorkersFork(base.BaseTestCase):
+
+    def test_prepare_workers_fork(self):
+        with mock.patch.object(service.session, 'dispose_engines') as dispose:
+            with mock.patch.object(service, 'gc') as gc:
+                service._prepare_workers_fork()
+
+        dispose.assert_called_once_with()
+        gc.collect.assert_called_once_with()
+
+
+class TestWorkersFork(base.BaseTestCase):
+
+    def setUp(self):
+        super(TestWorkersFork, self).setUp()
+        self.prepare = mock.patch.object(service,
+                                         '_prepare_workers_fork').start()
+        mock.patch('neutron.common.config.load_paste_app').start()
+        self.server = mock.patch('neutron.wsgi.Server').start().return_value
+
+    def test_run_wsgi_with_workers_prepares_fork(self):
+        cfg.CONF.set_override('api_workers', 2)
+
+        service._run_wsgi('neutron')
+
+        self.prepare.assert_called_once_with()
+        self.server.start.assert_called_once_with(
+            mock.ANY, mock.ANY, mock.ANY, workers=2)
+
+    def test_run_wsgi_without_workers(self):
+        service._run_wsgi('neutron')
+
+        self.assertFalse(self.prepare.called)
+
+    def _serve_rpc(self, workers):
+        cfg.CONF.set_override('rpc_workers', workers)
+        with mock.patch('neutron.manager.NeutronManager.get_plugin'):
+            with mock.patch.object(service, 'RpcWorker'):
+                with mock.patch.object(service.common_service,
+                                       'ProcessLauncher') as launcher:
+                    service.serve_rpc()
+        return launcher.return_value
+
+    def test_serve_rpc_with_workers_prepares_fork(self):
+        launcher = self._serve_rpc(2)
+
+        self.prepare.assert_called_once_with()
+        launcher.launch_service.assert_called_once_with(mock.ANY, workers=2)
+
+    def test_serve_rpc_without_workers(self):
+        launcher = self._serve_rpc(0)
+
+        self.assertFalse(self.prepare.called)
+        self.assertFalse(launcher.launch_service.called)
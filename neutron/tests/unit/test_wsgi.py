@@ -456,6 +456,25 @@ class JSONDictSerializerTest(base.BaseTestCase):
 
         self.assertEqual(result, expected_json)
 
+    def test_serialize_chunks(self):
+        items = [{'id': i, 'name': u'\u7f51\u7edc'} for i in range(100)]
+        input_dict = {'networks': items, 'networks_links': []}
+        serializer = wsgi.JSONDictSerializer()
+        serializer.chunk_size = 100
+
+        chunks = list(serializer.serialize_chunks(
+            dict(input_dict, networks=iter(items))))
+
+        self.assertTrue(len(chunks) > 1)
+        self.assertEqual(serializer.serialize(input_dict), ''.join(chunks))
+
+    def test_serialize_chunks_empty_iterator(self):
+        serializer = wsgi.JSONDictSerializer()
+
+        chunks = serializer.serialize_chunks({'networks': iter([])})
+
+        self.assertEqual(['{"networks": []}'], list(chunks))
+
 
 class TextDeserializerTest(base.BaseTestCase):
 
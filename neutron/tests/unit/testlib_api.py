@@ -13,6 +13,9 @@
 #    License for the specific language governing permissions and limitations
 #    under the License.
 
+import contextlib
+
+from sqlalchemy import event
 import testtools
 
 from neutron.db import api as db_api
@@ -73,6 +76,25 @@ class SqlTestCase(base.BaseTestCase):
 
         self.addCleanup(clear_tables)
 
+    @contextlib.contextmanager
+    def assert_max_queries(self, budget):
+        """Fail when the code in the block runs more than budget queries."""
+        statements = []
+
+        def record(conn, cursor, statement, parameters, context,
+                   executemany):
+            statements.append(statement)
+
+        engine = db_api.get_engine()
+        event.listen(engine, 'after_cursor_execute', record)
+        try:
+            yield
+        finally:
+            event.remove(engine, 'after_cursor_execute', record)
+        if len(statements) > budget:
+            self.fail("%d queries run, over the budget of %d:\n%s" %
+                      (len(statements), budget, '\n'.join(statements)))
+
 
 class WebTestCase(SqlTestCase):
     fmt = 'json'
@@ -17,6 +17,7 @@
 import contextlib
 import time
 
+import eventlet
 import mock
 from oslo.config import cfg
 from oslo.serialization import jsonutils
@@ -503,32 +504,38 @@ class SyncTestCase(testlib_api.SqlTestCase):
                 self.fc.handle_get('/ws.v1/lrouter'))['results']
             fake_lswitchports = jsonutils.loads(
                 self.fc.handle_get('/ws.v1/lswitch/*/lport'))['results']
-            return_values = [
-                # Chunk 0 - lswitches
-                (fake_lswitches, None, 4),
-                # Chunk 0 - lrouters
-                (fake_lrouters[:2], 'xxx', 4),
-                # Chunk 0 - lports (size only)
-                ([], 'start', 4),
-                # Chunk 1 - lrouters (2 more) (lswitches are skipped)
-                (fake_lrouters[2:], None, None),
-                # Chunk 1 - lports
-                (fake_lswitchports, None, 4)]
-
-            def fake_fetch_data(*args, **kwargs):
-                return return_values.pop(0)
+            synchronizer = self._plugin._synchronizer
+            # The resource types are fetched concurrently, so the results
+            # are returned by URI
+            return_values = {
+                synchronizer.LS_URI: [
+                    # Chunk 0
+                    (fake_lswitches, None, 4)],
+                synchronizer.LR_URI: [
+                    # Chunk 0
+                    (fake_lrouters[:2], 'xxx', 4),
+                    # Chunk 1 (2 more)
+                    (fake_lrouters[2:], None, None)],
+                synchronizer.LP_URI: [
+                    # Chunk 0 (size only)
+                    ([], 'start', 4),
+                    # Chunk 1
+                    (fake_lswitchports, None, 4)]}
+
+            def fake_fetch_data(uri, cursor, page_size):
+                return return_values[uri].pop(0)
 
             # 2 Chunks, with 6 resources each.
             # 1st chunk lswitches and lrouters
             # 2nd chunk lrouters and lports
             # Mock _fetch_data
             with mock.patch.object(
-                self._plugin._synchronizer, '_fetch_data',
-                side_effect=fake_fetch_data):
+                synchronizer, '_fetch_data',
+                side_effect=fake_fetch_data) as fetch_data:
                 sp = sync.SyncParameters(6)
 
                 def do_chunk(chunk_idx, ls_cursor, lr_cursor, lp_cursor):
-                    self._plugin._synchronizer._synchronize_state(sp)
+                    synchronizer._synchronize_state(sp)
                     self.assertEqual(chunk_idx, sp.current_chunk)
                     self.assertEqual(ls_cursor, sp.ls_cursor)
                     self.assertEqual(lr_cursor, sp.lr_cursor)
@@ -540,6 +547,93 @@ class SyncTestCase(testlib_api.SqlTestCase):
                 do_chunk(0, None, None, None)
                 # Chunk size should have stayed the same
                 self.assertEqual(sp.chunk_size, 6)
+                # The resources left after the 1st chunk were all fetched
+                # by the last one
+                self.assertEqual(
+                    sorted([mock.call(synchronizer.LR_URI, 'xxx', 2),
+                            mock.call(synchronizer.LP_URI, 'start', 4)]),
+                    sorted(fetch_data.call_args_list[3:]))
+
+    def test_sync_fetches_resource_types_concurrently(self):
+        ctx = context.get_admin_context()
+        synchronizer = self._plugin._synchronizer
+        real_fetch_data = synchronizer._fetch_data
+        in_flight = []
+        max_in_flight = [0]
+
+        def fetch_data(*args):
+            in_flight.append(args[0])
+            max_in_flight[0] = max(max_in_flight[0], len(in_flight))
+            # Yield as waiting for the NSX backend would
+            eventlet.sleep(0)
+            try:
+                return real_fetch_data(*args)
+            finally:
+                in_flight.remove(args[0])
+
+        with self._populate_data(ctx):
+            with mock.patch.object(synchronizer, '_fetch_data',
+                                   side_effect=fetch_data):
+                self._test_sync(
+                    constants.NET_STATUS_ACTIVE,
+                    constants.PORT_STATUS_ACTIVE,
+                    constants.NET_STATUS_ACTIVE)
+        self.assertEqual(3, max_in_flight[0])
+
+    def test_sync_resource_stats(self):
+        ctx = context.get_admin_context()
+        synchronizer = self._plugin._synchronizer
+        with self._populate_data(ctx, net_size=2, port_size=1,
+                                 router_size=3):
+            synchronizer._synchronize_state(sync.SyncParameters(100))
+            exp_fetched = {
+                'lswitches': len(self.fc._fake_lswitch_dict),
+                'lrouters': len(self.fc._fake_lrouter_dict),
+                'lswitchports': len(self.fc._fake_lswitch_lport_dict)}
+        stats = synchronizer.get_resource_stats()
+        self.assertEqual(exp_fetched,
+                         dict((name, resource_stats['fetched'])
+                              for name, resource_stats in stats.items()))
+        for resource_stats in stats.values():
+            self.assertTrue(resource_stats['fetch_time'] >= 0)
+            self.assertTrue(resource_stats['sync_time'] >= 0)
+
+    def test_get_page_sizes_first_chunk(self):
+        sp = sync.SyncParameters(10)
+        sp.extra_chunk_size = 5
+        self.assertEqual(
+            {'lswitches': 15, 'lrouters': 15, 'lswitchports': 15},
+            self._plugin._synchronizer._get_page_sizes(sp))
+
+    def test_get_page_sizes_spreads_remaining_resources(self):
+        sp = sync.SyncParameters(10)
+        sp.current_chunk = 1
+        sp.num_chunks = 4
+        sp.ls_cursor = None
+        sp.lr_cursor = sp.lp_cursor = 'xxx'
+        sp.remaining = {'lswitches': 0, 'lrouters': 2, 'lswitchports': 10}
+        # Switches are complete, the routers left still get a page each
+        # chunk and the ports are rounded up to finish in the last chunk
+        self.assertEqual(
+            {'lrouters': 1, 'lswitchports': 4},
+            self._plugin._synchronizer._get_page_sizes(sp))
+
+    def test_sync_nsx_failure_in_one_resource_type_backoff(self):
+        synchronizer = self._plugin._synchronizer
+        real_fetch_data = synchronizer._fetch_data
+
+        def fetch_data(uri, cursor, page_size):
+            if uri == synchronizer.LR_URI:
+                raise api_exc.RequestTimeout()
+            return real_fetch_data(uri, cursor, page_size)
+
+        sp = sync.SyncParameters(999)
+        with mock.patch.object(synchronizer, '_fetch_data',
+                               side_effect=fetch_data):
+            self.assertEqual(1, synchronizer._synchronize_state(sp))
+        # The chunk is retried after the backoff
+        self.assertEqual(0, sp.current_chunk)
+        self.assertEqual(2, synchronizer._sync_backoff)
 
     def test_synchronize_network(self):
         ctx = context.get_admin_context()
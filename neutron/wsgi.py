@@ -18,6 +18,7 @@ Utility methods for working with WSGI servers
 """
 from __future__ import print_function
 
+import collections
 import errno
 import os
 import socket
@@ -101,7 +102,7 @@ class WorkerService(object):
         # We may have just forked from parent process.  A quick disposal of the
         # existing sql connections avoids producting 500 errors later when they
         # are discovered to be broken.
-        api.get_engine().pool.dispose()
+        api.dispose_engines()
         self._server = self._service.pool.spawn(self._service._run,
                                                 self._application,
                                                 self._service._socket)
@@ -403,11 +404,53 @@ class DictSerializer(ActionDispatcher):
 class JSONDictSerializer(DictSerializer):
     """Default JSON request body serialization."""
 
+    # Size of the chunks the streamed bodies are written in
+    chunk_size = 64 * 1024
+
     def default(self, data):
         def sanitizer(obj):
             return unicode(obj)
         return jsonutils.dumps(data, default=sanitizer)
 
+    def serialize_chunks(self, data):
+        """Serialize a dict into chunks of JSON.
+
+        The values of the dict which are iterators, like the collections
+        listed by the controllers when stream_collections is set, are
+        serialized an item at a time while being consumed. The chunks add up
+        to what default returns with lists instead of the iterators.
+        """
+        parts = []
+        size = 0
+        for part in self._iter_parts(data):
+            parts.append(part)
+            size += len(part)
+            if size >= self.chunk_size:
+                yield ''.join(parts)
+                parts = []
+                size = 0
+                # Let the other requests of the worker go on in between
+                eventlet.sleep(0)
+        if parts:
+            yield ''.join(parts)
+
+    def _iter_parts(self, data):
+        yield '{'
+        for i, (key, value) in enumerate(data.iteritems()):
+            if i:
+                yield ', '
+            yield self.default(key) + ': '
+            if isinstance(value, collections.Iterator):
+                yield '['
+                for j, item in enumerate(value):
+                    if j:
+                        yield ', '
+                    yield self.default(item)
+                yield ']'
+            else:
+                yield self.default(value)
+        yield '}'
+
 
 class ResponseHeaderSerializer(ActionDispatcher):
     """Default response headers serialization."""
@@ -0,0 +1,196 @@
+# Copyright 2015 OpenStack Foundation
+#
+#    Licensed under the Apache License, Version 2.0 (the "License"); you may
+#    not use this file except in compliance with the License. You may obtain
+#    a copy of the License at
+#
+#         http://www.apache.org/licenses/LICENSE-2.0
+#
+#    Unless required by applicable law or agreed to in writing, software
+#    distributed under the License is distributed on an "AS IS" BASIS, WITHOUT
+#    WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied. See the
+#    License for the specific language governing permissions and limitations
+#    under the License.
+
+"""Measure the listing of large collections through the API.
+
+A database is filled with ports, and a server process loads the ML2 plugin
+and the API application as neutron-server does, once building the whole
+response before sending it and once with stream_collections set. The ports
+are listed as the admin, the time to the first byte of the response and
+to its last byte are reported, along with the growth of the peak resident
+memory of the server while it handles the request.
+"""
+
+from __future__ import print_function
+
+import eventlet
+eventlet.monkey_patch()
+
+import argparse
+import httplib
+import os
+import shutil
+import signal
+import subprocess
+import sys
+import tempfile
+import time
+import uuid
+
+from oslo.config import cfg
+
+from neutron.common import config
+from neutron import service
+
+CONFIG = """
+[DEFAULT]
+core_plugin = neutron.plugins.ml2.plugin.Ml2Plugin
+rpc_backend = fake
+auth_strategy = noauth
+api_paste_config = %(paste)s
+state_path = %(state_path)s
+lock_path = %(state_path)s
+bind_host = 127.0.0.1
+bind_port = 0
+api_workers = 0
+stream_collections = %(stream)s
+
+[database]
+connection = sqlite:///%(state_path)s/neutron.sqlite
+
+[ml2]
+mechanism_drivers = openvswitch
+"""
+
+
+def serve(config_file):
+    """Start the API server as neutron-server does."""
+    config.init(['--config-file', config_file])
+    server = service._run_wsgi('neutron')
+    print(server.port)
+    sys.stdout.flush()
+    server.wait()
+
+
+def create_database(state_path, ports):
+    from neutron.db import api as db_api
+    from neutron.db.migration.models import head  # noqa
+    from neutron.db import model_base
+    from neutron.db import models_v2
+    from neutron.plugins.ml2 import models as ml2_models
+
+    cfg.CONF.set_override('connection',
+                          'sqlite:///%s/neutron.sqlite' % state_path,
+                          'database')
+    engine = db_api.get_engine()
+    model_base.BASEV2.metadata.create_all(engine)
+    tenant_id = 'tenant'
+    network_id = str(uuid.uuid4())
+    subnet_id = str(uuid.uuid4())
+    engine.execute(models_v2.Network.__table__.insert(),
+                   id=network_id, tenant_id=tenant_id, name='network',
+                   status='ACTIVE', admin_state_up=True, shared=False)
+    engine.execute(models_v2.Subnet.__table__.insert(),
+                   id=subnet_id, tenant_id=tenant_id, name='subnet',
+                   network_id=network_id, ip_version=4, cidr='10.0.0.0/8',
+                   gateway_ip='10.0.0.1', enable_dhcp=True, shared=False)
+    port_ids = [str(uuid.uuid4()) for i in range(ports)]
+    engine.execute(models_v2.Port.__table__.insert(), [
+        {'id': port_id, 'tenant_id': tenant_id, 'name': 'port-%d' % i,
+         'network_id': network_id,
+         'mac_address': 'fa:16:3e:%02x:%02x:%02x' % (
+             i >> 16 & 255, i >> 8 & 255, i & 255),
+         'admin_state_up': True, 'status': 'ACTIVE',
+         'device_id': str(uuid.uuid4()), 'device_owner': 'compute:nova'}
+        for i, port_id in enumerate(port_ids)])
+    engine.execute(models_v2.IPAllocation.__table__.insert(), [
+        {'port_id': port_id, 'subnet_id': subnet_id,
+         'network_id': network_id,
+         'ip_address': '10.%d.%d.%d' % (
+             (i + 2) >> 16 & 255, (i + 2) >> 8 & 255, (i + 2) & 255)}
+        for i, port_id in enumerate(port_ids)])
+    engine.execute(ml2_models.PortBinding.__table__.insert(), [
+        {'port_id': port_id, 'host': 'compute-%d' % (i % 100),
+         'vif_type': 'ovs', 'vif_details': '{"port_filter": true}'}
+        for i, port_id in enumerate(port_ids)])
+
+
+def read_peak_memory(pid):
+    """Return the peak resident memory of a process in kB."""
+    with open('/proc/%s/status' % pid) as f:
+        for line in f:
+            if line.startswith('VmHWM:'):
+                return int(line.split()[1])
+
+
+def measure(config_file):
+    server = subprocess.Popen(
+        [sys.executable, __file__, '--serve', config_file],
+        stdout=subprocess.PIPE)
+    try:
+        port = int(server.stdout.readline())
+        # Load what the first request loads before measuring
+        connection = httplib.HTTPConnection('127.0.0.1', port)
+        connection.request('GET', '/v2.0/networks.json')
+        connection.getresponse().read()
+        peak = read_peak_memory(server.pid)
+
+        start = time.time()
+        connection.request('GET', '/v2.0/ports.json')
+        response = connection.getresponse()
+        response.read(1)
+        first_byte = time.time() - start
+        size = 1 + len(response.read())
+        last_byte = time.time() - start
+        assert response.status == 200
+        connection.close()
+        growth = (read_peak_memory(server.pid) - peak) / 1024.0
+    finally:
+        server.send_signal(signal.SIGTERM)
+        server.wait()
+    return first_byte, last_byte, growth, size / 1024.0 / 1024.0
+
+
+def run(args):
+    state_path = tempfile.mkdtemp()
+    try:
+        compare(args, state_path)
+    finally:
+        shutil.rmtree(state_path)
+
+
+def compare(args, state_path):
+    create_database(state_path, args.ports)
+    paste = os.path.join(os.path.dirname(__file__), '..', '..', 'etc',
+                         'api-paste.ini')
+    print('%d ports' % args.ports)
+    print('%-10s %16s %15s %16s %14s' %
+          ('response', 'first byte (s)', 'last byte (s)',
+           'peak growth (MB)', 'body (MB)'))
+    for stream in (False, True):
+        config_file = os.path.join(state_path, 'neutron-%s.conf' % stream)
+        with open(config_file, 'w') as f:
+            f.write(CONFIG % {'paste': os.path.abspath(paste),
+                              'state_path': state_path,
+                              'stream': stream})
+        first_byte, last_byte, growth, size = measure(config_file)
+        print('%-10s %16.2f %15.2f %16.1f %14.1f' %
+              ('streamed' if stream else 'buffered', first_byte, last_byte,
+               growth, size))
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument('--ports', type=int, default=20000)
+    parser.add_argument('--serve', metavar='CONFIG_FILE',
+                        help=argparse.SUPPRESS)
+    args = parser.parse_args()
+    if args.serve:
+        serve(args.serve)
+    else:
+        run(args)
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,192 @@
+# Copyright 2015 OpenStack Foundation
+#
+#    Licensed under the Apache License, Version 2.0 (the "License"); you may
+#    not use this file except in compliance with the License. You may obtain
+#    a copy of the License at
+#
+#         http://www.apache.org/licenses/LICENSE-2.0
+#
+#    Unless required by applicable law or agreed to in writing, software
+#    distributed under the License is distributed on an "AS IS" BASIS, WITHOUT
+#    WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied. See the
+#    License for the specific language governing permissions and limitations
+#    under the License.
+
+"""Compare per-request and pooled HTTPS connections to SDN controllers.
+
+The OpenDaylight mechanism driver and the Big Switch server proxy send
+requests from concurrent green threads to a local TLS stand-in for their
+controller, once opening a connection for every request and once through
+their connection pools. The throughput, mean latency and number of
+connections the stand-in accepted are reported for each setup.
+
+The Big Switch client pins TLSv1, which recent OpenSSL builds refuse, so
+its stand-in is reached over plain HTTP and only saves TCP handshakes.
+"""
+
+from __future__ import print_function
+
+import eventlet
+eventlet.monkey_patch()
+
+import argparse
+import os
+import shutil
+import ssl
+import subprocess
+import sys
+import tempfile
+import time
+
+import eventlet.wsgi
+from oslo.config import cfg
+import requests
+
+from neutron.plugins.bigswitch import config as bsn_config
+from neutron.plugins.bigswitch.db import consistency_db
+from neutron.plugins.bigswitch import servermanager
+from neutron.plugins.ml2.drivers import mechanism_odl
+
+
+class NullLog(object):
+    def write(self, *args):
+        pass
+
+
+class Controller(object):
+    """Answer every request, counting the connections it accepted."""
+
+    def __init__(self, certfile=None, keyfile=None):
+        self.sock = eventlet.listen(('127.0.0.1', 0), backlog=1024)
+        if certfile:
+            self.sock = eventlet.wrap_ssl(self.sock, certfile=certfile,
+                                          keyfile=keyfile, server_side=True)
+        self.port = self.sock.getsockname()[1]
+        self.connections = 0
+        controller = self
+
+        class Protocol(eventlet.wsgi.HttpProtocol):
+            def handle(self):
+                controller.connections += 1
+                try:
+                    eventlet.wsgi.HttpProtocol.handle(self)
+                except ssl.SSLError:
+                    # Clients closing without a TLS shutdown
+                    pass
+
+        eventlet.spawn_n(eventlet.wsgi.server, self.sock, self,
+                         protocol=Protocol, log=NullLog(),
+                         custom_pool=eventlet.GreenPool(1000))
+
+    def __call__(self, environ, start_response):
+        # Emulate the cookies OpenDaylight authenticates the sessions with
+        # and the consistency hash of Big Switch
+        start_response('200 OK', [('Content-Type', 'application/json'),
+                                  (servermanager.HASH_MATCH_HEADER, 'hash'),
+                                  ('Set-Cookie', 'JSESSIONID=1'),
+                                  ('Set-Cookie', 'JSESSIONIDSSO=1')])
+        return ['{}']
+
+
+def make_certificate(tmpdir):
+    certfile = os.path.join(tmpdir, 'cert.pem')
+    keyfile = os.path.join(tmpdir, 'key.pem')
+    with open(os.devnull, 'w') as devnull:
+        subprocess.check_call(
+            ['openssl', 'req', '-x509', '-newkey', 'rsa:2048', '-nodes',
+             '-days', '1', '-subj', '/CN=localhost',
+             '-addext', 'subjectAltName=DNS:localhost',
+             '-keyout', keyfile, '-out', certfile],
+            stdout=devnull, stderr=devnull)
+    return certfile, keyfile
+
+
+def odl_client(port, pooled):
+    cfg.CONF.set_override('url', 'https://localhost:%d/neutron' % port,
+                          'ml2_odl')
+    cfg.CONF.set_override('username', 'admin', 'ml2_odl')
+    cfg.CONF.set_override('password', 'admin', 'ml2_odl')
+    driver = mechanism_odl.OpenDaylightMechanismDriver()
+    driver.initialize()
+    if not pooled:
+        # The module level functions open a connection for every request
+        driver.session = driver.auth.session = requests
+    return lambda: driver.sendjson('post', 'ports', {'port': {}})
+
+
+def bsn_client(port, pooled):
+    proxy = servermanager.ServerProxy(
+        'localhost', port, False, None, 'benchmark',
+        cfg.CONF.RESTPROXY.server_timeout, servermanager.BASE_URI,
+        'NeutronRestProxy', None, None)
+    # Servers not advertising keep-alive get a connection per request
+    proxy.capabilities = ['keep-alive'] if pooled else []
+
+    def call():
+        if proxy.rest_call('POST', '/ports', {'port': {}})[0] != 200:
+            raise RuntimeError('Request failed')
+    return call
+
+
+def measure(call, requests_count, concurrency):
+    latencies = []
+
+    def timed():
+        start = time.time()
+        call()
+        latencies.append(time.time() - start)
+
+    pool = eventlet.GreenPool(concurrency)
+    start = time.time()
+    for i in range(requests_count):
+        pool.spawn_n(timed)
+    pool.waitall()
+    rate = requests_count / (time.time() - start)
+    return rate, 1000 * sum(latencies) / len(latencies)
+
+
+def run(args):
+    tmpdir = tempfile.mkdtemp()
+    try:
+        certfile, keyfile = make_certificate(tmpdir)
+        os.environ['REQUESTS_CA_BUNDLE'] = certfile
+        bsn_config.register_config()
+        cfg.CONF.set_override('server_pool_size', args.concurrency,
+                              'RESTPROXY')
+        cfg.CONF.set_override('max_connections', args.concurrency, 'ml2_odl')
+        cfg.CONF.set_override('connection', 'sqlite://', 'database')
+        consistency_db.HashHandler()
+        consistency_db.ConsistencyHash.__table__.create(
+            consistency_db.HashHandler._FACADE.get_engine())
+
+        print('%d requests, concurrency %d' %
+              (args.requests, args.concurrency))
+        print('%-12s %-12s %10s %12s %12s' %
+              ('client', 'connections', 'req/s', 'latency (ms)',
+               'accepted'))
+        for name in ('opendaylight', 'bigswitch'):
+            for pooled in (False, True):
+                if name == 'opendaylight':
+                    controller = Controller(certfile, keyfile)
+                    call = odl_client(controller.port, pooled)
+                else:
+                    controller = Controller()
+                    call = bsn_client(controller.port, pooled)
+                rate, latency = measure(call, args.requests,
+                                        args.concurrency)
+                print('%-12s %-12s %10.1f %12.1f %12d' %
+                      (name, 'pooled' if pooled else 'per-request', rate,
+                       latency, controller.connections))
+    finally:
+        shutil.rmtree(tmpdir)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument('--requests', type=int, default=2000)
+    parser.add_argument('--concurrency', type=int, default=10)
+    run(parser.parse_args())
+
+
+if __name__ == '__main__':
+    sys.exit(main())
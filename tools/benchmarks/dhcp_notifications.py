@@ -0,0 +1,153 @@
+# Copyright 2015 OpenStack Foundation
+#
+#    Licensed under the Apache License, Version 2.0 (the "License"); you may
+#    not use this file except in compliance with the License. You may obtain
+#    a copy of the License at
+#
+#         http://www.apache.org/licenses/LICENSE-2.0
+#
+#    Unless required by applicable law or agreed to in writing, software
+#    distributed under the License is distributed on an "AS IS" BASIS, WITHOUT
+#    WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied. See the
+#    License for the specific language governing permissions and limitations
+#    under the License.
+
+"""Measure the cost of notifying the DHCP agents of port operations.
+
+Ports are created, updated and deleted on networks hosted by DHCP agents
+and the notifier of the API is told of each operation, as it would be on
+the API path. This is done once without caching nor batching, as the
+notifier used to, once with the agents of the networks cached and once
+with the notifications batched as well. The time spent on the API path,
+the number of SQL queries run and the number of messages cast to the
+agents are reported.
+"""
+
+from __future__ import print_function
+
+import eventlet
+eventlet.monkey_patch()
+
+import argparse
+import sys
+import time
+
+from oslo.config import cfg
+from oslo.utils import timeutils
+import sqlalchemy
+
+from neutron.api.rpc.agentnotifiers import dhcp_rpc_agent_api
+from neutron.common import config
+from neutron.common import constants
+from neutron.common import topics
+from neutron import context
+from neutron.db import agents_db
+from neutron.db import agentschedulers_db
+from neutron.db import api as db_api
+from neutron.db import db_base_plugin_v2
+from neutron.db.migration.models import head  # noqa
+from neutron.db import model_base
+from neutron.db import models_v2
+from neutron.scheduler import dhcp_agent_scheduler
+
+
+class FakePlugin(db_base_plugin_v2.NeutronDbPluginV2,
+                 agentschedulers_db.DhcpAgentSchedulerDbMixin):
+    supported_extension_aliases = [constants.DHCP_AGENT_SCHEDULER_EXT_ALIAS]
+
+    def __init__(self):
+        self.network_scheduler = dhcp_agent_scheduler.ChanceScheduler()
+
+    def get_agents_db(self, context, filters=None):
+        return context.session.query(agents_db.Agent).all()
+
+
+class Client(object):
+    """Stand-in for the RPC client counting the casts."""
+
+    def __init__(self):
+        self.casts = 0
+
+    def prepare(self, **kwargs):
+        return self
+
+    def cast(self, context, method, **kwargs):
+        self.casts += 1
+
+
+def populate(ctx, n_agents, n_networks):
+    now = timeutils.utcnow()
+    with ctx.session.begin():
+        for i in range(n_agents):
+            ctx.session.add(agents_db.Agent(
+                id='agent-%d' % i, binary='neutron-dhcp-agent',
+                host='host-%d' % i, topic=topics.DHCP_AGENT,
+                configurations='{}', agent_type=constants.AGENT_TYPE_DHCP,
+                created_at=now, started_at=now, heartbeat_timestamp=now))
+        for i in range(n_networks):
+            network_id = 'net-%d' % i
+            ctx.session.add(models_v2.Network(id=network_id, name='',
+                                              tenant_id='tenant',
+                                              admin_state_up=True,
+                                              status='ACTIVE', shared=False))
+            ctx.session.add(agentschedulers_db.NetworkDhcpAgentBinding(
+                network_id=network_id, dhcp_agent_id='agent-%d' %
+                (i % n_agents)))
+
+
+def notify(notifier, ctx, networks, ports):
+    for method in ('port.create.end', 'port.update.end', 'port.delete.end'):
+        for i in range(ports):
+            port = {'id': 'port-%d' % i, 'network_id': 'net-%d' %
+                    (i % networks), 'device_id': 'vm-%d' % i,
+                    'device_owner': 'compute:nova'}
+            notifier.notify(ctx, {'port': port}, method)
+
+
+def run(args):
+    config.init([])
+    cfg.CONF.set_override('connection', 'sqlite://', 'database')
+    engine = db_api.get_engine()
+    queries = [0]
+
+    def count(*args):
+        queries[0] += 1
+    sqlalchemy.event.listen(engine, 'before_cursor_execute', count)
+
+    print('%d agents, %d networks, %d ports created, updated and deleted' %
+          (args.agents, args.networks, args.ports))
+    print('%-10s %12s %10s %10s %10s' %
+          ('mode', 'API path (s)', 'total (s)', 'queries', 'casts'))
+    for mode, ttl, interval in (('legacy', 0, 0),
+                                ('cached', 10, 0),
+                                ('batched', 10, args.interval)):
+        model_base.BASEV2.metadata.drop_all(engine)
+        model_base.BASEV2.metadata.create_all(engine)
+        ctx = context.get_admin_context()
+        populate(ctx, args.agents, args.networks)
+        cfg.CONF.set_override('dhcp_agents_cache_ttl', ttl)
+        cfg.CONF.set_override('dhcp_notification_batch_interval', interval)
+        notifier = dhcp_rpc_agent_api.DhcpAgentNotifyAPI(plugin=FakePlugin())
+        notifier.client = Client()
+        queries[0] = 0
+        start = time.time()
+        notify(notifier, ctx, args.networks, args.ports)
+        api_path = time.time() - start
+        if notifier._batcher._flusher is not None:
+            notifier._batcher._flusher.wait()
+        print('%-10s %12.2f %10.2f %10d %10d' %
+              (mode, api_path, time.time() - start, queries[0],
+               notifier.client.casts))
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument('--agents', type=int, default=10)
+    parser.add_argument('--networks', type=int, default=100)
+    parser.add_argument('--ports', type=int, default=2000)
+    parser.add_argument('--interval', type=float, default=0.1)
+    run(parser.parse_args())
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,160 @@
+# Copyright 2015 OpenStack Foundation
+#
+#    Licensed under the Apache License, Version 2.0 (the "License"); you may
+#    not use this file except in compliance with the License. You may obtain
+#    a copy of the License at
+#
+#         http://www.apache.org/licenses/LICENSE-2.0
+#
+#    Unless required by applicable law or agreed to in writing, software
+#    distributed under the License is distributed on an "AS IS" BASIS, WITHOUT
+#    WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied. See the
+#    License for the specific language governing permissions and limitations
+#    under the License.
+
+"""Simulate the scheduling of many networks to DHCP agents.
+
+For each scheduler, networks holding a random number of ports are
+scheduled either one at a time, as done on network creation, or in bulk,
+and the runtime and resulting balance of the agents load are reported.
+"""
+
+from __future__ import print_function
+
+import argparse
+import math
+import random
+import sys
+import time
+
+from oslo.config import cfg
+from oslo.utils import timeutils
+
+from neutron.common import config
+from neutron.common import constants
+from neutron.common import topics
+from neutron import context
+from neutron.db import agents_db
+from neutron.db import agentschedulers_db
+from neutron.db import api as db_api
+from neutron.db.migration.models import head  # noqa
+from neutron.db import model_base
+from neutron.db import models_v2
+from neutron.scheduler import dhcp_agent_scheduler
+
+
+SCHEDULERS = {
+    'chance': dhcp_agent_scheduler.ChanceScheduler,
+    'weight': dhcp_agent_scheduler.WeightScheduler,
+}
+
+
+class FakePlugin(agentschedulers_db.DhcpAgentSchedulerDbMixin):
+    """Only the DB methods used by the schedulers are needed."""
+
+    def get_agents_db(self, context, filters=None):
+        query = context.session.query(agents_db.Agent)
+        query = query.filter(
+            agents_db.Agent.agent_type == constants.AGENT_TYPE_DHCP,
+            agents_db.Agent.admin_state_up.is_(True))
+        return query.all()
+
+
+def reset_db(engine):
+    model_base.BASEV2.metadata.drop_all(engine)
+    model_base.BASEV2.metadata.create_all(engine)
+
+
+def populate(ctx, n_agents, n_networks, max_ports):
+    random.seed(0)
+    now = timeutils.utcnow()
+    with ctx.session.begin():
+        for i in range(n_agents):
+            ctx.session.add(agents_db.Agent(
+                binary='neutron-dhcp-agent', host='host-%d' % i,
+                topic=topics.DHCP_AGENT, configurations='{}',
+                agent_type=constants.AGENT_TYPE_DHCP, created_at=now,
+                started_at=now, heartbeat_timestamp=now))
+        for i in range(n_networks):
+            network_id = 'net-%d' % i
+            ctx.session.add(models_v2.Network(id=network_id))
+            for j in range(random.randint(0, max_ports)):
+                ctx.session.add(models_v2.Port(
+                    network_id=network_id, mac_address='%d-%d' % (i, j),
+                    admin_state_up=True, status='ACTIVE', device_id='',
+                    device_owner=''))
+    return [{'id': 'net-%d' % i} for i in range(n_networks)]
+
+
+def get_load(ctx):
+    binding = agentschedulers_db.NetworkDhcpAgentBinding
+    load = dict((agent.id, [0, 0]) for agent in
+                ctx.session.query(agents_db.Agent))
+    query = ctx.session.query(binding.dhcp_agent_id, models_v2.Port.id)
+    query = query.outerjoin(
+        models_v2.Port, models_v2.Port.network_id == binding.network_id)
+    for agent_id, port_id in query:
+        load[agent_id][1] += port_id is not None
+    for (agent_id,) in ctx.session.query(binding.dhcp_agent_id):
+        load[agent_id][0] += 1
+    return load.values()
+
+
+def stats(values):
+    mean = float(sum(values)) / len(values)
+    stddev = math.sqrt(sum((v - mean) ** 2 for v in values) / len(values))
+    return '%6d %6d %9.1f %8.1f' % (min(values), max(values), mean, stddev)
+
+
+def run(args):
+    config.init([])
+    cfg.CONF.set_override('connection', 'sqlite://', 'database')
+    cfg.CONF.set_override('dhcp_agents_per_network', args.agents_per_network)
+    cfg.CONF.set_override('dhcp_load_type', args.load_type)
+    engine = db_api.get_engine()
+    plugin = FakePlugin()
+
+    print('%d agents, %d networks, up to %d ports per network, %d agents '
+          'per network, load type %s' %
+          (args.agents, args.networks, args.max_ports,
+           args.agents_per_network, args.load_type))
+    print('%-9s %-6s %8s | %-33s | %-33s' %
+          ('', '', '', 'networks per agent', 'ports per agent'))
+    print('%-9s %-6s %8s | %6s %6s %9s %8s | %6s %6s %9s %8s' %
+          (('scheduler', 'mode', 'time (s)') + ('min', 'max', 'mean',
+                                                'stddev') * 2))
+    for name in args.schedulers:
+        for mode in ('single', 'bulk'):
+            reset_db(engine)
+            ctx = context.get_admin_context()
+            networks = populate(ctx, args.agents, args.networks,
+                                args.max_ports)
+            scheduler = SCHEDULERS[name]()
+            start = time.time()
+            if mode == 'bulk':
+                scheduler.schedule_networks(plugin, ctx, networks)
+            else:
+                for network in networks:
+                    scheduler.schedule(plugin, ctx, network)
+            elapsed = time.time() - start
+            load = get_load(ctx)
+            print('%-9s %-6s %8.2f | %s | %s' %
+                  (name, mode, elapsed, stats([n for n, _p in load]),
+                   stats([p for _n, p in load])))
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument('--agents', type=int, default=20)
+    parser.add_argument('--networks', type=int, default=2000)
+    parser.add_argument('--max-ports', type=int, default=20)
+    parser.add_argument('--agents-per-network', type=int, default=1)
+    parser.add_argument('--load-type', default='ports',
+                        choices=['networks', 'subnets', 'ports'])
+    parser.add_argument('--schedulers', nargs='+', default=sorted(SCHEDULERS),
+                        choices=sorted(SCHEDULERS))
+    run(parser.parse_args())
+
+
+if __name__ == '__main__':
+    sys.exit(main())
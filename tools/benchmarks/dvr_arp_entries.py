@@ -0,0 +1,154 @@
+# Copyright 2015 OpenStack Foundation
+#
+#    Licensed under the Apache License, Version 2.0 (the "License"); you may
+#    not use this file except in compliance with the License. You may obtain
+#    a copy of the License at
+#
+#         http://www.apache.org/licenses/LICENSE-2.0
+#
+#    Unless required by applicable law or agreed to in writing, software
+#    distributed under the License is distributed on an "AS IS" BASIS, WITHOUT
+#    WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied. See the
+#    License for the specific language governing permissions and limitations
+#    under the License.
+
+"""Measure the cost of sending the ARP entries of DVR routers.
+
+VM ports are created and deleted on subnets attached to distributed
+routers and the server is told of each of them, as it would be on the API
+path. This is done once entry by entry without caching, as the server used
+to, once with the router of the subnets cached and once with the entries
+batched as well. The time spent on the API path, the number of SQL queries
+run and the number of messages cast to the agents are reported.
+"""
+
+from __future__ import print_function
+
+import eventlet
+eventlet.monkey_patch()
+
+import argparse
+import sys
+import time
+
+from oslo.config import cfg
+import sqlalchemy
+
+from neutron.common import config
+from neutron.common import constants
+from neutron import context
+from neutron.db import api as db_api
+from neutron.db import l3_attrs_db
+from neutron.db import l3_db
+from neutron.db import l3_dvr_db
+from neutron.db.migration.models import head  # noqa
+from neutron.db import model_base
+from neutron.db import models_v2
+
+
+class Notifier(object):
+    """Stand-in for the L3 agent notifier counting the casts."""
+
+    def __init__(self):
+        self.casts = 0
+
+    def _cast(self, *args):
+        self.casts += 1
+
+    add_arp_entry = del_arp_entry = update_arp_entries = _cast
+
+
+def populate(ctx, n_routers, n_subnets):
+    with ctx.session.begin():
+        for i in range(n_routers):
+            ctx.session.add(l3_db.Router(id='router-%d' % i,
+                                         tenant_id='tenant',
+                                         admin_state_up=True,
+                                         status='ACTIVE'))
+            ctx.session.add(l3_attrs_db.RouterExtraAttributes(
+                router_id='router-%d' % i, distributed=True))
+        for i in range(n_subnets):
+            network_id = 'net-%d' % i
+            subnet_id = 'subnet-%d' % i
+            port_id = 'port-%d' % i
+            router_id = 'router-%d' % (i % n_routers)
+            ctx.session.add(models_v2.Network(id=network_id,
+                                              tenant_id='tenant',
+                                              admin_state_up=True,
+                                              status='ACTIVE', shared=False))
+            ctx.session.add(models_v2.Subnet(id=subnet_id,
+                                             network_id=network_id,
+                                             ip_version=4,
+                                             cidr='10.%d.0.0/16' % i))
+            ctx.session.add(models_v2.Port(
+                id=port_id, network_id=network_id,
+                mac_address='fa:16:3e:00:%02x:%02x' % (i >> 8, i & 255),
+                admin_state_up=True, status='ACTIVE', device_id=router_id,
+                device_owner=constants.DEVICE_OWNER_DVR_INTERFACE))
+            ctx.session.add(l3_db.RouterPort(
+                router_id=router_id, port_id=port_id,
+                port_type=constants.DEVICE_OWNER_DVR_INTERFACE))
+            ctx.session.add(models_v2.IPAllocation(
+                port_id=port_id, ip_address='10.%d.0.1' % i,
+                subnet_id=subnet_id, network_id=network_id))
+
+
+def update(plugin, ctx, subnets, ports):
+    for action in ('add', 'del'):
+        for i in range(ports):
+            port = {'device_owner': 'compute:nova',
+                    'mac_address': 'fa:16:3e:%02x:%02x:%02x' % (
+                        i >> 16, (i >> 8) & 255, i & 255),
+                    'fixed_ips': [{'ip_address': '10.%d.%d.%d' % (
+                                       i % subnets, i // 250, i % 250 + 2),
+                                   'subnet_id': 'subnet-%d' % (i % subnets)}]}
+            plugin.dvr_vmarp_table_update(ctx, port, action)
+
+
+def run(args):
+    config.init([])
+    cfg.CONF.set_override('connection', 'sqlite://', 'database')
+    engine = db_api.get_engine()
+    queries = [0]
+
+    def count(*args):
+        queries[0] += 1
+    sqlalchemy.event.listen(engine, 'before_cursor_execute', count)
+
+    print('%d routers, %d subnets, %d VM ports created and deleted' %
+          (args.routers, args.subnets, args.ports))
+    print('%-10s %12s %10s %10s %10s' %
+          ('mode', 'API path (s)', 'total (s)', 'queries', 'casts'))
+    for mode, ttl, interval in (('legacy', 0, 0),
+                                ('cached', 10, 0),
+                                ('batched', 10, args.interval)):
+        model_base.BASEV2.metadata.drop_all(engine)
+        model_base.BASEV2.metadata.create_all(engine)
+        ctx = context.get_admin_context()
+        populate(ctx, args.routers, args.subnets)
+        cfg.CONF.set_override('dvr_router_cache_ttl', ttl)
+        cfg.CONF.set_override('dvr_arp_batch_interval', interval)
+        plugin = l3_dvr_db.L3_NAT_with_dvr_db_mixin()
+        plugin.l3_rpc_notifier = notifier = Notifier()
+        queries[0] = 0
+        start = time.time()
+        update(plugin, ctx, args.subnets, args.ports)
+        api_path = time.time() - start
+        if plugin._arp_batcher._flusher is not None:
+            plugin._arp_batcher._flusher.wait()
+        print('%-10s %12.2f %10.2f %10d %10d' %
+              (mode, api_path, time.time() - start, queries[0],
+               notifier.casts))
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument('--routers', type=int, default=10)
+    parser.add_argument('--subnets', type=int, default=50)
+    parser.add_argument('--ports', type=int, default=2000)
+    parser.add_argument('--interval', type=float, default=0.1)
+    run(parser.parse_args())
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,151 @@
+# Copyright 2015 OpenStack Foundation
+#
+#    Licensed under the Apache License, Version 2.0 (the "License"); you may
+#    not use this file except in compliance with the License. You may obtain
+#    a copy of the License at
+#
+#         http://www.apache.org/licenses/LICENSE-2.0
+#
+#    Unless required by applicable law or agreed to in writing, software
+#    distributed under the License is distributed on an "AS IS" BASIS, WITHOUT
+#    WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied. See the
+#    License for the specific language governing permissions and limitations
+#    under the License.
+
+"""Compare applying router iptables rules in the caller and through a service.
+
+A full synchronization of the L3 agent is emulated: router workers apply
+the rules of each router namespace twice, as adding a router does, while
+as many firewall agent workers apply their rules to every router at the
+same time. The
+iptables-save and iptables-restore commands are replaced by processes
+taking a fixed time, so that neither root privileges nor iptables are
+needed. The duration of the synchronization, the number of applies that
+ran and the mean time an apply took are reported for each setup.
+"""
+
+from __future__ import print_function
+
+import eventlet
+eventlet.monkey_patch()
+
+import argparse
+import shutil
+import sys
+import tempfile
+import time
+
+from oslo.config import cfg
+
+from neutron.agent.common import config
+from neutron.agent.linux import iptables_manager
+from neutron.agent.linux import utils
+
+
+class Iptables(object):
+    """Stand-in for the iptables commands of many namespaces."""
+
+    def __init__(self, delay):
+        self.delay = delay
+        self.dumps = {}
+        self.applies = 0
+
+    def execute(self, args, root_helper=None, process_input=None):
+        namespace = args[3]
+        # Spawn a process like the real commands would
+        output = utils.execute(['sh', '-c', 'sleep %s; cat' % self.delay],
+                               process_input=process_input or '')
+        if args[4].endswith('-save'):
+            return self.dumps.get(namespace, '')
+        self.applies += 1
+        self.dumps[namespace] = output
+
+
+def make_managers(routers, iptables, service):
+    managers = []
+    for i in range(routers):
+        manager = iptables_manager.IptablesManager(
+            _execute=iptables.execute, namespace='qrouter-%d' % i,
+            apply_service=service)
+        for j in range(20):
+            manager.ipv4['nat'].add_rule('float-snat',
+                                         '-s 10.0.%d.%d -j SNAT' % (i, j))
+        managers.append(manager)
+    return managers
+
+
+def synchronize(managers, workers):
+    def router_update(manager):
+        manager.apply()
+        manager.apply()
+
+    def firewall_agent():
+        pool = eventlet.GreenPool(workers)
+        for manager in managers:
+            pool.spawn_n(manager.apply)
+        pool.waitall()
+
+    firewall = eventlet.spawn(firewall_agent)
+    pool = eventlet.GreenPool(workers)
+    for manager in managers:
+        pool.spawn_n(router_update, manager)
+    pool.waitall()
+    firewall.wait()
+
+
+def run(args):
+    config.register_iptables_opts(cfg.CONF)
+    lock_path = tempfile.mkdtemp()
+    cfg.CONF.set_override('lock_path', lock_path)
+    try:
+        compare(args)
+    finally:
+        shutil.rmtree(lock_path)
+
+
+def compare(args):
+    print('%d routers, %d router workers, %d apply workers, %.3fs per '
+          'command' % (args.routers, args.workers, args.apply_workers,
+                       args.delay))
+    print('%-10s %10s %10s %16s' %
+          ('mode', 'time (s)', 'applies', 'mean apply (s)'))
+    for mode in ('caller', 'service'):
+        iptables = Iptables(args.delay)
+        service = None
+        if mode == 'service':
+            service = iptables_manager.IptablesApplyService(
+                args.apply_workers)
+        managers = make_managers(args.routers, iptables, service)
+        applies = []
+        if not service:
+            # Time the applies run by the callers
+            for manager in managers:
+                apply_locked = manager._apply_locked
+
+                def timed(apply_locked=apply_locked):
+                    start = time.time()
+                    apply_locked()
+                    applies.append(time.time() - start)
+                manager._apply_locked = timed
+        start = time.time()
+        synchronize(managers, args.workers)
+        duration = time.time() - start
+        if service:
+            mean = service.stats['apply_time'] / service.stats['applies']
+        else:
+            mean = sum(applies) / len(applies)
+        print('%-10s %10.2f %10d %16.3f' %
+              (mode, duration, iptables.applies, mean))
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument('--routers', type=int, default=200)
+    parser.add_argument('--workers', type=int, default=8)
+    parser.add_argument('--apply-workers', type=int, default=16)
+    parser.add_argument('--delay', type=float, default=0.1)
+    run(parser.parse_args())
+
+
+if __name__ == '__main__':
+    sys.exit(main())
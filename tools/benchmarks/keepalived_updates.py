@@ -0,0 +1,150 @@
+# Copyright 2015 OpenStack Foundation
+#
+#    Licensed under the Apache License, Version 2.0 (the "License"); you may
+#    not use this file except in compliance with the License. You may obtain
+#    a copy of the License at
+#
+#         http://www.apache.org/licenses/LICENSE-2.0
+#
+#    Unless required by applicable law or agreed to in writing, software
+#    distributed under the License is distributed on an "AS IS" BASIS, WITHOUT
+#    WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied. See the
+#    License for the specific language governing permissions and limitations
+#    under the License.
+
+"""Measure the keepalived handling of the L3 agent for many HA routers.
+
+A keepalived instance is spawned for every router, then the routers are
+updated without any change to their configuration, once reloading
+keepalived as the agent used to and once only when the configuration
+file changed. The liveness of all the instances is then checked, once
+router by router and once against a single scan of /proc. The time
+taken and the number of processes spawned are reported for each step.
+
+keepalived is replaced by a daemon ignoring SIGHUP, so that neither root
+privileges nor keepalived are needed.
+"""
+
+from __future__ import print_function
+
+import argparse
+import os
+import shutil
+import stat
+import sys
+import tempfile
+import time
+
+from neutron.agent.linux import external_process
+from neutron.agent.linux import keepalived
+from neutron.agent.linux import utils
+
+KEEPALIVED = """#!%s
+import os
+import signal
+import sys
+import time
+
+if os.fork() or os.fork():
+    os._exit(0)
+# Detach from the pipes the agent waits on, as a daemon does
+devnull = os.open(os.devnull, os.O_RDWR)
+for fd in range(3):
+    os.dup2(devnull, fd)
+signal.signal(signal.SIGHUP, signal.SIG_IGN)
+with open(sys.argv[sys.argv.index('-p') + 1], 'w') as f:
+    f.write(str(os.getpid()))
+while True:
+    time.sleep(1000)
+""" % sys.executable
+
+
+def legacy_restart(manager):
+    # The behaviour before the configuration was diffed
+    if manager.process.active:
+        manager._output_config_file()
+        manager.process.reload_cfg()
+    else:
+        manager.process.disable()
+        manager.spawn()
+
+
+def make_managers(routers, conf_path):
+    managers = []
+    for i in range(routers):
+        config = keepalived.KeepalivedConf()
+        instance = keepalived.KeepalivedInstance('BACKUP', 'ha-%d' % i, i,
+                                                 nopreempt=True)
+        instance.vips.append(keepalived.KeepalivedVipAddress(
+            '10.0.%d.%d/24' % (i // 250, i % 250 + 1), 'qr-%d' % i))
+        config.add_instance(instance)
+        managers.append(keepalived.KeepalivedManager(
+            'router-%d' % i, config, conf_path=conf_path))
+    return managers
+
+
+def run(args):
+    processes = [0]
+    execute = utils.execute
+
+    def counting_execute(*a, **kw):
+        processes[0] += 1
+        return execute(*a, **kw)
+    utils.execute = counting_execute
+
+    tmpdir = tempfile.mkdtemp()
+    os.environ['PATH'] = '%s:%s' % (tmpdir, os.environ['PATH'])
+    stand_in = os.path.join(tmpdir, 'keepalived')
+    with open(stand_in, 'w') as f:
+        f.write(KEEPALIVED)
+    os.chmod(stand_in, stat.S_IRWXU)
+    managers = make_managers(args.routers, tmpdir)
+
+    def step(name, func):
+        processes[0] = 0
+        start = time.time()
+        func()
+        print('%-24s %10.2f %10d' % (name, time.time() - start,
+                                     processes[0]))
+
+    def update(restart):
+        def func():
+            for i in range(args.updates):
+                for manager in managers:
+                    restart(manager)
+        return func
+
+    def sweep(running_pids):
+        def func():
+            for i in range(args.sweeps):
+                pids = external_process.get_running_pids() if running_pids \
+                    else None
+                for manager in managers:
+                    manager.revive(pids)
+        return func
+
+    print('%d HA routers, %d updates, %d liveness sweeps' %
+          (args.routers, args.updates, args.sweeps))
+    print('%-24s %10s %10s' % ('step', 'time (s)', 'processes'))
+    try:
+        step('spawn', lambda: [manager.spawn() for manager in managers])
+        step('update, always reload', update(legacy_restart))
+        step('update, diffed', update(keepalived.KeepalivedManager.restart))
+        step('sweep, per router', sweep(False))
+        step('sweep, one /proc scan', sweep(True))
+    finally:
+        for manager in managers:
+            manager.disable()
+        shutil.rmtree(tmpdir)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument('--routers', type=int, default=200)
+    parser.add_argument('--updates', type=int, default=5)
+    parser.add_argument('--sweeps', type=int, default=20)
+    run(parser.parse_args())
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,167 @@
+# Copyright 2015 OpenStack Foundation
+#
+#    Licensed under the Apache License, Version 2.0 (the "License"); you may
+#    not use this file except in compliance with the License. You may obtain
+#    a copy of the License at
+#
+#         http://www.apache.org/licenses/LICENSE-2.0
+#
+#    Unless required by applicable law or agreed to in writing, software
+#    distributed under the License is distributed on an "AS IS" BASIS, WITHOUT
+#    WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied. See the
+#    License for the specific language governing permissions and limitations
+#    under the License.
+
+"""Replay a full synchronization of the routers of an L3 agent.
+
+The router updates of a full synchronization are processed by the
+workers of the agent while a few routers keep receiving updates through
+RPC, once with a queue keeping every update as the agent used to and once
+with the queue merging the updates of a router. Processing a router is
+replaced by a fixed delay. The time the synchronization took, the number
+of times routers were processed and the delay until the routers updated
+through RPC were processed are reported, along with the largest number of
+updates waiting in the queue. A synchronization still running after the
+timeout is stopped, the number of routers it processed telling how far it
+got.
+"""
+
+from __future__ import print_function
+
+import eventlet
+eventlet.monkey_patch()
+
+import argparse
+import Queue
+import random
+import sys
+import time
+
+from oslo.config import cfg
+
+from neutron.agent.l3 import agent as l3_agent
+from neutron.agent.l3 import router_processing_queue as queue
+
+
+class LegacyQueue(object):
+    """The queue of the agent before updates were merged."""
+
+    def __init__(self):
+        self._queue = Queue.PriorityQueue()
+
+    def add(self, update):
+        self._queue.put(update)
+
+    def get_stats(self):
+        return {'queue_depth': self._queue.qsize()}
+
+    def each_update_to_next_router(self):
+        next_update = self._queue.get()
+        with queue.ExclusiveRouterProcessor(next_update.id) as rp:
+            rp.queue_update(next_update)
+            for update in rp.updates():
+                yield (rp, update)
+
+
+class PluginApi(object):
+    def get_routers(self, context, router_ids=None):
+        eventlet.sleep(0.005)
+        return [{'id': router_id} for router_id in router_ids]
+
+
+class Agent(l3_agent.L3NATAgent):
+    """The router processing of the agent only."""
+
+    def __init__(self, routers_queue, delay):
+        self.conf = cfg.CONF
+        self.context = None
+        self.plugin_rpc = PluginApi()
+        self.fullsync = False
+        self._queue = routers_queue
+        self.delay = delay
+        self.processed = []
+
+    def _process_router_if_compatible(self, router):
+        self.processed.append((router['id'], time.time()))
+        eventlet.sleep(self.delay)
+
+    def _router_removed(self, router_id):
+        pass
+
+
+def replay(args, routers_queue):
+    agent = Agent(routers_queue, args.delay)
+    routers = ['router-%d' % i for i in range(args.routers)]
+    # Fresh routers, whatever was processed by the previous run
+    queue.ExclusiveRouterProcessor._router_timestamps.clear()
+    start = time.time()
+    for router_id in routers:
+        agent._queue.add(queue.RouterUpdate(
+            router_id, queue.PRIORITY_SYNC_ROUTERS_TASK,
+            router={'id': router_id}))
+    loop = eventlet.spawn(agent._process_routers_loop)
+
+    sent = []
+    chatty = routers[:args.chatty]
+
+    depths = [0]
+
+    def rpc_updates():
+        rng = random.Random(0)
+        while (len(set(r for r, t in agent.processed)) < len(routers) and
+               time.time() - start < args.timeout):
+            router_id = rng.choice(chatty)
+            sent.append((router_id, time.time()))
+            agent._queue.add(queue.RouterUpdate(router_id,
+                                                queue.PRIORITY_RPC))
+            depths.append(agent._queue.get_stats()['queue_depth'])
+            eventlet.sleep(1.0 / args.rate)
+
+    eventlet.spawn(rpc_updates).wait()
+    duration = time.time() - start
+    synced = len(set(r for r, t in agent.processed))
+    # Let the workers finish before the next run reuses the routers
+    while queue.ExclusiveRouterProcessor._masters:
+        eventlet.sleep(0.01)
+    loop.kill()
+
+    latencies = []
+    for router_id, sent_at in sent:
+        processed_at = [t for r, t in agent.processed
+                        if r == router_id and t >= sent_at]
+        if processed_at:
+            latencies.append(processed_at[0] - sent_at)
+    return (duration, synced, len(agent.processed), max(depths),
+            sum(latencies) / len(latencies), max(latencies))
+
+
+def run(args):
+    cfg.CONF.register_opts(l3_agent.L3NATAgent.OPTS)
+    cfg.CONF.set_override('router_processing_workers', args.workers)
+    print('%d routers, %d workers, %d RPC updates/s on %d routers' %
+          (args.routers, args.workers, args.rate, args.chatty))
+    print('%-10s %10s %10s %10s %10s %14s %13s' %
+          ('queue', 'sync (s)', 'synced', 'processed', 'max depth',
+           'RPC mean (ms)', 'RPC max (ms)'))
+    for name, routers_queue in (('legacy', LegacyQueue()),
+                                ('merging', queue.RouterProcessingQueue())):
+        duration, synced, processed, depth, mean, worst = replay(
+            args, routers_queue)
+        print('%-10s %10.2f %10d %10d %10d %14.1f %13.1f' %
+              (name, duration, synced, processed, depth, mean * 1000,
+               worst * 1000))
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument('--routers', type=int, default=1000)
+    parser.add_argument('--workers', type=int, default=8)
+    parser.add_argument('--delay', type=float, default=0.05)
+    parser.add_argument('--chatty', type=int, default=5)
+    parser.add_argument('--rate', type=int, default=200)
+    parser.add_argument('--timeout', type=float, default=60)
+    run(parser.parse_args())
+
+
+if __name__ == '__main__':
+    sys.exit(main())
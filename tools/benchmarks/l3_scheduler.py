@@ -0,0 +1,160 @@
+# Copyright 2015 OpenStack Foundation
+#
+#    Licensed under the Apache License, Version 2.0 (the "License"); you may
+#    not use this file except in compliance with the License. You may obtain
+#    a copy of the License at
+#
+#         http://www.apache.org/licenses/LICENSE-2.0
+#
+#    Unless required by applicable law or agreed to in writing, software
+#    distributed under the License is distributed on an "AS IS" BASIS, WITHOUT
+#    WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied. See the
+#    License for the specific language governing permissions and limitations
+#    under the License.
+
+"""Simulate the failover of the routers hosted by a dead L3 agent.
+
+All the routers start on one agent which is then considered dead. For
+each scheduler, the routers are rescheduled either one at a time or in a
+single batch, and the runtime, number of notifications and resulting
+balance of the surviving agents load are reported.
+"""
+
+from __future__ import print_function
+
+import argparse
+import datetime
+import math
+import sys
+import time
+
+from oslo.config import cfg
+from oslo.utils import timeutils
+
+from neutron.common import config
+from neutron.common import constants
+from neutron.common import topics
+from neutron import context
+from neutron.db import agents_db
+from neutron.db import api as db_api
+from neutron.db import common_db_mixin
+from neutron.db import l3_agentschedulers_db
+from neutron.db import l3_db
+from neutron.db.migration.models import head  # noqa
+from neutron.db import model_base
+from neutron.scheduler import l3_agent_scheduler
+
+
+SCHEDULERS = {
+    'chance': l3_agent_scheduler.ChanceScheduler,
+    'leastrouters': l3_agent_scheduler.LeastRoutersScheduler,
+}
+
+
+class CountingNotifier(object):
+
+    def __init__(self):
+        self.calls = 0
+
+    def router_added_to_agent(self, context, router_ids, host):
+        self.calls += 1
+
+    def router_removed_from_agent(self, context, router_id, host):
+        self.calls += 1
+
+
+class FakePlugin(common_db_mixin.CommonDbMixin,
+                 l3_db.L3_NAT_db_mixin,
+                 l3_agentschedulers_db.L3AgentSchedulerDbMixin):
+    """Only the DB methods used by the schedulers are needed."""
+
+
+def reset_db(engine):
+    model_base.BASEV2.metadata.drop_all(engine)
+    model_base.BASEV2.metadata.create_all(engine)
+
+
+def populate(ctx, n_agents, n_routers):
+    now = timeutils.utcnow()
+    with ctx.session.begin():
+        agents = []
+        for i in range(n_agents + 1):
+            agent = agents_db.Agent(
+                binary='neutron-l3-agent', host='host-%d' % i,
+                topic=topics.L3_AGENT, configurations='{}',
+                agent_type=constants.AGENT_TYPE_L3, created_at=now,
+                started_at=now, heartbeat_timestamp=now)
+            ctx.session.add(agent)
+            agents.append(agent)
+        dead_agent = agents[0]
+        dead_agent.heartbeat_timestamp = now - datetime.timedelta(hours=1)
+        for i in range(n_routers):
+            router_id = 'router-%d' % i
+            ctx.session.add(l3_db.Router(id=router_id, tenant_id='tenant',
+                                         admin_state_up=True))
+            ctx.session.add(l3_agentschedulers_db.RouterL3AgentBinding(
+                router_id=router_id, l3_agent=dead_agent))
+    return ['router-%d' % i for i in range(n_routers)]
+
+
+def get_load(ctx):
+    binding = l3_agentschedulers_db.RouterL3AgentBinding
+    load = dict((agent.id, 0) for agent in
+                ctx.session.query(agents_db.Agent).filter(
+                    agents_db.Agent.host != 'host-0'))
+    for (agent_id,) in ctx.session.query(binding.l3_agent_id):
+        if agent_id in load:
+            load[agent_id] += 1
+    return load.values()
+
+
+def stats(values):
+    mean = float(sum(values)) / len(values)
+    stddev = math.sqrt(sum((v - mean) ** 2 for v in values) / len(values))
+    return '%6d %6d %9.1f %8.1f' % (min(values), max(values), mean, stddev)
+
+
+def run(args):
+    config.init([])
+    cfg.CONF.set_override('connection', 'sqlite://', 'database')
+    engine = db_api.get_engine()
+
+    print('%d routers failing over to %d agents' %
+          (args.routers, args.agents))
+    print('%-12s %-6s %8s %8s | %-33s' %
+          ('', '', '', '', 'routers per agent'))
+    print('%-12s %-6s %8s %8s | %6s %6s %9s %8s' %
+          ('scheduler', 'mode', 'time (s)', 'notifs',
+           'min', 'max', 'mean', 'stddev'))
+    for name in args.schedulers:
+        for mode in ('single', 'bulk'):
+            reset_db(engine)
+            ctx = context.get_admin_context()
+            router_ids = populate(ctx, args.agents, args.routers)
+            plugin = FakePlugin()
+            plugin.router_scheduler = SCHEDULERS[name]()
+            notifier = CountingNotifier()
+            plugin.agent_notifiers = {constants.AGENT_TYPE_L3: notifier}
+            start = time.time()
+            if mode == 'bulk':
+                plugin.reschedule_routers(ctx, router_ids)
+            else:
+                for router_id in router_ids:
+                    plugin.reschedule_router(ctx, router_id)
+            elapsed = time.time() - start
+            print('%-12s %-6s %8.2f %8d | %s' %
+                  (name, mode, elapsed, notifier.calls,
+                   stats(get_load(ctx))))
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument('--agents', type=int, default=10)
+    parser.add_argument('--routers', type=int, default=800)
+    parser.add_argument('--schedulers', nargs='+', default=sorted(SCHEDULERS),
+                        choices=sorted(SCHEDULERS))
+    run(parser.parse_args())
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,107 @@
+# Copyright 2015 OpenStack Foundation
+#
+#    Licensed under the Apache License, Version 2.0 (the "License"); you may
+#    not use this file except in compliance with the License. You may obtain
+#    a copy of the License at
+#
+#         http://www.apache.org/licenses/LICENSE-2.0
+#
+#    Unless required by applicable law or agreed to in writing, software
+#    distributed under the License is distributed on an "AS IS" BASIS, WITHOUT
+#    WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied. See the
+#    License for the specific language governing permissions and limitations
+#    under the License.
+
+"""Measure how fast the LinuxBridge agent programs l2population entries.
+
+A synthetic fdb_add message for the ports of many remote VTEPs is applied
+to a real vxlan interface, once entry by entry as the agent used to and
+once with the bridge FDB changes in batch mode, then sent again as
+l2population does when agents resynchronize. The time taken and the
+number of processes spawned are reported for each step. Creating the vxlan
+interface requires root privileges.
+"""
+
+from __future__ import print_function
+
+import argparse
+import subprocess
+import sys
+import time
+
+from neutron.agent.linux import utils
+from neutron.common import constants
+from neutron.plugins.common import constants as p_const
+from neutron.plugins.linuxbridge.agent import linuxbridge_neutron_agent as lb
+from neutron.plugins.linuxbridge.common import constants as lconst
+
+NETWORK_ID = 'benchmark'
+SEGMENTATION_ID = 4242
+INTERFACE = 'vxlan-%d' % SEGMENTATION_ID
+
+
+class Agent(object):
+    def __init__(self):
+        self.br_mgr = lb.LinuxBridgeManager({}, None)
+        self.br_mgr.vxlan_mode = lconst.VXLAN_UCAST
+        self.br_mgr.network_map[NETWORK_ID] = lb.NetworkSegment(
+            p_const.TYPE_VXLAN, None, SEGMENTATION_ID)
+
+
+def fdb_entries(entries, vteps):
+    ports = {}
+    for i in range(entries):
+        agent_ip = '10.%d.0.1' % (i % vteps + 1)
+        ports.setdefault(agent_ip, [constants.FLOODING_ENTRY]).append(
+            ['fa:16:3e:%02x:%02x:%02x' % (i >> 16, (i >> 8) & 255, i & 255),
+             '192.168.%d.%d' % (i >> 8, i & 255)])
+    return {NETWORK_ID: {'ports': ports,
+                         'network_type': p_const.TYPE_VXLAN,
+                         'segment_id': SEGMENTATION_ID}}
+
+
+def run(args):
+    processes = [0]
+    execute = utils.execute
+
+    def counting_execute(*a, **kw):
+        processes[0] += 1
+        return execute(*a, **kw)
+    utils.execute = counting_execute
+
+    callbacks = lb.LinuxBridgeRpcCallbacks(None, Agent())
+    entries = fdb_entries(args.entries, args.vteps)
+    print('%d entries, %d remote VTEPs' % (args.entries, args.vteps))
+    print('%-20s %10s %10s' % ('step', 'time (s)', 'processes'))
+    try:
+        for step, apply in (('per entry',
+                             lambda cb, e: cb._add_fdb_entries(e)),
+                            ('batched', lambda cb, e: cb.fdb_add(None, e)),
+                            ('batched, unchanged',
+                             lambda cb, e: cb.fdb_add(None, e))):
+            if step != 'batched, unchanged':
+                subprocess.check_call(['ip', 'link', 'add', INTERFACE,
+                                       'type', 'vxlan', 'id',
+                                       str(SEGMENTATION_ID), 'dstport',
+                                       '4789', 'nolearning'])
+                callbacks.agent.br_mgr.forget_fdb_entries(INTERFACE)
+            processes[0] = 0
+            start = time.time()
+            apply(callbacks, entries)
+            print('%-20s %10.2f %10d' % (step, time.time() - start,
+                                         processes[0]))
+            if step == 'per entry':
+                subprocess.check_call(['ip', 'link', 'del', INTERFACE])
+    finally:
+        subprocess.call(['ip', 'link', 'del', INTERFACE])
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument('--entries', type=int, default=5000)
+    parser.add_argument('--vteps', type=int, default=50)
+    run(parser.parse_args())
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,124 @@
+# Copyright 2015 OpenStack Foundation
+#
+#    Licensed under the Apache License, Version 2.0 (the "License"); you may
+#    not use this file except in compliance with the License. You may obtain
+#    a copy of the License at
+#
+#         http://www.apache.org/licenses/LICENSE-2.0
+#
+#    Unless required by applicable law or agreed to in writing, software
+#    distributed under the License is distributed on an "AS IS" BASIS, WITHOUT
+#    WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied. See the
+#    License for the specific language governing permissions and limitations
+#    under the License.
+
+"""Measure how long the LinuxBridge agent takes to notice new taps.
+
+The agent loop runs with its device processing replaced by a recorder,
+once polling the taps every polling interval and once woken up by the
+link monitor. Tap devices are created at random times, and the delay
+until the loop processes them as well as the number of scans of all the
+devices while nothing changes are reported. Creating the taps requires
+root privileges.
+"""
+
+from __future__ import print_function
+
+import eventlet
+eventlet.monkey_patch()
+
+import argparse
+import random
+import subprocess
+import sys
+import time
+
+from oslo.config import cfg
+
+from neutron.agent.linux import link_monitor
+from neutron.common import constants
+from neutron.plugins.linuxbridge.agent import linuxbridge_neutron_agent as lb
+
+PREFIX = constants.TAP_DEVICE_PREFIX + 'bench'
+
+
+class Agent(lb.LinuxBridgeNeutronAgentRPC):
+    """The agent loop only, without RPC nor bridge configuration."""
+
+    def __init__(self, polling_interval, monitor_links):
+        self.polling_interval = polling_interval
+        self.root_helper = None
+        self.updated_devices = set()
+        self.br_mgr = lb.LinuxBridgeManager({}, None)
+        self.link_monitor = None
+        if monitor_links:
+            self.link_monitor = link_monitor.LinkMonitor(
+                prefix=constants.TAP_DEVICE_PREFIX)
+        self.scans = 0
+        self.processed = {}
+
+    def scan_devices(self, previous, sync):
+        self.scans += 1
+        return super(Agent, self).scan_devices(previous, sync)
+
+    def process_network_devices(self, device_info):
+        now = time.time()
+        for device in device_info['added']:
+            self.processed.setdefault(device, now)
+        return False
+
+
+def ip_tuntap(action, name):
+    subprocess.check_call(['ip', 'tuntap', action, 'dev', name,
+                           'mode', 'tap'])
+
+
+def run_mode(args, monitor_links):
+    agent = Agent(args.polling_interval, monitor_links)
+    loop = eventlet.spawn(agent.daemon_loop)
+    names = ['%s%d' % (PREFIX, i) for i in range(args.taps)]
+    created = {}
+    random.seed(0)
+    try:
+        # Let the first iteration, which processes all the taps, complete
+        eventlet.sleep(args.polling_interval)
+        start_scans = agent.scans
+        eventlet.sleep(args.idle)
+        idle_scans = agent.scans - start_scans
+        for name in names:
+            eventlet.sleep(random.uniform(0, 2 * args.polling_interval))
+            # The tap may be processed before the command returns
+            created[name] = time.time()
+            ip_tuntap('add', name)
+        eventlet.sleep(args.polling_interval + 1)
+    finally:
+        loop.kill()
+        if agent.link_monitor:
+            agent.link_monitor.stop()
+        for name in created:
+            ip_tuntap('del', name)
+    latencies = [1000 * (agent.processed[name] - created[name])
+                 for name in names]
+    return (sum(latencies) / len(latencies), max(latencies), idle_scans)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument('--taps', type=int, default=20)
+    parser.add_argument('--polling-interval', type=int, default=2)
+    parser.add_argument('--idle', type=int, default=20,
+                        help='Seconds without changes to count scans over')
+    args = parser.parse_args()
+    cfg.CONF.set_override('full_scan_interval', 60, 'AGENT')
+
+    print('%d taps, polling interval %ds, %ds idle' %
+          (args.taps, args.polling_interval, args.idle))
+    print('%-10s %16s %16s %12s' %
+          ('mode', 'mean delay (ms)', 'max delay (ms)', 'idle scans'))
+    for name, monitor_links in (('polling', False), ('monitor', True)):
+        mean, worst, idle_scans = run_mode(args, monitor_links)
+        print('%-10s %16.1f %16.1f %12d' % (name, mean, worst, idle_scans))
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,191 @@
+# Copyright 2015 OpenStack Foundation
+#
+#    Licensed under the Apache License, Version 2.0 (the "License"); you may
+#    not use this file except in compliance with the License. You may obtain
+#    a copy of the License at
+#
+#         http://www.apache.org/licenses/LICENSE-2.0
+#
+#    Unless required by applicable law or agreed to in writing, software
+#    distributed under the License is distributed on an "AS IS" BASIS, WITHOUT
+#    WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied. See the
+#    License for the specific language governing permissions and limitations
+#    under the License.
+
+"""Compare one metadata proxy process per router with a multiplexed one.
+
+The proxies listen on local TCP ports of the current namespace instead of
+one namespace per router, so that no privileges are needed, and forward
+the requests to a stand-in for the metadata agent answering on the UNIX
+domain socket. The total RSS of the proxy processes and the throughput of
+requests spread over all the proxies are reported for both setups.
+"""
+
+from __future__ import print_function
+
+import eventlet
+eventlet.monkey_patch()
+
+import argparse
+import httplib
+import os
+import shutil
+import socket
+import subprocess
+import sys
+import tempfile
+import time
+
+import eventlet.wsgi
+from oslo.serialization import jsonutils
+
+from neutron.agent.metadata import agent
+
+NS_PROXY = ('from neutron.agent.metadata import namespace_proxy; '
+            'namespace_proxy.main()')
+MUX_PROXY = ('from neutron.agent.metadata import multiplexed_proxy; '
+             'multiplexed_proxy.main()')
+
+
+class NullLog(object):
+    def write(self, *args):
+        pass
+
+
+def metadata_agent(environ, start_response):
+    router_id = environ.get('HTTP_X_NEUTRON_ROUTER_ID', '')
+    start_response('200 OK', [('Content-Type', 'text/plain')])
+    return [router_id]
+
+
+def start_metadata_agent(path):
+    sock = eventlet.listen(path, family=socket.AF_UNIX, backlog=1024)
+    eventlet.spawn_n(eventlet.wsgi.server, sock, metadata_agent,
+                     protocol=agent.UnixDomainHttpProtocol, log=NullLog())
+
+
+def spawn(code, name, args, tmpdir):
+    with open(os.devnull, 'w') as devnull:
+        return subprocess.Popen(
+            [sys.executable, '-c', code] + args +
+            ['--nodaemonize', '--state_path=%s' % tmpdir,
+             '--pid_file=%s' % os.path.join(tmpdir, '%s.pid' % name),
+             '--metadata_proxy_socket=%s' % os.path.join(tmpdir, 'agent')],
+            stdout=devnull, stderr=devnull)
+
+
+def wait_for(address, family=socket.AF_INET, timeout=120):
+    deadline = time.time() + timeout
+    while True:
+        sock = socket.socket(family, socket.SOCK_STREAM)
+        try:
+            sock.connect(address)
+            return
+        except socket.error:
+            if time.time() > deadline:
+                raise
+            eventlet.sleep(0.1)
+        finally:
+            sock.close()
+
+
+def control(path, request):
+    sock = socket.socket(socket.AF_UNIX, socket.SOCK_STREAM)
+    sock.connect(path)
+    stream = sock.makefile('rw')
+    stream.write(jsonutils.dumps(request) + '\n')
+    stream.flush()
+    reply = jsonutils.loads(stream.readline())
+    sock.close()
+    if reply['status'] != 'ok':
+        raise RuntimeError(reply)
+
+
+def start_per_router(ports, tmpdir):
+    processes = [spawn(NS_PROXY, 'router-%d' % port,
+                       ['--router_id=router-%d' % port,
+                        '--metadata_port=%d' % port], tmpdir)
+                 for port in ports]
+    for port in ports:
+        wait_for(('127.0.0.1', port))
+    return processes
+
+
+def start_multiplexed(ports, tmpdir):
+    control_socket = os.path.join(tmpdir, 'ctl')
+    process = spawn(MUX_PROXY, 'multiplexed',
+                    ['--control_socket=%s' % control_socket], tmpdir)
+    wait_for(control_socket, family=socket.AF_UNIX)
+    for port in ports:
+        control(control_socket, {'command': 'add',
+                                 'uuid': 'router-%d' % port,
+                                 'namespace': None, 'port': port,
+                                 'router_id': 'router-%d' % port})
+    return [process]
+
+
+def rss(processes):
+    total = 0
+    for process in processes:
+        with open('/proc/%d/status' % process.pid) as f:
+            for line in f:
+                if line.startswith('VmRSS:'):
+                    total += int(line.split()[1])
+    return total
+
+
+def get(port):
+    conn = httplib.HTTPConnection('127.0.0.1', port)
+    conn.request('GET', '/latest/meta-data/')
+    body = conn.getresponse().read()
+    conn.close()
+    if body != 'router-%d' % port:
+        raise RuntimeError('Unexpected response from port %d' % port)
+
+
+def throughput(ports, requests, concurrency):
+    pool = eventlet.GreenPool(concurrency)
+    start = time.time()
+    for i in range(requests):
+        pool.spawn_n(get, ports[i % len(ports)])
+    pool.waitall()
+    return requests / (time.time() - start)
+
+
+def run(args):
+    tmpdir = tempfile.mkdtemp()
+    try:
+        start_metadata_agent(os.path.join(tmpdir, 'agent'))
+        print('%d proxies, %d requests, concurrency %d' %
+              (args.proxies, args.requests, args.concurrency))
+        print('%-12s %10s %12s %10s' %
+              ('mode', 'processes', 'RSS (MiB)', 'req/s'))
+        for mode, start in (('per-router', start_per_router),
+                            ('multiplexed', start_multiplexed)):
+            ports = range(args.base_port, args.base_port + args.proxies)
+            processes = start(ports, tmpdir)
+            try:
+                # Let the proxies settle before sampling their memory
+                eventlet.sleep(1)
+                rate = throughput(ports, args.requests, args.concurrency)
+                print('%-12s %10d %12.1f %10.1f' %
+                      (mode, len(processes), rss(processes) / 1024.0, rate))
+            finally:
+                for process in processes:
+                    process.kill()
+                    process.wait()
+    finally:
+        shutil.rmtree(tmpdir)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument('--proxies', type=int, default=20)
+    parser.add_argument('--requests', type=int, default=2000)
+    parser.add_argument('--concurrency', type=int, default=20)
+    parser.add_argument('--base-port', type=int, default=19000)
+    run(parser.parse_args())
+
+
+if __name__ == '__main__':
+    sys.exit(main())
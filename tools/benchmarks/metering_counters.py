@@ -0,0 +1,146 @@
+# Copyright 2015 OpenStack Foundation
+#
+#    Licensed under the Apache License, Version 2.0 (the "License"); you may
+#    not use this file except in compliance with the License. You may obtain
+#    a copy of the License at
+#
+#         http://www.apache.org/licenses/LICENSE-2.0
+#
+#    Unless required by applicable law or agreed to in writing, software
+#    distributed under the License is distributed on an "AS IS" BASIS, WITHOUT
+#    WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied. See the
+#    License for the specific language governing permissions and limitations
+#    under the License.
+
+"""Measure how long the iptables metering driver takes to read counters.
+
+The traffic counters of every label of every router are collected once
+chain by chain, as the driver used to, and once table by table with the
+namespaces processed concurrently. The iptables command is replaced by a
+process taking a fixed time and printing a listing of the chains, so that
+neither root privileges nor iptables are needed. The collection time and
+the number of processes spawned are reported for each grid of routers and
+labels.
+"""
+
+from __future__ import print_function
+
+import eventlet
+eventlet.monkey_patch()
+
+import argparse
+import shutil
+import sys
+import tempfile
+import time
+
+from oslo.config import cfg
+
+from neutron.agent.linux import iptables_manager
+from neutron.agent.linux import utils
+from neutron.common import constants
+from neutron.services.metering.drivers.iptables import iptables_driver
+
+
+class Iptables(object):
+    """Stand-in for the iptables command of many namespaces."""
+
+    def __init__(self, delay):
+        self.delay = delay
+        self.processes = 0
+
+    def execute(self, manager, args, root_helper=None, process_input=None):
+        if '-L' not in args:
+            # Applying the rules is not measured
+            return ''
+        self.processes += 1
+        listing = []
+        for chain in sorted(manager.ipv4['filter'].unwrapped_chains):
+            listing += ['Chain %s (1 references)' % chain,
+                        '    pkts      bytes target     prot opt in     out'
+                        '     source               destination',
+                        '     100    12345            all  --  *      *'
+                        '       0.0.0.0/0            0.0.0.0/0',
+                        '']
+        return utils.execute(['sh', '-c', 'sleep %s; cat' % self.delay],
+                             process_input='\n'.join(listing))
+
+
+def legacy_get_traffic_counters(driver, routers):
+    # The collection before all the chains of a table were read at once
+    accs = {}
+    for router in routers:
+        rm = driver.routers[router['id']]
+        for label_id in rm.metering_labels:
+            chain = iptables_manager.get_chain_name(
+                iptables_driver.WRAP_NAME + iptables_driver.LABEL + label_id,
+                wrap=False)
+            chain_acc = rm.iptables_manager.get_traffic_counters(
+                chain, wrap=False, zero=True)
+            acc = accs.setdefault(label_id, {'pkts': 0, 'bytes': 0})
+            acc['pkts'] += chain_acc['pkts']
+            acc['bytes'] += chain_acc['bytes']
+    return accs
+
+
+def make_driver(iptables, routers, labels):
+    driver = iptables_driver.IptablesMeteringDriver(None, cfg.CONF)
+    router_dicts = []
+    for i in range(routers):
+        router = {'id': 'router-%05d' % i, 'gw_port_id': 'gw-%05d' % i,
+                  'tenant_id': 'tenant',
+                  constants.METERING_LABEL_KEY: [
+                      {'id': '%05d%03d-label' % (i, j), 'rules': []}
+                      for j in range(labels)]}
+        manager = driver._update_router(router).iptables_manager
+        manager.execute = (lambda args, manager=manager, **kwargs:
+                           iptables.execute(manager, args, **kwargs))
+        router_dicts.append(router)
+    driver.add_metering_label(None, router_dicts)
+    return driver, router_dicts
+
+
+def run(args):
+    cfg.CONF.set_override('interface_driver',
+                          'neutron.agent.linux.interface.NullDriver')
+    cfg.CONF.set_override('traffic_counters_workers', args.workers)
+    lock_path = tempfile.mkdtemp()
+    cfg.CONF.set_override('lock_path', lock_path)
+    try:
+        compare(args)
+    finally:
+        shutil.rmtree(lock_path)
+
+
+def compare(args):
+    print('%.3fs per command, %d workers' % (args.delay, args.workers))
+    print('%-8s %8s %-10s %10s %10s' %
+          ('routers', 'labels', 'mode', 'time (s)', 'processes'))
+    for routers in args.routers:
+        for labels in args.labels:
+            iptables = Iptables(args.delay)
+            driver, router_dicts = make_driver(iptables, routers, labels)
+            for mode, collect in (
+                    ('per chain', legacy_get_traffic_counters),
+                    ('per table',
+                     lambda d, r: d.get_traffic_counters(None, r))):
+                iptables.processes = 0
+                start = time.time()
+                accs = collect(driver, router_dicts)
+                assert len(accs) == routers * labels
+                print('%-8d %8d %-10s %10.2f %10d' %
+                      (routers, labels, mode, time.time() - start,
+                       iptables.processes))
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument('--routers', type=int, nargs='+', default=[30, 300])
+    parser.add_argument('--labels', type=int, nargs='+', default=[1, 5])
+    parser.add_argument('--workers', type=int, default=16)
+    parser.add_argument('--delay', type=float, default=0.01)
+    run(parser.parse_args())
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,168 @@
+# Copyright 2015 OpenStack Foundation
+#
+#    Licensed under the Apache License, Version 2.0 (the "License"); you may
+#    not use this file except in compliance with the License. You may obtain
+#    a copy of the License at
+#
+#         http://www.apache.org/licenses/LICENSE-2.0
+#
+#    Unless required by applicable law or agreed to in writing, software
+#    distributed under the License is distributed on an "AS IS" BASIS, WITHOUT
+#    WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied. See the
+#    License for the specific language governing permissions and limitations
+#    under the License.
+
+"""Stress the creation of ports on a network from concurrent threads.
+
+Threads create ports on the same subnet through the ML2 plugin, as
+concurrent boots of instances on a network do. This is done once with each
+port created in one transaction which also allocates its addresses, as
+the plugin used to, and once with the addresses allocated in a transaction
+of their own and the transactions retried on deadlocks. The throughput,
+the deadlocks retried and the ports that failed to be created are
+reported.
+
+SQLite serializes the transactions that write and oslo.db does not report
+its lock errors as deadlocks, so nothing is retried on it; point
+--connection at a MySQL database to see the deadlocks InnoDB detects.
+"""
+
+from __future__ import print_function
+
+import argparse
+import collections
+import logging
+import os
+import shutil
+import sys
+import tempfile
+import threading
+import time
+
+from oslo.config import cfg
+
+from neutron.api.v2 import attributes
+from neutron.common import config
+from neutron.common import rpc as n_rpc
+from neutron import context
+from neutron.db import api as db_api
+from neutron.db.migration.models import head  # noqa
+from neutron.db import model_base
+from neutron import manager
+
+NOT_SPECIFIED = attributes.ATTR_NOT_SPECIFIED
+
+
+class RetryCounter(logging.Handler):
+    """Count the retries of deadlocked transactions."""
+
+    def __init__(self):
+        logging.Handler.__init__(self, logging.DEBUG)
+        self.retries = 0
+
+    def emit(self, record):
+        if 'deadlocked, retrying' in record.msg:
+            self.retries += 1
+
+
+def setup(connection):
+    config.init([])
+    cfg.CONF.set_override('core_plugin',
+                          'neutron.plugins.ml2.plugin.Ml2Plugin')
+    cfg.CONF.set_override('rpc_backend', 'fake')
+    cfg.CONF.set_override('connection', connection, 'database')
+    n_rpc.init(cfg.CONF)
+    model_base.BASEV2.metadata.create_all(db_api.get_engine())
+    return manager.NeutronManager.get_plugin()
+
+
+def create_network(plugin, ctx, index):
+    name = 'network-%d' % index
+    network = plugin.create_network(ctx, {'network': {
+        'name': name, 'admin_state_up': True, 'shared': False,
+        'tenant_id': 'tenant'}})
+    plugin.create_subnet(ctx, {'subnet': {
+        'name': name, 'network_id': network['id'], 'ip_version': 4,
+        'cidr': '10.%d.0.0/16' % index, 'gateway_ip': '10.%d.0.1' % index,
+        'allocation_pools': NOT_SPECIFIED, 'dns_nameservers': NOT_SPECIFIED,
+        'host_routes': NOT_SPECIFIED, 'enable_dhcp': True,
+        'ipv6_ra_mode': NOT_SPECIFIED, 'ipv6_address_mode': NOT_SPECIFIED,
+        'tenant_id': 'tenant'}})
+    return network['id']
+
+
+def port(network_id, i):
+    return {'port': {
+        'name': 'port-%d' % i, 'network_id': network_id,
+        'admin_state_up': True, 'mac_address': NOT_SPECIFIED,
+        'fixed_ips': NOT_SPECIFIED, 'device_id': 'vm-%d' % i,
+        'device_owner': 'compute:nova', 'tenant_id': 'tenant'}}
+
+
+def measure(plugin, network_id, threads, ports, one_transaction):
+    errors = collections.Counter()
+    created = []
+
+    def create(first):
+        ctx = context.get_admin_context()
+        for i in range(first, ports, threads):
+            try:
+                if one_transaction:
+                    with ctx.session.begin(subtransactions=True):
+                        plugin.create_port(ctx, port(network_id, i))
+                else:
+                    plugin.create_port(ctx, port(network_id, i))
+                created.append(i)
+            except Exception as e:
+                errors[type(e).__name__] += 1
+                ctx = context.get_admin_context()
+
+    workers = [threading.Thread(target=create, args=(i,))
+               for i in range(threads)]
+    start = time.time()
+    for worker in workers:
+        worker.start()
+    for worker in workers:
+        worker.join()
+    return len(created) / (time.time() - start), errors
+
+
+def run(args, state_path):
+    plugin = setup(args.connection or
+                   'sqlite:///%s' % os.path.join(state_path, 'neutron.sqlite'))
+    counter = RetryCounter()
+    logger = logging.getLogger('neutron.db.api')
+    logger.setLevel(logging.DEBUG)
+    logger.addHandler(counter)
+    ctx = context.get_admin_context()
+    print('%d ports created by %d threads' % (args.ports, args.threads))
+    print('%-18s %10s %10s  %s' %
+          ('transactions', 'ports/s', 'retries', 'failures'))
+    for index, one_transaction in enumerate((True, False)):
+        network_id = create_network(plugin, ctx, index)
+        counter.retries = 0
+        rate, errors = measure(plugin, network_id, args.threads, args.ports,
+                               one_transaction)
+        print('%-18s %10.1f %10d  %s' %
+              ('one' if one_transaction else 'split and retried', rate,
+               counter.retries,
+               ', '.join('%s: %d' % item for item in sorted(errors.items()))
+               or '-'))
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument('--threads', type=int, default=8)
+    parser.add_argument('--ports', type=int, default=400)
+    parser.add_argument('--connection',
+                        help='database to use instead of a SQLite file')
+    args = parser.parse_args()
+    state_path = tempfile.mkdtemp()
+    try:
+        run(args, state_path)
+    finally:
+        shutil.rmtree(state_path)
+
+
+if __name__ == '__main__':
+    sys.exit(main())
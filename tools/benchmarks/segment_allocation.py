@@ -0,0 +1,159 @@
+# Copyright 2015 OpenStack Foundation
+#
+#    Licensed under the Apache License, Version 2.0 (the "License"); you may
+#    not use this file except in compliance with the License. You may obtain
+#    a copy of the License at
+#
+#         http://www.apache.org/licenses/LICENSE-2.0
+#
+#    Unless required by applicable law or agreed to in writing, software
+#    distributed under the License is distributed on an "AS IS" BASIS, WITHOUT
+#    WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied. See the
+#    License for the specific language governing permissions and limitations
+#    under the License.
+
+"""Measure the synchronization and allocation of VXLAN segments.
+
+The VXLAN type driver synchronizes its pool with a range of VNIs on an
+empty SQLite file and again as a restart would, once reading the whole
+pool as the driver used to and once with the set-based synchronization.
+
+The lower half of the pool is then marked allocated and tenant segments
+are allocated by rounds of concurrent allocations: each round, as many
+allocations as the concurrency select a segment before any of them marks
+its segment allocated, as allocations racing on a database do. This is
+done once taking the first unallocated segment, as the drivers used to,
+and once picking one from a random start. The time taken by a selection
+and the share of the selections that lost their segment to another
+allocation, which then has to select again, are reported.
+"""
+
+from __future__ import print_function
+
+import argparse
+import os
+import shutil
+import sys
+import tempfile
+import time
+
+from oslo.config import cfg
+from six import moves
+import sqlalchemy
+
+from neutron.common import config
+from neutron.db import api as db_api
+from neutron.plugins.ml2.drivers import type_vxlan
+
+BULK_SIZE = 100
+
+
+def legacy_sync(driver):
+    """Synchronize the pool as the VXLAN driver used to."""
+    vxlan_vnis = set()
+    for tun_min, tun_max in driver.tunnel_ranges:
+        vxlan_vnis |= set(moves.xrange(tun_min, tun_max + 1))
+
+    session = db_api.get_session()
+    with session.begin(subtransactions=True):
+        allocs = (session.query(type_vxlan.VxlanAllocation).
+                  with_lockmode("update").all())
+        existing_vnis = set(alloc.vxlan_vni for alloc in allocs)
+        vnis_to_remove = [alloc.vxlan_vni for alloc in allocs
+                          if (alloc.vxlan_vni not in vxlan_vnis and
+                              not alloc.allocated)]
+        for i in range(0, len(vnis_to_remove), BULK_SIZE):
+            session.query(type_vxlan.VxlanAllocation).filter(
+                type_vxlan.VxlanAllocation.vxlan_vni.in_(
+                    vnis_to_remove[i:i + BULK_SIZE])).delete(
+                        synchronize_session=False)
+        vnis = list(vxlan_vnis - existing_vnis)
+        for i in range(0, len(vnis), BULK_SIZE):
+            session.execute(type_vxlan.VxlanAllocation.__table__.insert(),
+                            [{'vxlan_vni': vni, 'allocated': False}
+                             for vni in vnis[i:i + BULK_SIZE]])
+
+
+def first_segment(select, key, lowest, highest):
+    """Select the segment as the drivers used to."""
+    alloc = select.first()
+    return {'vxlan_vni': alloc.vxlan_vni} if alloc else None
+
+
+def contend(driver, vnis, concurrency, networks):
+    session = db_api.get_session()
+    model = driver.model
+    key = getattr(model, driver.segmentation_key)
+    with session.begin():
+        session.query(model).filter(key <= vnis / 2).update(
+            {'allocated': True}, synchronize_session=False)
+    selections = lost = 0
+    selecting = 0.0
+    for i in range(networks / concurrency):
+        with session.begin():
+            select = session.query(model).filter_by(allocated=False)
+            lowest, highest = session.query(sqlalchemy.func.min(key),
+                                            sqlalchemy.func.max(key)).one()
+            start = time.time()
+            segments = [driver._select_random_segment(select, key, lowest,
+                                                      highest)
+                        for j in range(concurrency)]
+            selecting += time.time() - start
+            selections += concurrency
+            for segment in segments:
+                if not select.filter_by(**segment).update(
+                        {'allocated': True}, synchronize_session=False):
+                    lost += 1
+    return 1000 * selecting / selections, 100.0 * lost / selections
+
+
+def measure(args, state_path, legacy):
+    cfg.CONF.set_override(
+        'connection', 'sqlite:///%s' % os.path.join(
+            state_path, 'neutron-%s.sqlite' % legacy), 'database')
+    cfg.CONF.set_override('vni_ranges', ['1:%d' % args.vnis],
+                          'ml2_type_vxlan')
+    db_api._FACADE = None
+    type_vxlan.VxlanAllocation.__table__.create(db_api.get_engine())
+    driver = type_vxlan.VxlanTypeDriver()
+    if legacy:
+        driver.sync_allocations = lambda: legacy_sync(driver)
+        driver._select_random_segment = first_segment
+    timings = []
+    for sync in ('first', 'restart'):
+        start = time.time()
+        driver.initialize()
+        timings.append(time.time() - start)
+    return timings + list(contend(driver, args.vnis, args.concurrency,
+                                  args.networks))
+
+
+def run(args, state_path):
+    config.init([])
+    print('%d VNIs, %d networks allocated %d at a time' %
+          (args.vnis, args.networks, args.concurrency))
+    print('%-10s %14s %16s %16s %18s' %
+          ('driver', 'first sync (s)', 'restart sync (s)',
+           'ms/selection', 'selections lost (%)'))
+    for legacy in (True, False):
+        first, restart, selection, lost = measure(args, state_path, legacy)
+        print('%-10s %14.2f %16.2f %16.2f %18.1f' %
+              ('legacy' if legacy else 'current', first, restart,
+               selection, lost))
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument('--vnis', type=int, default=200000)
+    parser.add_argument('--networks', type=int, default=400)
+    parser.add_argument('--concurrency', type=int, default=8)
+    args = parser.parse_args()
+    state_path = tempfile.mkdtemp()
+    try:
+        run(args, state_path)
+    finally:
+        shutil.rmtree(state_path)
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,156 @@
+# Copyright 2015 OpenStack Foundation
+#
+#    Licensed under the Apache License, Version 2.0 (the "License"); you may
+#    not use this file except in compliance with the License. You may obtain
+#    a copy of the License at
+#
+#         http://www.apache.org/licenses/LICENSE-2.0
+#
+#    Unless required by applicable law or agreed to in writing, software
+#    distributed under the License is distributed on an "AS IS" BASIS, WITHOUT
+#    WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied. See the
+#    License for the specific language governing permissions and limitations
+#    under the License.
+
+"""Measure the time neutron-server takes to answer its first request.
+
+Each run starts a new process which loads the plugins and the API
+application from the configuration files, as neutron-server does, and
+lists the networks. The runs are done without extension manifest, with
+the manifest written by the run itself and with the manifest written by
+a previous run. The time from the start of the process to the first
+response, the time spent importing extension files and the number of
+extension files imported are reported, averaged over the runs.
+"""
+
+from __future__ import print_function
+
+import argparse
+import os
+import shutil
+import subprocess
+import sys
+import tempfile
+import time
+
+from oslo.config import cfg
+from oslo.serialization import jsonutils
+import webob
+
+from neutron.api import extensions
+from neutron.common import config
+from neutron import context
+
+CONFIG = """
+[DEFAULT]
+core_plugin = neutron.plugins.ml2.plugin.Ml2Plugin
+service_plugins = neutron.services.l3_router.l3_router_plugin.L3RouterPlugin,
+    neutron.services.metering.metering_plugin.MeteringPlugin
+rpc_backend = fake
+auth_strategy = noauth
+api_paste_config = %(paste)s
+state_path = %(state_path)s
+lock_path = %(state_path)s
+api_extensions_manifest = %(manifest)s
+
+[database]
+connection = sqlite:///%(state_path)s/neutron.sqlite
+
+[ml2]
+mechanism_drivers = openvswitch
+"""
+
+
+def first_request(config_file):
+    """Start the API as neutron-server does and list the networks."""
+    imports = []
+    load_source = extensions.imp.load_source
+
+    def timed_load_source(*args):
+        start = time.time()
+        try:
+            return load_source(*args)
+        finally:
+            imports.append(time.time() - start)
+    extensions.imp.load_source = timed_load_source
+
+    config.init(['--config-file', config_file])
+    app = config.load_paste_app('neutron')
+    request = webob.Request.blank('/v2.0/networks.json')
+    request.environ['neutron.context'] = context.get_admin_context()
+    response = request.get_response(app)
+    assert response.status_int == 200, response.status
+    print(jsonutils.dumps({'imports': len(imports),
+                           'import_time': sum(imports)}))
+
+
+def create_database(state_path):
+    # The models are imported in this process only, they would import
+    # the extension files ahead of the server otherwise
+    from neutron.db import api as db_api
+    from neutron.db.migration.models import head  # noqa
+    from neutron.db import model_base
+
+    cfg.CONF.set_override('connection',
+                          'sqlite:///%s/neutron.sqlite' % state_path,
+                          'database')
+    model_base.BASEV2.metadata.create_all(db_api.get_engine())
+
+
+def start_server(config_file):
+    start = time.time()
+    output = subprocess.check_output(
+        [sys.executable, __file__, '--child', config_file])
+    result = jsonutils.loads(output.splitlines()[-1])
+    result['time'] = time.time() - start
+    return result
+
+
+def run(args):
+    state_path = tempfile.mkdtemp()
+    try:
+        compare(args, state_path)
+    finally:
+        shutil.rmtree(state_path)
+
+
+def compare(args, state_path):
+    create_database(state_path)
+    paste = os.path.join(os.path.dirname(__file__), '..', '..', 'etc',
+                         'api-paste.ini')
+    manifest = os.path.join(state_path, 'api_extensions.json')
+    print('%d runs' % args.runs)
+    print('%-10s %22s %18s %10s' %
+          ('manifest', 'first response (s)', 'extensions (s)', 'imported'))
+    for mode in ('none', 'cold', 'warm'):
+        config_file = os.path.join(state_path, '%s.conf' % mode)
+        with open(config_file, 'w') as f:
+            f.write(CONFIG % {'paste': os.path.abspath(paste),
+                              'state_path': state_path,
+                              'manifest': manifest if mode != 'none' else ''})
+        results = []
+        for i in range(args.runs):
+            if mode == 'cold' and os.path.exists(manifest):
+                os.unlink(manifest)
+            results.append(start_server(config_file))
+        print('%-10s %22.2f %18.3f %10d' %
+              (mode,
+               sum(r['time'] for r in results) / args.runs,
+               sum(r['import_time'] for r in results) / args.runs,
+               results[-1]['imports']))
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument('--runs', type=int, default=5)
+    parser.add_argument('--child', metavar='CONFIG_FILE',
+                        help=argparse.SUPPRESS)
+    args = parser.parse_args()
+    if args.child:
+        first_request(args.child)
+    else:
+        run(args)
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,168 @@
+# Copyright 2015 OpenStack Foundation
+#
+#    Licensed under the Apache License, Version 2.0 (the "License"); you may
+#    not use this file except in compliance with the License. You may obtain
+#    a copy of the License at
+#
+#         http://www.apache.org/licenses/LICENSE-2.0
+#
+#    Unless required by applicable law or agreed to in writing, software
+#    distributed under the License is distributed on an "AS IS" BASIS, WITHOUT
+#    WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied. See the
+#    License for the specific language governing permissions and limitations
+#    under the License.
+
+"""Measure the memory used by the API workers of neutron-server.
+
+A server process loads the plugins and the API application from the
+configuration files and forks its API workers, as neutron-server does,
+once as it used to and once readied for the fork. The networks are then
+listed a number of times, so that every worker handles requests, and the
+memory of the workers is read from /proc. The resident set size (RSS),
+the proportional set size (PSS) and the private memory of a worker are
+reported, along with the PSS of the server and its workers together.
+"""
+
+from __future__ import print_function
+
+import eventlet
+eventlet.monkey_patch()
+
+import argparse
+import httplib
+import os
+import shutil
+import signal
+import subprocess
+import sys
+import tempfile
+import time
+
+from oslo.config import cfg
+
+from neutron.agent.linux import utils
+from neutron.common import config
+from neutron import service
+
+CONFIG = """
+[DEFAULT]
+core_plugin = neutron.plugins.ml2.plugin.Ml2Plugin
+service_plugins = neutron.services.l3_router.l3_router_plugin.L3RouterPlugin,
+    neutron.services.metering.metering_plugin.MeteringPlugin
+rpc_backend = fake
+auth_strategy = noauth
+api_paste_config = %(paste)s
+state_path = %(state_path)s
+lock_path = %(state_path)s
+bind_host = 127.0.0.1
+bind_port = 0
+api_workers = %(workers)d
+
+[database]
+connection = sqlite:///%(state_path)s/neutron.sqlite
+
+[ml2]
+mechanism_drivers = openvswitch
+"""
+
+
+def serve(config_file, mode):
+    """Start the API workers as neutron-server does."""
+    config.init(['--config-file', config_file])
+    if mode == 'legacy':
+        service._prepare_workers_fork = lambda: None
+    server = service._run_wsgi('neutron')
+    print(server.port)
+    sys.stdout.flush()
+    server.wait()
+
+
+def create_database(state_path):
+    from neutron.db import api as db_api
+    from neutron.db.migration.models import head  # noqa
+    from neutron.db import model_base
+
+    cfg.CONF.set_override('connection',
+                          'sqlite:///%s/neutron.sqlite' % state_path,
+                          'database')
+    model_base.BASEV2.metadata.create_all(db_api.get_engine())
+
+
+def read_memory(pid):
+    """Return the RSS, PSS and private memory of a process in kB."""
+    memory = {'Rss': 0, 'Pss': 0, 'Private_Clean': 0, 'Private_Dirty': 0}
+    with open('/proc/%s/smaps' % pid) as f:
+        for line in f:
+            field, _sep, value = line.partition(':')
+            if field in memory:
+                memory[field] += int(value.split()[0])
+    return (memory['Rss'], memory['Pss'],
+            memory['Private_Clean'] + memory['Private_Dirty'])
+
+
+def measure(config_file, mode, requests):
+    server = subprocess.Popen(
+        [sys.executable, __file__, '--serve', config_file, '--mode', mode],
+        stdout=subprocess.PIPE)
+    try:
+        port = int(server.stdout.readline())
+        for i in range(requests):
+            connection = httplib.HTTPConnection('127.0.0.1', port)
+            connection.request('GET', '/v2.0/networks.json')
+            assert connection.getresponse().status == 200
+            connection.close()
+        time.sleep(1)
+        workers = [read_memory(pid)
+                   for pid in utils.find_child_pids(str(server.pid))]
+        parent = read_memory(server.pid)
+    finally:
+        server.send_signal(signal.SIGTERM)
+        server.wait()
+    mean = [sum(column) / len(workers) / 1024.0 for column in zip(*workers)]
+    total = (parent[1] + sum(worker[1] for worker in workers)) / 1024.0
+    return len(workers), mean, total
+
+
+def run(args):
+    state_path = tempfile.mkdtemp()
+    try:
+        compare(args, state_path)
+    finally:
+        shutil.rmtree(state_path)
+
+
+def compare(args, state_path):
+    create_database(state_path)
+    paste = os.path.join(os.path.dirname(__file__), '..', '..', 'etc',
+                         'api-paste.ini')
+    config_file = os.path.join(state_path, 'neutron.conf')
+    with open(config_file, 'w') as f:
+        f.write(CONFIG % {'paste': os.path.abspath(paste),
+                          'state_path': state_path,
+                          'workers': args.workers})
+    print('%d API workers, %d requests' % (args.workers, args.requests))
+    print('%-10s %8s %14s %14s %18s %15s' %
+          ('mode', 'workers', 'RSS (MB)', 'PSS (MB)', 'private (MB)',
+           'total PSS (MB)'))
+    for mode in ('legacy', 'prepared'):
+        workers, mean, total = measure(config_file, mode, args.requests)
+        print('%-10s %8d %14.1f %14.1f %18.1f %15.1f' %
+              ((mode, workers) + tuple(mean) + (total,)))
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument('--workers', type=int, default=32)
+    parser.add_argument('--requests', type=int, default=640)
+    parser.add_argument('--serve', metavar='CONFIG_FILE',
+                        help=argparse.SUPPRESS)
+    parser.add_argument('--mode', help=argparse.SUPPRESS)
+    args = parser.parse_args()
+    if args.serve:
+        serve(args.serve, args.mode)
+    else:
+        run(args)
+
+
+if __name__ == '__main__':
+    sys.exit(main())